@@ -22,6 +22,14 @@ from database.position import PortfolioPositions
 from database.valuation import PortfolioValuationDaily, PortfolioReturns
 from database.stock_data import CompanyMarketData, StockPriceHistory
 from database.fx import FxRate
+from database.scan_cache import ScanResultCache
+from database.ingestion_watermark import IngestionWatermark
+from database.screening_facts import CompanyScreeningFacts
+from database.account_ledger import AccountLedgerCheckpoint
+from database.rematerialization import RematerializationRequest
+from database.realized_pnl import RealizedPnlEntry
+from database.latest_bar import CompanyLatestBar
+from database.industry_aggregate import IndustryAggregate
 
 # If you have any other models, import them here too
 from database.user import User, Invitation
@@ -0,0 +1,143 @@
+"""add_industry_aggregates
+
+Revision ID: 3b7e1d9c4a52
+Revises: 9d4f2a6c1e85
+Create Date: 2026-10-19 23:18:42.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1d9c4a52'
+down_revision: Union[str, None] = '9d4f2a6c1e85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_METRICS = ('pe_ratio', 'ev_ebitda', 'p_b_ratio', 'dividend_yield')
+
+# Snapshot of services/industry_aggregate_service._REFRESH_SQL at this revision
+BACKFILL_SQL = """
+WITH peers AS (
+    SELECT
+        c.company_id,
+        c.market_id,
+        c.industry,
+        CASE WHEN f.current_price IS NOT NULL AND COALESCE(NULLIF(f.diluted_eps, 0), f.basic_eps) > 0
+            THEN f.current_price / COALESCE(NULLIF(f.diluted_eps, 0), f.basic_eps)
+        END AS pe_ratio,
+        CASE WHEN f.ebitda <> 0 THEN
+            COALESCE(
+                f.enterprise_value,
+                COALESCE(f.shares_outstanding * f.current_price, 0)
+                    + COALESCE(f.total_debt, 0) - COALESCE(f.cash_and_cash_equivalents, 0)
+            ) / f.ebitda
+        END AS ev_ebitda,
+        CASE WHEN f.current_price IS NOT NULL AND f.enterprise_value <> 0 AND f.shares_outstanding <> 0
+                AND f.enterprise_value - COALESCE(f.total_debt, 0) + COALESCE(f.cash_and_cash_equivalents, 0) <> 0
+            THEN f.current_price / NULLIF(
+                (f.enterprise_value - COALESCE(f.total_debt, 0) + COALESCE(f.cash_and_cash_equivalents, 0))
+                    / f.shares_outstanding,
+                0
+            )
+        END AS p_b_ratio,
+        CASE WHEN f.shares_outstanding <> 0 AND f.current_price <> 0
+            THEN COALESCE(f.dividends_paid, 0) / (f.shares_outstanding * f.current_price)
+        END AS dividend_yield
+    FROM companies c
+    JOIN company_financials f ON f.company_id = c.company_id
+    WHERE c.industry IS NOT NULL AND c.market_id IS NOT NULL
+)
+INSERT INTO industry_aggregates (
+    market_id, industry, peer_count, company_ids,
+    pe_ratio_values, pe_ratio_p25, pe_ratio_median, pe_ratio_p75,
+    ev_ebitda_values, ev_ebitda_p25, ev_ebitda_median, ev_ebitda_p75,
+    p_b_ratio_values, p_b_ratio_p25, p_b_ratio_median, p_b_ratio_p75,
+    dividend_yield_values, dividend_yield_p25, dividend_yield_median, dividend_yield_p75,
+    updated_at
+)
+SELECT
+    market_id,
+    industry,
+    count(*),
+    array_agg(company_id ORDER BY company_id),
+    COALESCE(array_agg(pe_ratio ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'), '{}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'),
+    COALESCE(array_agg(ev_ebitda ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'), '{}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'),
+    COALESCE(array_agg(p_b_ratio ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'), '{}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'),
+    COALESCE(array_agg(dividend_yield ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'), '{}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'),
+    now() AT TIME ZONE 'utc'
+FROM peers
+GROUP BY market_id, industry
+ON CONFLICT (market_id, industry) DO UPDATE SET
+    peer_count = EXCLUDED.peer_count,
+    company_ids = EXCLUDED.company_ids,
+    pe_ratio_values = EXCLUDED.pe_ratio_values,
+    pe_ratio_p25 = EXCLUDED.pe_ratio_p25,
+    pe_ratio_median = EXCLUDED.pe_ratio_median,
+    pe_ratio_p75 = EXCLUDED.pe_ratio_p75,
+    ev_ebitda_values = EXCLUDED.ev_ebitda_values,
+    ev_ebitda_p25 = EXCLUDED.ev_ebitda_p25,
+    ev_ebitda_median = EXCLUDED.ev_ebitda_median,
+    ev_ebitda_p75 = EXCLUDED.ev_ebitda_p75,
+    p_b_ratio_values = EXCLUDED.p_b_ratio_values,
+    p_b_ratio_p25 = EXCLUDED.p_b_ratio_p25,
+    p_b_ratio_median = EXCLUDED.p_b_ratio_median,
+    p_b_ratio_p75 = EXCLUDED.p_b_ratio_p75,
+    dividend_yield_values = EXCLUDED.dividend_yield_values,
+    dividend_yield_p25 = EXCLUDED.dividend_yield_p25,
+    dividend_yield_median = EXCLUDED.dividend_yield_median,
+    dividend_yield_p75 = EXCLUDED.dividend_yield_p75,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def upgrade() -> None:
+    """Create industry_aggregates and backfill it for every industry."""
+    metric_columns = []
+    for metric in _METRICS:
+        metric_columns += [
+            sa.Column(f'{metric}_values', postgresql.ARRAY(sa.Float()), nullable=False),
+            sa.Column(f'{metric}_p25', sa.Float(), nullable=True),
+            sa.Column(f'{metric}_median', sa.Float(), nullable=True),
+            sa.Column(f'{metric}_p75', sa.Float(), nullable=True),
+        ]
+    op.create_table(
+        'industry_aggregates',
+        sa.Column(
+            'market_id',
+            sa.Integer(),
+            sa.ForeignKey('markets.market_id', ondelete='CASCADE'),
+            primary_key=True,
+        ),
+        sa.Column('industry', sa.String(), primary_key=True),
+        sa.Column('peer_count', sa.Integer(), nullable=False),
+        sa.Column('company_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+        *metric_columns,
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    """Drop industry_aggregates."""
+    op.drop_table('industry_aggregates')
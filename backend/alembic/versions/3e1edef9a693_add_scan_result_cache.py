@@ -0,0 +1,51 @@
+"""add_scan_result_cache
+
+Revision ID: 3e1edef9a693
+Revises: fd767e979d90
+Create Date: 2026-10-19 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e1edef9a693'
+down_revision: Union[str, None] = 'fd767e979d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create scan_result_cache table (generic per-company scan output cache)."""
+    op.create_table(
+        'scan_result_cache',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('scan_type', sa.String(length=50), nullable=False),
+        sa.Column('params_hash', sa.String(length=64), nullable=False),
+        sa.Column(
+            'company_id',
+            sa.Integer(),
+            sa.ForeignKey('companies.company_id', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('data_version', sa.String(length=100), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint(
+            'scan_type', 'params_hash', 'company_id', name='uq_scan_result_cache_key'
+        ),
+    )
+    op.create_index(
+        'idx_scan_result_cache_scan_params',
+        'scan_result_cache',
+        ['scan_type', 'params_hash'],
+    )
+
+
+def downgrade() -> None:
+    """Drop scan_result_cache table."""
+    op.drop_index('idx_scan_result_cache_scan_params', table_name='scan_result_cache')
+    op.drop_table('scan_result_cache')
@@ -0,0 +1,38 @@
+"""add_rematerialization_queue
+
+Revision ID: 4e7b1c9d0a63
+Revises: 9d3f6a2b8c14
+Create Date: 2026-10-19 18:55:03.402871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7b1c9d0a63'
+down_revision: Union[str, None] = '9d3f6a2b8c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create rematerialization_queue table."""
+    op.create_table(
+        'rematerialization_queue',
+        sa.Column('portfolio_id', sa.Integer(), sa.ForeignKey('portfolios.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('dirty_from', sa.Date(), nullable=False),
+        sa.Column('pending_from', sa.Date(), nullable=True),
+        sa.Column('requested_at', sa.DateTime(), nullable=False),
+        sa.Column('first_requested_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Drop rematerialization_queue table."""
+    op.drop_table('rematerialization_queue')
@@ -0,0 +1,105 @@
+"""add_company_screening_facts
+
+Revision ID: 5a9e3c1b7d42
+Revises: 8b4c2d7e1f05
+Create Date: 2026-10-19 13:40:05.118270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9e3c1b7d42'
+down_revision: Union[str, None] = '8b4c2d7e1f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Snapshot of services/screening_facts_service._REFRESH_SQL at this revision
+BACKFILL_SQL = """
+WITH fx_direct AS (
+    SELECT DISTINCT ON (base_currency) base_currency AS currency, close AS rate
+    FROM fx_rates
+    WHERE quote_currency = 'USD' AND close IS NOT NULL AND close <> 0
+    ORDER BY base_currency, date DESC
+),
+fx_inverse AS (
+    SELECT DISTINCT ON (quote_currency) quote_currency AS currency, 1.0 / close AS rate
+    FROM fx_rates
+    WHERE base_currency = 'USD' AND close IS NOT NULL AND close <> 0
+    ORDER BY quote_currency, date DESC
+)
+INSERT INTO company_screening_facts (
+    company_id, market_id, currency, sector, industry,
+    market_cap_usd, avg_dollar_volume_usd, updated_at
+)
+SELECT
+    c.company_id,
+    c.market_id,
+    cur.currency,
+    COALESCE(c.sector, ov.sector),
+    COALESCE(c.industry, ov.industry),
+    md.market_cap * usd.rate,
+    md.average_volume * md.current_price * usd.rate,
+    now() AT TIME ZONE 'utc'
+FROM companies c
+LEFT JOIN markets m ON m.market_id = c.market_id
+LEFT JOIN company_overview ov ON ov.company_id = c.company_id
+LEFT JOIN LATERAL (
+    SELECT market_cap, average_volume, current_price
+    FROM company_market_data
+    WHERE company_id = c.company_id
+    ORDER BY last_updated DESC NULLS LAST, id DESC
+    LIMIT 1
+) md ON TRUE
+CROSS JOIN LATERAL (SELECT COALESCE(m.currency, 'USD') AS currency) cur
+LEFT JOIN fx_direct fd ON fd.currency = cur.currency
+LEFT JOIN fx_inverse fi ON fi.currency = cur.currency
+CROSS JOIN LATERAL (
+    SELECT CASE WHEN cur.currency = 'USD' THEN 1.0 ELSE COALESCE(fd.rate, fi.rate) END AS rate
+) usd
+WHERE TRUE
+ON CONFLICT (company_id) DO UPDATE SET
+    market_id = EXCLUDED.market_id,
+    currency = EXCLUDED.currency,
+    sector = EXCLUDED.sector,
+    industry = EXCLUDED.industry,
+    market_cap_usd = EXCLUDED.market_cap_usd,
+    avg_dollar_volume_usd = EXCLUDED.avg_dollar_volume_usd,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def upgrade() -> None:
+    """Create company_screening_facts and backfill it for every company."""
+    op.create_table(
+        'company_screening_facts',
+        sa.Column(
+            'company_id',
+            sa.Integer(),
+            sa.ForeignKey('companies.company_id', ondelete='CASCADE'),
+            primary_key=True,
+        ),
+        sa.Column('market_id', sa.Integer(), sa.ForeignKey('markets.market_id'), nullable=True),
+        sa.Column('currency', sa.String(length=10), nullable=True),
+        sa.Column('sector', sa.String(), nullable=True),
+        sa.Column('industry', sa.String(), nullable=True),
+        sa.Column('market_cap_usd', sa.Float(), nullable=True),
+        sa.Column('avg_dollar_volume_usd', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    for column in ('market_id', 'sector', 'industry', 'market_cap_usd', 'avg_dollar_volume_usd'):
+        op.create_index(
+            f'ix_company_screening_facts_{column}', 'company_screening_facts', [column]
+        )
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    """Drop company_screening_facts."""
+    for column in ('market_id', 'sector', 'industry', 'market_cap_usd', 'avg_dollar_volume_usd'):
+        op.drop_index(f'ix_company_screening_facts_{column}', table_name='company_screening_facts')
+    op.drop_table('company_screening_facts')
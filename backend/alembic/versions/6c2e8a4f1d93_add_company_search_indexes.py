@@ -0,0 +1,50 @@
+"""add_company_search_indexes
+
+Revision ID: 6c2e8a4f1d93
+Revises: 3b7e1d9c4a52
+Create Date: 2026-10-19 23:52:17.902441
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c2e8a4f1d93'
+down_revision: Union[str, None] = '3b7e1d9c4a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Prefix (btree) and trigram (GIN) indexes for services/company_search_service.py."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+    # Exact / prefix matches (short queries)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_companies_ticker_upper_prefix "
+        "ON companies (upper(ticker) text_pattern_ops);"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_companies_name_lower_prefix "
+        "ON companies (lower(name) text_pattern_ops);"
+    )
+
+    # Substring and fuzzy matches (3+ characters)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_companies_ticker_upper_trgm "
+        "ON companies USING GIN (upper(ticker) gin_trgm_ops);"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_companies_name_lower_trgm "
+        "ON companies USING GIN (lower(name) gin_trgm_ops);"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_companies_name_lower_trgm;")
+    op.execute("DROP INDEX IF EXISTS idx_companies_ticker_upper_trgm;")
+    op.execute("DROP INDEX IF EXISTS idx_companies_name_lower_prefix;")
+    op.execute("DROP INDEX IF EXISTS idx_companies_ticker_upper_prefix;")
+    # pg_trgm is left installed; other objects may depend on it
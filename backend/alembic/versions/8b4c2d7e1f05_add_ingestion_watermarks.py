@@ -0,0 +1,42 @@
+"""add_ingestion_watermarks
+
+Revision ID: 8b4c2d7e1f05
+Revises: 3e1edef9a693
+Create Date: 2026-10-19 11:02:17.530944
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4c2d7e1f05'
+down_revision: Union[str, None] = '3e1edef9a693'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create ingestion_watermarks table and its global version sequence."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence('ingestion_watermark_version_seq')))
+    op.create_table(
+        'ingestion_watermarks',
+        sa.Column('source', sa.String(length=20), primary_key=True),
+        sa.Column('entity_key', sa.String(length=40), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        'idx_ingestion_watermarks_source_version',
+        'ingestion_watermarks',
+        ['source', 'version'],
+    )
+
+
+def downgrade() -> None:
+    """Drop ingestion_watermarks table and sequence."""
+    op.drop_index('idx_ingestion_watermarks_source_version', table_name='ingestion_watermarks')
+    op.drop_table('ingestion_watermarks')
+    op.execute(sa.schema.DropSequence(sa.Sequence('ingestion_watermark_version_seq')))
@@ -0,0 +1,42 @@
+"""add_account_ledger_checkpoints
+
+Revision ID: 9d3f6a2b8c14
+Revises: c6d81f0a2e37
+Create Date: 2026-10-19 17:40:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6a2b8c14'
+down_revision: Union[str, None] = 'c6d81f0a2e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create account_ledger_checkpoints and index transactions for account replays."""
+    op.create_table(
+        'account_ledger_checkpoints',
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('accounts.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('as_of', sa.Date(), primary_key=True),
+        sa.Column('state', sa.JSON(), nullable=False),
+        sa.Column('tx_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        'idx_transactions_account_timestamp',
+        'transactions',
+        ['account_id', 'timestamp'],
+    )
+    # Checkpoints are built lazily on first replay; nothing to backfill
+
+
+def downgrade() -> None:
+    """Drop account_ledger_checkpoints and the replay index."""
+    op.drop_index('idx_transactions_account_timestamp', table_name='transactions')
+    op.drop_table('account_ledger_checkpoints')
@@ -0,0 +1,101 @@
+"""add_company_latest_bar
+
+Revision ID: 9d4f2a6c1e85
+Revises: e5c3a8f1b264
+Create Date: 2026-10-19 22:41:05.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f2a6c1e85'
+down_revision: Union[str, None] = 'e5c3a8f1b264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Snapshot of services/latest_bar_service._REFRESH_SQL at this revision
+BACKFILL_SQL = """
+INSERT INTO company_latest_bar (
+    company_id, market_id, date,
+    open, high, low, close, adjusted_close, volume,
+    sma_20, sma_50, sma_100, sma_200,
+    prev_date, prev_close, updated_at
+)
+SELECT
+    c.company_id, c.market_id, bar.date,
+    bar.open, bar.high, bar.low, bar.close, bar.adjusted_close, bar.volume,
+    bar.sma_20, bar.sma_50, bar.sma_100, bar.sma_200,
+    prev.date, prev.close,
+    now() AT TIME ZONE 'utc'
+FROM companies c
+CROSS JOIN LATERAL (
+    SELECT date, open, high, low, close, adjusted_close, volume, sma_20, sma_50, sma_100, sma_200
+    FROM stock_price_history
+    WHERE company_id = c.company_id AND market_id = c.market_id
+    ORDER BY date DESC
+    LIMIT 1
+) bar
+LEFT JOIN LATERAL (
+    SELECT date, close
+    FROM stock_price_history
+    WHERE company_id = c.company_id AND market_id = c.market_id AND date < bar.date
+    ORDER BY date DESC
+    LIMIT 1
+) prev ON TRUE
+WHERE TRUE
+ON CONFLICT (company_id) DO UPDATE SET
+    market_id = EXCLUDED.market_id,
+    date = EXCLUDED.date,
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    adjusted_close = EXCLUDED.adjusted_close,
+    volume = EXCLUDED.volume,
+    sma_20 = EXCLUDED.sma_20,
+    sma_50 = EXCLUDED.sma_50,
+    sma_100 = EXCLUDED.sma_100,
+    sma_200 = EXCLUDED.sma_200,
+    prev_date = EXCLUDED.prev_date,
+    prev_close = EXCLUDED.prev_close,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def upgrade() -> None:
+    """Create company_latest_bar and backfill it for every company."""
+    op.create_table(
+        'company_latest_bar',
+        sa.Column(
+            'company_id',
+            sa.Integer(),
+            sa.ForeignKey('companies.company_id', ondelete='CASCADE'),
+            primary_key=True,
+        ),
+        sa.Column('market_id', sa.Integer(), sa.ForeignKey('markets.market_id'), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('open', sa.Float(), nullable=True),
+        sa.Column('high', sa.Float(), nullable=True),
+        sa.Column('low', sa.Float(), nullable=True),
+        sa.Column('close', sa.Float(), nullable=True),
+        sa.Column('adjusted_close', sa.Float(), nullable=True),
+        sa.Column('volume', sa.BigInteger(), nullable=True),
+        sa.Column('sma_20', sa.Float(), nullable=True),
+        sa.Column('sma_50', sa.Float(), nullable=True),
+        sa.Column('sma_100', sa.Float(), nullable=True),
+        sa.Column('sma_200', sa.Float(), nullable=True),
+        sa.Column('prev_date', sa.Date(), nullable=True),
+        sa.Column('prev_close', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    """Drop company_latest_bar."""
+    op.drop_table('company_latest_bar')
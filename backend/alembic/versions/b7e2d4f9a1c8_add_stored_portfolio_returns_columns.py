@@ -0,0 +1,75 @@
+"""add_stored_portfolio_returns_columns
+
+Revision ID: b7e2d4f9a1c8
+Revises: 4e7b1c9d0a63
+Create Date: 2026-10-19 20:12:41.530218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4f9a1c8'
+down_revision: Union[str, None] = '4e7b1c9d0a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_NEW_COLUMNS = [
+    ('start_date', sa.Date(), {}),
+    ('ttwr_invested', sa.Numeric(18, 8), {}),
+    ('breakdown', sa.JSON(), {}),
+    ('closed_positions', sa.JSON(), {}),
+    ('valuation_version', sa.BigInteger(), {'nullable': False, 'server_default': '0'}),
+    ('computed_at', sa.DateTime(), {'nullable': False, 'server_default': sa.text('CURRENT_TIMESTAMP')}),
+]
+
+
+def upgrade() -> None:
+    """Add stored-performance columns to portfolio_returns (create it if missing)."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('portfolio_returns'):
+        op.create_table(
+            'portfolio_returns',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('portfolio_id', sa.Integer(), sa.ForeignKey('portfolios.id'), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('period', sa.String(length=10), nullable=False),
+            sa.Column('ttwr', sa.Numeric(18, 8)),
+            sa.Column('mwrr', sa.Numeric(18, 8)),
+            sa.Column('unrealized_gains', sa.Numeric(18, 4)),
+            sa.Column('realized_gains', sa.Numeric(18, 4)),
+            sa.Column('dividend_income', sa.Numeric(18, 4)),
+            sa.Column('interest_income', sa.Numeric(18, 4)),
+            sa.Column('currency_effects', sa.Numeric(18, 4)),
+            sa.Column('fees_paid', sa.Numeric(18, 4)),
+            sa.Column('total_return', sa.Numeric(18, 4)),
+            sa.Column('beginning_value', sa.Numeric(18, 4)),
+            sa.Column('ending_value', sa.Numeric(18, 4)),
+            sa.Column('net_cash_flows', sa.Numeric(18, 4)),
+            *[sa.Column(name, type_, **kw) for name, type_, kw in _NEW_COLUMNS],
+            sa.UniqueConstraint('portfolio_id', 'date', 'period', name='uq_portfolio_returns'),
+        )
+        op.create_index('idx_portfolio_returns_date', 'portfolio_returns', ['portfolio_id', 'date'])
+        return
+
+    existing = {c['name'] for c in inspector.get_columns('portfolio_returns')}
+    for name, type_, kw in _NEW_COLUMNS:
+        if name not in existing:
+            op.add_column('portfolio_returns', sa.Column(name, type_, **kw))
+    # Numeric(10, 6) rounded returns and overflowed past 9999
+    op.alter_column('portfolio_returns', 'ttwr', type_=sa.Numeric(18, 8))
+    op.alter_column('portfolio_returns', 'mwrr', type_=sa.Numeric(18, 8))
+
+
+def downgrade() -> None:
+    """Drop stored-performance columns from portfolio_returns."""
+    op.alter_column('portfolio_returns', 'mwrr', type_=sa.Numeric(10, 6))
+    op.alter_column('portfolio_returns', 'ttwr', type_=sa.Numeric(10, 6))
+    for name, _, _ in reversed(_NEW_COLUMNS):
+        op.drop_column('portfolio_returns', name)
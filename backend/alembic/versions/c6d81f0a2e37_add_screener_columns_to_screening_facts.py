@@ -0,0 +1,137 @@
+"""add_screener_columns_to_screening_facts
+
+Revision ID: c6d81f0a2e37
+Revises: 5a9e3c1b7d42
+Create Date: 2026-10-19 15:21:48.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d81f0a2e37'
+down_revision: Union[str, None] = '5a9e3c1b7d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NEW_COLUMNS = [
+    ('price_date', sa.Date()),
+    ('last_close', sa.Float()),
+    ('sma_50', sa.Float()),
+    ('sma_200', sa.Float()),
+    ('pct_vs_sma_200', sa.Float()),
+    ('ev_to_revenue', sa.Float()),
+    ('net_margin_pct', sa.Float()),
+    ('pe_ratio', sa.Float()),
+    ('price_to_book', sa.Float()),
+]
+INDEXED = ('pct_vs_sma_200', 'ev_to_revenue', 'net_margin_pct', 'pe_ratio')
+
+# Snapshot of services/screening_facts_service._REFRESH_SQL at this revision
+BACKFILL_SQL = """
+WITH fx_direct AS (
+    SELECT DISTINCT ON (base_currency) base_currency AS currency, close AS rate
+    FROM fx_rates
+    WHERE quote_currency = 'USD' AND close IS NOT NULL AND close <> 0
+    ORDER BY base_currency, date DESC
+),
+fx_inverse AS (
+    SELECT DISTINCT ON (quote_currency) quote_currency AS currency, 1.0 / close AS rate
+    FROM fx_rates
+    WHERE base_currency = 'USD' AND close IS NOT NULL AND close <> 0
+    ORDER BY quote_currency, date DESC
+)
+INSERT INTO company_screening_facts (
+    company_id, market_id, currency, sector, industry,
+    market_cap_usd, avg_dollar_volume_usd,
+    price_date, last_close, sma_50, sma_200, pct_vs_sma_200,
+    ev_to_revenue, net_margin_pct, pe_ratio, price_to_book,
+    updated_at
+)
+SELECT
+    c.company_id,
+    c.market_id,
+    cur.currency,
+    COALESCE(c.sector, ov.sector),
+    COALESCE(c.industry, ov.industry),
+    md.market_cap * usd.rate,
+    md.average_volume * md.current_price * usd.rate,
+    bar.date,
+    bar.close,
+    bar.sma_50,
+    bar.sma_200,
+    CASE WHEN bar.sma_200 > 0 THEN (bar.close / bar.sma_200 - 1) * 100 END,
+    CASE WHEN fin.total_revenue <> 0 THEN
+        COALESCE(
+            fin.enterprise_value,
+            CASE WHEN md.market_cap > 0 THEN md.market_cap + fin.total_debt - fin.cash_and_cash_equivalents END
+        ) / fin.total_revenue
+    END,
+    CASE WHEN fin.total_revenue <> 0 THEN fin.net_income / fin.total_revenue * 100 END,
+    CASE WHEN fin.net_income > 0 AND md.market_cap > 0 THEN md.market_cap / fin.net_income END,
+    md.price_to_book,
+    now() AT TIME ZONE 'utc'
+FROM companies c
+LEFT JOIN markets m ON m.market_id = c.market_id
+LEFT JOIN company_overview ov ON ov.company_id = c.company_id
+LEFT JOIN company_financials fin ON fin.company_id = c.company_id
+LEFT JOIN LATERAL (
+    SELECT market_cap, average_volume, current_price, price_to_book
+    FROM company_market_data
+    WHERE company_id = c.company_id
+    ORDER BY last_updated DESC NULLS LAST, id DESC
+    LIMIT 1
+) md ON TRUE
+LEFT JOIN LATERAL (
+    SELECT date, close, sma_50, sma_200
+    FROM stock_price_history
+    WHERE company_id = c.company_id AND market_id = c.market_id
+    ORDER BY date DESC
+    LIMIT 1
+) bar ON TRUE
+CROSS JOIN LATERAL (SELECT COALESCE(m.currency, 'USD') AS currency) cur
+LEFT JOIN fx_direct fd ON fd.currency = cur.currency
+LEFT JOIN fx_inverse fi ON fi.currency = cur.currency
+CROSS JOIN LATERAL (
+    SELECT CASE WHEN cur.currency = 'USD' THEN 1.0 ELSE COALESCE(fd.rate, fi.rate) END AS rate
+) usd
+WHERE TRUE
+ON CONFLICT (company_id) DO UPDATE SET
+    market_id = EXCLUDED.market_id,
+    currency = EXCLUDED.currency,
+    sector = EXCLUDED.sector,
+    industry = EXCLUDED.industry,
+    market_cap_usd = EXCLUDED.market_cap_usd,
+    avg_dollar_volume_usd = EXCLUDED.avg_dollar_volume_usd,
+    price_date = EXCLUDED.price_date,
+    last_close = EXCLUDED.last_close,
+    sma_50 = EXCLUDED.sma_50,
+    sma_200 = EXCLUDED.sma_200,
+    pct_vs_sma_200 = EXCLUDED.pct_vs_sma_200,
+    ev_to_revenue = EXCLUDED.ev_to_revenue,
+    net_margin_pct = EXCLUDED.net_margin_pct,
+    pe_ratio = EXCLUDED.pe_ratio,
+    price_to_book = EXCLUDED.price_to_book,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def upgrade() -> None:
+    """Add price / valuation columns used by the composite screener and backfill them."""
+    for name, type_ in NEW_COLUMNS:
+        op.add_column('company_screening_facts', sa.Column(name, type_, nullable=True))
+    for name in INDEXED:
+        op.create_index(f'ix_company_screening_facts_{name}', 'company_screening_facts', [name])
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    """Drop the screener columns."""
+    for name in INDEXED:
+        op.drop_index(f'ix_company_screening_facts_{name}', table_name='company_screening_facts')
+    for name, _ in reversed(NEW_COLUMNS):
+        op.drop_column('company_screening_facts', name)
@@ -0,0 +1,63 @@
+"""add_realized_pnl_ledger
+
+Revision ID: e5c3a8f1b264
+Revises: b7e2d4f9a1c8
+Create Date: 2026-10-19 21:03:27.914406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c3a8f1b264'
+down_revision: Union[str, None] = 'b7e2d4f9a1c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create realized_pnl_ledger table."""
+    op.create_table(
+        'realized_pnl_ledger',
+        sa.Column('transaction_id', sa.Integer(), sa.ForeignKey('transactions.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('portfolio_id', sa.Integer(), sa.ForeignKey('portfolios.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('transaction_type', sa.String(length=4), nullable=False),
+        sa.Column('pool_shares', sa.Numeric(), nullable=False),
+        sa.Column('pool_cost', sa.Numeric(), nullable=False),
+        sa.Column('pool_cost_icy', sa.Numeric(), nullable=False),
+        sa.Column('pool_ts_weighted', sa.Numeric(), nullable=False),
+        sa.Column('quantity', sa.Numeric(), nullable=True),
+        sa.Column('price', sa.Numeric(), nullable=True),
+        sa.Column('fx_rate', sa.Numeric(), nullable=True),
+        sa.Column('currency', sa.String(length=3), nullable=True),
+        sa.Column('proceeds_pcy', sa.Numeric(), nullable=True),
+        sa.Column('proceeds_icy', sa.Numeric(), nullable=True),
+        sa.Column('cost_basis_pcy', sa.Numeric(), nullable=True),
+        sa.Column('cost_basis_icy', sa.Numeric(), nullable=True),
+        sa.Column('realized_pnl', sa.Numeric(), nullable=True),
+        sa.Column('realized_pnl_icy', sa.Numeric(), nullable=True),
+        sa.Column('holding_period_days', sa.Integer(), nullable=True),
+    )
+    op.create_index(
+        'idx_realized_pnl_ledger_pool',
+        'realized_pnl_ledger',
+        ['portfolio_id', 'company_id', 'timestamp', 'transaction_id'],
+    )
+    op.create_index(
+        'idx_realized_pnl_ledger_portfolio_ts',
+        'realized_pnl_ledger',
+        ['portfolio_id', 'timestamp'],
+    )
+    # Rows are replayed lazily on first read; nothing to backfill
+
+
+def downgrade() -> None:
+    """Drop realized_pnl_ledger table."""
+    op.drop_index('idx_realized_pnl_ledger_portfolio_ts', table_name='realized_pnl_ledger')
+    op.drop_index('idx_realized_pnl_ledger_pool', table_name='realized_pnl_ledger')
+    op.drop_table('realized_pnl_ledger')
@@ -5,8 +5,7 @@ from database.account import Account
 from database.portfolio import Portfolio, Transaction, TransactionType
 
 from database.company import Company
-from database.stock_data import StockPriceHistory
-from api.valuation_preview import fx_to_base_for_currency
+from services.reference_price_service import get_closes_as_of, get_fx_as_of
 
 from sqlalchemy.orm import joinedload
 from sqlalchemy import func
@@ -20,121 +19,166 @@ from database.position import PortfolioPositions
 CASH_IN  = {TransactionType.DEPOSIT, TransactionType.DIVIDEND, TransactionType.INTEREST, TransactionType.TRANSFER_IN}
 CASH_OUT = {TransactionType.WITHDRAWAL, TransactionType.FEE, TransactionType.TAX, TransactionType.TRANSFER_OUT}
 
-def _latest_close_as_of(db, company_id: int, as_of: date) -> Decimal | None:
-    row = (
-        db.query(StockPriceHistory.close)
-        .filter(StockPriceHistory.company_id == company_id)
-        .filter(StockPriceHistory.date <= as_of)
-        .order_by(StockPriceHistory.date.desc())
-        .first()
+def _cash_line(tx_type, ccy: str, amt, rate: Decimal) -> tuple[Decimal, dict]:
+    amt = Decimal(str(amt or 0))
+    signed = amt if tx_type in CASH_IN else -amt
+    base_amt = signed * rate
+    return base_amt, {
+        "type": tx_type.value if hasattr(tx_type, "value") else str(tx_type),
+        "currency": ccy,
+        "amount": str(amt),
+        "fx_to_base": str(rate),
+        "amount_base": str(base_amt),
+    }
+
+
+def _fallback_fx(db, portfolio_id: int, currencies: set[str], as_of: date) -> tuple[dict, dict]:
+    """
+    Last transaction ``currency_rate`` per (company, currency) and per
+    currency, for currencies without an FX rate (same last resort as
+    ``fx_to_base_for_currency``).  Two queries, only when needed.
+    """
+    if not currencies:
+        return {}, {}
+    cutoff = datetime.combine(as_of, datetime.max.time()).replace(microsecond=0)
+    base_query = (
+        db.query(Transaction.company_id, Transaction.currency, Transaction.currency_rate)
+        .filter(Transaction.portfolio_id == portfolio_id)
+        .filter(Transaction.currency.in_(currencies))
+        .filter(Transaction.timestamp <= cutoff)
     )
-    return Decimal(str(row[0])) if row and row[0] is not None else None
+    by_company = {
+        (cid, ccy): Decimal(str(rate))
+        for cid, ccy, rate in (
+            base_query.filter(Transaction.company_id.isnot(None))
+            .order_by(Transaction.company_id, Transaction.currency, Transaction.timestamp.desc())
+            .distinct(Transaction.company_id, Transaction.currency)
+        )
+        if rate
+    }
+    by_currency = {
+        ccy: Decimal(str(rate))
+        for _, ccy, rate in (
+            base_query.order_by(Transaction.currency, Transaction.timestamp.desc())
+            .distinct(Transaction.currency)
+        )
+        if rate
+    }
+    return by_company, by_currency
 
-def _snapshot_for_account(db, account: Account, base_ccy: str, as_of: date) -> dict:
+
+def _snapshots_for_accounts(db, portfolio_id: int, accounts: list[Account], base_ccy: str, as_of: date) -> list[dict]:
+    """
+    Per-account snapshots with every price and FX rate resolved up front:
+    one query each for cash sums, positions, closes and FX rates (plus the
+    transaction-rate fallback when some currency has no FX rate).
+    """
     cutoff = datetime.combine(as_of, datetime.max.time()).replace(microsecond=0)
+    account_ids = [acc.id for acc in accounts]
 
     # --- CASH (company_id is NULL) ---
     cash_rows = (
         db.query(
+            Transaction.account_id,
             Transaction.transaction_type,
             Transaction.currency,
             func.sum(Transaction.quantity).label("amt"),
         )
-        .filter(Transaction.account_id == account.id)
+        .filter(Transaction.account_id.in_(account_ids))
         .filter(Transaction.company_id == None)
         .filter(Transaction.timestamp <= cutoff)
-        .group_by(Transaction.transaction_type, Transaction.currency)
+        .filter(Transaction.transaction_type.in_(CASH_IN | CASH_OUT))
+        .group_by(Transaction.account_id, Transaction.transaction_type, Transaction.currency)
         .all()
     )
 
-    cash_components = []
-    cash_total_base = Decimal("0")
-
-    for tx_type, ccy, amt in cash_rows:
-        amt = Decimal(str(amt or 0))
-        if tx_type in CASH_IN:
-            signed = amt
-        elif tx_type in CASH_OUT:
-            signed = -amt
-        else:
-            continue
+    # --- SECURITIES (positions table) ---
+    pos_rows = [
+        p
+        for p in (
+            db.query(PortfolioPositions)
+            .options(joinedload(PortfolioPositions.company).joinedload(Company.market))
+            .filter(PortfolioPositions.account_id.in_(account_ids))
+            .all()
+        )
+        if Decimal(str(p.quantity or 0)) != Decimal("0")
+    ]
+
+    def inst_ccy_of(p) -> str:
+        return p.company.market.currency.upper() if p.company and p.company.market else base_ccy
+
+    # --- Bulk price / FX resolution ---
+    closes = get_closes_as_of(db, {p.company_id for p in pos_rows}, [as_of])
+    currencies = {(ccy or base_ccy).upper() for _, _, ccy, _ in cash_rows} | {inst_ccy_of(p) for p in pos_rows}
+    fx = {ccy: rates[as_of] for ccy, rates in get_fx_as_of(db, currencies, base_ccy, [as_of]).items()}
+    fx[base_ccy] = Decimal("1")
+    fx_by_company, fx_by_currency = _fallback_fx(db, portfolio_id, currencies - set(fx), as_of)
+
+    snapshots = {
+        acc.id: {
+            "cash_total": Decimal("0"), "cash_lines": [],
+            "sec_total": Decimal("0"), "sec_lines": [],
+        }
+        for acc in accounts
+    }
 
+    for account_id, tx_type, ccy, amt in cash_rows:
         ccy = (ccy or base_ccy).upper()
-        rate = fx_to_base_for_currency(db, as_of, ccy, base_ccy, account.portfolio_id, None)
+        rate = fx.get(ccy, fx_by_currency.get(ccy))
         if rate is None:
             continue
-
-        base_amt = signed * rate
-        cash_total_base += base_amt
-        cash_components.append({
-            "type": tx_type.value if hasattr(tx_type, "value") else str(tx_type),
-            "currency": ccy,
-            "amount": str(amt),
-            "fx_to_base": str(rate),
-            "amount_base": str(base_amt),
-        })
-
-    # --- SECURITIES (positions table) ---
-    pos_rows = (
-        db.query(PortfolioPositions)
-        .options(joinedload(PortfolioPositions.company).joinedload(Company.market))
-        .filter(PortfolioPositions.account_id == account.id)
-        .all()
-    )
-
-    sec_lines = []
-    sec_total_base = Decimal("0")
+        base_amt, line = _cash_line(tx_type, ccy, amt, rate)
+        snapshots[account_id]["cash_total"] += base_amt
+        snapshots[account_id]["cash_lines"].append(line)
 
     for p in pos_rows:
         qty = Decimal(str(p.quantity or 0))
-        if qty == Decimal("0"):
-            continue
-
-        inst_ccy = (
-            p.company.market.currency.upper()
-            if p.company and p.company.market else base_ccy
-        )
-        px = _latest_close_as_of(db, p.company_id, as_of)
+        inst_ccy = inst_ccy_of(p)
+        px = closes.get(p.company_id, {}).get(as_of)
         if px is None:
             continue
 
-        fx = fx_to_base_for_currency(db, as_of, inst_ccy, base_ccy, account.portfolio_id, p.company_id)
-        if fx is None:
+        rate = fx.get(inst_ccy, fx_by_company.get((p.company_id, inst_ccy)))
+        if rate is None:
             continue
 
-        base_val = qty * px * fx
-        sec_total_base += base_val
-
-        sec_lines.append({
+        base_val = qty * px * rate
+        snapshots[p.account_id]["sec_total"] += base_val
+        snapshots[p.account_id]["sec_lines"].append({
             "company_id": p.company_id,
             "qty": str(qty),
             "price_inst": str(px),
             "inst_ccy": inst_ccy,
-            "fx_to_base": str(fx),
+            "fx_to_base": str(rate),
             "value_base": str(base_val),
         })
 
-    total_base = cash_total_base + sec_total_base
-
-    return {
-        "account_id": account.id,
-        "name": account.name,
-        "account_type": account.account_type,
-        "currency_hint": (account.currency or "").upper() if account.currency else None,
-        "totals": {
-            "total_base": str(total_base),
-            "cash_base": str(cash_total_base),
-            "securities_base": str(sec_total_base),
-        },
-        "cash": {
-            "total_base": str(cash_total_base),
-            "components": cash_components,
-        },
-        "securities": {
-            "total_base": str(sec_total_base),
-            "lines": sec_lines,
-        },
-    }
+    result = []
+    for acc in accounts:
+        snap = snapshots[acc.id]
+        cash_total_base = snap["cash_total"]
+        sec_total_base = snap["sec_total"]
+        total_base = cash_total_base + sec_total_base
+        result.append({
+            "account_id": acc.id,
+            "name": acc.name,
+            "account_type": acc.account_type,
+            "currency_hint": (acc.currency or "").upper() if acc.currency else None,
+            "totals": {
+                "total_base": str(total_base),
+                "cash_base": str(cash_total_base),
+                "securities_base": str(sec_total_base),
+            },
+            "cash": {
+                "total_base": str(cash_total_base),
+                "components": snap["cash_lines"],
+            },
+            "securities": {
+                "total_base": str(sec_total_base),
+                "lines": snap["sec_lines"],
+            },
+        })
+    return result
 
 router = APIRouter(prefix="/api/snapshot", tags=["Snapshots"])
 
@@ -180,10 +224,8 @@ def portfolio_accounts_snapshot(
     agg_cash = Decimal("0")
     agg_secs = Decimal("0")
 
-    snapshots = []
-    for acc in accounts:
-        snap = _snapshot_for_account(db, acc, base_ccy, as_of)
-        snapshots.append(snap)
+    snapshots = _snapshots_for_accounts(db, portfolio_id, accounts, base_ccy, as_of)
+    for snap in snapshots:
         agg_total += Decimal(snap["totals"]["total_base"])
         agg_cash  += Decimal(snap["totals"]["cash_base"])
         agg_secs  += Decimal(snap["totals"]["securities_base"])
@@ -19,7 +19,9 @@ from services.fundamentals.financials_batch_update_service import (
 )
 from services.admin_yfinance_probe import gather_yfinance_snapshot
 from services.basket_resolver import resolve_baskets_to_companies
+from services.logo_service import prefetch_logos
 from services.scan_job_service import create_job, get_active_job, run_scan_task, start_job_in_thread
+from services.scan_result_cache import get_cache_stats
 
 
 class SyncCompanyMarketsRequest(BaseModel):
@@ -145,6 +147,38 @@ def run_financials_batch_update(
     return {"job_id": job.id, "status": "PENDING", "already_running": False}
 
 
+def run_logo_prefetch_task(db: Session, market_name: str | None = None):
+    from database.market import Market
+    from database.company import Company
+
+    query = db.query(Company.ticker).filter(
+        (Company.yfinance_market.is_(None)) | (Company.yfinance_market != "DELISTED")
+    )
+    if market_name and market_name.lower() != "all":
+        query = query.join(Market, Market.market_id == Company.market_id).filter(Market.name == market_name)
+    return prefetch_logos(ticker for (ticker,) in query.all())
+
+
+@router.post("/prefetch-logos")
+def run_logo_prefetch(
+    market_name: str | None = None,
+    db: Session = Depends(get_db),
+    _: str = Depends(require_admin),  # Only admin can modify
+):
+    """Download missing company logos of a market (or all markets) in the background."""
+    existing = get_active_job(db, "logo_prefetch")
+    if existing:
+        return {"job_id": existing.id, "status": existing.status, "already_running": True}
+
+    job = create_job(db, "logo_prefetch")
+
+    def task_wrapper(db_session: Session):
+        return run_logo_prefetch_task(db_session, market_name)
+
+    start_job_in_thread(job.id, task_wrapper)
+    return {"job_id": job.id, "status": "PENDING", "already_running": False}
+
+
 def run_financials_for_baskets_task(db: Session, basket_ids: list[int]):
     market_ids, companies = resolve_baskets_to_companies(db, basket_ids)
     if not companies:
@@ -278,3 +312,12 @@ def yfinance_probe(
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch yfinance data: {exc}"
         ) from exc
+
+
+@router.get("/scan-cache/stats")
+def scan_cache_stats(
+    db: Session = Depends(get_db),
+    _: str = Depends(require_admin_or_demo),  # Demo can view
+):
+    """Per scan type hit ratio (since process start) and stored entry count."""
+    return get_cache_stats(db)
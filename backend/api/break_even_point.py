@@ -7,12 +7,14 @@ import logging
 from database.base import get_db
 from database.company import Company
 from database.financials import CompanyFinancials
-from database.stock_data import CompanyMarketData
 from services.basket_resolver import resolve_baskets_to_companies
 from services.company_filter_service import filter_by_market_cap
 from services.auth.auth import get_current_user
 from database.user import User
 from services.scan_job_service import create_job, run_scan_task
+from services.ingestion_watermarks import FUNDAMENTALS
+from services.scan_result_cache import run_cached
+from utils.itertools_helpers import chunked
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -29,44 +31,35 @@ class BreakEvenResultItem(BaseModel):
     currency: str = "USD"
     net_margin_pct: float
 
-def _process_company_break_even(
-    db: Session,
-    company: Company,
-    threshold_pct: float
-) -> Optional[dict]:
-    try:
-        fin = db.query(CompanyFinancials).filter(CompanyFinancials.company_id == company.company_id).first()
-        if not fin or fin.total_revenue is None or fin.net_income is None:
-            return None
-        
-        revenue = fin.total_revenue
-        income = fin.net_income
-        
-        if revenue == 0:
-            return None
-            
-        margin = (income / revenue) * 100.0
-        
-        # Check if margin is within +/- threshold
-        if abs(margin) <= threshold_pct:
-            currency = "USD"
-            if company.market and company.market.currency:
-                currency = company.market.currency
-            elif company.currency:
-                currency = company.currency
-
-            return {
-                "ticker": company.ticker,
-                "company_name": company.name,
+def _compute_break_even(db: Session, company_ids: List[int]) -> dict[int, dict]:
+    """Unfiltered net margin per company, from one bulk financials query per chunk."""
+    computed = {}
+    for chunk_ids in chunked(company_ids, 1000):
+        rows = (
+            db.query(
+                CompanyFinancials.company_id,
+                CompanyFinancials.total_revenue,
+                CompanyFinancials.net_income,
+            )
+            .filter(CompanyFinancials.company_id.in_(list(chunk_ids)))
+            .all()
+        )
+        for company_id, revenue, income in rows:
+            if revenue is None or income is None or revenue == 0:
+                continue
+            computed[company_id] = {
                 "current_net_income": income,
-                "currency": currency,
-                "net_margin_pct": round(margin, 2)
+                "net_margin_pct": (income / revenue) * 100.0,
             }
-    except Exception as e:
-        # Log debug only to avoid spam
-        # logger.debug(f"Failed to process {company.ticker}: {e}")
-        return None
-    return None
+    return computed
+
+
+def _company_currency(company: Company) -> str:
+    if company.market and company.market.currency:
+        return company.market.currency
+    if company.currency:
+        return company.currency
+    return "USD"
 
 def run_break_even_scan(db: Session, req: BreakEvenScanRequest):
     """
@@ -87,13 +80,30 @@ def run_break_even_scan(db: Session, req: BreakEvenScanRequest):
         if req.min_market_cap:
             companies = filter_by_market_cap(db, companies, req.min_market_cap)
 
-        results = []
         logger.info(f"Scanning {len(companies)} companies for Break Even Point...")
 
+        # Margins are cached per company; the threshold is applied below
+        per_company = run_cached(
+            db,
+            "break_even_point",
+            {},
+            [c.company_id for c in companies],
+            lambda ids: _compute_break_even(db, ids),
+            sources=(FUNDAMENTALS,),
+        )
+
+        results = []
         for company in companies:
-            item = _process_company_break_even(db, company, req.threshold_pct)
-            if item:
-                results.append(item)
+            item = per_company.get(company.company_id)
+            # Check if margin is within +/- threshold
+            if item and abs(item["net_margin_pct"]) <= req.threshold_pct:
+                results.append({
+                    "ticker": company.ticker,
+                    "company_name": company.name,
+                    "current_net_income": item["current_net_income"],
+                    "currency": _company_currency(company),
+                    "net_margin_pct": round(item["net_margin_pct"], 2),
+                })
                 
         # Sort by proximity to 0 margin (closest to break even first)
         results.sort(key=lambda x: abs(x["net_margin_pct"]))
@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 import logging
 import time
+import numpy as np
+import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
 from services.auth.auth import get_current_user
@@ -12,9 +14,11 @@ from database.stock_data import StockPriceHistory
 from services.yfinance_data_update.data_update_service import (
     fetch_and_save_stock_price_history_data_batch,
 )
-from services.scan_universe_resolver import resolve_universe
-from services.company_filter_service import filter_by_market_cap
+from services.scan_universe_resolver import resolve_universe_refs
 from services.scan_job_service import create_job, run_scan_task
+from services.scan_executor import pack_price_frame, run_sharded_scan
+from services.ingestion_watermarks import PRICE
+from services.scan_result_cache import run_cached
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -23,43 +27,118 @@ logger.setLevel(logging.INFO)
 from utils.itertools_helpers import chunked
 
 
-def detect_consolidation(prices: list[StockPriceHistory], consolidation_period: int, threshold_pct: float):
-    # Sort prices by date ascending just in case
-    prices.sort(key=lambda x: x.date)
-    
-    if len(prices) < consolidation_period:
+def detect_consolidation(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    volumes: np.ndarray,
+    consolidation_period: int,
+    threshold_pct: float,
+):
+    """Check the last N bars (date-ascending arrays) for a tight trading range."""
+    if len(closes) < consolidation_period:
         return None  # Not enough data
 
     # Consider the last N days (consolidation window)
-    window = prices[-consolidation_period:]
-    
-    highs = [p.high for p in window if p.high is not None]
-    lows = [p.low for p in window if p.low is not None]
-    
-    if not highs or not lows:
+    window_highs = highs[-consolidation_period:]
+    window_lows = lows[-consolidation_period:]
+    window_highs = window_highs[~np.isnan(window_highs)]
+    window_lows = window_lows[~np.isnan(window_lows)]
+
+    if not len(window_highs) or not len(window_lows):
         return None
-        
-    range_high = max(highs)
-    range_low = min(lows)
-    
+
+    range_high = float(window_highs.max())
+    range_low = float(window_lows.min())
+
     if range_low == 0:
         return None
 
     # Calculate range percentage variation
     # (High - Low) / Low
     range_pct = ((range_high - range_low) / range_low) * 100.0
-    
+
     if range_pct > threshold_pct:
         return None # Range too wide, not a tight consolidation
 
+    current_volume = volumes[-1]
     return {
         "range_high": range_high,
         "range_low": range_low,
         "range_pct": range_pct,
-        "current_price": window[-1].close,
-        "current_volume": window[-1].volume
+        "current_price": float(closes[-1]),
+        "current_volume": None if np.isnan(current_volume) else int(current_volume),
     }
 
+
+def _consolidation_kernel(
+    columns: dict[str, np.ndarray],
+    company_ids: np.ndarray,
+    offsets: np.ndarray,
+    params: dict,
+) -> list[dict]:
+    """Scan-executor kernel: run detect_consolidation for every company in the shard."""
+    matches = []
+    for i, company_id in enumerate(company_ids):
+        lo, hi = offsets[i], offsets[i + 1]
+        if hi == lo:
+            continue
+        data = detect_consolidation(
+            columns["high"][lo:hi],
+            columns["low"][lo:hi],
+            columns["close"][lo:hi],
+            columns["volume"][lo:hi],
+            params["consolidation_period"],
+            params["threshold_pct"],
+        )
+        if data:
+            data["company_id"] = int(company_id)
+            data["date"] = str(columns["date"][hi - 1])
+            matches.append(data)
+    return matches
+
+
+def _compute_consolidations(
+    db: Session,
+    company_ids: list[int],
+    start_date,
+    consolidation_period: int,
+) -> dict[int, dict]:
+    """Bulk-load bars since start_date and measure every company's range."""
+    rows = []
+    for chunk_ids in chunked(company_ids, 1000):
+        rows.extend(
+            db.query(
+                StockPriceHistory.company_id,
+                StockPriceHistory.date,
+                StockPriceHistory.high,
+                StockPriceHistory.low,
+                StockPriceHistory.close,
+                StockPriceHistory.volume,
+            )
+            .filter(StockPriceHistory.company_id.in_(list(chunk_ids)))
+            .filter(StockPriceHistory.date >= start_date)
+            .all()
+        )
+
+    frame = pd.DataFrame(rows, columns=["company_id", "date", "high", "low", "close", "volume"])
+    columns, packed_ids, offsets = pack_price_frame(frame, ["high", "low", "close", "volume"])
+    del rows, frame
+
+    matches = run_sharded_scan(
+        _consolidation_kernel,
+        columns,
+        packed_ids,
+        offsets,
+        params={
+            "consolidation_period": consolidation_period,
+            "threshold_pct": float("inf"),
+        },
+        label="consolidation",
+    )
+    return {match.pop("company_id"): match for match in matches}
+
+
 def run_consolidation_scan(db: Session, request: BreakoutRequest):
     """
     Core logic for consolidation scan, intended to run in the background.
@@ -68,17 +147,14 @@ def run_consolidation_scan(db: Session, request: BreakoutRequest):
     results = []
 
     # 1. Resolve Universe
-    market_ids, companies = resolve_universe(db, None, request.basket_ids)
+    # 2. The market-cap filter is applied inside the universe query
+    market_ids, companies = resolve_universe_refs(
+        db, None, request.basket_ids, min_cap_millions=request.min_market_cap
+    )
     
     if not companies:
         return {"status": "success", "data": []}
 
-    # 2. Filter by Market Cap
-    if request.min_market_cap:
-        companies = filter_by_market_cap(db, companies, request.min_market_cap)
-        if not companies:
-            return {"status": "success", "data": []}
-
     # 3. Fetch/Ensure Data
     lookback_days = request.consolidation_period + 10 
     today = datetime.utcnow().date()
@@ -87,15 +163,8 @@ def run_consolidation_scan(db: Session, request: BreakoutRequest):
     
     tickers_by_market = {}
     for comp in companies:
-        if not comp.market:
-            # Try to ensure market is loaded
-            try:
-                db.refresh(comp)
-            except Exception:
-                pass
-        
-        if comp.market:
-            tickers_by_market.setdefault(comp.market.name, []).append(comp.ticker)
+        if comp.market_name:
+            tickers_by_market.setdefault(comp.market_name, []).append(comp.ticker)
         else:
             logger.warning(f"Company {comp.ticker} has no linked Market, skipping data fetch.")
 
@@ -111,42 +180,33 @@ def run_consolidation_scan(db: Session, request: BreakoutRequest):
                 force_update=False,
             )
 
-    # 4. Analyze
-    matches_count = 0
+    # 4. Analyze — served from the scan result cache; only companies with new
+    # bars are reloaded and run through the scan executor.  The range is cached
+    # unfiltered so any threshold can reuse it.
     logger.info(f"Starting analysis on {len(companies)} companies...")
-    
+    per_company = run_cached(
+        db,
+        "consolidation",
+        {"consolidation_period": request.consolidation_period},
+        [c.company_id for c in companies],
+        lambda ids: _compute_consolidations(db, ids, start_date, request.consolidation_period),
+        sources=(PRICE,),
+    )
+
     for comp in companies:
-        prices = (
-            db.query(StockPriceHistory)
-            .filter(StockPriceHistory.company_id == comp.company_id)
-            .filter(StockPriceHistory.date >= start_date)
-            .order_by(StockPriceHistory.date.asc())
-            .all()
-        )
-        
-        # Debug logging for first few companies or if list is empty
-        if not prices:
-            # logger.debug(f"No prices found for {comp.ticker} since {start_date}")
+        match = per_company.get(comp.company_id)
+        if not match or match["range_pct"] > request.threshold_percentage:
             continue
-            
-        consolidation_data = detect_consolidation(
-            prices, 
-            request.consolidation_period, 
-            request.threshold_percentage
-        )
-        
-        if consolidation_data:
-            matches_count += 1
-            results.append({
-                "ticker": comp.ticker,
-                "name": comp.name,
-                "current_price": consolidation_data["current_price"],
-                "range_high": consolidation_data["range_high"],
-                "range_low": consolidation_data["range_low"],
-                "range_pct": consolidation_data["range_pct"],
-                "volume": consolidation_data["current_volume"],
-                "date": prices[-1].date.strftime("%Y-%m-%d") if prices else str(today)
-            })
+        results.append({
+            "ticker": comp.ticker,
+            "name": comp.name,
+            "current_price": match["current_price"],
+            "range_high": match["range_high"],
+            "range_low": match["range_low"],
+            "range_pct": match["range_pct"],
+            "volume": match["current_volume"],
+            "date": match["date"],
+        })
 
     elapsed = time.time() - start_time
     logger.info(f"Consolidation scan processed {len(companies)} companies in {elapsed:.2f}s. Found {len(results)} matches.")
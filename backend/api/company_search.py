@@ -1,8 +1,6 @@
 import logging
 from typing import Optional
 
-import requests
-import yfinance as yf
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
@@ -10,6 +8,8 @@ from sqlalchemy.orm import Session
 
 from database.base import get_db
 from database.company import Company
+from services.company_search_service import find_companies
+from services.external_ticker_lookup import lookup_external_tickers
 from services.company_market_sync import (
     YAHOO_TO_EXCHANGE,
     _detect_yahoo_exchange,
@@ -31,39 +31,6 @@ def _market_payload(exchange_code: str | None, db: Session) -> dict:
     return {"market_id": None, "name": mapped}
 
 
-def _direct_lookup(ticker: str, db: Session) -> dict | None:
-    ticker = ticker.strip().upper()
-    if not ticker:
-        return None
-    try:
-        ticker_obj = yf.Ticker(ticker)
-        fast_info = getattr(ticker_obj, "fast_info", {}) or {}
-        info = getattr(ticker_obj, "info", {}) or {}
-
-        quote_type = fast_info.get("quoteType") or info.get("quoteType")
-        if quote_type and str(quote_type).upper() == "OPTION":
-            return None
-
-        name = (
-            info.get("shortName")
-            or info.get("longName")
-            or info.get("longname")
-            or ticker
-        )
-        exchange_code = _detect_yahoo_exchange(ticker)
-        market = _market_payload(exchange_code, db)
-        return {
-            "company_id": None,
-            "name": name,
-            "ticker": ticker,
-            "market": market,
-            "source": "external",
-        }
-    except Exception as exc:  # noqa: BLE001
-        logger.warning("YFinance direct lookup failed for %s: %s", ticker, exc)
-        return None
-
-
 def _sync_company_id_sequence(db: Session) -> None:
     """Ensure the companies PK sequence is at least max(company_id)."""
     try:
@@ -145,66 +112,16 @@ def _persist_external_results(results: list[dict], db: Session) -> None:
 
 
 def _search_yfinance(search: str, limit: int, db: Session) -> list[dict]:
-    results: list[dict] = []
-    seen: set[str] = set()
-    headers = {"User-Agent": "Mozilla/5.0"}
-    url = "https://query2.finance.yahoo.com/v1/finance/search"
-    params = {
-        "q": search,
-        "quotesCount": limit,
-        "newsCount": 0,
-        "quotesQueryId": "tss_match_phrase_query",
-    }
-
-    # If the query looks like a ticker, try to resolve it directly first
-    raw_ticker = search.strip().upper()
-    looks_like_ticker = raw_ticker and (" " not in raw_ticker) and len(raw_ticker) <= 10
-    if looks_like_ticker:
-        direct = _direct_lookup(raw_ticker, db)
-        if direct:
-            results.append(direct)
-            seen.add(direct["ticker"])
-
-    try:
-        response = requests.get(url, params=params, headers=headers, timeout=5)
-        response.raise_for_status()
-        data = response.json() or {}
-        quotes = data.get("quotes") or []
-        for quote in quotes:
-            symbol = quote.get("symbol")
-            if not symbol or symbol in seen:
-                continue
-            quote_type = (quote.get("typeDisp") or quote.get("quoteType") or "").upper()
-            if quote_type == "OPTION":
-                continue
-            exchange = (
-                quote.get("exchDisp")
-                or quote.get("exchangeDisplay")
-                or quote.get("exchange")
-                or ""
-            )
-            name = (
-                quote.get("shortname")
-                or quote.get("longname")
-                or quote.get("name")
-                or symbol
-            )
-            results.append(
-                {
-                    "company_id": None,
-                    "name": name,
-                    "ticker": symbol,
-                    "market": _market_payload(exchange, db),
-                    "source": "external",
-                }
-            )
-            seen.add(symbol)
-            if len(results) >= limit:
-                break
-    except Exception as exc:  # noqa: BLE001
-        logger.warning("YFinance search failed for %s: %s", search, exc)
-
-    return results
+    return [
+        {
+            "company_id": None,
+            "name": item["name"],
+            "ticker": item["ticker"],
+            "market": _market_payload(item["exchange"], db),
+            "source": "external",
+        }
+        for item in lookup_external_tickers(search, limit)
+    ]
 
 
 @router.get("")
@@ -217,16 +134,8 @@ def search_companies(
         False, description="Search yfinance for additional tickers"
     ),
 ):
-    query = db.query(Company)
     raw_search = search
-    if market_id:
-        query = query.filter(Company.market_id == market_id)
-    if search:
-        pattern = f"%{search}%"
-        query = query.filter(
-            (Company.name.ilike(pattern)) | (Company.ticker.ilike(pattern))
-        )
-    companies = query.limit(limit).all()
+    companies = find_companies(db, search, limit, market_id)
     results = []
     for c in companies:
         # Get currency from market if available
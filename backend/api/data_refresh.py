@@ -5,6 +5,10 @@ Two core refresh jobs:
 1. Daily price refresh for all companies
 2. Daily fundamental data refresh (smart quarterly/annual check)
 
+A read-only change feed (`/n8n-changes`) exposes the per-entity ingestion
+watermarks bumped by those jobs, so downstream workflows can process only
+what changed since their last run.
+
 Each job is exposed via two auth paths:
 - n8n endpoints (X-Internal-Token)
 - admin endpoints (JWT + require_admin)
@@ -17,10 +21,11 @@ by `ensure_portfolio_prices_fresh` in portfolio_positions_service.py
 import logging
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 
 from api.alert_checker import verify_internal_token
+from api.stock_details import warm_stock_details_cache
 from database.base import get_db
 from database.company import Company
 from database.stock_data import CompanyMarketData
@@ -28,7 +33,10 @@ from services.auth.authorization import require_admin
 from services.fundamentals.financials_batch_update_service import (
     update_financials_for_tickers,
 )
+from services.ingestion_watermarks import SOURCES, get_changes_since
 from services.scan_job_service import create_job, get_active_job, start_job_in_thread
+from services.industry_aggregate_service import refresh_industry_aggregates
+from services.screening_facts_service import refresh_screening_facts
 from services.yfinance_data_update.data_update_service import (
     fetch_and_save_stock_price_history_data_batch,
 )
@@ -120,6 +128,7 @@ def _run_daily_prices(db: Session):
                 })
 
     logger.info(f"[daily-prices] Done. Processed {total} tickers.")
+    warm_stock_details_cache(db)
     return {"total_tickers": total, "results": results}
 
 
@@ -161,7 +170,12 @@ def _run_daily_fundamentals(db: Session):
                 "error": str(e),
             })
 
+    # Full pass also picks up sector/industry edits and FX moves
+    refresh_screening_facts(db)
+    refresh_industry_aggregates(db)
+
     logger.info(f"[daily-fundamentals] Done. Checked {total} tickers.")
+    warm_stock_details_cache(db)
     return {"total_tickers": total, "results": results}
 
 
@@ -213,6 +227,22 @@ def daily_fundamentals(
     return {"job_id": job.id, "status": "PENDING", "already_running": False}
 
 
+@router.get("/n8n-changes")
+def changes_since(
+    source: str = Query(..., description="price | fundamentals | fx | universe | valuation"),
+    since: int = Query(0, ge=0, description="Last version the caller processed"),
+    db: Session = Depends(get_db),
+    _=Depends(verify_internal_token),
+):
+    """
+    Change feed: entities whose data was written after version `since`.
+    Store the returned `current_version` and pass it as `since` next time.
+    """
+    if source not in SOURCES:
+        raise HTTPException(status_code=400, detail=f"Unknown source '{source}'")
+    return get_changes_since(db, source, since)
+
+
 # ── Admin endpoints (JWT auth) ───────────────────────────────────────────────
 
 
@@ -7,13 +7,15 @@ import time
 
 from database.base import get_db
 from database.user import User
-from database.company import Company
 from database.financials import CompanyFinancials
 from database.stock_data import CompanyMarketData
-from services.basket_resolver import resolve_baskets_to_companies
+from services.basket_resolver import resolve_baskets_to_refs
 from services.company_filter_service import filter_by_market_cap
 from services.auth.auth import get_current_user
 from services.scan_job_service import create_job, run_scan_task
+from services.ingestion_watermarks import FUNDAMENTALS, PRICE
+from services.scan_result_cache import run_cached
+from utils.itertools_helpers import chunked
 
 
 logger = logging.getLogger(__name__)
@@ -36,50 +38,53 @@ class EvToRevenueResultItem(BaseModel):
 class EvToRevenueResponse(BaseModel):
     data: List[EvToRevenueResultItem]
 
-def _process_company_ev_revenue(
-    db: Session, 
-    company: Company, 
-    min_ratio: float, 
-    max_ratio: float
-) -> Optional[EvToRevenueResultItem]:
-    try:
-        # Get Financials (Revenue, Debt, Cash, EV)
-        fin = db.query(CompanyFinancials).filter(CompanyFinancials.company_id == company.company_id).first()
-        if not fin:
-            return None
-            
-        # Get Market Data (Market Cap)
-        mkt = db.query(CompanyMarketData).filter(CompanyMarketData.company_id == company.company_id).first()
-        market_cap = mkt.market_cap if mkt and mkt.market_cap else 0
-        
-        # Determine EV and Revenue
-        ev = fin.enterprise_value
-        revenue = fin.total_revenue
-        
-        # Fallback Calculation for EV if missing
-        if ev is None and market_cap > 0 and fin.total_debt is not None and fin.cash_and_cash_equivalents is not None:
-            ev = market_cap + fin.total_debt - fin.cash_and_cash_equivalents
-            
-        if ev is None or revenue is None or revenue == 0:
-            return None
-            
-        ratio = ev / revenue
-        
-        if min_ratio <= ratio <= max_ratio:
-            return EvToRevenueResultItem(
-                ticker=company.ticker,
-                company_name=company.name,
-                ev_to_revenue=round(ratio, 2),
-                market_cap=market_cap,
-                total_revenue=revenue,
-                enterprise_value=ev
-            )
-            
-    except Exception as e:
-        logger.warning(f"Error processing {company.ticker} for EV/Rev: {e}")
-        return None
-        
-    return None
+def _compute_ev_revenue(db: Session, company_ids: List[int]) -> dict[int, dict]:
+    """
+    EV/Revenue inputs for a batch of companies (two bulk queries).
+    Returns {company_id: {...}} for companies with a computable ratio.
+    """
+    financials = {}
+    market_caps = {}
+    for chunk_ids in chunked(company_ids, 1000):
+        chunk_ids = list(chunk_ids)
+        financials.update({
+            fin.company_id: fin
+            for fin in db.query(CompanyFinancials)
+            .filter(CompanyFinancials.company_id.in_(chunk_ids))
+            .all()
+        })
+        market_caps.update(dict(
+            db.query(CompanyMarketData.company_id, CompanyMarketData.market_cap)
+            .filter(CompanyMarketData.company_id.in_(chunk_ids))
+            .all()
+        ))
+
+    computed = {}
+    for company_id, fin in financials.items():
+        try:
+            market_cap = market_caps.get(company_id) or 0
+
+            # Determine EV and Revenue
+            ev = fin.enterprise_value
+            revenue = fin.total_revenue
+
+            # Fallback Calculation for EV if missing
+            if ev is None and market_cap > 0 and fin.total_debt is not None and fin.cash_and_cash_equivalents is not None:
+                ev = market_cap + fin.total_debt - fin.cash_and_cash_equivalents
+
+            if ev is None or revenue is None or revenue == 0:
+                continue
+
+            computed[company_id] = {
+                "ev_to_revenue": ev / revenue,
+                "market_cap": market_cap,
+                "total_revenue": revenue,
+                "enterprise_value": ev,
+            }
+        except Exception as e:
+            logger.warning(f"Error processing company {company_id} for EV/Rev: {e}")
+
+    return computed
 
 
 
@@ -90,7 +95,7 @@ def run_ev_to_revenue_scan(db: Session, req: EvToRevenueScanRequest):
     try:
         # 1. Resolve Universe
         try:
-            _, companies = resolve_baskets_to_companies(db, req.basket_ids)
+            _, companies = resolve_baskets_to_refs(db, req.basket_ids)
         except ValueError as exc:
             # In background task, we can't raise HTTPException to user directly, 
             # but run_scan_task catches exceptions and marks job as FAILED.
@@ -103,15 +108,33 @@ def run_ev_to_revenue_scan(db: Session, req: EvToRevenueScanRequest):
         if req.min_market_cap:
             companies = filter_by_market_cap(db, companies, req.min_market_cap)
 
-        results = []
         logger.info(f"Scanning {len(companies)} companies for EV/Revenue...")
 
+        # 3. Ratios are cached unfiltered per company; bounds are applied below
+        per_company = run_cached(
+            db,
+            "ev_to_revenue",
+            {},
+            [c.company_id for c in companies],
+            lambda ids: _compute_ev_revenue(db, ids),
+            sources=(FUNDAMENTALS, PRICE),
+        )
+
+        results = []
         for company in companies:
-            item = _process_company_ev_revenue(
-                db, company, req.min_ev_to_revenue, req.max_ev_to_revenue
-            )
-            if item:
-                results.append(item.dict()) # Convert Pydantic model to dict for JSON serialization
+            item = per_company.get(company.company_id)
+            if not item:
+                continue
+            ratio = item["ev_to_revenue"]
+            if req.min_ev_to_revenue <= ratio <= req.max_ev_to_revenue:
+                results.append(EvToRevenueResultItem(
+                    ticker=company.ticker,
+                    company_name=company.name,
+                    ev_to_revenue=round(ratio, 2),
+                    market_cap=item["market_cap"],
+                    total_revenue=item["total_revenue"],
+                    enterprise_value=item["enterprise_value"],
+                ).dict())  # Convert Pydantic model to dict for JSON serialization
                 
         # Sort by Ratio (Cheapest first)
         results.sort(key=lambda x: x["ev_to_revenue"])
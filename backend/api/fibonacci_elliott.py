@@ -10,8 +10,11 @@ from sqlalchemy.orm import Session
 from database.base import get_db
 from database.company import Company
 from database.stock_data import StockPriceHistory
-from services.basket_resolver import resolve_baskets_to_companies
+from services.basket_resolver import resolve_baskets_to_refs
 from services.company_filter_service import filter_by_market_cap
+from services.ingestion_watermarks import PRICE
+from services.scan_result_cache import run_cached
+from services.universe_cache import CompanyRef
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -418,15 +421,14 @@ class ScanResponse(BaseModel):
     data: List[ScanResultItem]
 
 
-def _process_company_scan(
+def _analyze_company(
     db: Session,
-    company: Company,
+    company: CompanyRef,
     pivot_threshold: float,
-    min_kelly_fraction: float
-) -> Optional[ScanResultItem]:
+) -> Optional[dict]:
     """
     Helper to process a single company for the scan including data loading and analysis.
-    Returns None if criteria not met or error occurs.
+    Returns the unfiltered wave metrics, or None if there is no data or an error occurs.
     """
     try:
         # Load data for the company
@@ -443,25 +445,17 @@ def _process_company_scan(
         # Calculate risk metrics and Kelly Fraction
         _, kelly = compute_risk(df.close, waves)
         
-        # Filter by minimum Kelly Fraction
-        if kelly >= min_kelly_fraction:
+        return {
+            "kelly_fraction": kelly,
+            "wave_count": len(waves),
+            "pivot_count": len(pivots),
             # Get the last wave label
-            last_wave = waves[-1].wave_label if waves else None
-            
-            return ScanResultItem(
-                ticker=company.ticker,
-                company_name=company.name,
-                kelly_fraction=kelly,
-                wave_count=len(waves),
-                pivot_count=len(pivots),
-                last_wave=last_wave,
-            )
+            "last_wave": waves[-1].wave_label if waves else None,
+        }
     except Exception as e:
         # Log but return None to continue scanning other stocks
         logger.warning(f"Failed to analyze {company.ticker}: {str(e)}")
         return None
-    
-    return None
 
 
 @router.post("/scan", response_model=ScanResponse)
@@ -475,7 +469,7 @@ def scan_fibonacci_elliott(
     """
     # Get companies from the specified baskets using the resolver
     try:
-        _, companies = resolve_baskets_to_companies(db, req.basket_ids)
+        _, companies = resolve_baskets_to_refs(db, req.basket_ids)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     
@@ -486,15 +480,37 @@ def scan_fibonacci_elliott(
     if not companies:
         return ScanResponse(data=[])
     
-    results = []
     logger.info(f"Scanning {len(companies)} companies for Elliott Wave patterns")
     
+    by_id = {c.company_id: c for c in companies}
+
+    def compute(company_ids: List[int]) -> Dict[int, dict]:
+        analysed = {}
+        for cid in company_ids:
+            metrics = _analyze_company(db, by_id[cid], req.pivot_threshold)
+            if metrics:
+                analysed[cid] = metrics
+        return analysed
+
+    # Metrics are cached per company; the Kelly threshold is applied below
+    per_company = run_cached(
+        db,
+        "elliott_wave",
+        {"pivot_threshold": req.pivot_threshold},
+        list(by_id),
+        compute,
+        sources=(PRICE,),
+    )
+
+    results = []
     for company in companies:
-        result_item = _process_company_scan(
-            db, company, req.pivot_threshold, req.min_kelly_fraction
-        )
-        if result_item:
-            results.append(result_item)
+        metrics = per_company.get(company.company_id)
+        if metrics and metrics["kelly_fraction"] >= req.min_kelly_fraction:
+            results.append(ScanResultItem(
+                ticker=company.ticker,
+                company_name=company.name,
+                **metrics,
+            ))
     
     logger.info(f"Found {len(results)} stocks matching criteria")
     return ScanResponse(data=results)
@@ -21,6 +21,7 @@ from services.auth.auth import get_current_user
 from services.gmma_scanner import run_gmma_scan, get_gmma_chart_data, run_gmma_scan_for_company_ids
 from services.scan_job_service import create_job, run_scan_task
 from core.config import settings
+from utils.columnar import ChartFormat, FastJSONResponse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -133,6 +134,7 @@ def scan_gmma_squeeze(
 def gmma_chart(
     ticker: str,
     days: int = 365,
+    format: ChartFormat = "rows",
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -140,6 +142,7 @@ def gmma_chart(
     Return GMMA band chart data for a single ticker.
     Used by the frontend to render an inline GMMA chart.
     `days` controls how many trading days to return (default 365 ≈ 1 year).
+    `format=columnar` returns parallel arrays per field instead of per-day rows.
     """
     if not current_user:
         raise HTTPException(
@@ -150,11 +153,12 @@ def gmma_chart(
     # Clamp to reasonable range
     days = max(30, min(days, 1500))
 
-    result = get_gmma_chart_data(db, ticker.upper(), session_limit=days)
+    columnar = format == "columnar"
+    result = get_gmma_chart_data(db, ticker.upper(), session_limit=days, columnar=columnar)
     if not result["data"]:
         raise HTTPException(status_code=404, detail=f"No data for ticker {ticker}")
 
-    return result
+    return FastJSONResponse(result) if columnar else result
 
 
 # ── n8n GMMA Squeeze Report ─────────────────────────────────────────
@@ -1,25 +1,18 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
 from sqlalchemy.orm import Session
 
 from api.dependencies.portfolio import get_user_portfolio
-from api.watchlist import build_watchlist_full_for_user
 from services.auth.auth import get_current_user
-from services.portfolio_positions_service import get_holdings_for_user, ensure_portfolio_prices_fresh
-from services.portfolio_snapshot_service import get_portfolio_snapshot
-from services.portfolio_transactions_service import get_transactions_for_portfolio
-from services.portfolio_valuation_service import get_latest_portfolio_valuation
+from services.dashboard_core_service import get_dashboard_sections
+from services.portfolio_positions_service import ensure_portfolio_prices_fresh
 from utils.portfolio_utils import parse_as_of_date
 from database.base import get_db
-from services.portfolio_metrics_service import PortfolioMetricsService
-from database.alert import Alert
-from decimal import Decimal
+from services.portfolio_returns_service import get_performance
 
 
 router = APIRouter()
 
-from fastapi import APIRouter, Depends, Query, BackgroundTasks
-
 @router.get("/dashboard/core")
 def get_portfolio_dashboard_core(
     background_tasks: BackgroundTasks,
@@ -28,11 +21,8 @@ def get_portfolio_dashboard_core(
     as_of_date: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    # Auto-refresh stale prices (older than 1h), protecting against redundant API calls.
-    # checking staleness of PRICES
-    ensure_portfolio_prices_fresh(db, portfolio, background_tasks)
-
-    from services.valuation.rematerializ import rematerialize_from_tx
+    from services.valuation.rematerialization_queue import enqueue_rematerialization, get_pending_from
+    from services.valuation.valuation_version import is_today_current
     from datetime import date, timedelta
     from database.valuation import PortfolioValuationDaily
     from sqlalchemy import func
@@ -42,10 +32,15 @@ def get_portfolio_dashboard_core(
         PortfolioValuationDaily.portfolio_id == portfolio.id
     ).scalar()
 
+    # Queue state before this request's own sync: a rebuild requested here is
+    # a routine refresh, not a change the client has to wait for
+    pending_from = get_pending_from(db, portfolio.id)
+    valuations_pending = pending_from is not None
+
     try:
         # Strategy:
         # 1. Historical Fix (Last 7 Days): Run only ONCE per day (heavy).
-        # 2. Current Day Fix: Run EVERY time (durable, fast).
+        # 2. Current Day Fix: Run whenever today's prices, FX or cash moved (fast).
         # If we run the Heavy Sync, it covers Today automatically, so we don't need to run both.
         
         needs_history_sync = not latest_update or latest_update.date() < date.today()
@@ -64,25 +59,28 @@ def get_portfolio_dashboard_core(
                 
             days_back = min(days_back, 45)
 
-            rematerialize_from_tx(db, portfolio.id, tx_day=date.today() - timedelta(days=days_back))
-        else:
-            # Light Sync: Refreshes Today only. Ensures "Now" is up to date with instant trades.
-            rematerialize_from_tx(db, portfolio.id, tx_day=date.today())
+            sync_from = date.today() - timedelta(days=days_back)
+            if pending_from is None or pending_from > sync_from:
+                enqueue_rematerialization(db, portfolio.id, sync_from)
+        elif pending_from is None and not is_today_current(db, portfolio):
+            # Light Sync: Refreshes Today only. Transactions queue their own rebuilds.
+            enqueue_rematerialization(db, portfolio.id, date.today())
             
     except Exception as e:
         # Don't break dashboard if valuation fails
         pass
 
-    portfolio_id = portfolio.id
     end_date = parse_as_of_date(as_of_date)
     # CORE: No performance service call here
 
-    holdings = get_holdings_for_user(db, portfolio)
-    watchlist = build_watchlist_full_for_user(db, user)
-    transactions = get_transactions_for_portfolio(db, portfolio_id)
-    alerts = db.query(Alert).filter(Alert.user_id == user.id).all()
+    # Served from the per-user section cache; misses are computed concurrently
+    sections, refreshed = get_dashboard_sections(db, portfolio.id, user.id)
+    snapshot = sections["snapshot"]
 
-    snapshot = get_portfolio_snapshot(db, portfolio)
+    # Auto-refresh stale prices (older than 1h) whenever holdings are recomputed,
+    # protecting against redundant API calls.
+    if "holdings" in refreshed:
+        ensure_portfolio_prices_fresh(db, portfolio, background_tasks)
 
     # Simplified net_invested_cash until performance loads ITD
     # Or calculate partial ITD flow here if fast?
@@ -113,12 +111,13 @@ def get_portfolio_dashboard_core(
             ]
         },
         "as_of_date": end_date.isoformat(),
+        "valuations_pending": valuations_pending,
         # Performance is omitted or empty
         "performance": {}, 
-        "holdings": holdings,
-        "watchlist": watchlist,
-        "transactions": transactions,
-        "alerts": alerts,
+        "holdings": sections["holdings"],
+        "watchlist": sections["watchlist"],
+        "transactions": sections["transactions"],
+        "alerts": sections["alerts"],
         "accounts": [
             {
                 "id": acc.id,
@@ -139,62 +138,13 @@ def get_portfolio_dashboard_performance(
     as_of_date: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    portfolio_id = portfolio.id
     end_date = parse_as_of_date(as_of_date)
-    svc = PortfolioMetricsService(db)
 
-    # --- Live Value Override Logic ---
-    # 1. Fetch current holdings (with latest prices)
-    holdings = get_holdings_for_user(db, portfolio)
-    
-    # 2. Sum invested value (Live)
-    # Holdings already contain price * quantity * fx logic in `period_pnl` calculation or we recompute?
-    # get_holdings_for_user returns dicts. Let's recompute safe total.
-    live_invested = sum(
-        Decimal(str(h["shares"])) * 
-        Decimal(str(h["last_price"])) * 
-        Decimal(str(h["fx_rate_to_portfolio_ccy"])) 
-        for h in holdings
-    )
-    
-    # 3. Sum cash (Real-time from accounts)
-    live_cash = sum(Decimal(str(a.cash)) for a in portfolio.accounts)
-    
-    # 4. Total Live Value
-    live_total_value = live_invested + live_cash
-    
-    # 5. Live PnL Map (Sum of period_pnl from holdings)
-    live_pnl_map = {}
-    # We exclude 'itd' from PnL override because ITD PnL includes realized history 
-    # which is NOT in the holdings table. Forcing it to match table causes 
-    # math artifacts (phantom 'starting investment').
-    PERIODS_TO_SUM = ["1d", "1w", "1m", "3m", "6m", "1y", "ytd"]
-    
-    # Initialize
-    for p in PERIODS_TO_SUM:
-        live_pnl_map[p] = Decimal("0")
-        
-    for h in holdings:
-        ppnl = h.get("period_pnl", {})
-        for p in PERIODS_TO_SUM:
-            val = ppnl.get(p)
-            if val is not None:
-                live_pnl_map[p] += Decimal(str(val))
-
-    overrides = {
-        "total_value": live_total_value,
-        "cash_val": live_cash,
-        "period_pnl_map": live_pnl_map
-    }
+    # Stored after each rematerialization; computed (and stored) only when
+    # the valuations changed since, or for a new as-of date
+    performance = get_performance(db, portfolio, end_date)
 
-    # This is the heavy part
-    performance = svc.build_performance_summary(
-        portfolio_id,
-        end_date,
-        include_all_breakdowns=True,
-        current_values_override=overrides
-    )
-    
+    portfolio_id = portfolio.id
     return {
         "portfolio_id": portfolio_id,
         "performance": performance
@@ -204,13 +154,14 @@ def get_portfolio_dashboard_performance(
 # Backwards compatibility (Deprecate soon)
 @router.get("/dashboard")
 def get_portfolio_dashboard_legacy(
+    background_tasks: BackgroundTasks,
     portfolio = Depends(get_user_portfolio),
     user = Depends(get_current_user),
     as_of_date: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
     # Call core
-    core = get_portfolio_dashboard_core(portfolio, user, as_of_date, db)
+    core = get_portfolio_dashboard_core(background_tasks, portfolio, user, as_of_date, db)
     
     # Call performance
     perf_resp = get_portfolio_dashboard_performance(portfolio, as_of_date, db)
@@ -16,7 +16,7 @@ from database.portfolio import Transaction
 from database.account import Account
 from database.company import Company
 from schemas.portfolio_schemas import TradeBase, TradeResponse, TransactionType
-from services.valuation.rematerializ import rematerialize_from_tx
+from services.valuation.rematerialization_queue import enqueue_rematerialization
 from services.fx.fx_rate_service import fetch_and_save_fx_rate
 from database.fx import FxRate
 from decimal import Decimal, getcontext
@@ -242,9 +242,9 @@ def add_dividend(
     db.commit()
 
     # Rematerialize from this date to keep PVD correct
-    rematerialize_from_tx(db, portfolio_id=portfolio.id, tx_day=payload.event_date)
+    pending = enqueue_rematerialization(db, portfolio.id, payload.event_date)
 
-    return {"message": "Dividend recorded"}
+    return {"message": "Dividend recorded", "valuations_pending": pending}
 
 
 @router.post("/interest", response_model=TradeResponse)
@@ -282,9 +282,9 @@ def add_interest(
     _adjust_account_cash(db, account, amount)
     db.commit()
 
-    rematerialize_from_tx(db, portfolio_id=portfolio.id, tx_day=payload.event_date)
+    pending = enqueue_rematerialization(db, portfolio.id, payload.event_date)
 
-    return {"message": "Interest recorded"}
+    return {"message": "Interest recorded", "valuations_pending": pending}
 
 
 @router.post("/deposit", response_model=TradeResponse)
@@ -322,8 +322,8 @@ def deposit_cash(
     _adjust_account_cash(db, account, amount)
     db.commit()
 
-    rematerialize_from_tx(db, portfolio_id=portfolio.id, tx_day=payload.event_date)
-    return {"message": "Deposit recorded"}
+    pending = enqueue_rematerialization(db, portfolio.id, payload.event_date)
+    return {"message": "Deposit recorded", "valuations_pending": pending}
 
 
 @router.post("/withdrawal", response_model=TradeResponse)
@@ -364,8 +364,8 @@ def withdraw_cash(
     _adjust_account_cash(db, account, -amount)
     db.commit()
 
-    rematerialize_from_tx(db, portfolio_id=portfolio.id, tx_day=payload.event_date)
-    return {"message": "Withdrawal recorded"}
+    pending = enqueue_rematerialization(db, portfolio.id, payload.event_date)
+    return {"message": "Withdrawal recorded", "valuations_pending": pending}
 
 
 
@@ -429,12 +429,9 @@ def buy_stock(
     _adjust_account_cash(db, account, -total_cost_account_ccy)
     db.commit()
 
-    try:
-        rematerialize_from_tx(db, portfolio.id, tx.timestamp.date())
-    except Exception:
-        pass
+    pending = enqueue_rematerialization(db, portfolio.id, tx.timestamp.date())
 
-    return {"message": "Buy recorded"}
+    return {"message": "Buy recorded", "valuations_pending": pending}
 
 
 @router.post("/sell", response_model=TradeResponse)
@@ -510,9 +507,6 @@ def sell_stock(
     _adjust_account_cash(db, account, total_value_account_ccy)
     db.commit()
 
-    try:
-        rematerialize_from_tx(db, portfolio.id, tx.timestamp.date())
-    except Exception:
-        pass
+    pending = enqueue_rematerialization(db, portfolio.id, tx.timestamp.date())
 
-    return {"message": "Sell recorded"}
+    return {"message": "Sell recorded", "valuations_pending": pending}
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from database.base import get_db
+from database.user import User
+from schemas.screener_schemas import ScreenerRequest, ScreenerResponse
+from services.auth.auth import get_current_user
+from services.screener_service import list_fields, run_screen
+
+router = APIRouter()
+
+
+@router.get("/fields")
+def screener_fields():
+    """Fields, their kinds and the operators each accepts."""
+    return list_fields()
+
+
+@router.post("/run", response_model=ScreenerResponse)
+def run_screener(
+    request: ScreenerRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Run a composite screen, e.g. above SMA200 AND EV/Revenue < 2 AND cap > $1B:
+
+        {"criteria": [
+            {"field": "above_sma_200", "op": "is_true"},
+            {"field": "ev_to_revenue", "op": "lt", "value": 2},
+            {"field": "market_cap_usd", "op": "gt", "value": 1000000000}
+        ]}
+
+    Answered synchronously from company_screening_facts in a single query.
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required"
+        )
+    try:
+        return run_screen(db, request)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
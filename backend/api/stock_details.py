@@ -1,12 +1,14 @@
 import logging
 import os
+import time
 from datetime import datetime, timedelta, timezone
 
+import httpx
 import requests
 import yfinance as yf
-from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from fastapi.responses import FileResponse
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, BackgroundTasks, Response
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
@@ -26,6 +28,7 @@ from services.company_market_sync import (
     get_available_markets,
 )
 from utils.cleaning import clean_nan_values
+from utils.columnar import ChartFormat, FastJSONResponse
 from utils.comparables import build_peer_comparisons
 from utils.financial_utils import calculate_financial_ratios
 from utils.insights import (
@@ -36,10 +39,19 @@ from utils.insights import (
 from utils.sanitize import sanitize_numpy_types
 from utils.valuation import build_valuation_metrics
 from services.yfinance_data_update.data_update_service import ensure_fresh_data
+from core.config import settings
+from services.logo_service import get_logo, valid_ticker
+from services.stock_details_cache import get_page, most_viewed, page_version, record_view, store_page
+from services.valuation.valuation_version import matches_etag
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_DEFAULT_SHORT_WINDOW = 50
+_DEFAULT_LONG_WINDOW = 200
+# Shared pages; clients keep them but revalidate (cheap 304 when unchanged)
+_CACHE_CONTROL = "public, no-cache"
+
 
 def fetch_company_overview_from_api(ticker: str) -> dict:
     api_key = os.getenv("FMP_API_KEY")
@@ -354,41 +366,35 @@ def build_executive_summary(company: Company, market: Market | None) -> dict:
     }
 
 
-@router.get("/{ticker}/logo", response_class=FileResponse)
-def get_company_logo(ticker: str):
+@router.get("/{ticker}/logo")
+async def get_company_logo(ticker: str, if_none_match: Optional[str] = Header(None)):
     """
-    Returns the company logo.
-    If not present locally, attempts to download it from FMP.
+    Returns the company logo (memory → disk → remote, see services/logo_service.py).
+    Served with a long-lived Cache-Control and an ETag; tickers without a logo
+    get a 404 that browsers may cache too.
     """
-    # Basic sanitization
     ticker = ticker.upper().strip()
+    if not valid_ticker(ticker):
+        raise HTTPException(status_code=404, detail="Logo not found")
 
-    # Define paths
-    static_dir = Path(__file__).resolve().parent.parent / "static" / "logos"
-    static_dir.mkdir(parents=True, exist_ok=True)
-
-    logo_path = static_dir / f"{ticker}.png"
-
-    if logo_path.exists():
-        return FileResponse(logo_path)
-
-    # Not found, try to fetch
-    url = f"https://financialmodelingprep.com/image-stock/{ticker}.png"
     try:
-        resp = requests.get(url, timeout=5)
-        if resp.status_code == 200:
-            with open(logo_path, "wb") as f:
-                f.write(resp.content)
-            return FileResponse(logo_path)
-        else:
-            logger.warning(f"Failed to download logo for {ticker}, status: {resp.status_code}")
-            raise HTTPException(status_code=404, detail="Logo not found")
-    except HTTPException:
-        raise
-    except Exception as e:
+        logo = await get_logo(ticker)
+    except (httpx.HTTPError, OSError) as e:
         logger.error(f"Error fetching logo for {ticker}: {e}")
         raise HTTPException(status_code=500, detail="Error fetching logo")
 
+    if logo is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Logo not found",
+            headers={"Cache-Control": f"public, max-age={settings.LOGO_MISS_TTL_SECONDS}"},
+        )
+
+    headers = {"ETag": logo.etag, "Cache-Control": f"public, max-age={settings.LOGO_MAX_AGE_SECONDS}"}
+    if matches_etag(if_none_match, logo.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=logo.content, media_type="image/png", headers=headers)
+
 
 def background_fresh_data_wrapper(ticker: str, market_name: str):
     """Wrapper to run ensure_fresh_data with its own DB session."""
@@ -401,84 +407,17 @@ def background_fresh_data_wrapper(ticker: str, market_name: str):
         db.close()
 
 
-@router.get("/{ticker}")
-def get_stock_details(
-    ticker: str,
-    background_tasks: BackgroundTasks,
-    short_window: int = Query(50, ge=1, description="Short MA window in days"),
-    long_window: int = Query(200, ge=1, description="Long MA window in days"),
-    db: Session = Depends(get_db),
-):
-    import time
-    start_total = time.time()
-    ticker = ticker.upper().strip()
-    
-    company = get_company_by_ticker(ticker, db)
-    logger.info(f"[PERF] {ticker} get_company_by_ticker: {time.time() - start_total:.4f}s")
-
-    if company.yfinance_market == "DELISTED":
-        overview = company.overview
-        overview_payload = {
-            "description": overview.description if overview else "Company marked as delisted.",
-            "website": overview.website if overview else "",
-            "sector": overview.sector if overview else company.sector,
-            "industry": overview.industry if overview else company.industry,
-            "country": overview.headquarters_country if overview else "",
-        }
-        response = {
-            "delisted": True,
-            "message": "This ticker is marked as delisted.",
-            "executive_summary": build_executive_summary(company, company.market),
-            "company_overview": overview_payload,
-        }
-        return sanitize_numpy_types(response)
-
-    t_market = time.time()
-    market = get_company_market(company, db)
-    logger.info(f"[PERF] {ticker} get_company_market: {time.time() - t_market:.4f}s")
-
-    if not market:
-        logger.warning("Market not found for ticker %s after auto-detection", ticker)
-        raise HTTPException(
-            status_code=404,
-            detail=(
-                "Market not found for this company. "
-                "Could not resolve exchange automatically; please set a market first."
-            ),
-        )
-
-    t_fresh = time.time()
-    scheduled = False
-    
-    # --- STALE-WHILE-REVALIDATE OPTIMIZATION ---
-    # Check if we have basic market data (price)
-    md = db.query(CompanyMarketData).filter(CompanyMarketData.company_id == company.company_id).first()
-    
-    # We consider data "present" if we have a current price. 
-    # Whether it's 1 hour or 1 day old, we show it instantly and update in background.
-    has_data = md and md.current_price is not None
-    
-    if has_data:
-        logger.info(f"Data exists (Price: {md.current_price}). Scheduling background update.")
-        background_tasks.add_task(background_fresh_data_wrapper, company.ticker, market.name)
-        scheduled = True
-        logger.info(f"ensure_fresh_data (BACKGROUND SCHEDULED): {time.time() - t_fresh:.4f}s")
-    else:
-        logger.info(f"No data found. Running synchronous update.")
-        ensure_fresh_data(company.ticker, market.name, False, db)
-        logger.info(f"ensure_fresh_data (SYNC): {time.time() - t_fresh:.4f}s")
-    # -------------------------------------------
-    
-    # ... (rest of function) ...
-    
-
-    
-    # Wait, I need to match the return block.
-    # I'll just restore the full block since I can't jump lines easily in Python with context.
-    
+def _build_stock_details(
+    db: Session,
+    company: Company,
+    market: Market,
+    short_window: int,
+    long_window: int,
+    columnar: bool = False,
+) -> dict:
+    """The full stock page of *company* (everything but per-request flags)."""
+    ticker = company.ticker
     t_overview = time.time()
-    # ...
-    # (Restoring omitted code to ensure integrity)
     overview = company.overview
     if not overview:
         try:
@@ -551,7 +490,7 @@ def get_stock_details(
     investor_metrics = build_investor_metrics(financials, trends)
     valuation_metrics = build_valuation_metrics(company, financials, db)
     raw_technical_analysis = build_extended_technical_analysis(
-        stock_history, short_window=short_window, long_window=long_window
+        stock_history, short_window=short_window, long_window=long_window, columnar=columnar
     )
     technical_analysis = clean_nan_values(raw_technical_analysis)
     risk_metrics = {}  # build_risk_metrics(company, stock_history, db)  # Placeholder
@@ -576,8 +515,134 @@ def get_stock_details(
         "risk_metrics": risk_metrics,
         "peer_comparison": peer_comparison,
         "analysis_dashboard": dashboard_metrics,
-        "background_update_scheduled": scheduled,
     }
+    return sanitize_numpy_types(response)
+
+
+def warm_stock_details_cache(db: Session, limit: int | None = None) -> int:
+    """
+    Rebuild the cached pages (default MA windows) of the most-viewed tickers,
+    e.g. right after a daily refresh bumped their versions.  Returns pages built.
+    """
+    limit = settings.STOCK_DETAILS_WARM_TOP if limit is None else limit
+    variant = (_DEFAULT_SHORT_WINDOW, _DEFAULT_LONG_WINDOW, "rows")
+    built = 0
+    for ticker in most_viewed(limit):
+        try:
+            company = db.query(Company).filter(Company.ticker == ticker).first()
+            if not company or not company.market or company.yfinance_market == "DELISTED":
+                continue
+            version = page_version(db, company.company_id)
+            if get_page(company.company_id, variant, version):
+                continue
+            body = _build_stock_details(db, company, company.market, _DEFAULT_SHORT_WINDOW, _DEFAULT_LONG_WINDOW)
+            store_page(company.company_id, variant, version, body)
+            built += 1
+        except HTTPException as ex:
+            logger.info(f"Stock details warmup skipped {ticker}: {ex.detail}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Stock details warmup failed for {ticker}: {e}")
+    logger.info(f"Stock details warmup: built {built} pages")
+    return built
+
+
+@router.get("/{ticker}")
+def get_stock_details(
+    ticker: str,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    short_window: int = Query(_DEFAULT_SHORT_WINDOW, ge=1, description="Short MA window in days"),
+    long_window: int = Query(_DEFAULT_LONG_WINDOW, ge=1, description="Long MA window in days"),
+    format: ChartFormat = Query("rows", description="technical_analysis.historical as per-day rows or columnar arrays"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Full stock page.  Served from the versioned page cache when the company's
+    price and fundamentals versions are unchanged; the strong ETag lets
+    clients revalidate with If-None-Match (304).  ``format=columnar`` returns
+    the price/SMA series as parallel arrays, encoded with orjson.
+    """
+    start_total = time.time()
+    ticker = ticker.upper().strip()
+    
+    company = get_company_by_ticker(ticker, db)
+    logger.info(f"[PERF] {ticker} get_company_by_ticker: {time.time() - start_total:.4f}s")
+    record_view(company.ticker)
+
+    if company.yfinance_market == "DELISTED":
+        overview = company.overview
+        overview_payload = {
+            "description": overview.description if overview else "Company marked as delisted.",
+            "website": overview.website if overview else "",
+            "sector": overview.sector if overview else company.sector,
+            "industry": overview.industry if overview else company.industry,
+            "country": overview.headquarters_country if overview else "",
+        }
+        payload = {
+            "delisted": True,
+            "message": "This ticker is marked as delisted.",
+            "executive_summary": build_executive_summary(company, company.market),
+            "company_overview": overview_payload,
+        }
+        return sanitize_numpy_types(payload)
+
+    t_market = time.time()
+    market = get_company_market(company, db)
+    logger.info(f"[PERF] {ticker} get_company_market: {time.time() - t_market:.4f}s")
+
+    if not market:
+        logger.warning("Market not found for ticker %s after auto-detection", ticker)
+        raise HTTPException(
+            status_code=404,
+            detail=(
+                "Market not found for this company. "
+                "Could not resolve exchange automatically; please set a market first."
+            ),
+        )
+
+    t_fresh = time.time()
+    scheduled = False
+    
+    # --- STALE-WHILE-REVALIDATE OPTIMIZATION ---
+    # Check if we have basic market data (price)
+    md = db.query(CompanyMarketData).filter(CompanyMarketData.company_id == company.company_id).first()
     
+    # We consider data "present" if we have a current price. 
+    # Whether it's 1 hour or 1 day old, we show it instantly and update in background.
+    has_data = md and md.current_price is not None
+    
+    if has_data:
+        logger.info(f"Data exists (Price: {md.current_price}). Scheduling background update.")
+        background_tasks.add_task(background_fresh_data_wrapper, company.ticker, market.name)
+        scheduled = True
+        logger.info(f"ensure_fresh_data (BACKGROUND SCHEDULED): {time.time() - t_fresh:.4f}s")
+    else:
+        logger.info(f"No data found. Running synchronous update.")
+        ensure_fresh_data(company.ticker, market.name, False, db)
+        logger.info(f"ensure_fresh_data (SYNC): {time.time() - t_fresh:.4f}s")
+    # -------------------------------------------
+
+    # Versions are read after a synchronous refresh, so a fresh fetch misses
+    columnar = format == "columnar"
+    variant = (short_window, long_window, format)
+    version = page_version(db, company.company_id)
+    page = get_page(company.company_id, variant, version)
+    if page is None:
+        body = _build_stock_details(db, company, market, short_window, long_window, columnar)
+        page = store_page(company.company_id, variant, version, body)
+    else:
+        logger.info(f"[PERF] {ticker} served from page cache")
+
+    etag = f'"{page.digest}-{int(scheduled)}"'
+    if matches_etag(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL})
+
+    content = {**page.body, "background_update_scheduled": scheduled}
     logger.info(f"[PERF] {ticker} TOTAL TIME: {time.time() - start_total:.4f}s")
-    return sanitize_numpy_types(response)
+    if columnar:
+        return FastJSONResponse(content, headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = _CACHE_CONTROL
+    return content
@@ -14,18 +14,22 @@ from schemas.portfolio_schemas import (
 from collections import defaultdict
 import pandas as pd
 
+from utils.columnar import ChartFormat, FastJSONResponse, column
+
 router = APIRouter(prefix="", tags=["Stock Data"])
 
 @router.get("/{ticker}/candles")
 def get_stock_candles(
     ticker: str,
     limit: int = Query(52, description="Number of latest candles to return (default: 52)"),
+    format: ChartFormat = Query("rows", description="Per-week rows or columnar arrays"),
     db: Session = Depends(get_db),
 ):
     """
     Returns weekly candles for the last N weeks + volume info.
     Use limit=1 to get only the latest candle for price checking.
     """
+    columnar = format == "columnar"
     ticker = ticker.upper().strip()
     company = db.query(Company).filter(Company.ticker == ticker).first()
     if not company:
@@ -45,7 +49,7 @@ def get_stock_candles(
     )
 
     if not records:
-        return JSONResponse(content=[])
+        return JSONResponse(content={} if columnar else [])
 
     # Convert to DataFrame
     data = [
@@ -78,6 +82,16 @@ def get_stock_candles(
     # Slice to last N weeks based on limit parameter
     df_weekly = df_weekly.iloc[-limit:]
 
+    if columnar:
+        return FastJSONResponse({
+            "date": [d.isoformat() for d in df_weekly.index],
+            "open": column(df_weekly["open"]),
+            "high": column(df_weekly["high"]),
+            "low": column(df_weekly["low"]),
+            "close": column(df_weekly["close"]),
+            "volume": df_weekly["volume"].astype("int64").tolist(),
+        })
+
     # Format for response
     result = []
     for date, row in df_weekly.iterrows():
@@ -96,6 +110,7 @@ def get_stock_candles(
 @router.post("/price-history")
 def price_history(
     req: PriceHistoryRequest,
+    format: ChartFormat = Query("rows", description="Per-ticker rows or columnar arrays"),
     db: Session = Depends(get_db),
 ):
     # 1) Determine cutoff_date via start_date > period > All
@@ -119,7 +134,9 @@ def price_history(
     company_ids = list(id_map.keys())
 
     # 3) Query price history from cutoff_date (if any)
-    query = db.query(StockPriceHistory).filter(
+    query = db.query(
+        StockPriceHistory.company_id, StockPriceHistory.date, StockPriceHistory.close
+    ).filter(
         StockPriceHistory.company_id.in_(company_ids)
     )
     if cutoff_date:
@@ -127,6 +144,14 @@ def price_history(
 
     records = query.order_by(StockPriceHistory.company_id, StockPriceHistory.date).all()
 
+    if format == "columnar":
+        series = defaultdict(lambda: {"date": [], "close": []})
+        for company_id, day, close in records:
+            entry = series[id_map[company_id]]
+            entry["date"].append(day)
+            entry["close"].append(close)
+        return FastJSONResponse(dict(series))
+
     # --- NEW: group results by ticker ---
     data = defaultdict(list)
     for r in records:
@@ -10,7 +10,10 @@ from services.positions_service import (
     apply_transaction_to_position,
     recompute_account_cash,
 )
-from services.valuation.rematerializ import rematerialize_from_tx
+from services.valuation.rematerialization_queue import enqueue_rematerialization
+from api.dependencies.portfolio import get_user_portfolio
+from schemas.portfolio_schemas import TransactionImportRequest, TransactionImportResponse
+from services.transaction_import_service import TransactionImportError, import_transactions_bulk
 
 router = APIRouter(prefix="/api/transactions", tags=["Transactions"])
 
@@ -26,6 +29,8 @@ def edit_transaction(transaction_id: int, payload: dict, db: Session = Depends(g
     if not tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
+    old_date = tx.timestamp.date()
+
     # Reverse current transaction from position
     reverse_transaction_from_position(db, tx)
 
@@ -41,12 +46,13 @@ def edit_transaction(transaction_id: int, payload: dict, db: Session = Depends(g
     recompute_account_cash(db, tx.account_id)
     
     db.commit()
-    
-    # ADD THIS: Trigger portfolio rematerialization for metrics
-    rematerialize_from_tx(db, tx.portfolio_id, tx.timestamp.date())
-    
+
+    # Rebuild valuations in the background from the earliest affected day
+    dirty_from = min(old_date, tx.timestamp.date())
+    pending = enqueue_rematerialization(db, tx.portfolio_id, dirty_from)
+
     db.refresh(tx)
-    return {"message": "Transaction updated", "id": tx.id}
+    return {"message": "Transaction updated", "id": tx.id, "valuations_pending": pending}
 
 # --------------------------------------------------------------------
 # DELETE /transactions/{id}
@@ -71,10 +77,9 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
     
     db.commit()
 
-    # ADD THIS: Trigger portfolio rematerialization for metrics
-    rematerialize_from_tx(db, portfolio_id, transaction_date)
+    pending = enqueue_rematerialization(db, portfolio_id, transaction_date)
 
-    return {"message": f"Transaction {transaction_id} deleted"}
+    return {"message": f"Transaction {transaction_id} deleted", "valuations_pending": pending}
 
 # --------------------------------------------------------------------
 # POST /transactions
@@ -126,9 +131,39 @@ def create_transaction(payload: dict, db: Session = Depends(get_db)):
     recompute_account_cash(db, tx.account_id)
 
     db.commit()
-    
-    # ADD THIS: Trigger portfolio rematerialization for metrics
-    rematerialize_from_tx(db, tx.portfolio_id, tx.timestamp.date())
-    
+
+    pending = enqueue_rematerialization(db, tx.portfolio_id, tx.timestamp.date())
+
     db.refresh(tx)
-    return {"message": "Transaction created", "id": tx.id, "type": tx.transaction_type.value}
+    return {
+        "message": "Transaction created",
+        "id": tx.id,
+        "type": tx.transaction_type.value,
+        "valuations_pending": pending,
+    }
+
+
+# --------------------------------------------------------------------
+# POST /transactions/import
+# --------------------------------------------------------------------
+@router.post("/import", response_model=TransactionImportResponse, operation_id="transactions_import")
+def import_transactions(
+    payload: TransactionImportRequest,
+    portfolio = Depends(get_user_portfolio),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk import: validates all rows, inserts them in one DB transaction,
+    recomputes each affected position and account once and queues one
+    valuation rebuild from the earliest imported date.
+    Any invalid row rejects the whole import (400, per-row errors).
+    """
+    try:
+        result = import_transactions_bulk(
+            db, portfolio, portfolio.user_id, payload.rows, account_id=payload.account_id
+        )
+    except TransactionImportError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "errors": e.errors})
+
+    pending = enqueue_rematerialization(db, portfolio.id, result["rebuild_from"])
+    return {**result, "valuations_pending": pending}
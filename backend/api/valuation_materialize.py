@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 from database.base import get_db
 from services.scan_job_service import create_job, run_scan_task
 from services.valuation.materialization_service import run_materialize_day, run_materialize_range
+from services.valuation.rematerialization_queue import get_pending_from
 
 router = APIRouter()
 log = logging.getLogger(__name__)
@@ -44,3 +45,14 @@ def materialize_range(
     
     background_tasks.add_task(run_scan_task, job.id, task_wrapper)
     return {"job_id": job.id, "status": "PENDING"}
+
+
+@router.get("/pending", operation_id="valuation_getPending")
+def rematerialization_pending(portfolio_id: int, db: Session = Depends(get_db)):
+    """Whether a background valuation rebuild is queued or running for the portfolio."""
+    pending_from = get_pending_from(db, portfolio_id)
+    return {
+        "portfolio_id": portfolio_id,
+        "valuations_pending": pending_from is not None,
+        "dirty_from": pending_from.isoformat() if pending_from else None,
+    }
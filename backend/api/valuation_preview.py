@@ -11,6 +11,7 @@ from database.company import Company
 from database.market import Market
 from database.stock_data import StockPriceHistory, CompanyMarketData
 from database.fx import FxRate
+from services.latest_bar_service import get_latest_bars
 
 router = APIRouter()
 
@@ -108,8 +109,15 @@ def preview_day_value(
     )
 
     # --- latest price helper (<= as_of) ---
+    # Latest bars of all held companies in one primary-key read
+    latest_bars = get_latest_bars(db, [r.company_id for r in rows])
+
     def latest_price(company_id: int) -> Decimal | None:
         # 1. Primary: StockPriceHistory (Historical/Consistent)
+        bar = latest_bars.get(company_id)
+        if bar is not None and bar.date <= as_of and bar.close is not None:
+            return Decimal(str(bar.close))
+
         row = (
             db.query(StockPriceHistory.close)
             .filter(StockPriceHistory.company_id == company_id, StockPriceHistory.date <= as_of)
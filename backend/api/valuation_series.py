@@ -1,16 +1,22 @@
 # api/valuation/valuation_series.py
+import logging
 from datetime import date, timedelta
-from decimal import Decimal
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from database.base import get_db
-from database.portfolio import Portfolio, Transaction
+from database.portfolio import Portfolio
 from database.valuation import PortfolioValuationDaily
-from api.valuation_materialize import run_materialize_day
+from services.valuation.materialization_service import get_first_tx_date, run_materialize_range
+from services.valuation.valuation_version import get_valuation_version, matches_etag
 
 router = APIRouter()
+log = logging.getLogger(__name__)
+
+# Clients may keep the series but must revalidate; revalidation is cheap (304)
+_CACHE_CONTROL = "private, no-cache"
 
 class SeriesRequest(BaseModel):
     portfolio_id: int
@@ -33,41 +39,85 @@ class SeriesRequest(BaseModel):
         }
     }
 
-def _daterange(d1: date, d2: date):
-    cur = d1
-    while cur <= d2:
-        yield cur
-        cur += timedelta(days=1)
+_BREAKDOWN_KEYS = ("by_stock", "by_etf", "by_bond", "by_crypto", "by_commodity", "by_cash", "net_contributions")
+
+
+def _missing_spans(days: list[date], have: set[date]) -> list[tuple[date, date]]:
+    """Contiguous [first, last] runs of *days* not in *have*."""
+    spans: list[tuple[date, date]] = []
+    for d in days:
+        if d in have:
+            continue
+        if spans and spans[-1][1] == d - timedelta(days=1):
+            spans[-1] = (spans[-1][0], d)
+        else:
+            spans.append((d, d))
+    return spans
+
+
+def _series_etag(
+    portfolio_id: int,
+    version: int,
+    start: date,
+    end: date,
+    include_breakdown: bool,
+    carry_forward: bool,
+) -> str:
+    shape = ("b" if include_breakdown else "t") + ("c" if carry_forward else "g")
+    return f'W/"pv-{portfolio_id}-{version}-{start:%Y%m%d}-{end:%Y%m%d}-{shape}"'
+
+
+def _row_point(r: PortfolioValuationDaily, include_breakdown: bool) -> dict:
+    point = {"date": r.date.isoformat(), "total": str(r.total_value)}
+    if include_breakdown:
+        point.update({k: str(getattr(r, k)) for k in _BREAKDOWN_KEYS})
+    return point
+
+
+def _materialized_point(p: dict, include_breakdown: bool) -> dict:
+    point = {"date": p["date"], "total": p["total_value"]}
+    if include_breakdown:
+        point.update({k: p[k] for k in _BREAKDOWN_KEYS})
+    return point
+
 
 @router.get("/series", operation_id="valuation_getSeries")
 def valuation_series(
     portfolio_id: int,
+    response: Response,
     start: date = Query(..., description="YYYY-MM-DD"),
     end: date = Query(..., description="YYYY-MM-DD"),
     carry_forward: bool = True,
     include_breakdown: bool = False,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
 ):
+    """
+    Daily valuation series.  Days without a stored row are materialized first,
+    one range pass per request.  The response carries an ETag tied to the
+    portfolio's materialization version; a matching If-None-Match gets 304.
+    """
     if end < start:
         raise HTTPException(status_code=400, detail="end < start")
 
+    etag = _series_etag(
+        portfolio_id, get_valuation_version(db, portfolio_id), start, end, include_breakdown, carry_forward
+    )
+    if matches_etag(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL})
+
     pf = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
     if not pf:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
+    response.headers["Cache-Control"] = _CACHE_CONTROL
+
     # clamp to first transaction date to avoid leading zeros
-    first_tx = (
-        db.query(Transaction.timestamp)
-        .filter(Transaction.portfolio_id == portfolio_id)
-        .order_by(Transaction.timestamp.asc())
-        .first()
-    )
-    if not first_tx:
-        return {"portfolio_id": portfolio_id, "points": []}
-    first_dt = first_tx[0].date()
-    if end < first_dt:
+    first_dt = get_first_tx_date(db, portfolio_id)
+    if not first_dt or end < first_dt:
+        response.headers["ETag"] = etag
         return {"portfolio_id": portfolio_id, "points": []}
-    start = max(start, first_dt)
+    eff_start = max(start, first_dt)
 
     # preload existing rows
     rows = (
@@ -75,84 +125,64 @@ def valuation_series(
         .filter(
             and_(
                 PortfolioValuationDaily.portfolio_id == portfolio_id,
-                PortfolioValuationDaily.date >= start,
+                PortfolioValuationDaily.date >= eff_start,
                 PortfolioValuationDaily.date <= end,
             )
         )
         .all()
     )
-    by_date = {r.date: r for r in rows}
+    points_by_date = {r.date: _row_point(r, include_breakdown) for r in rows}
 
-    points = []
-    last_total = None
-    last_stock = None
-    last_cash = None
-
-    for d in _daterange(start, end):
-        r = by_date.get(d)
-        if not r:
-            # compute + persist for this day
-            res = run_materialize_day(portfolio_id=portfolio_id, as_of=d, db=db)
-            total = Decimal(res["total_value"])
-            if include_breakdown:
-                stock = Decimal(res["by_stock"])
-                etf = Decimal(res["by_etf"])
-                bond = Decimal(res["by_bond"])
-                crypto = Decimal(res["by_crypto"])
-                commodity = Decimal(res["by_commodity"])
-                cash = Decimal(res["by_cash"])
-                points.append({
-                    "date": d.isoformat(),
-                    "total": str(total),
-                    "by_stock": str(stock),
-                    "by_etf": str(etf),
-                    "by_bond": str(bond),
-                    "by_crypto": str(crypto),
-                    "by_commodity": str(commodity),
-                    "by_cash": str(cash),
-                    "net_contributions": str(Decimal(res["net_contributions"])),
-                })
-                # last_stock etc could be tracked if needed, but primary loop covers it
-            else:
-                points.append({"date": d.isoformat(), "total": str(total)})
-            last_total = total
-            continue
+    days = [eff_start + timedelta(days=i) for i in range((end - eff_start).days + 1)]
+    spans = _missing_spans(days, set(points_by_date))
+    if spans:
+        # One pass from the first to the last gap; days in between that
+        # already have rows only advance the running state.
+        missing = {d for d in days if d not in points_by_date}
+        res = run_materialize_range(
+            portfolio_id=portfolio_id,
+            start=spans[0][0],
+            end=spans[-1][1],
+            db=db,
+            only_dates=missing,
+        )
+        for p in res["points"]:
+            points_by_date[date.fromisoformat(p["date"])] = _materialized_point(p, include_breakdown)
+        log.info(
+            f"Valuation series {portfolio_id}: filled {len(missing)} days in {len(spans)} gaps"
+        )
+        etag = _series_etag(
+            portfolio_id, get_valuation_version(db, portfolio_id), start, end, include_breakdown, carry_forward
+        )
 
-        # have a stored row
-        total = r.total_value
-        if include_breakdown:
-            points.append({
-                "date": d.isoformat(),
-                "total": str(total),
-                "by_stock": str(r.by_stock),
-                "by_etf": str(r.by_etf),
-                "by_bond": str(r.by_bond),
-                "by_crypto": str(r.by_crypto),
-                "by_commodity": str(r.by_commodity),
-                "by_cash": str(r.by_cash),
-                "net_contributions": str(r.net_contributions),
-            })
-        else:
-            points.append({"date": d.isoformat(), "total": str(total)})
-        last_total = total
-
-    # optional forward-fill for any zeros/gaps (already dense now, so just carry forward if any None)
-    if carry_forward and points:
-        for i in range(len(points)):
-            if include_breakdown:
-                # if there were any None values (shouldn't be), carry forward last known ones
-                pass  # left here intentionally; computation above already filled
-            else:
-                pass
+    points = []
+    last = None
+    for d in days:
+        point = points_by_date.get(d)
+        if point is None and carry_forward and last is not None:
+            point = {**last, "date": d.isoformat()}
+        if point is not None:
+            points.append(point)
+            last = point
 
+    response.headers["ETag"] = etag
     return {"portfolio_id": portfolio_id, "points": points}
 
 @router.post("/series", operation_id="valuation_postSeries")
-def valuation_series_post(payload: SeriesRequest, db: Session = Depends(get_db)):
+def valuation_series_post(
+    payload: SeriesRequest,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """Return time series of daily valuations (JSON body)."""
     return valuation_series(
         portfolio_id=payload.portfolio_id,
+        response=response,
         start=payload.start,
         end=payload.end,
+        carry_forward=payload.carry_forward,
+        include_breakdown=payload.include_breakdown,
+        if_none_match=if_none_match,
         db=db,
     )
@@ -1,14 +1,17 @@
-from typing import List, Optional, Dict
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, true
+from sqlalchemy.orm import Session, aliased, joinedload
 
 from api.portfolio_crud import get_or_create_portfolio
 from services.auth.auth import get_current_user
 from services.company.company_service import get_or_create_company
-from services.sma_lookup_service import get_latest_smas_for_company, get_latest_smas_bulk
 from database.base import get_db
+from database.account import Account
+from database.latest_bar import CompanyLatestBar
+from database.market import Market
 from database.portfolio import FavoriteStock
 from database.position import PortfolioPositions
 from database.user import User
@@ -59,6 +62,29 @@ def get_watchlist_companies_for_user(db: Session, user: User) -> List[dict]:
     ]
 
 
+def _latest_market_data():
+    """Most recent CompanyMarketData row of the outer query's company."""
+    return (
+        select(
+            CompanyMarketData.id,
+            CompanyMarketData.current_price,
+            CompanyMarketData.last_updated,
+        )
+        .where(CompanyMarketData.company_id == Company.company_id)
+        .order_by(CompanyMarketData.last_updated.desc())
+        .limit(1)
+        .lateral("latest_md")
+    )
+
+
+def _round_price(value) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def _float_or_none(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
 def get_holdings_for_user(db: Session, user: User) -> List[dict]:
     """
     Returns a list of current holdings for the user's portfolio:
@@ -74,65 +100,49 @@ def get_holdings_for_user(db: Session, user: User) -> List[dict]:
       },
       ...
     ]
+
+    One joined query (positions ⋈ company ⋈ market ⋈ latest market data ⋈
+    latest bar), whatever the number of positions.
     """
     portfolio = get_or_create_portfolio(db, user.id)
-    # Use all accounts for this portfolio, then positions for those accounts
-    account_ids = [a.id for a in portfolio.accounts]
-    if not account_ids:
-        return []
-
-    positions = (
-        db.query(PortfolioPositions)
-        .filter(PortfolioPositions.account_id.in_(account_ids))
+    md = _latest_market_data()
+    rows = (
+        db.query(
+            Company.ticker,
+            Company.name,
+            PortfolioPositions.quantity,
+            PortfolioPositions.avg_cost_instrument_ccy,
+            PortfolioPositions.instrument_currency_code,
+            Market.currency.label("market_currency"),
+            md.c.current_price,
+            CompanyLatestBar.sma_50,
+            CompanyLatestBar.sma_200,
+        )
+        .join(Company, Company.company_id == PortfolioPositions.company_id)
+        .outerjoin(Market, Market.market_id == Company.market_id)
+        .outerjoin(md, true())
+        .outerjoin(CompanyLatestBar, CompanyLatestBar.company_id == Company.company_id)
+        .filter(
+            PortfolioPositions.account_id.in_(
+                select(Account.id).where(Account.portfolio_id == portfolio.id)
+            )
+        )
         .all()
     )
 
-    # Bulk-fetch SMA values from StockPriceHistory
-    all_company_ids = {pos.company_id for pos in positions}
-    sma_map = get_latest_smas_bulk(db, all_company_ids)
-
-    holdings: List[dict] = []
-    for pos in positions:
-        latest_md: Optional[CompanyMarketData] = (
-            db.query(CompanyMarketData)
-            .filter_by(company_id=pos.company_id)
-            .order_by(CompanyMarketData.last_updated.desc())
-            .first()
-        )
-        last_price: Optional[float] = None
-        currency: Optional[str] = None
-
-        if latest_md and latest_md.current_price is not None:
-            last_price = round(float(latest_md.current_price), 2)
-
-        sma_vals = sma_map.get(pos.company_id, {})
-        sma_50 = sma_vals.get("sma_50")
-        sma_200 = sma_vals.get("sma_200")
-
-        if pos.instrument_currency_code:
-            currency = pos.instrument_currency_code
-        elif pos.company and pos.company.market and pos.company.market.currency:
-            currency = pos.company.market.currency
-        avg_price = None
-        if pos.avg_cost_instrument_ccy is not None:
-            try:
-                avg_price = float(pos.avg_cost_instrument_ccy)
-            except (TypeError, ValueError):
-                avg_price = None
-        
-        holdings.append(
-            {
-                "ticker": pos.company.ticker,
-                "name": pos.company.name,
-                "shares": float(pos.quantity),
-                "average_price": avg_price,
-                "last_price": last_price,
-                "currency": currency,
-                "sma_50": sma_50,
-                "sma_200": sma_200,
-            }
-        )
-    return holdings
+    return [
+        {
+            "ticker": r.ticker,
+            "name": r.name,
+            "shares": float(r.quantity),
+            "average_price": _float_or_none(r.avg_cost_instrument_ccy),
+            "last_price": _round_price(r.current_price),
+            "currency": r.instrument_currency_code or r.market_currency,
+            "sma_50": _float_or_none(r.sma_50),
+            "sma_200": _float_or_none(r.sma_200),
+        }
+        for r in rows
+    ]
 
 
 def _add_company_to_watchlist(
@@ -162,41 +172,31 @@ def _add_company_to_watchlist(
     return fav
 
 
-def _get_latest_market_data_for_company(
-    db: Session,
-    company_id: int,
-) -> Dict[str, Optional[object]]:
-    latest_md: Optional[CompanyMarketData] = (
-        db.query(CompanyMarketData)
-        .filter_by(company_id=company_id)
-        .order_by(CompanyMarketData.last_updated.desc())
-        .first()
-    )
-
-    last_price: Optional[float] = None
-    currency: Optional[str] = None
-    last_updated: Optional[str] = None
+def _note_summary(note: Optional[CompanyNote]) -> Optional[dict]:
+    if note is None:
+        return None
 
-    if latest_md:
-        if latest_md.current_price is not None:
-            last_price = round(float(latest_md.current_price), 2)
-        if (
-            latest_md.company
-            and latest_md.company.market
-            and latest_md.company.market.currency
-        ):
-            currency = latest_md.company.market.currency
-        if latest_md.last_updated is not None:
-            last_updated = latest_md.last_updated.isoformat()
-
-    sma_vals = get_latest_smas_for_company(db, company_id)
+    next_catalyst_str = None
+    if note.next_catalyst and isinstance(note.next_catalyst, dict):
+        next_catalyst_str = note.next_catalyst.get("event")
+    elif note.next_catalyst and isinstance(note.next_catalyst, str):
+        next_catalyst_str = note.next_catalyst
 
     return {
-        "last_price": last_price,
-        "currency": currency,
-        "last_updated": last_updated,
-        "sma_50": sma_vals["sma_50"],
-        "sma_200": sma_vals["sma_200"],
+        "title": note.notes,
+        "research_status": note.research_status,
+        "sentiment_score": note.sentiment_score,
+        "sentiment_trend": note.sentiment_trend,
+        "thesis": note.investment_thesis,
+        "risk_factors": note.risk_factors,
+        "next_catalyst": next_catalyst_str,
+        "target_price_low": _float_or_none(note.intrinsic_value_low),
+        "target_price_high": _float_or_none(note.intrinsic_value_high),
+        "intrinsic_value_low": _float_or_none(note.intrinsic_value_low),
+        "intrinsic_value_high": _float_or_none(note.intrinsic_value_high),
+        "margin_of_safety": _float_or_none(note.margin_of_safety),
+        "tags": note.tags,
+        "updated_at": note.updated_at.isoformat() if note.updated_at else None,
     }
 
 
@@ -207,99 +207,92 @@ def build_watchlist_full_for_user(db: Session, user: User) -> List[dict]:
     - Company
     - CompanyNote (if exists)
     - Latest CompanyMarketData
+    - Latest bar (SMAs)
     - Holdings info (is_held, shares, average_price)
+
+    Everything comes from one joined query, so the number of queries does
+    not grow with the watchlist.
     """
-    favorites: List[FavoriteStock] = (
-        db.query(FavoriteStock)
-        .options(joinedload(FavoriteStock.company))
-        .filter(FavoriteStock.user_id == user.id)
-        .all()
-    )
-    if not favorites:
-        return []
+    portfolio = get_or_create_portfolio(db, user.id)
 
-    company_ids = [fav.company_id for fav in favorites]
+    md = _latest_market_data()
+    note_sq = (
+        select(CompanyNote)
+        .where(
+            CompanyNote.user_id == FavoriteStock.user_id,
+            CompanyNote.company_id == FavoriteStock.company_id,
+        )
+        .order_by(CompanyNote.id.desc())
+        .limit(1)
+        .lateral("latest_note")
+    )
+    note_alias = aliased(CompanyNote, note_sq, name="note")
+    position_sq = (
+        select(PortfolioPositions.quantity, PortfolioPositions.avg_cost_instrument_ccy)
+        .where(
+            PortfolioPositions.company_id == FavoriteStock.company_id,
+            PortfolioPositions.account_id.in_(
+                select(Account.id).where(Account.portfolio_id == portfolio.id)
+            ),
+        )
+        .order_by(PortfolioPositions.id.desc())
+        .limit(1)
+        .lateral("held")
+    )
 
-    # Notes mapping
-    notes_by_company: Dict[int, CompanyNote] = {
-        note.company_id: note
-        for note in db.query(CompanyNote)
-        .filter(CompanyNote.user_id == user.id)
-        .filter(CompanyNote.company_id.in_(company_ids))
+    rows = (
+        db.query(
+            FavoriteStock.company_id,
+            FavoriteStock.created_at,
+            Company.ticker,
+            Company.name,
+            Company.sector,
+            Company.industry,
+            Market.currency,
+            md.c.id.label("market_data_id"),
+            md.c.current_price,
+            md.c.last_updated,
+            CompanyLatestBar.sma_50,
+            CompanyLatestBar.sma_200,
+            position_sq.c.quantity.label("held_quantity"),
+            position_sq.c.avg_cost_instrument_ccy.label("held_avg_cost"),
+            note_alias,
+        )
+        .join(Company, Company.company_id == FavoriteStock.company_id)
+        .outerjoin(Market, Market.market_id == Company.market_id)
+        .outerjoin(md, true())
+        .outerjoin(CompanyLatestBar, CompanyLatestBar.company_id == Company.company_id)
+        .outerjoin(position_sq, true())
+        .outerjoin(note_alias, true())
+        .filter(FavoriteStock.user_id == user.id)
+        .order_by(FavoriteStock.id)
         .all()
-    }
-
-    # Holdings mapping by ticker
-    holdings_list = get_holdings_for_user(db, user)
-    holdings_by_ticker: Dict[str, dict] = {
-        h["ticker"]: h for h in holdings_list
-    }
+    )
 
     result: List[dict] = []
-
-    for fav in favorites:
-        company = fav.company
-        ticker = company.ticker
-
-        market_data = _get_latest_market_data_for_company(
-            db, company.company_id
-        )
-
-        note = notes_by_company.get(company.company_id)
-        note_summary: Optional[dict] = None
-        if note:
-            next_catalyst_str = None
-            if note.next_catalyst and isinstance(note.next_catalyst, dict):
-                next_catalyst_str = note.next_catalyst.get("event")
-            elif note.next_catalyst and isinstance(note.next_catalyst, str):
-                next_catalyst_str = note.next_catalyst
-
-            note_summary = {
-                "title": note.notes,
-                "research_status": note.research_status,
-                "sentiment_score": note.sentiment_score,
-                "sentiment_trend": note.sentiment_trend,
-                "thesis": note.investment_thesis,
-                "risk_factors": note.risk_factors,
-                "next_catalyst": next_catalyst_str,
-                "target_price_low": float(note.intrinsic_value_low)
-                if note.intrinsic_value_low is not None
-                else None,
-                "target_price_high": float(note.intrinsic_value_high)
-                if note.intrinsic_value_high is not None
-                else None,
-                "intrinsic_value_low": float(note.intrinsic_value_low)
-                if note.intrinsic_value_low is not None
-                else None,
-                "intrinsic_value_high": float(note.intrinsic_value_high)
-                if note.intrinsic_value_high is not None
-                else None,
-                "margin_of_safety": float(note.margin_of_safety)
-                if note.margin_of_safety is not None
-                else None,
-                "tags": note.tags,
-                "updated_at": note.updated_at.isoformat() if note.updated_at else None,
-            }
-
-        holding = holdings_by_ticker.get(ticker)
-        is_held = holding is not None
-        held_shares = holding["shares"] if holding else None
-        average_price = holding["average_price"] if holding else None
+    for r in rows:
+        has_market_data = r.market_data_id is not None
+        is_held = r.held_quantity is not None
 
         result.append(
             {
-                "company_id": company.company_id,
-                "ticker": ticker,
-                "name": company.name,
-                # Include more company meta if you have it:
-                "sector": getattr(company, "sector", None),
-                "industry": getattr(company, "industry", None),
-                "added_at": fav.created_at.isoformat() if fav.created_at else None,
-                "market_data": market_data,
-                "note": note_summary,
+                "company_id": r.company_id,
+                "ticker": r.ticker,
+                "name": r.name,
+                "sector": r.sector,
+                "industry": r.industry,
+                "added_at": r.created_at.isoformat() if r.created_at else None,
+                "market_data": {
+                    "last_price": _round_price(r.current_price),
+                    "currency": r.currency if has_market_data else None,
+                    "last_updated": r.last_updated.isoformat() if r.last_updated else None,
+                    "sma_50": _float_or_none(r.sma_50),
+                    "sma_200": _float_or_none(r.sma_200),
+                },
+                "note": _note_summary(r.note),
                 "is_held": is_held,
-                "held_shares": held_shares,
-                "average_price": average_price,
+                "held_shares": float(r.held_quantity) if is_held else None,
+                "average_price": _float_or_none(r.held_avg_cost) if is_held else None,
             }
         )
 
@@ -11,6 +11,26 @@ class Settings(BaseSettings):
     ENV: str = "development"
     TELEGRAM_BOT_TOKEN: str = ""
     INTERNAL_API_TOKEN: str = ""
+    SCAN_WORKERS: int = 0                   # scan worker processes per API process (0 = one per CPU core, at most 4)
+    SCAN_PARALLEL_MIN_COMPANIES: int = 200  # smaller universes run in-process
+    UNIVERSE_CACHE_CHECK_SECONDS: float = 5.0  # max staleness of cached basket membership across processes
+    REMATERIALIZE_DEBOUNCE_SECONDS: float = 3.0   # quiet period before a queued portfolio rebuild runs
+    REMATERIALIZE_MAX_WAIT_SECONDS: float = 30.0  # run anyway once the oldest request is this old
+    VALUATION_VERSION_CHECK_SECONDS: float = 5.0  # max staleness of cached valuation ETags across processes
+    WATERMARK_SETTLE_SECONDS: float = 30.0  # change feed only reports versions stamped at least this long ago
+    DASHBOARD_CACHE_TTL_SECONDS: float = 60.0        # cached dashboard sections older than this refresh in the background
+    DASHBOARD_CACHE_MAX_STALE_SECONDS: float = 900.0  # ... and older than this are recomputed before responding
+    DASHBOARD_WORKERS: int = 4                       # threads computing dashboard sections concurrently
+    STOCK_DETAILS_CACHE_SIZE: int = 256  # stock pages kept per process (LRU)
+    STOCK_DETAILS_WARM_TOP: int = 50     # most-viewed stock pages rebuilt after each daily refresh
+    LOGO_CACHE_SIZE: int = 512                # logos kept in memory per process (LRU)
+    LOGO_MISS_TTL_SECONDS: int = 86400        # tickers without a logo are not re-fetched for this long
+    LOGO_MAX_AGE_SECONDS: int = 604800        # browser cache lifetime of served logos
+    LOGO_PREFETCH_CONCURRENCY: int = 8        # parallel downloads of the bulk prefetch job
+    COMPANY_SEARCH_FUZZY_THRESHOLD: float = 0.4  # pg_trgm word similarity needed for a fuzzy name match
+    COMPANY_SEARCH_EXTERNAL_TIMEOUT_SECONDS: float = 2.5  # shared deadline of the external (Yahoo) lookups
+    COMPANY_SEARCH_EXTERNAL_TTL_SECONDS: int = 3600       # cached external results ...
+    COMPANY_SEARCH_EXTERNAL_MISS_TTL_SECONDS: int = 600   # ... and empty results (typos)
 
     class Config:
         env_file = ".env"
@@ -27,3 +27,11 @@ from .user import User
 from .fx import FxRate
 from .baskets import Basket, BasketCompany, BasketType
 from .job import Job
+from .scan_cache import ScanResultCache
+from .ingestion_watermark import IngestionWatermark
+from .screening_facts import CompanyScreeningFacts
+from .account_ledger import AccountLedgerCheckpoint
+from .rematerialization import RematerializationRequest
+from .realized_pnl import RealizedPnlEntry
+from .latest_bar import CompanyLatestBar
+from .industry_aggregate import IndustryAggregate
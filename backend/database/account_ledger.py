@@ -0,0 +1,27 @@
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, JSON
+from .base import Base
+
+
+class AccountLedgerCheckpoint(Base):
+    """
+    Replayed transaction state of one account at the end of ``as_of``.
+
+    ``state`` holds cash flows per kind and currency and quantity per
+    instrument (see ``services/account_ledger.py``).  Rows are written at
+    month ends while replaying and deleted from the date of any transaction
+    that is inserted, edited or removed later, so every remaining row is
+    valid.
+    """
+
+    __tablename__ = "account_ledger_checkpoints"
+
+    account_id = Column(
+        Integer,
+        ForeignKey("accounts.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    as_of = Column(Date, primary_key=True)
+    state = Column(JSON, nullable=False)
+    tx_count = Column(Integer, nullable=False)  # transactions folded in, for diagnostics
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
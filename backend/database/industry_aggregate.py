@@ -0,0 +1,51 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from .base import Base
+
+
+class IndustryAggregate(Base):
+    """
+    Peer statistics of one (listing market, industry): the member companies
+    (those with a ``company_financials`` row) and, per valuation ratio, the
+    sorted non-zero member values with their quartiles.
+
+    Maintained by services/industry_aggregate_service.py and refreshed after
+    fundamentals updates, so peer comparison reads one row instead of every
+    peer's financials.  Ratios use the definitions of
+    ``utils/comparables.company_peer_metrics``.
+    """
+
+    __tablename__ = "industry_aggregates"
+
+    market_id = Column(
+        Integer,
+        ForeignKey("markets.market_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    industry = Column(String, primary_key=True)
+
+    peer_count = Column(Integer, nullable=False)
+    company_ids = Column(ARRAY(Integer), nullable=False)
+
+    pe_ratio_values = Column(ARRAY(Float), nullable=False)
+    pe_ratio_p25 = Column(Float, nullable=True)
+    pe_ratio_median = Column(Float, nullable=True)
+    pe_ratio_p75 = Column(Float, nullable=True)
+
+    ev_ebitda_values = Column(ARRAY(Float), nullable=False)
+    ev_ebitda_p25 = Column(Float, nullable=True)
+    ev_ebitda_median = Column(Float, nullable=True)
+    ev_ebitda_p75 = Column(Float, nullable=True)
+
+    p_b_ratio_values = Column(ARRAY(Float), nullable=False)
+    p_b_ratio_p25 = Column(Float, nullable=True)
+    p_b_ratio_median = Column(Float, nullable=True)
+    p_b_ratio_p75 = Column(Float, nullable=True)
+
+    dividend_yield_values = Column(ARRAY(Float), nullable=False)
+    dividend_yield_p25 = Column(Float, nullable=True)
+    dividend_yield_median = Column(Float, nullable=True)
+    dividend_yield_p75 = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
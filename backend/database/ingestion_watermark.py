@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, Index, Sequence, String
+from .base import Base
+
+# One global counter so versions are comparable across sources
+watermark_version_seq = Sequence("ingestion_watermark_version_seq", metadata=Base.metadata)
+
+
+class IngestionWatermark(Base):
+    """
+    Latest ingestion version per entity, bumped by every data write path.
+
+    ``source`` is the kind of data ("price", "fundamentals", "fx") and
+    ``entity_key`` identifies the entity within it (company_id as text for
+    company sources, "BASE/QUOTE" for FX pairs).  ``version`` comes from
+    ``ingestion_watermark_version_seq`` and only ever grows, so consumers can
+    ask for everything with ``version > last_seen``.
+    """
+
+    __tablename__ = "ingestion_watermarks"
+
+    source = Column(String(20), primary_key=True)
+    entity_key = Column(String(40), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("idx_ingestion_watermarks_source_version", "source", "version"),
+    )
@@ -0,0 +1,42 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, ForeignKey, Integer
+from .base import Base
+
+
+class CompanyLatestBar(Base):
+    """
+    Latest ``stock_price_history`` bar of each company on its listing market
+    (one row per company), plus the close before it.
+
+    Maintained by services/latest_bar_service.py and refreshed by every price
+    write path, so "latest close / SMAs" lookups are primary-key reads instead
+    of max-date scans over the partitioned history.
+    """
+
+    __tablename__ = "company_latest_bar"
+
+    company_id = Column(
+        Integer,
+        ForeignKey("companies.company_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    market_id = Column(Integer, ForeignKey("markets.market_id"), nullable=False)
+    date = Column(Date, nullable=False)
+
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=True)
+    adjusted_close = Column(Float, nullable=True)
+    volume = Column(BigInteger, nullable=True)
+
+    sma_20 = Column(Float, nullable=True)
+    sma_50 = Column(Float, nullable=True)
+    sma_100 = Column(Float, nullable=True)
+    sma_200 = Column(Float, nullable=True)
+
+    # Bar before ``date`` (day change)
+    prev_date = Column(Date, nullable=True)
+    prev_close = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
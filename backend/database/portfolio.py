@@ -48,6 +48,10 @@ class Portfolio(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Account ledger replays (see services/account_ledger.py)
+        Index("idx_transactions_account_timestamp", "account_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
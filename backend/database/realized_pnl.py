@@ -0,0 +1,55 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Numeric, String
+from .base import Base
+
+
+class RealizedPnlEntry(Base):
+    """
+    Weighted-average-cost lot pool of one (portfolio, company) right after a
+    BUY or SELL, one row per transaction (see ``services/realized_pnl_ledger.py``).
+
+    ``pool_*`` columns are the pool after the transaction; SELL rows also carry
+    the realized result (NULL when the pool was empty and the sell was
+    ignored).  Rows from the date of any inserted, edited or removed
+    transaction on are deleted and replayed from the preceding row.
+    Amounts use unconstrained NUMERIC so a replay continues with exactly the
+    Decimal values it stored.
+    """
+
+    __tablename__ = "realized_pnl_ledger"
+
+    transaction_id = Column(
+        Integer,
+        ForeignKey("transactions.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False)
+    company_id = Column(Integer, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    transaction_type = Column(String(4), nullable=False)  # 'BUY' / 'SELL'
+
+    # Pool after the transaction
+    pool_shares = Column(Numeric, nullable=False)
+    pool_cost = Column(Numeric, nullable=False)         # portfolio currency
+    pool_cost_icy = Column(Numeric, nullable=False)     # instrument currency
+    pool_ts_weighted = Column(Numeric, nullable=False)  # Σ cost × buy epoch, for holding periods
+
+    # SELL only
+    quantity = Column(Numeric)
+    price = Column(Numeric)
+    fx_rate = Column(Numeric)
+    currency = Column(String(3))
+    proceeds_pcy = Column(Numeric)
+    proceeds_icy = Column(Numeric)
+    cost_basis_pcy = Column(Numeric)
+    cost_basis_icy = Column(Numeric)
+    realized_pnl = Column(Numeric)
+    realized_pnl_icy = Column(Numeric)
+    holding_period_days = Column(Integer)
+
+    __table_args__ = (
+        Index(
+            "idx_realized_pnl_ledger_pool",
+            "portfolio_id", "company_id", "timestamp", "transaction_id",
+        ),
+        Index("idx_realized_pnl_ledger_portfolio_ts", "portfolio_id", "timestamp"),
+    )
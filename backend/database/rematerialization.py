@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, Text
+from .base import Base
+
+
+class RematerializationRequest(Base):
+    """
+    Pending valuation rebuild of one portfolio, from ``dirty_from`` to today.
+
+    Repeated requests coalesce into the single row (earliest date wins) and are
+    processed in the background once no new request arrived for the debounce
+    interval.  Requests arriving while a worker holds the row (``claimed_at``)
+    collect in ``pending_from`` and become the next run.
+    """
+
+    __tablename__ = "rematerialization_queue"
+
+    portfolio_id = Column(
+        Integer,
+        ForeignKey("portfolios.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    dirty_from = Column(Date, nullable=False)
+    pending_from = Column(Date, nullable=True)
+    requested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    first_requested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
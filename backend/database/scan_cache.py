@@ -0,0 +1,44 @@
+from datetime import datetime
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    String,
+    UniqueConstraint,
+)
+from .base import Base
+
+
+class ScanResultCache(Base):
+    """
+    Per-company scan output, reusable while the company's inputs are unchanged.
+
+    One row per (scan_type, params_hash, company_id).  ``data_version`` is the
+    company's ingested price/fundamentals version at compute time; a row is a
+    hit only while it still matches.  ``result`` is NULL when the company was
+    analysed but produced no signal.
+    """
+
+    __tablename__ = "scan_result_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    scan_type = Column(String(50), nullable=False)      # e.g. "gmma_squeeze"
+    params_hash = Column(String(64), nullable=False)    # sha256 of normalized params
+    company_id = Column(
+        Integer,
+        ForeignKey("companies.company_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    data_version = Column(String(100), nullable=False)
+    result = Column(JSON, nullable=True)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "scan_type", "params_hash", "company_id", name="uq_scan_result_cache_key"
+        ),
+        Index("idx_scan_result_cache_scan_params", "scan_type", "params_hash"),
+    )
@@ -0,0 +1,45 @@
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, String
+from .base import Base
+
+
+class CompanyScreeningFacts(Base):
+    """
+    Denormalized per-company facts for universe filters (one row per company).
+
+    Maintained by services/screening_facts_service.py from companies, markets,
+    company_market_data, company_financials, the latest stock_price_history
+    bar and fx_rates; refreshed by the ingestion paths.
+    Monetary values are converted to USD with the latest FX close and are NULL
+    when no rate is available.
+    """
+
+    __tablename__ = "company_screening_facts"
+
+    company_id = Column(
+        Integer,
+        ForeignKey("companies.company_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    market_id = Column(Integer, ForeignKey("markets.market_id"), nullable=True, index=True)
+    currency = Column(String(10), nullable=True)
+    sector = Column(String, nullable=True, index=True)
+    industry = Column(String, nullable=True, index=True)
+
+    market_cap_usd = Column(Float, nullable=True, index=True)
+    avg_dollar_volume_usd = Column(Float, nullable=True, index=True)  # average_volume × price
+
+    # Latest bar (local currency) and its cached SMAs
+    price_date = Column(Date, nullable=True)
+    last_close = Column(Float, nullable=True)
+    sma_50 = Column(Float, nullable=True)
+    sma_200 = Column(Float, nullable=True)
+    pct_vs_sma_200 = Column(Float, nullable=True, index=True)  # (close / sma_200 - 1) × 100
+
+    # Valuation ratios (currency-neutral)
+    ev_to_revenue = Column(Float, nullable=True, index=True)
+    net_margin_pct = Column(Float, nullable=True, index=True)
+    pe_ratio = Column(Float, nullable=True, index=True)        # market cap / net income, profitable only
+    price_to_book = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
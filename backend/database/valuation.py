@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Date, Numeric, DateTime, ForeignKey, String, UniqueConstraint, Index
+from sqlalchemy import BigInteger, Column, Integer, Date, Numeric, DateTime, ForeignKey, JSON, String, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from database.base import Base
 
@@ -33,16 +33,27 @@ class PortfolioValuationDaily(Base):
 
 
 class PortfolioReturns(Base):
+    """
+    Stored dashboard performance of a portfolio as of ``date``, one row per
+    standard period ("1d" … "itd", see ``PERIODS`` in portfolio_metrics_service).
+
+    Rows are recomputed after each rematerialization and are valid while
+    ``valuation_version`` equals the portfolio's current inputs version
+    (valuations, cash, prices and FX; see portfolio_returns_service).
+    """
+
     __tablename__ = "portfolio_returns"
     
     id = Column(Integer, primary_key=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
     date = Column(Date, nullable=False)
-    period = Column(String(10), nullable=False)  # 'daily', 'weekly', 'monthly', 'ytd', 'qtd', 'itd'
+    period = Column(String(10), nullable=False)  # '1d', '1w', '1m', '3m', '6m', '1y', 'ytd', 'itd'
+    start_date = Column(Date)
     
     # Core metrics
-    ttwr = Column(Numeric(10, 6))  # Time-Weighted Return
-    mwrr = Column(Numeric(10, 6))  # Money-Weighted Return
+    ttwr = Column(Numeric(18, 8))  # Time-Weighted Return
+    ttwr_invested = Column(Numeric(18, 8))  # TWR of the invested (non-cash) part
+    mwrr = Column(Numeric(18, 8))  # Money-Weighted Return
     
     # Returns breakdown
     unrealized_gains = Column(Numeric(18, 4), default=0)
@@ -57,9 +68,17 @@ class PortfolioReturns(Base):
     beginning_value = Column(Numeric(18, 4))
     ending_value = Column(Numeric(18, 4))
     net_cash_flows = Column(Numeric(18, 4))
+
+    # Serialized breakdown as served by /dashboard/performance
+    breakdown = Column(JSON)
+    # Portfolio-wide closed positions, kept on the 'itd' row only
+    closed_positions = Column(JSON)
+
+    valuation_version = Column(BigInteger, nullable=False, default=0)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     portfolio = relationship("Portfolio")
     __table_args__ = (
         UniqueConstraint("portfolio_id", "date", "period", name="uq_portfolio_returns"),
         Index("idx_portfolio_returns_date", "portfolio_id", "date"),
-    )
\ No newline at end of file
+    )
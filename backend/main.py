@@ -41,6 +41,7 @@ from api import (
     ev_to_revenue,
     break_even_point,
     data_refresh,
+    screener,
 )
 
 from database.base import Base, engine
@@ -56,14 +57,24 @@ if settings.ENV != "production":
     for ns in ("api", "services", "utils", "database"):
         logging.getLogger(ns).setLevel(logging.DEBUG)
 
+from contextlib import asynccontextmanager
 from api.telegram_bot import telegram_lifespan
+from services.valuation.rematerialization_queue import start_worker as start_rematerialization_worker
+
+
+@asynccontextmanager
+async def app_lifespan(app):
+    # Drain valuation rebuilds queued before a restart
+    start_rematerialization_worker()
+    async with telegram_lifespan(app):
+        yield
 
 # Initialize FastAPI
 app = FastAPI(
     title="Stock Scout API",
     docs_url=None if settings.ENV == "production" else "/docs",
     redoc_url=None,
-    lifespan=telegram_lifespan,
+    lifespan=app_lifespan,
 )
 add_bearer_auth(app)
 
@@ -90,6 +101,7 @@ app.include_router(wyckoff.router,                    prefix="/api/technical-ana
 app.include_router(ev_to_revenue.router,              prefix="/api/technical-analysis", tags=["Analysis"])
 app.include_router(break_even_point.router,           prefix="/api/technical-analysis", tags=["Analysis"])
 app.include_router(gmma.router,                       prefix="/api/technical-analysis", tags=["Analysis"])
+app.include_router(screener.router,                   prefix="/api/screener",     tags=["Analysis"])
 app.include_router(fundamentals.router,               prefix="/api/fundamentals", tags=["Analysis"])
 app.include_router(compare.router,                    prefix="/api/compare",      tags=["Comparison"])
 app.include_router(company_search.router,             prefix="/api/companies",    tags=["Company Search"])
@@ -65,6 +65,53 @@ class TradeBase(BaseModel):
 
 class TradeResponse(BaseModel):
     message: str
+    valuations_pending: bool = False  # valuation history is being rebuilt in the background
+
+
+class TransactionImportRow(BaseModel):
+    transaction_type: TransactionType
+    timestamp: datetime
+    quantity: Decimal = Field(..., gt=0, description="Shares for BUY/SELL, cash amount otherwise")
+    price: Optional[Decimal] = Field(None, ge=0)
+    fee: Optional[Decimal] = Field(None, ge=0)
+    total_value: Optional[Decimal] = None
+
+    currency: str
+    currency_rate: Optional[Decimal] = Field(None, gt=0, description="Transaction currency -> portfolio currency")
+
+    # Instrument: company_id wins over ticker
+    company_id: Optional[int] = None
+    ticker: Optional[str] = None
+    account_id: Optional[int] = Field(None, description="Defaults to the request's account")
+    note: Optional[str] = None
+
+    @field_validator("currency")
+    @classmethod
+    def _norm_currency(cls, v: str) -> str:
+        v = (v or "").strip().upper()
+        if len(v) != 3:
+            raise ValueError("currency must be a 3-letter code")
+        return v
+
+    @field_validator("ticker")
+    @classmethod
+    def _norm_ticker(cls, v: Optional[str]) -> Optional[str]:
+        return (v or "").strip().upper() or None
+
+
+class TransactionImportRequest(BaseModel):
+    rows: List[TransactionImportRow] = Field(..., min_length=1)
+    account_id: Optional[int] = Field(None, description="Default account (portfolio's default account if omitted)")
+
+
+class TransactionImportResponse(BaseModel):
+    imported: int
+    positions_recomputed: int
+    accounts_recomputed: int
+    rebuild_from: Optional[date] = None
+    seconds: float
+    rows_per_second: float
+    valuations_pending: bool = False
 
 
 class PositionOut(BaseModel):
@@ -0,0 +1,45 @@
+from typing import Any, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+ScreenerOp = Literal["gt", "gte", "lt", "lte", "eq", "neq", "between", "in", "is_true", "is_false"]
+
+
+class ScreenerCriterion(BaseModel):
+    field: str                 # see GET /screener/fields
+    op: ScreenerOp
+    value: Any = None          # number / string, [low, high] for "between", list for "in"
+
+
+class ScreenerRequest(BaseModel):
+    criteria: List[ScreenerCriterion] = []
+    basket_ids: List[int] | None = None     # universe; all companies when both are empty
+    markets: List[str] | None = None
+    sort_by: str = "market_cap_usd"
+    sort_desc: bool = True
+    page: int = Field(1, ge=1)
+    page_size: int = Field(50, ge=1, le=500)
+
+
+class ScreenerResultItem(BaseModel):
+    company_id: int
+    ticker: str
+    name: str
+    sector: Optional[str] = None
+    industry: Optional[str] = None
+    market_cap_usd: Optional[float] = None
+    avg_dollar_volume_usd: Optional[float] = None
+    last_close: Optional[float] = None
+    price_date: Optional[str] = None
+    pct_vs_sma_200: Optional[float] = None
+    ev_to_revenue: Optional[float] = None
+    net_margin_pct: Optional[float] = None
+    pe_ratio: Optional[float] = None
+    price_to_book: Optional[float] = None
+
+
+class ScreenerResponse(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    data: List[ScreenerResultItem]
@@ -23,6 +23,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 import pandas as pd
 from sqlalchemy import text
 from database.base import SessionLocal
+from services.latest_bar_service import refresh_latest_bars
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
@@ -65,6 +66,9 @@ def backfill_sma():
         elapsed = time.time() - start
         logger.info(f"Backfill complete. Processed {total} pairs in {elapsed:.1f}s")
 
+        # SMAs of the latest bars changed
+        refresh_latest_bars(db)
+
     finally:
         db.close()
 
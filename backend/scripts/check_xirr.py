@@ -0,0 +1,101 @@
+"""
+Regression check of the vectorized XIRR solver (services/xirr.py) against
+the scalar secant solver it replaced in PortfolioMetricsService.
+
+Usage:
+    python scripts/check_xirr.py
+    python scripts/check_xirr.py --sets 2000 --seed 7 --tolerance 1e-8
+
+Exits with status 1 when any flow set differs by more than the tolerance.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from services.xirr import xirr_batch
+
+
+def legacy_xirr(flows) -> Decimal:
+    """The former PortfolioMetricsService._xirr_solver, unchanged."""
+    fflows = [(d, float(v)) for d, v in flows]
+    t0 = fflows[0][0]
+
+    def xnpv(rate, date_flows):
+        acc = 0.0
+        base = 1.0 + rate
+        for d, cf in date_flows:
+            days = (d - t0).days
+            acc += cf / (base ** (days / 365.0))
+        return acc
+
+    def solve(guess):
+        r = guess
+        for _ in range(50):
+            v = xnpv(r, fflows)
+            if abs(v) < 1e-5:
+                return r
+            d = 1e-5
+            v_d = xnpv(r + d, fflows)
+            derivative = (v_d - v) / d
+            if abs(derivative) < 1e-10:
+                return None
+            new_r = r - v / derivative
+            if abs(new_r - r) < 1e-5:
+                return new_r
+            r = new_r
+        return None
+
+    for guess in [0.1, -0.1, 0.5, -0.5, 0.0]:
+        try:
+            res = solve(guess)
+            if res and -0.999 < res < 100:
+                return Decimal(str(res))
+        except Exception:
+            continue
+    return Decimal("0")
+
+
+def random_flows(rng: random.Random, mixed: bool):
+    """An investment followed by withdrawals/valuation; *mixed* adds flows of both signs."""
+    start = date(2015, 1, 1) + timedelta(days=rng.randrange(3000))
+    days = sorted(rng.sample(range(1, 2000), rng.randrange(1, 12)))
+    flows = [(start, Decimal(str(round(-rng.uniform(100, 10000), 2))))]
+    for offset in days:
+        amount = rng.uniform(-5000, 5000) if mixed else -rng.uniform(0, 3000)
+        flows.append((start + timedelta(days=offset), Decimal(str(round(amount, 2)))))
+    final = rng.uniform(0, 20000)
+    flows.append((start + timedelta(days=days[-1] + rng.randrange(1, 60)), Decimal(str(round(final, 2)))))
+    return flows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare xirr_batch with the legacy secant solver")
+    parser.add_argument("--sets", type=int, default=600, help="Random flow sets (half mixed-sign)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=1e-8)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    flow_sets = [random_flows(rng, mixed=i % 2 == 1) for i in range(args.sets)]
+    batch = xirr_batch(flow_sets)
+
+    mismatches = 0
+    fallbacks = 0
+    for i, flows in enumerate(flow_sets):
+        expected = float(legacy_xirr(flows))
+        fallbacks += expected == 0.0
+        if abs(batch[i] - expected) > args.tolerance:
+            mismatches += 1
+            print(f"set {i}: legacy {expected!r}, batch {batch[i]!r}, flows {flows}")
+
+    print(f"{args.sets} sets, {fallbacks} legacy fallbacks to 0, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
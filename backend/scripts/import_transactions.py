@@ -1,9 +1,9 @@
 
 import os
 import sys
+import time
 import pandas as pd
 from decimal import Decimal
-from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import create_engine
 
@@ -14,10 +14,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import *
 from database.alert import Alert # specifically import Alert if not in __init__
 from database.base import SessionLocal, engine
-from database.portfolio import Transaction, Portfolio
+from database.portfolio import Portfolio
 from database.company import Company
-from schemas.portfolio_schemas import TransactionType
-from services.positions_service import apply_transaction_to_position
+from schemas.portfolio_schemas import TransactionImportRow, TransactionType
+from services.transaction_import_service import TransactionImportError, import_transactions_bulk
 from services.valuation.rematerializ import rematerialize_from_tx
 
 # Configuration
@@ -67,10 +67,92 @@ def get_company_id(db: Session, symbol):
     
     return company.company_id if company else None
 
+def _parse_rows(db: Session, df) -> list[TransactionImportRow]:
+    rows = []
+    for _, row in df.iterrows():
+        if pd.isna(row['ID']) or row['ID'] == 'Total':
+            continue
+        
+        raw_type = row['Type']
+        if raw_type not in TYPE_MAP:
+            print(f"Skipping unknown type: {raw_type} (ID: {row['ID']})")
+            continue
+        
+        tx_type = TYPE_MAP[raw_type]
+        timestamp = row['Time']
+        amount_pln = float(row['Amount'])
+        symbol = row['Symbol']
+        comment = str(row['Comment'])
+        
+        qty = 0
+        price = 0
+        currency = 'PLN'
+        currency_rate = 1.0
+        company_id = None
+        total_value_pln = abs(amount_pln)
+        
+        if tx_type == TransactionType.BUY:
+            qty_val, price_val = parse_buy_comment(comment)
+            if qty_val is None:
+                print(f"Could not parse BUY comment: {comment}")
+                continue
+            qty = qty_val
+            price = price_val
+            company_id = get_company_id(db, symbol)
+            if not company_id:
+                # The bulk import rejects trades without a company; skip the row, not the file
+                print(f"Skipping BUY, company not found for {symbol} (ID: {row['ID']})")
+                continue
+            
+            # Determine currency from symbol
+            if symbol.endswith('.US'):
+                currency = 'USD'
+            elif symbol.endswith('.DE'):
+                currency = 'EUR'
+            elif symbol.endswith('.PL'):
+                currency = 'PLN'
+            
+            # Calculate implied rate
+            if currency != 'PLN':
+                currency_rate = total_value_pln / (qty * price)
+            else:
+                currency_rate = 1.0
+
+        elif tx_type in [TransactionType.DIVIDEND, TransactionType.TAX]:
+            company_id = get_company_id(db, symbol)
+            if not company_id and tx_type == TransactionType.DIVIDEND:
+                print(f"Skipping DIVIDEND, company not found for {symbol} (ID: {row['ID']})")
+                continue
+            # Correctly set quantity to the cash amount for these types so metrics work
+            qty = total_value_pln
+
+        elif tx_type in [TransactionType.DEPOSIT, TransactionType.INTEREST]:
+            # Correctly set quantity to the cash amount for these types so metrics work
+            qty = total_value_pln
+
+        if not qty:
+            print(f"Skipping zero-amount row (ID: {row['ID']})")
+            continue
+
+        rows.append(TransactionImportRow(
+            transaction_type=tx_type,
+            timestamp=timestamp,
+            quantity=Decimal(str(qty)),
+            price=Decimal(str(price)),
+            fee=Decimal("0"),
+            total_value=Decimal(str(total_value_pln)),
+            currency=currency,
+            currency_rate=Decimal(str(currency_rate)),
+            company_id=company_id,
+            account_id=ACCOUNT_ID,
+            note=f"Imported from Excel ID: {row['ID']}. Comment: {comment}",
+        ))
+    return rows
+
+
 def import_transactions():
     db = SessionLocal()
     try:
-        # Get user_id
         portfolio = db.query(Portfolio).filter(Portfolio.id == PORTFOLIO_ID).first()
         if not portfolio:
             print(f"Portfolio {PORTFOLIO_ID} not found")
@@ -83,110 +165,31 @@ def import_transactions():
         
         # Sort by time ascending to process chronologically
         df = df.sort_values('Time')
+        rows = _parse_rows(db, df)
+        if not rows:
+            print("No transactions to import.")
+            return
 
-        count = 0
-        for _, row in df.iterrows():
-            if pd.isna(row['ID']) or row['ID'] == 'Total':
-                continue
-            
-            raw_type = row['Type']
-            if raw_type not in TYPE_MAP:
-                print(f"Skipping unknown type: {raw_type} (ID: {row['ID']})")
-                continue
-            
-            tx_type = TYPE_MAP[raw_type]
-            timestamp = row['Time']
-            amount_pln = float(row['Amount'])
-            symbol = row['Symbol']
-            comment = str(row['Comment'])
-            
-            qty = 0
-            price = 0
-            currency = 'PLN'
-            currency_rate = 1.0
-            company_id = None
-            
-            if tx_type == TransactionType.BUY:
-                qty_val, price_val = parse_buy_comment(comment)
-                if qty_val is None:
-                    print(f"Could not parse BUY comment: {comment}")
-                    continue
-                qty = qty_val
-                price = price_val
-                company_id = get_company_id(db, symbol)
-                if not company_id:
-                    print(f"Warning: Company not found for {symbol}")
-                
-                # Determine currency from symbol
-                if symbol.endswith('.US'):
-                    currency = 'USD'
-                elif symbol.endswith('.DE'):
-                    currency = 'EUR'
-                elif symbol.endswith('.PL'):
-                    currency = 'PLN'
-                
-                total_value_pln = abs(amount_pln)
-                
-                # Calculate implied rate
-                if currency != 'PLN':
-                    currency_rate = total_value_pln / (qty * price)
-                else:
-                    currency_rate = 1.0
-
-            elif tx_type in [TransactionType.DIVIDEND, TransactionType.TAX]:
-                company_id = get_company_id(db, symbol)
-                price = 0
-                total_value_pln = abs(amount_pln)
-                # Correctly set quantity to the cash amount for these types so metrics work
-                qty = total_value_pln
-                currency = 'PLN'
-                currency_rate = 1.0
-
-            elif tx_type in [TransactionType.DEPOSIT, TransactionType.INTEREST]:
-                total_value_pln = abs(amount_pln)
-                # Correctly set quantity to the cash amount for these types so metrics work
-                qty = total_value_pln
-                
-                currency = 'PLN'
-                currency_rate = 1.0
-
-            # Create Transaction
-            tx = Transaction(
-                user_id=user_id,
-                portfolio_id=PORTFOLIO_ID,
-                account_id=ACCOUNT_ID,
-                company_id=company_id,
-                transaction_type=tx_type,
-                quantity=Decimal(str(qty)),
-                price=Decimal(str(price)),
-                fee=Decimal("0"),
-                total_value=Decimal(str(total_value_pln)),
-                currency=currency,
-                currency_rate=Decimal(str(currency_rate)),
-                timestamp=timestamp,
-                note=f"Imported from Excel ID: {row['ID']}. Comment: {comment}"
-            )
-            
-            db.add(tx)
-            db.flush()
-            
-            # Apply to position
-            apply_transaction_to_position(db, tx)
-            count += 1
+        # All rows in one DB transaction; positions and cash recomputed once each
+        try:
+            result = import_transactions_bulk(db, portfolio, user_id, rows, account_id=ACCOUNT_ID)
+        except TransactionImportError as e:
+            print(f"Import rejected, nothing written: {e}")
+            for err in e.errors:
+                print(f"  row {err['row']}: {err['error']}")
+            return
 
-        db.commit()
-        print("Zeroes fixed.")
+        print(
+            f"Imported {result['imported']} transactions in {result['seconds']:.2f}s "
+            f"({result['rows_per_second']:.0f} rows/s); "
+            f"{result['positions_recomputed']} positions, {result['accounts_recomputed']} accounts recomputed."
+        )
 
-        # 4. Sync Account Cash
-        from services.positions_service import recompute_account_cash
-        recompute_account_cash(db, ACCOUNT_ID)
+        # One rebuild from the earliest imported day
+        start = time.time()
+        rematerialize_from_tx(db, PORTFOLIO_ID, result["rebuild_from"])
         db.commit()
-        print(f"Account {ACCOUNT_ID} cash recomputed.")
-        print(f"Successfully imported {count} transactions.")
-        
-        # Rematerialize
-        rematerialize_from_tx(db, PORTFOLIO_ID, datetime.now().date())
-        print("Portfolio rematerialized.")
+        print(f"Portfolio rematerialized from {result['rebuild_from']} in {time.time() - start:.2f}s.")
 
     except Exception as e:
         db.rollback()
@@ -0,0 +1,314 @@
+"""
+Checkpointed cash and position ledger per account.
+
+Cash balances, net invested cash and holdings at a date used to be computed
+by replaying every transaction since inception.  Here the replayed state of
+an account is stored at month ends in ``account_ledger_checkpoints``; the
+state as of D is the nearest checkpoint on or before D plus the transactions
+after it.  Replays write the checkpoints they pass (closed months only, once
+enough transactions accumulated), in the caller's transaction.
+
+Cash is kept per flow kind and booked currency, both as booked and converted
+at each transaction's ``currency_rate``.  That is enough for every reader's
+conversion rule: portfolio cash buckets, ``Account.cash`` in account currency
+and net invested / deposited cash for the dashboard snapshot.
+
+Any ORM insert, edit or delete of a ``Transaction`` deletes the account's
+checkpoints from the transaction date on (both old and new date for edits)
+in the same flush.  Bulk Core writes bypass the session events — call
+:func:`invalidate_account_ledger` after those.
+"""
+import logging
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy import and_, delete, event, inspect, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.account import Account
+from database.account_ledger import AccountLedgerCheckpoint
+from database.portfolio import Transaction, TransactionType
+from utils.decimal_helpers import to_decimal as _dec
+
+logger = logging.getLogger(__name__)
+
+# Cash flow kinds
+TRADE = "trade"        # BUY / SELL
+EXTERNAL = "external"  # DEPOSIT / WITHDRAWAL / TRANSFER_IN / TRANSFER_OUT
+INCOME = "income"      # DIVIDEND / INTEREST
+COSTS = "costs"        # FEE / TAX
+
+# Quantity-based cash flows: type → (kind, sign)
+_QUANTITY_FLOWS = {
+    TransactionType.DEPOSIT: (EXTERNAL, 1),
+    TransactionType.WITHDRAWAL: (EXTERNAL, -1),
+    TransactionType.TRANSFER_IN: (EXTERNAL, 1),
+    TransactionType.TRANSFER_OUT: (EXTERNAL, -1),
+    TransactionType.DIVIDEND: (INCOME, 1),
+    TransactionType.INTEREST: (INCOME, 1),
+    TransactionType.FEE: (COSTS, -1),
+    TransactionType.TAX: (COSTS, -1),
+}
+
+_POSITION_SIGN = {
+    TransactionType.BUY: 1,
+    TransactionType.SELL: -1,
+    TransactionType.TRANSFER_IN: 1,
+    TransactionType.TRANSFER_OUT: -1,
+}
+
+# A closed month end becomes a checkpoint once this many transactions were
+# folded in since the previous one
+_MIN_TXS_PER_CHECKPOINT = 25
+
+_ZERO = Decimal("0")
+
+
+def _month_end(d: date) -> date:
+    return d.replace(day=monthrange(d.year, d.month)[1])
+
+
+def _day_start(d: date) -> datetime:
+    return datetime(d.year, d.month, d.day)
+
+
+class LedgerState:
+    """Cash flows and holdings of one account at the end of a day."""
+
+    __slots__ = ("flows", "positions", "tx_count")
+
+    def __init__(self, flows=None, positions=None, tx_count: int = 0):
+        # kind → booked currency → [amount as booked, amount × tx.currency_rate]
+        self.flows: dict[str, dict[str, list[Decimal]]] = flows or {}
+        # company_id → quantity
+        self.positions: dict[int, Decimal] = positions or {}
+        self.tx_count = tx_count
+
+    def apply(self, tx: Transaction) -> None:
+        ttype = tx.transaction_type
+        qty = _dec(tx.quantity)
+
+        if ttype == TransactionType.BUY:
+            kind, amount = TRADE, -(qty * _dec(tx.price) + _dec(tx.fee))
+        elif ttype == TransactionType.SELL:
+            kind, amount = TRADE, qty * _dec(tx.price) - _dec(tx.fee)
+        elif ttype in _QUANTITY_FLOWS:
+            kind, sign = _QUANTITY_FLOWS[ttype]
+            amount = qty if sign > 0 else -qty
+        else:
+            kind = None
+
+        if kind is not None:
+            ccy = (tx.currency or "").upper()
+            entry = self.flows.setdefault(kind, {}).setdefault(ccy, [_ZERO, _ZERO])
+            entry[0] += amount
+            entry[1] += amount * _dec(tx.currency_rate or 1)
+
+        if tx.company_id and ttype in _POSITION_SIGN:
+            cid = tx.company_id
+            delta = qty if _POSITION_SIGN[ttype] > 0 else -qty
+            self.positions[cid] = self.positions.get(cid, _ZERO) + delta
+
+        self.tx_count += 1
+
+    def cash_flows(self, kinds: Iterable[str] | None = None):
+        """Yield ``(booked_currency, amount_as_booked, amount_at_tx_rate)``."""
+        kinds = set(kinds) if kinds is not None else None
+        for kind, by_ccy in self.flows.items():
+            if kinds is not None and kind not in kinds:
+                continue
+            for ccy, (booked, at_rate) in by_ccy.items():
+                yield ccy, booked, at_rate
+
+    def to_json(self) -> dict:
+        return {
+            "flows": {
+                kind: {ccy: [str(v[0]), str(v[1])] for ccy, v in by_ccy.items()}
+                for kind, by_ccy in self.flows.items()
+            },
+            "positions": {str(cid): str(q) for cid, q in self.positions.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict, tx_count: int) -> "LedgerState":
+        flows = {
+            kind: {ccy: [Decimal(v[0]), Decimal(v[1])] for ccy, v in by_ccy.items()}
+            for kind, by_ccy in (data.get("flows") or {}).items()
+        }
+        positions = {int(cid): Decimal(q) for cid, q in (data.get("positions") or {}).items()}
+        return cls(flows, positions, tx_count)
+
+
+# ── State as of a date ──────────────────────────────────────────────
+
+def _load_checkpoints(db: Session, account_ids: list[int], as_of: date | None) -> dict[int, AccountLedgerCheckpoint]:
+    query = db.query(AccountLedgerCheckpoint).filter(AccountLedgerCheckpoint.account_id.in_(account_ids))
+    if as_of is not None:
+        query = query.filter(AccountLedgerCheckpoint.as_of <= as_of)
+    rows = (
+        query.order_by(AccountLedgerCheckpoint.account_id, AccountLedgerCheckpoint.as_of.desc())
+        .distinct(AccountLedgerCheckpoint.account_id)
+        .all()
+    )
+    return {cp.account_id: cp for cp in rows}
+
+
+def account_states(
+    db: Session,
+    account_ids: Iterable[int],
+    as_of: date | None = None,
+) -> dict[int, LedgerState]:
+    """
+    State of each account at the end of *as_of* (all transactions when None):
+    nearest checkpoint plus the transactions after it, one query for all accounts.
+    """
+    ids = sorted({int(a) for a in account_ids if a is not None})
+    if not ids:
+        return {}
+
+    checkpoints = _load_checkpoints(db, ids, as_of)
+    states: dict[int, LedgerState] = {}
+    replay_from: dict[int, date | None] = {}
+    for account_id in ids:
+        cp = checkpoints.get(account_id)
+        if cp is not None:
+            states[account_id] = LedgerState.from_json(cp.state, cp.tx_count)
+            replay_from[account_id] = cp.as_of
+        else:
+            states[account_id] = LedgerState()
+            replay_from[account_id] = None
+
+    windows = [
+        Transaction.account_id == account_id if start is None
+        else and_(Transaction.account_id == account_id, Transaction.timestamp >= _day_start(start + timedelta(days=1)))
+        for account_id, start in replay_from.items()
+    ]
+    query = db.query(Transaction).filter(or_(*windows))
+    if as_of is not None:
+        query = query.filter(Transaction.timestamp < _day_start(as_of + timedelta(days=1)))
+    txs = query.order_by(Transaction.account_id, Transaction.timestamp, Transaction.id).all()
+
+    new_checkpoints = []
+    today = date.today()
+    pending_month_end: dict[int, date] = {}
+
+    def _maybe_checkpoint(account_id: int, month_end: date) -> None:
+        state = states[account_id]
+        last = checkpoints.get(account_id)
+        since = state.tx_count - (last.tx_count if last is not None else 0)
+        if month_end < today and since >= _MIN_TXS_PER_CHECKPOINT:
+            new_checkpoints.append({
+                "account_id": account_id,
+                "as_of": month_end,
+                "state": state.to_json(),
+                "tx_count": state.tx_count,
+                "created_at": datetime.utcnow(),
+            })
+            checkpoints[account_id] = AccountLedgerCheckpoint(
+                account_id=account_id, as_of=month_end, tx_count=state.tx_count
+            )
+
+    for tx in txs:
+        account_id = tx.account_id
+        month_end = _month_end(tx.timestamp.date())
+        prev_month_end = pending_month_end.get(account_id)
+        if prev_month_end is not None and prev_month_end < month_end:
+            # Every transaction up to prev_month_end is folded in
+            _maybe_checkpoint(account_id, prev_month_end)
+        pending_month_end[account_id] = month_end
+        states[account_id].apply(tx)
+
+    for account_id, month_end in pending_month_end.items():
+        if as_of is None or month_end <= as_of:
+            _maybe_checkpoint(account_id, month_end)
+
+    if new_checkpoints:
+        stmt = insert(AccountLedgerCheckpoint).values(new_checkpoints)
+        db.execute(stmt.on_conflict_do_nothing(index_elements=["account_id", "as_of"]))
+        logger.debug(f"Account ledger: wrote {len(new_checkpoints)} checkpoints")
+
+    return states
+
+
+def account_state(db: Session, account_id: int, as_of: date | None = None) -> LedgerState:
+    return account_states(db, [account_id], as_of)[account_id]
+
+
+def portfolio_state_at(
+    db: Session, portfolio_id: int, as_of: date, base_ccy: str
+) -> tuple[dict[str, Decimal], dict[int, Decimal]]:
+    """
+    Returns (cash_by_currency, positions) at end of *as_of*.
+
+    Flows booked in a foreign currency on a base-currency account count as
+    base cash converted at the transaction rate; on other accounts they stay
+    in their own currency.
+    """
+    accounts = dict(
+        db.query(Account.id, Account.currency).filter(Account.portfolio_id == portfolio_id).all()
+    )
+    cash: dict[str, Decimal] = {}
+    positions: dict[int, Decimal] = {}
+
+    for account_id, state in account_states(db, accounts, as_of).items():
+        acc_ccy = (accounts[account_id] or "").upper()
+        for ccy, booked, at_rate in state.cash_flows():
+            tx_ccy = ccy or base_ccy
+            if acc_ccy == base_ccy and tx_ccy != base_ccy:
+                cash[base_ccy] = cash.get(base_ccy, _ZERO) + at_rate
+            else:
+                cash[tx_ccy] = cash.get(tx_ccy, _ZERO) + booked
+        for cid, qty in state.positions.items():
+            positions[cid] = positions.get(cid, _ZERO) + qty
+
+    return cash, positions
+
+
+# ── Invalidation ────────────────────────────────────────────────────
+
+def invalidate_account_ledger(db: Session, account_ids: Iterable[int], from_date: date | None = None) -> None:
+    """Delete checkpoints of *account_ids* on or after *from_date* (all when None)."""
+    ids = sorted({int(a) for a in account_ids if a is not None})
+    if not ids:
+        return
+    stmt = delete(AccountLedgerCheckpoint).where(AccountLedgerCheckpoint.account_id.in_(ids))
+    if from_date is not None:
+        stmt = stmt.where(AccountLedgerCheckpoint.as_of >= from_date)
+    db.execute(stmt)
+
+
+def _history_values(state, attr: str) -> list:
+    hist = state.attrs[attr].history
+    return [v for v in chain(hist.added or (), hist.deleted or (), hist.unchanged or ()) if v is not None]
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_transaction_change(session: Session, flush_context) -> None:
+    earliest: dict[int, date] = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Transaction):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        state = inspect(obj)
+        dates = [ts.date() for ts in _history_values(state, "timestamp")]
+        # Unknown date (unloaded attribute): drop all of the account's checkpoints
+        first = min(dates) if dates else date.min
+        for account_id in _history_values(state, "account_id"):
+            if account_id not in earliest or first < earliest[account_id]:
+                earliest[account_id] = first
+
+    if not earliest:
+        return
+    conn = session.connection()
+    for account_id, first in earliest.items():
+        conn.execute(
+            delete(AccountLedgerCheckpoint).where(
+                AccountLedgerCheckpoint.account_id == account_id,
+                AccountLedgerCheckpoint.as_of >= first,
+            )
+        )
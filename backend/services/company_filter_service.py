@@ -2,21 +2,71 @@
 Company filtering utilities for scan endpoints.
 
 Provides shared filtering logic used across multiple technical analysis scans
-(Golden Cross, CHoCH, Breakout, etc.).
+(Golden Cross, CHoCH, Breakout, etc.).  Filters run as indexed WHERE clauses
+against ``company_screening_facts`` (USD-normalized, see
+services/screening_facts_service.py) instead of converting currencies in Python.
 """
 import logging
+from typing import Iterable, TypeVar
+
 from sqlalchemy.orm import Session
-from database.company import Company
-from database.market import Market
-from database.stock_data import CompanyMarketData
+
+from database.screening_facts import CompanyScreeningFacts
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+def screen_company_ids(
+    db: Session,
+    company_ids: Iterable[int] | None = None,
+    min_cap_millions: float | None = None,
+    min_dollar_volume_millions: float | None = None,
+    sectors: list[str] | None = None,
+    industries: list[str] | None = None,
+    market_ids: list[int] | None = None,
+) -> list[int]:
+    """
+    Company ids passing every given filter (all companies when *company_ids* is None).
+
+    Caps and volumes are in millions of USD.  Companies without a USD value
+    (missing market data or FX rate) never pass a cap/volume filter.
+    """
+    query = db.query(CompanyScreeningFacts.company_id)
+    if company_ids is not None:
+        ids = list(company_ids)
+        if not ids:
+            return []
+        query = query.filter(CompanyScreeningFacts.company_id.in_(ids))
+    if min_cap_millions:
+        query = query.filter(CompanyScreeningFacts.market_cap_usd >= min_cap_millions * 1_000_000)
+    if min_dollar_volume_millions:
+        query = query.filter(
+            CompanyScreeningFacts.avg_dollar_volume_usd >= min_dollar_volume_millions * 1_000_000
+        )
+    if sectors:
+        query = query.filter(CompanyScreeningFacts.sector.in_(sectors))
+    if industries:
+        query = query.filter(CompanyScreeningFacts.industry.in_(industries))
+    if market_ids:
+        query = query.filter(CompanyScreeningFacts.market_id.in_(market_ids))
+    return [cid for (cid,) in query.all()]
+
+
+def filter_companies(db: Session, companies: list[T], **filters) -> list[T]:
+    """Keep the companies (ORM rows or CompanyRef) whose ids pass screen_company_ids(**filters)."""
+    if not companies:
+        return []
+    valid_id_set = set(screen_company_ids(db, [c.company_id for c in companies], **filters))
+    return [c for c in companies if c.company_id in valid_id_set]
+
 
-def filter_by_market_cap(db: Session, companies: list[Company], min_cap_millions: float) -> list[Company]:
+def filter_by_market_cap(db: Session, companies: list[T], min_cap_millions: float) -> list[T]:
     """Filter companies by market cap (in millions USD).
     
-    Converts all market caps to USD using latest FX rates for cross-currency comparison.
+    Market caps are pre-converted to USD in company_screening_facts, so this is
+    a single indexed query.
     
     Args:
         db: Database session
@@ -26,59 +76,9 @@ def filter_by_market_cap(db: Session, companies: list[Company], min_cap_millions
     Returns:
         Filtered list of companies meeting the market cap threshold
     """
-    if not companies:
-        return []
-    
-    from services.fx.fx_rate_helper import get_fx_rates_batch
-    
-    min_cap_usd_raw = min_cap_millions * 1_000_000
-    comp_ids = [c.company_id for c in companies]
-    
-    # Get market data with market relationship
-    market_data_records = (
-        db.query(CompanyMarketData, Company, Market)
-        .join(Company, CompanyMarketData.company_id == Company.company_id)
-        .join(Market, Company.market_id == Market.market_id)
-        .filter(CompanyMarketData.company_id.in_(comp_ids))
-        .filter(CompanyMarketData.market_cap.isnot(None))
-        .all()
-    )
-    
-    if not market_data_records:
-        logger.info(f"Market Cap Filter (USD): No market data found for {len(companies)} companies")
-        return []
-    
-    # Collect unique currencies and fetch FX rates in batch
-    currencies = {market.currency for _, _, market in market_data_records if market.currency}
-    fx_rates = get_fx_rates_batch(db, currencies, "USD")
-    
-    valid_id_set = set()
-    skipped_count = 0
-    
-    for market_data, company, market in market_data_records:
-        local_market_cap = market_data.market_cap
-        currency = market.currency or "USD"
-        
-        # Convert to USD
-        if currency == "USD":
-            market_cap_usd = local_market_cap
-        else:
-            fx_rate = fx_rates.get(currency)
-            if fx_rate is None:
-                logger.warning(
-                    f"No FX rate for {currency}/USD, skipping {company.ticker} (market cap filter)"
-                )
-                skipped_count += 1
-                continue
-            market_cap_usd = local_market_cap * fx_rate
-        
-        # Filter
-        if market_cap_usd >= min_cap_usd_raw:
-            valid_id_set.add(company.company_id)
-    
-    filtered = [c for c in companies if c.company_id in valid_id_set]
+    filtered = filter_companies(db, companies, min_cap_millions=min_cap_millions)
     logger.info(
         f"Market Cap Filter (USD): {len(companies)} -> {len(filtered)} "
-        f"(min ${min_cap_millions}M USD, skipped {skipped_count} due to missing FX rates)"
+        f"(min ${min_cap_millions}M USD)"
     )
     return filtered
@@ -0,0 +1,86 @@
+"""
+Ranked company search for the type-ahead box (``GET /api/companies``).
+
+The endpoint used to filter ``name ILIKE '%term%' OR ticker ILIKE '%term%'``
+— a sequential scan per keystroke, in table order.  Matching now runs on
+expression indexes (migration ``6c2e8a4f1d93``):
+
+* ``upper(ticker)`` / ``lower(name)`` with ``text_pattern_ops`` for exact and
+  prefix matches;
+* the same expressions with ``gin_trgm_ops`` (pg_trgm) for substring and
+  fuzzy (word similarity) matches.
+
+Queries shorter than three characters have no trigram to search on, so they
+only match ticker/name prefixes.  Results are ranked exact ticker → ticker
+prefix → name prefix → substring → fuzzy, then by similarity and ticker length.
+"""
+from typing import Optional
+
+from sqlalchemy import case, func, or_, text
+from sqlalchemy.orm import Session, joinedload
+
+from core.config import settings
+from database.company import Company
+
+_MIN_TRIGRAM_QUERY = 3
+
+_TICKER = func.upper(Company.ticker)
+_NAME = func.lower(Company.name)
+
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def find_companies(
+    db: Session,
+    term: Optional[str],
+    limit: int,
+    market_id: Optional[int] = None,
+) -> list[Company]:
+    """Companies matching *term* (all when empty), best match first; market eager-loaded."""
+    query = db.query(Company).options(joinedload(Company.market))
+    if market_id:
+        query = query.filter(Company.market_id == market_id)
+
+    term = (term or "").strip()
+    if not term:
+        return query.limit(limit).all()
+
+    upper, lower = term.upper(), term.lower()
+    ticker_prefix = _TICKER.like(f"{_like_escape(upper)}%")
+    name_prefix = _NAME.like(f"{_like_escape(lower)}%")
+
+    exact = _TICKER == upper
+    if len(term) < _MIN_TRIGRAM_QUERY:
+        tier = case((exact, 0), (ticker_prefix, 1), else_=2)
+        return (
+            query.filter(or_(ticker_prefix, name_prefix))
+            .order_by(tier, func.length(Company.ticker), Company.name)
+            .limit(limit)
+            .all()
+        )
+
+    # Fuzzy threshold of the "<%" operator, for this transaction only
+    db.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+        {"threshold": str(settings.COMPANY_SEARCH_FUZZY_THRESHOLD)},
+    )
+    ticker_contains = _TICKER.like(f"%{_like_escape(upper)}%")
+    name_contains = _NAME.like(f"%{_like_escape(lower)}%")
+    name_fuzzy = text(":search_term <% lower(companies.name)").bindparams(search_term=lower)
+
+    tier = case(
+        (exact, 0),
+        (ticker_prefix, 1),
+        (name_prefix, 2),
+        (or_(ticker_contains, name_contains), 3),
+        else_=4,  # fuzzy only
+    )
+    score = func.greatest(func.word_similarity(lower, _NAME), func.similarity(upper, _TICKER))
+    return (
+        query.filter(or_(ticker_contains, name_contains, name_fuzzy))
+        .order_by(tier, score.desc(), func.length(Company.ticker), Company.name)
+        .limit(limit)
+        .all()
+    )
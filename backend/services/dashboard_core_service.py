@@ -0,0 +1,257 @@
+"""
+Cached, concurrently computed sections of ``/dashboard/core``.
+
+The endpoint used to build holdings, snapshot, watchlist, transactions and
+alerts one after another on every load, so its latency was their sum.  Each
+section is now cached per (user, portfolio) under the versions of the data it
+reads:
+
+* ``portfolio:<id>`` / ``watchlist:<user_id>`` / ``alerts:<user_id>`` keys of
+  the ``user_data`` ingestion watermark, bumped in the same transaction as any
+  ORM change to transactions, accounts, favorites, notes or alerts (session
+  events below);
+* the portfolio's ``valuation`` version for the snapshot, and the calendar day
+  for holdings (period reference dates).
+
+A request reads the versions (one watermark query) and serves every section
+whose cached version still matches.  Sections whose version changed, or that
+are older than ``DASHBOARD_CACHE_MAX_STALE_SECONDS``, are computed
+concurrently on a small thread pool (own session per section), so a cold load
+costs its slowest section.  Matching entries older than
+``DASHBOARD_CACHE_TTL_SECONDS`` — live prices and FX moved on — are served
+as they are and refreshed in the background (stale-while-revalidate).
+
+Bulk Core writes bypass the session events — call :func:`invalidate_user_data`
+after those.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from itertools import chain
+from typing import Callable, Iterable, NamedTuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from api.watchlist import build_watchlist_full_for_user
+from core.config import settings
+from database.account import Account
+from database.alert import Alert
+from database.base import SessionLocal
+from database.company_note import CompanyNote
+from database.portfolio import FavoriteStock, Portfolio, Transaction
+from database.user import User
+from services.ingestion_watermarks import USER_DATA, bump_watermarks, get_watermarks, watermark_upsert
+from services.portfolio_positions_service import get_holdings_for_user
+from services.portfolio_snapshot_service import get_portfolio_snapshot
+from services.portfolio_transactions_service import get_transactions_for_portfolio
+from services.valuation.valuation_version import get_valuation_version
+
+logger = logging.getLogger(__name__)
+
+_MAX_ENTRIES = 4096
+
+
+def portfolio_key(portfolio_id: int) -> str:
+    return f"portfolio:{portfolio_id}"
+
+
+def watchlist_key(user_id: int) -> str:
+    return f"watchlist:{user_id}"
+
+
+def alerts_key(user_id: int) -> str:
+    return f"alerts:{user_id}"
+
+
+# ── Sections ────────────────────────────────────────────────────────
+# Each runs in a worker thread with its own session and returns plain data.
+
+def _holdings(db: Session, portfolio_id: int, user_id: int):
+    return get_holdings_for_user(db, db.get(Portfolio, portfolio_id))
+
+
+def _snapshot(db: Session, portfolio_id: int, user_id: int):
+    return get_portfolio_snapshot(db, db.get(Portfolio, portfolio_id))
+
+
+def _watchlist(db: Session, portfolio_id: int, user_id: int):
+    return build_watchlist_full_for_user(db, db.get(User, user_id))
+
+
+def _transactions(db: Session, portfolio_id: int, user_id: int):
+    return get_transactions_for_portfolio(db, portfolio_id)
+
+
+def _alerts(db: Session, portfolio_id: int, user_id: int):
+    columns = [c.key for c in Alert.__table__.columns]
+    alerts = db.query(Alert).filter(Alert.user_id == user_id).all()
+    return [{col: getattr(alert, col) for col in columns} for alert in alerts]
+
+
+_SECTIONS: dict[str, Callable[[Session, int, int], object]] = {
+    "holdings": _holdings,
+    "snapshot": _snapshot,
+    "watchlist": _watchlist,
+    "transactions": _transactions,
+    "alerts": _alerts,
+}
+
+
+def _section_versions(db: Session, portfolio_id: int, user_id: int) -> dict[str, tuple]:
+    keys = [portfolio_key(portfolio_id), watchlist_key(user_id), alerts_key(user_id)]
+    marks = get_watermarks(db, USER_DATA, keys)
+    portfolio_v, watchlist_v, alerts_v = (marks.get(k, 0) for k in keys)
+    return {
+        "holdings": (portfolio_v, date.today()),
+        "snapshot": (portfolio_v, get_valuation_version(db, portfolio_id)),
+        "watchlist": (watchlist_v,),
+        "transactions": (portfolio_v,),
+        "alerts": (alerts_v,),
+    }
+
+
+# ── Cache ───────────────────────────────────────────────────────────
+
+class _Entry(NamedTuple):
+    version: tuple
+    value: object
+    computed_at: float
+
+
+_cache: "OrderedDict[tuple, _Entry]" = OrderedDict()
+_refreshing: set[tuple] = set()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+
+
+def _lookup(key: tuple) -> _Entry | None:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+        return entry
+
+
+def _compute(key: tuple, version: tuple):
+    user_id, portfolio_id, section = key
+    start = time.monotonic()
+    db = SessionLocal()
+    try:
+        value = _SECTIONS[section](db, portfolio_id, user_id)
+    finally:
+        db.close()
+
+    with _lock:
+        _cache[key] = _Entry(version, value, time.monotonic())
+        _cache.move_to_end(key)
+        while len(_cache) > _MAX_ENTRIES:
+            _cache.popitem(last=False)
+    logger.debug(f"Dashboard {section} of portfolio {portfolio_id} computed in {time.monotonic() - start:.3f}s")
+    return value
+
+
+def _refresh_in_background(key: tuple, version: tuple) -> None:
+    with _lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def _done(future: Future) -> None:
+        with _lock:
+            _refreshing.discard(key)
+        if future.exception() is not None:
+            logger.error(f"Background refresh of dashboard {key[2]} for portfolio {key[1]} failed: {future.exception()}")
+
+    _executor.submit(_compute, key, version).add_done_callback(_done)
+
+
+def get_dashboard_sections(db: Session, portfolio_id: int, user_id: int) -> tuple[dict, set[str]]:
+    """
+    Holdings, snapshot, watchlist, transactions and alerts of *portfolio_id*
+    for *user_id*, from cache where the data versions still match.
+
+    Returns ``(sections, refreshed)`` where *refreshed* names the sections
+    that were computed now or are being refreshed in the background.
+    """
+    now = time.monotonic()
+    sections: dict = {}
+    missing: dict[tuple, tuple] = {}
+    refreshed: set[str] = set()
+
+    for section, version in _section_versions(db, portfolio_id, user_id).items():
+        key = (user_id, portfolio_id, section)
+        entry = _lookup(key)
+        age = now - entry.computed_at if entry is not None else None
+        if entry is None or entry.version != version or age > settings.DASHBOARD_CACHE_MAX_STALE_SECONDS:
+            missing[key] = version
+            continue
+        sections[section] = entry.value
+        if age > settings.DASHBOARD_CACHE_TTL_SECONDS:
+            _refresh_in_background(key, version)
+            refreshed.add(section)
+
+    if missing:
+        futures = {key: _executor.submit(_compute, key, version) for key, version in missing.items()}
+        for key, future in futures.items():
+            sections[key[2]] = future.result()
+            refreshed.add(key[2])
+    return sections, refreshed
+
+
+# ── Invalidation ────────────────────────────────────────────────────
+
+def invalidate_user_data(db: Session, portfolio_ids: Iterable[int] = (), user_ids: Iterable[int] = ()) -> None:
+    """Bump the dashboard versions of *portfolio_ids* / *user_ids* (after bulk Core writes; commits)."""
+    keys = [portfolio_key(pid) for pid in portfolio_ids]
+    for user_id in user_ids:
+        keys += [watchlist_key(user_id), alerts_key(user_id)]
+    bump_watermarks(db, USER_DATA, keys)
+
+
+def _history_values(state, attr: str) -> list:
+    hist = state.attrs[attr].history
+    return [v for v in chain(hist.added or (), hist.deleted or (), hist.unchanged or ()) if v is not None]
+
+
+# (class, attribute, key function); a transaction also flips watchlist "is held" flags
+_TRACKED = (
+    (Transaction, "portfolio_id", portfolio_key),
+    (Transaction, "user_id", watchlist_key),
+    (Account, "portfolio_id", portfolio_key),
+    (FavoriteStock, "user_id", watchlist_key),
+    (CompanyNote, "user_id", watchlist_key),
+    (Alert, "user_id", alerts_key),
+)
+_PENDING = "dashboard_cache_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_user_data_change(session: Session, flush_context) -> None:
+    touched: set[str] = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        for cls, attr, key_fn in _TRACKED:
+            if isinstance(obj, cls):
+                touched.update(key_fn(v) for v in _history_values(inspect(obj), attr))
+
+    pending = session.info.setdefault(_PENDING, set())
+    new_keys = touched - pending
+    if new_keys:
+        # Same transaction as the change itself: both commit or neither does
+        session.connection().execute(watermark_upsert(USER_DATA, sorted(new_keys)))
+        pending.update(new_keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_on_commit(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,252 @@
+"""
+External (Yahoo Finance) ticker lookups for company search.
+
+``include_external`` searches used to run a direct ``yf.Ticker`` lookup and
+then the Yahoo search API one after the other inside the request, without a
+time budget or caching.  Now:
+
+* both lookups are submitted to a small thread pool at once and the request
+  waits at most ``COMPANY_SEARCH_EXTERNAL_TIMEOUT_SECONDS`` for them
+  together — whatever finished by then is returned (partial results);
+* each lookup's result is cached per normalized query for
+  ``COMPANY_SEARCH_EXTERNAL_TTL_SECONDS``; empty results (no such ticker, no
+  quotes) are cached too, for ``COMPANY_SEARCH_EXTERNAL_MISS_TTL_SECONDS``,
+  so a common typo does not hit Yahoo for every user.  Failed lookups are
+  not cached;
+* a lookup that misses the deadline keeps running and fills the cache for
+  the next keystroke, but one still queued when no request waits for it any
+  more is cancelled, and new lookups are skipped while
+  ``_MAX_PENDING`` are outstanding — abandoned keystrokes cannot pile up
+  behind slow Yahoo calls;
+* both sources have a network timeout (``_FETCH_TIMEOUT``): the direct
+  lookup reads the chart endpoint (``history``), the one yfinance call that
+  takes a timeout, instead of the unbounded ``info`` request.
+
+Results are raw ``{"ticker", "name", "exchange"}`` dicts; mapping exchanges to
+markets needs the DB and stays with the caller.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+import requests
+import yfinance as yf
+from yfinance.exceptions import YFPricesMissingError, YFTzMissingError
+
+from core.config import settings
+from services.company_market_sync import _detect_yahoo_exchange
+
+logger = logging.getLogger(__name__)
+
+_SEARCH_URL = "https://query2.finance.yahoo.com/v1/finance/search"
+_HEADERS = {"User-Agent": "Mozilla/5.0"}
+_MAX_ENTRIES = 2048
+_MAX_PENDING = 16     # queued + running lookups
+_FETCH_TIMEOUT = 5.0  # seconds, per network request
+
+_cache: "OrderedDict[tuple, tuple[float, object]]" = OrderedDict()  # key -> (expires_at, result)
+_pending: dict[tuple, tuple[Future, int]] = {}  # key -> (lookup, requests waiting on it)
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ticker-lookup")
+
+
+def normalize_query(search: str) -> str:
+    return re.sub(r"\s+", " ", search.strip()).upper()
+
+
+def looks_like_ticker(query: str) -> bool:
+    return bool(query) and " " not in query and len(query) <= 10
+
+
+# ── Sources (no DB access; run in worker threads) ───────────────────
+
+def _fetch_direct(ticker: str) -> Optional[dict]:
+    """The ticker itself via yfinance; None when it does not resolve (or is an option)."""
+    ticker_obj = yf.Ticker(ticker)
+    try:
+        bars = ticker_obj.history(period="5d", timeout=_FETCH_TIMEOUT, raise_errors=True)
+    except (YFPricesMissingError, YFTzMissingError):
+        return None
+    if bars is None or bars.empty:
+        return None
+
+    meta = ticker_obj.history_metadata or {}
+    quote_type = meta.get("instrumentType")
+    if quote_type and str(quote_type).upper() == "OPTION":
+        return None
+
+    name = meta.get("shortName") or meta.get("longName") or ticker
+    return {"ticker": ticker, "name": name, "exchange": _detect_yahoo_exchange(ticker)}
+
+
+def _fetch_search(query: str, limit: int) -> list[dict]:
+    """Quotes of the Yahoo search API (options skipped)."""
+    params = {
+        "q": query,
+        "quotesCount": limit,
+        "newsCount": 0,
+        "quotesQueryId": "tss_match_phrase_query",
+    }
+    response = requests.get(_SEARCH_URL, params=params, headers=_HEADERS, timeout=_FETCH_TIMEOUT)
+    response.raise_for_status()
+    quotes = (response.json() or {}).get("quotes") or []
+
+    results = []
+    for quote in quotes:
+        symbol = quote.get("symbol")
+        if not symbol:
+            continue
+        quote_type = (quote.get("typeDisp") or quote.get("quoteType") or "").upper()
+        if quote_type == "OPTION":
+            continue
+        results.append({
+            "ticker": symbol,
+            "name": quote.get("shortname") or quote.get("longname") or quote.get("name") or symbol,
+            "exchange": (
+                quote.get("exchDisp") or quote.get("exchangeDisplay") or quote.get("exchange") or ""
+            ),
+        })
+    return results
+
+
+# ── Cache ───────────────────────────────────────────────────────────
+
+_MISSING = object()
+
+
+def _cached(key: tuple):
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del _cache[key]
+            return _MISSING
+        _cache.move_to_end(key)
+        return result
+
+
+def _store(key: tuple, result) -> None:
+    ttl = (
+        settings.COMPANY_SEARCH_EXTERNAL_TTL_SECONDS
+        if result
+        else settings.COMPANY_SEARCH_EXTERNAL_MISS_TTL_SECONDS
+    )
+    with _lock:
+        _cache[key] = (time.monotonic() + ttl, result)
+        _cache.move_to_end(key)
+        while len(_cache) > _MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def _run(key: tuple, fetch: Callable[[], object]):
+    try:
+        result = fetch()
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(f"External ticker lookup {key} failed: {exc}")
+        raise
+    _store(key, result)
+    return result
+
+
+def _submit(key: tuple, fetch: Callable[[], object]) -> Optional[Future]:
+    """
+    Future of *key*'s lookup, joining one already in flight; None when
+    ``_MAX_PENDING`` lookups are outstanding.  Pair with :func:`_release`.
+    """
+    with _lock:
+        entry = _pending.get(key)
+        if entry is not None:
+            future, waiters = entry
+            _pending[key] = (future, waiters + 1)
+            return future
+        if len(_pending) >= _MAX_PENDING:
+            return None
+        future = _executor.submit(_run, key, fetch)
+        _pending[key] = (future, 1)
+
+    def _done(f: Future) -> None:
+        with _lock:
+            entry = _pending.get(key)
+            if entry is not None and entry[0] is f:
+                del _pending[key]
+
+    future.add_done_callback(_done)
+    return future
+
+
+def _release(key: tuple, future: Future) -> None:
+    """Stop waiting on *key*'s lookup; cancel it if nobody waits and it has not started."""
+    with _lock:
+        entry = _pending.get(key)
+        if entry is None or entry[0] is not future:
+            return
+        waiters = entry[1] - 1
+        _pending[key] = (future, waiters)
+    if waiters <= 0:
+        future.cancel()  # no-op once running; it then still fills the cache
+
+
+# ── Entry point ─────────────────────────────────────────────────────
+
+def lookup_external_tickers(search: str, limit: int) -> list[dict]:
+    """
+    Direct ticker match (when *search* looks like a ticker) followed by the
+    Yahoo search quotes, deduplicated, at most *limit*.  Returns what is
+    cached or finished within the deadline.
+    """
+    query = normalize_query(search)
+    if not query:
+        return []
+
+    keys: dict[str, tuple] = {}
+    if looks_like_ticker(query):
+        keys["direct"] = ("direct", query)
+    keys["search"] = ("search", query, limit)
+    fetchers = {
+        "direct": lambda: _fetch_direct(query),
+        "search": lambda: _fetch_search(search.strip(), limit),
+    }
+
+    results: dict[str, object] = {}
+    futures: dict[str, Future] = {}
+    for source, key in keys.items():
+        cached = _cached(key)
+        if cached is not _MISSING:
+            results[source] = cached
+            continue
+        future = _submit(key, fetchers[source])
+        if future is None:
+            logger.info(f"External lookup for {query!r}: {source} skipped, lookup queue full")
+        else:
+            futures[source] = future
+
+    if futures:
+        try:
+            done, not_done = wait(futures.values(), timeout=settings.COMPANY_SEARCH_EXTERNAL_TIMEOUT_SECONDS)
+        finally:
+            for source, future in futures.items():
+                _release(keys[source], future)
+        for source, future in futures.items():
+            if future in done and not future.cancelled() and future.exception() is None:
+                results[source] = future.result()
+        if not_done:
+            slow = [source for source, future in futures.items() if future in not_done]
+            logger.info(f"External lookup for {query!r}: {slow} missed the deadline, partial results")
+
+    merged: list[dict] = []
+    seen: set[str] = set()
+    direct = results.get("direct")
+    for item in ([direct] if direct else []) + list(results.get("search") or []):
+        if item["ticker"] in seen:
+            continue
+        merged.append(item)
+        seen.add(item["ticker"])
+        if len(merged) >= limit:
+            break
+    return merged
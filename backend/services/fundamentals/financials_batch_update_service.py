@@ -25,6 +25,9 @@ from services.fundamentals.fetch_financial_data_executor import (
     get_first_valid_row,
     safe_get,
 )
+from services.ingestion_watermarks import FUNDAMENTALS, bump_watermarks
+from services.industry_aggregate_service import refresh_industry_aggregates
+from services.screening_facts_service import refresh_screening_facts
 from utils.db_retry import retry_on_db_lock
 
 logger = logging.getLogger(__name__)
@@ -385,6 +388,7 @@ def fetch_and_save_financial_data_for_list_of_tickers(
     eps_revision_mappings = []
     total_mappings = 0
     per_ticker_errors: list[dict] = []
+    changed_ids: set[int] = set()
 
     for comp in companies:
         ticker = comp.ticker
@@ -458,6 +462,7 @@ def fetch_and_save_financial_data_for_list_of_tickers(
                 db.merge(fn)
                 
                 db.commit()
+                changed_ids.add(comp.company_id)
             except Exception as db_exc:
                 logger.error(f"Failed to mark ticker {ticker} as failed in DB: {db_exc}")
                 db.rollback()
@@ -478,6 +483,7 @@ def fetch_and_save_financial_data_for_list_of_tickers(
                 if hasattr(md, "is_delisted"):
                     md.is_delisted = True
                 db.merge(md)
+                changed_ids.add(comp.company_id)
                 continue
 
             update_market_data(md, fast_info)
@@ -499,6 +505,7 @@ def fetch_and_save_financial_data_for_list_of_tickers(
                     ticker, fn, income_stmt, cf_df, bs_df, info_dict, fast_info, col
                 )
             db.merge(fn)
+            changed_ids.add(comp.company_id)
 
             # Build new financial history (no duplicates)
             mappings = build_financial_history_mappings(
@@ -635,6 +642,7 @@ def fetch_and_save_financial_data_for_list_of_tickers(
                     md.is_delisted = True
                 db.merge(md)
                 db.commit()
+                changed_ids.add(comp.company_id)
             except Exception as db_exc:
                 logger.error(f"Failed to mark ticker {ticker} as failed in DB after exception: {db_exc}")
                 db.rollback()
@@ -740,6 +748,10 @@ def fetch_and_save_financial_data_for_list_of_tickers(
             db.rollback()
             logger.exception("Bulk insert failed for eps revisions: %s", exc)
 
+    bump_watermarks(db, FUNDAMENTALS, changed_ids)
+    refresh_screening_facts(db, changed_ids)
+    refresh_industry_aggregates(db, changed_ids)
+
     if not history_mappings:
         logger.info(
             f"No new CompanyFinancialHistory rows to insert for tickers:"
@@ -6,6 +6,8 @@ from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from database.fx import FxRate
+from services.ingestion_watermarks import FX, bump_watermarks, fx_key
+from services.screening_facts_service import refresh_screening_facts_for_currencies
 
 
 def get_last_fx_rate_date(db: Session, base: str, quote: str):
@@ -100,6 +102,10 @@ def _fetch_direct_range(
             row.get("Close"),
         )
     db.commit()
+    bump_watermarks(db, FX, [fx_key(base, quote)])
+    if "USD" in (base, quote):
+        # USD-normalized screening facts depend on the latest XXX/USD close
+        refresh_screening_facts_for_currencies(db, {base, quote})
     return True
 
 
@@ -153,6 +159,7 @@ def _fetch_cross_range(
             cross_close,
         )
     db.commit()
+    bump_watermarks(db, FX, [fx_key(base, quote)])
 
 
 def save_fx_rate_to_db(db, base, quote, d, o, h, low, c):
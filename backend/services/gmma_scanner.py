@@ -1,7 +1,8 @@
 """
 GMMA 24-Line + Volatility Squeeze Scanner (Borawski Method)
 ============================================================
-Memory-safe execution for 4 GB RAM / 3 000+ stocks.
+Memory-safe execution for 4 GB RAM / 3 000+ stocks; the per-ticker
+computation runs in scan worker processes (services/scan_executor.py).
 
 Strategy:
 - 24 EMA lines grouped into Red (3-21), Blue (25-60), Green (65-90)
@@ -19,8 +20,13 @@ import pandas as pd
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from services.scan_universe_resolver import resolve_universe
-from services.company_filter_service import filter_by_market_cap
+from services.scan_universe_resolver import resolve_universe_refs
+from services.universe_cache import all_company_refs
+from services.company_filter_service import filter_by_market_cap, screen_company_ids
+from services.scan_executor import concat_packed, pack_price_frame, run_sharded_scan
+from services.ingestion_watermarks import PRICE
+from services.scan_result_cache import run_cached
+from utils.columnar import column
 from utils.itertools_helpers import chunked
 
 logger = logging.getLogger(__name__)
@@ -32,6 +38,10 @@ GREEN_PERIODS = [65, 70, 75, 80, 85, 90]                    # 6 lines
 
 CHUNK_SIZE = 300
 
+PRICE_COLUMNS = ["high", "low", "close", "sma_200"]
+
+SCAN_TYPE = "gmma_squeeze"
+
 
 # ── Data loading ────────────────────────────────────────────────────
 
@@ -41,8 +51,7 @@ def _load_chunk(db: Session, company_ids: list[int], session_limit: int = 200) -
     Uses ROW_NUMBER window function for efficient server-side limiting.
     """
     sql = text("""
-        SELECT sub.company_id, c.ticker, c.name,
-               sub.date, sub.high, sub.low, sub.close, sub.sma_200
+        SELECT sub.company_id, sub.date, sub.high, sub.low, sub.close, sub.sma_200
         FROM (
             SELECT sph.company_id, sph.date, sph.high, sph.low,
                    sph.close, sph.sma_200,
@@ -53,7 +62,6 @@ def _load_chunk(db: Session, company_ids: list[int], session_limit: int = 200) -
             FROM stock_price_history sph
             WHERE sph.company_id = ANY(:ids)
         ) sub
-        JOIN companies c ON c.company_id = sub.company_id
         WHERE sub.rn <= :limit
         ORDER BY sub.company_id, sub.date ASC
     """)
@@ -63,17 +71,50 @@ def _load_chunk(db: Session, company_ids: list[int], session_limit: int = 200) -
         return pd.DataFrame()
 
     df = pd.DataFrame(rows, columns=[
-        "company_id", "ticker", "name", "date",
-        "high", "low", "close", "sma_200",
+        "company_id", "date", "high", "low", "close", "sma_200",
     ])
 
     # Immediate float32 downcast — saves 50 % RAM on numerics
-    for col in ("high", "low", "close", "sma_200"):
+    for col in PRICE_COLUMNS:
         df[col] = df[col].astype(np.float32)
 
     return df
 
 
+def _load_packed_prices(db: Session, company_ids: list[int], session_limit: int):
+    """
+    Load the universe chunk by chunk and pack it into flat float32 columns
+    for the scan executor (see services/scan_executor.py).  Each chunk is
+    packed as soon as it is loaded, so at most one chunk exists as a frame.
+    """
+    parts = []
+    for chunk_ids in chunked(company_ids, CHUNK_SIZE):
+        df = _load_chunk(db, list(chunk_ids), session_limit)
+        if not df.empty:
+            parts.append(pack_price_frame(df, PRICE_COLUMNS, dtype=np.float32))
+        del df
+
+    packed = concat_packed(parts, PRICE_COLUMNS, dtype=np.float32)
+    del parts
+    gc.collect()
+    return packed
+
+
+def _load_company_labels(db: Session, company_ids: list[int]) -> dict[int, tuple[str, str]]:
+    """Return {company_id: (ticker, name)} — labels stay in the parent process."""
+    from database.company import Company
+
+    labels: dict[int, tuple[str, str]] = {}
+    for chunk_ids in chunked(company_ids, 1000):
+        rows = (
+            db.query(Company.company_id, Company.ticker, Company.name)
+            .filter(Company.company_id.in_(list(chunk_ids)))
+            .all()
+        )
+        labels.update({cid: (ticker, name) for cid, ticker, name in rows})
+    return labels
+
+
 # ── GMMA computation ───────────────────────────────────────────────
 
 def _compute_gmma_edges(group: pd.DataFrame) -> pd.DataFrame:
@@ -169,15 +210,16 @@ def _filter_signals(
     band_width_threshold: float = 5.0,
 ) -> list[dict]:
     """
-    Apply T0/T-1 signal logic across all tickers.
+    Apply T0/T-1 signal logic across all companies.
     Detects both UP and DOWN squeeze breakouts.
+    Signals carry company_id; ticker/name are attached by the caller.
 
     band_width_threshold: max allowed internal width of Red/Blue bands at T-1.
     Rejects signals where bands are already wide (trend developed, not a true squeeze).
     """
     results: list[dict] = []
 
-    for ticker, grp in df.groupby("ticker"):
+    for company_id, grp in df.groupby("company_id"):
         if len(grp) < 2:
             continue
 
@@ -224,10 +266,8 @@ def _filter_signals(
             continue
 
         # All conditions met
-        name = grp["name"].iloc[0]
         results.append({
-            "ticker": str(ticker),
-            "name": str(name),
+            "company_id": int(company_id),
             "trend": trend,
             "close": round(float(t_0["close"]), 2),
             "starter_yesterday_pct": round(float(t_minus_1["starter_pct"]), 2),
@@ -236,12 +276,105 @@ def _filter_signals(
             "blue_width_pct": round(float(t1_blue_w), 2),
             "opor_20d": round(float(t_0["opor_20d"]), 2) if pd.notna(t_0["opor_20d"]) else None,
             "ciasny_stop_3d": round(float(t_0["ciasny_stop_3d"]), 2) if pd.notna(t_0["ciasny_stop_3d"]) else None,
-            "date": str(t_0["date"]),
+            "date": pd.Timestamp(t_0["date"]).strftime("%Y-%m-%d"),
         })
 
     return results
 
 
+# ── Shard kernel (runs in scan worker processes) ───────────────────
+
+def _gmma_kernel(
+    columns: dict[str, np.ndarray],
+    company_ids: np.ndarray,
+    offsets: np.ndarray,
+    params: dict,
+) -> list[dict]:
+    """
+    Scan-executor kernel: rebuild the shard frame from shared arrays and run
+    the GMMA edge / indicator / signal pipeline on it.
+    """
+    if len(company_ids) == 0:
+        return []
+
+    df = pd.DataFrame({
+        "company_id": np.repeat(company_ids, np.diff(offsets)),
+        "date": columns["date"],
+        **{col: columns[col] for col in PRICE_COLUMNS},
+    })
+
+    df = df.groupby("company_id", group_keys=False).apply(_compute_gmma_edges)
+    df = df.groupby("company_id", group_keys=False).apply(
+        _compute_indicators, starter_smoothing=params["starter_smoothing"]
+    )
+    return _filter_signals(
+        df,
+        params["compression_threshold"],
+        params["trend_filter"],
+        params["band_width_threshold"],
+    )
+
+
+def _compute_signals(
+    db: Session,
+    company_ids: list[int],
+    params: dict,
+) -> dict[int, dict]:
+    """Load prices and fan the GMMA kernel out over the scan executor."""
+    columns, packed_ids, offsets = _load_packed_prices(db, company_ids, params["session_limit"])
+
+    signals = run_sharded_scan(
+        _gmma_kernel, columns, packed_ids, offsets, params=params, label="gmma",
+    )
+    del columns
+    gc.collect()
+
+    return {signal.pop("company_id"): signal for signal in signals}
+
+
+def _scan_company_ids(
+    db: Session,
+    company_ids: list[int],
+    compression_threshold: float,
+    starter_smoothing: int,
+    session_limit: int,
+    trend_filter: str,
+    band_width_threshold: float,
+) -> list[dict]:
+    """
+    Resolve signals through the scan result cache (recomputing only companies
+    whose price data changed) and attach ticker/name labels.
+    """
+    params = {
+        "compression_threshold": compression_threshold,
+        "starter_smoothing": starter_smoothing,
+        "session_limit": session_limit,
+        "trend_filter": trend_filter,
+        "band_width_threshold": band_width_threshold,
+    }
+    per_company = run_cached(
+        db,
+        SCAN_TYPE,
+        params,
+        company_ids,
+        lambda ids: _compute_signals(db, ids, params),
+        sources=(PRICE,),
+    )
+
+    signals = {cid: signal for cid, signal in per_company.items() if signal}
+    labels = _load_company_labels(db, list(signals))
+    final_results: list[dict] = []
+    for cid, signal in signals.items():
+        ticker, name = labels.get(cid, (None, None))
+        if ticker is None:
+            continue
+        final_results.append({"ticker": str(ticker), "name": str(name), **signal})
+
+    # Sort: uptrends first, then by tightest squeeze (starter_pct ascending)
+    final_results.sort(key=lambda r: (r["trend"] != "up", r["starter_yesterday_pct"]))
+    return final_results
+
+
 # ── Main orchestrator ───────────────────────────────────────────────
 
 def run_gmma_scan(
@@ -255,61 +388,41 @@ def run_gmma_scan(
     band_width_threshold: float = 5.0,
 ) -> dict:
     """
-    Memory-safe GMMA Squeeze scanner.
-    Processes companies in chunks of CHUNK_SIZE, garbage-collects after each.
+    GMMA Squeeze scanner.
+    Prices are loaded in chunks of CHUNK_SIZE, packed into shared arrays and
+    analysed in parallel by the scan executor.
     """
     start_time = time.time()
 
     # 1. Resolve scan universe
+    # (the optional market-cap filter is part of the universe query)
     if basket_ids:
-        _, companies = resolve_universe(db, None, basket_ids)
+        _, companies = resolve_universe_refs(
+            db, None, basket_ids, min_cap_millions=min_market_cap
+        )
     else:
         # No baskets specified → scan ALL companies
-        from database.company import Company
-        companies = db.query(Company).all()
+        companies = all_company_refs(db)
         logger.info(f"GMMA scan: scanning ALL {len(companies)} companies (no basket filter)")
+        if min_market_cap:
+            companies = filter_by_market_cap(db, companies, min_market_cap)
 
     if not companies:
         return {"status": "success", "data": []}
 
-    # 2. Optional market-cap filter
-    if min_market_cap:
-        companies = filter_by_market_cap(db, companies, min_market_cap)
-        if not companies:
-            return {"status": "success", "data": []}
-
     company_ids = [c.company_id for c in companies]
-    logger.info(f"GMMA scan: {len(company_ids)} companies in {len(list(chunked(company_ids, CHUNK_SIZE)))} chunks")
-
-    # 3. Process in chunks
-    final_results: list[dict] = []
-
-    for i, chunk_ids in enumerate(chunked(company_ids, CHUNK_SIZE)):
-        chunk_ids = list(chunk_ids)
-        logger.info(f"  Chunk {i + 1}: {len(chunk_ids)} companies")
-
-        df = _load_chunk(db, chunk_ids, session_limit)
-        if df.empty:
-            continue
-
-        # Compute GMMA edges per ticker (vectorised within each group)
-        df = df.groupby("ticker", group_keys=False).apply(_compute_gmma_edges)
-
-        # Compute indicators per ticker
-        df = df.groupby("ticker", group_keys=False).apply(
-            _compute_indicators, starter_smoothing=starter_smoothing
-        )
-
-        # Filter signals
-        chunk_signals = _filter_signals(df, compression_threshold, trend_filter, band_width_threshold)
-        final_results.extend(chunk_signals)
-
-        # ── FREE MEMORY ──
-        del df
-        gc.collect()
-
-    # 4. Sort: uptrends first, then by tightest squeeze (starter_pct ascending)
-    final_results.sort(key=lambda r: (r["trend"] != "up", r["starter_yesterday_pct"]))
+    logger.info(f"GMMA scan: {len(company_ids)} companies")
+
+    # 3. Load, shard and analyse
+    final_results = _scan_company_ids(
+        db,
+        company_ids,
+        compression_threshold=compression_threshold,
+        starter_smoothing=starter_smoothing,
+        session_limit=session_limit,
+        trend_filter=trend_filter,
+        band_width_threshold=band_width_threshold,
+    )
 
     elapsed = time.time() - start_time
     logger.info(
@@ -339,38 +452,22 @@ def run_gmma_scan_for_company_ids(
 
     # Optional market-cap filter
     if min_market_cap:
-        from database.company import Company
-        companies = db.query(Company).filter(Company.company_id.in_(company_ids)).all()
-        companies = filter_by_market_cap(db, companies, min_market_cap)
-        if not companies:
+        company_ids = screen_company_ids(db, company_ids, min_cap_millions=min_market_cap)
+        if not company_ids:
             return []
-        company_ids = [c.company_id for c in companies]
 
     start_time = time.time()
     logger.info(f"GMMA scan (direct): {len(company_ids)} companies")
 
-    final_results: list[dict] = []
-
-    for i, chunk_ids in enumerate(chunked(company_ids, CHUNK_SIZE)):
-        chunk_ids = list(chunk_ids)
-
-        df = _load_chunk(db, chunk_ids, session_limit)
-        if df.empty:
-            continue
-
-        df = df.groupby("ticker", group_keys=False).apply(_compute_gmma_edges)
-        df = df.groupby("ticker", group_keys=False).apply(
-            _compute_indicators, starter_smoothing=starter_smoothing
-        )
-
-        chunk_signals = _filter_signals(df, compression_threshold, trend_filter, band_width_threshold)
-        final_results.extend(chunk_signals)
-
-        del df
-        gc.collect()
-
-    # Sort: uptrends first, then by tightest squeeze
-    final_results.sort(key=lambda r: (r["trend"] != "up", r["starter_yesterday_pct"]))
+    final_results = _scan_company_ids(
+        db,
+        company_ids,
+        compression_threshold=compression_threshold,
+        starter_smoothing=starter_smoothing,
+        session_limit=session_limit,
+        trend_filter=trend_filter,
+        band_width_threshold=band_width_threshold,
+    )
 
     elapsed = time.time() - start_time
     logger.info(f"GMMA scan (direct) complete: {len(final_results)} signals in {elapsed:.1f}s")
@@ -380,10 +477,11 @@ def run_gmma_scan_for_company_ids(
 
 # ── Chart data for single ticker ────────────────────────────────────
 
-def get_gmma_chart_data(db: Session, ticker: str, session_limit: int = 200) -> dict:
+def get_gmma_chart_data(db: Session, ticker: str, session_limit: int = 200, columnar: bool = False) -> dict:
     """
     Return GMMA band data for a single ticker (for chart rendering).
-    Returns close, sma_200, and 5 GMMA edges per session.
+    Returns close, sma_200, and 5 GMMA edges per session — one dict per
+    session, or one array per field when *columnar*.
 
     Internally fetches session_limit + EMA_WARMUP extra days so that
     EMA values at the start of the visible window are fully converged.
@@ -410,7 +508,7 @@ def get_gmma_chart_data(db: Session, ticker: str, session_limit: int = 200) -> d
 
     rows = db.execute(sql, {"ticker": ticker, "limit": fetch_limit}).fetchall()
     if not rows:
-        return {"ticker": ticker, "data": []}
+        return {"ticker": ticker, "data": {} if columnar else []}
 
     df = pd.DataFrame(rows, columns=["date", "close", "sma_200"])
     for col in ("close", "sma_200"):
@@ -438,18 +536,13 @@ def get_gmma_chart_data(db: Session, ticker: str, session_limit: int = 200) -> d
     # Trim to requested window (drop warmup rows)
     df = df.tail(session_limit).reset_index(drop=True)
 
-    # Convert to list of dicts (rounded for JSON)
-    chart_data = []
-    for _, row in df.iterrows():
-        chart_data.append({
-            "date": str(row["date"]),
-            "close": round(float(row["close"]), 2),
-            "sma_200": round(float(row["sma_200"]), 2) if pd.notna(row["sma_200"]) else None,
-            "czerw_top": round(float(row["czerw_top"]), 2),
-            "czerw_bot": round(float(row["czerw_bot"]), 2),
-            "nieb_top": round(float(row["nieb_top"]), 2),
-            "nieb_bot": round(float(row["nieb_bot"]), 2),
-            "ziel_top": round(float(row["ziel_top"]), 2),
-        })
+    # Rounded columns; NaN (no SMA yet) becomes None
+    fields = ("close", "sma_200", "czerw_top", "czerw_bot", "nieb_top", "nieb_bot", "ziel_top")
+    columns = {"date": [str(d) for d in df["date"]]}
+    columns.update({field: column(df[field], 2) for field in fields})
+    if columnar:
+        return {"ticker": ticker, "data": columns}
 
+    keys = list(columns)
+    chart_data = [dict(zip(keys, values)) for values in zip(*columns.values())]
     return {"ticker": ticker, "data": chart_data}
@@ -0,0 +1,166 @@
+"""
+Maintenance of ``industry_aggregates`` — peer statistics per (listing
+market, industry) for the stock details peer comparison.
+
+``build_peer_comparisons`` used to load every peer's ``company_financials``
+row on each page view and average the ratios in Python.  The ratios are now
+computed in SQL with the same definitions (see
+``utils/comparables.company_peer_metrics``) and aggregated per industry:
+member ids, sorted non-zero values per ratio and their quartiles.
+
+The fundamentals batch calls :func:`refresh_industry_aggregates` for the
+companies whose snapshot changed (their whole industries are recomputed);
+the daily fundamentals job runs a full refresh, which also picks up
+industry reassignments.  Each refresh is one ``INSERT … SELECT … ON
+CONFLICT`` statement; industries without members lose their row.
+"""
+import logging
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.industry_aggregate import IndustryAggregate
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_SQL = """
+WITH peers AS (
+    SELECT
+        c.company_id,
+        c.market_id,
+        c.industry,
+        CASE WHEN f.current_price IS NOT NULL AND COALESCE(NULLIF(f.diluted_eps, 0), f.basic_eps) > 0
+            THEN f.current_price / COALESCE(NULLIF(f.diluted_eps, 0), f.basic_eps)
+        END AS pe_ratio,
+        CASE WHEN f.ebitda <> 0 THEN
+            COALESCE(
+                f.enterprise_value,
+                COALESCE(f.shares_outstanding * f.current_price, 0)
+                    + COALESCE(f.total_debt, 0) - COALESCE(f.cash_and_cash_equivalents, 0)
+            ) / f.ebitda
+        END AS ev_ebitda,
+        CASE WHEN f.current_price IS NOT NULL AND f.enterprise_value <> 0 AND f.shares_outstanding <> 0
+                AND f.enterprise_value - COALESCE(f.total_debt, 0) + COALESCE(f.cash_and_cash_equivalents, 0) <> 0
+            THEN f.current_price / NULLIF(
+                (f.enterprise_value - COALESCE(f.total_debt, 0) + COALESCE(f.cash_and_cash_equivalents, 0))
+                    / f.shares_outstanding,
+                0
+            )
+        END AS p_b_ratio,
+        CASE WHEN f.shares_outstanding <> 0 AND f.current_price <> 0
+            THEN COALESCE(f.dividends_paid, 0) / (f.shares_outstanding * f.current_price)
+        END AS dividend_yield
+    FROM companies c
+    JOIN company_financials f ON f.company_id = c.company_id
+    WHERE c.industry IS NOT NULL AND c.market_id IS NOT NULL {scope}
+)
+INSERT INTO industry_aggregates (
+    market_id, industry, peer_count, company_ids,
+    pe_ratio_values, pe_ratio_p25, pe_ratio_median, pe_ratio_p75,
+    ev_ebitda_values, ev_ebitda_p25, ev_ebitda_median, ev_ebitda_p75,
+    p_b_ratio_values, p_b_ratio_p25, p_b_ratio_median, p_b_ratio_p75,
+    dividend_yield_values, dividend_yield_p25, dividend_yield_median, dividend_yield_p75,
+    updated_at
+)
+SELECT
+    market_id,
+    industry,
+    count(*),
+    array_agg(company_id ORDER BY company_id),
+    COALESCE(array_agg(pe_ratio ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'), '{{}}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY pe_ratio) FILTER (WHERE pe_ratio <> 0 AND pe_ratio <> 'NaN'),
+    COALESCE(array_agg(ev_ebitda ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'), '{{}}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY ev_ebitda) FILTER (WHERE ev_ebitda <> 0 AND ev_ebitda <> 'NaN'),
+    COALESCE(array_agg(p_b_ratio ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'), '{{}}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY p_b_ratio) FILTER (WHERE p_b_ratio <> 0 AND p_b_ratio <> 'NaN'),
+    COALESCE(array_agg(dividend_yield ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'), '{{}}'),
+    percentile_cont(0.25) WITHIN GROUP (ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'),
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'),
+    percentile_cont(0.75) WITHIN GROUP (ORDER BY dividend_yield)
+        FILTER (WHERE dividend_yield <> 0 AND dividend_yield <> 'NaN'),
+    now() AT TIME ZONE 'utc'
+FROM peers
+GROUP BY market_id, industry
+ON CONFLICT (market_id, industry) DO UPDATE SET
+    peer_count = EXCLUDED.peer_count,
+    company_ids = EXCLUDED.company_ids,
+    pe_ratio_values = EXCLUDED.pe_ratio_values,
+    pe_ratio_p25 = EXCLUDED.pe_ratio_p25,
+    pe_ratio_median = EXCLUDED.pe_ratio_median,
+    pe_ratio_p75 = EXCLUDED.pe_ratio_p75,
+    ev_ebitda_values = EXCLUDED.ev_ebitda_values,
+    ev_ebitda_p25 = EXCLUDED.ev_ebitda_p25,
+    ev_ebitda_median = EXCLUDED.ev_ebitda_median,
+    ev_ebitda_p75 = EXCLUDED.ev_ebitda_p75,
+    p_b_ratio_values = EXCLUDED.p_b_ratio_values,
+    p_b_ratio_p25 = EXCLUDED.p_b_ratio_p25,
+    p_b_ratio_median = EXCLUDED.p_b_ratio_median,
+    p_b_ratio_p75 = EXCLUDED.p_b_ratio_p75,
+    dividend_yield_values = EXCLUDED.dividend_yield_values,
+    dividend_yield_p25 = EXCLUDED.dividend_yield_p25,
+    dividend_yield_median = EXCLUDED.dividend_yield_median,
+    dividend_yield_p75 = EXCLUDED.dividend_yield_p75,
+    updated_at = EXCLUDED.updated_at
+"""
+
+# Rows of industries that no longer have any member
+_PRUNE_SQL = """
+DELETE FROM industry_aggregates ia
+WHERE {scope}
+  AND NOT EXISTS (
+    SELECT 1
+    FROM companies c
+    JOIN company_financials f ON f.company_id = c.company_id
+    WHERE c.market_id = ia.market_id AND c.industry = ia.industry
+)
+"""
+
+_COMPANY_INDUSTRIES = "(SELECT market_id, industry FROM companies WHERE company_id = ANY(:ids))"
+
+
+def _run_refresh(db: Session, scope: str, prune_scope: str, params: dict, label: str) -> int:
+    start = time.time()
+    try:
+        db.execute(text(_PRUNE_SQL.format(scope=prune_scope)), params)
+        result = db.execute(text(_REFRESH_SQL.format(scope=scope)), params)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Industry aggregate refresh ({label}) failed: {e}")
+        return 0
+    logger.info(f"Industry aggregate refresh ({label}): {result.rowcount} industries in {time.time() - start:.2f}s")
+    return result.rowcount
+
+
+def refresh_industry_aggregates(db: Session, company_ids: Iterable[int] | None = None) -> int:
+    """
+    Recompute the industries of *company_ids* (all industries when None).
+    Like the watermark bumps, failures are logged and never break ingestion.
+    """
+    if company_ids is None:
+        return _run_refresh(db, "", "TRUE", {}, "all")
+    ids = sorted({int(cid) for cid in company_ids})
+    if not ids:
+        return 0
+    return _run_refresh(
+        db,
+        f"AND (c.market_id, c.industry) IN {_COMPANY_INDUSTRIES}",
+        f"(ia.market_id, ia.industry) IN {_COMPANY_INDUSTRIES}",
+        {"ids": ids},
+        f"industries of {len(ids)} companies",
+    )
+
+
+def get_industry_aggregate(db: Session, market_id: int, industry: str) -> Optional[IndustryAggregate]:
+    return db.get(IndustryAggregate, (market_id, industry))
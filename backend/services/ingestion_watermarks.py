@@ -0,0 +1,173 @@
+"""
+Per-entity ingestion watermarks — a cheap "what changed" feed.
+
+Every data write path calls :func:`bump_watermarks` after committing, which
+stamps the touched entities with the next value of one global, monotonic
+sequence.  Downstream consumers (scan result cache, incremental jobs, n8n)
+remember the highest version they processed and ask for
+:func:`get_changes_since` on the next run instead of recomputing everything
+or guessing from ``last_updated`` timestamps.
+
+Versions are taken from the sequence before the writing transaction
+commits, so a lower version can become visible after a higher one.  The
+feed therefore stops at the first version stamped less than
+``WATERMARK_SETTLE_SECONDS`` ago; entities written later are reported on a
+following call, once every transaction that could still hold a lower
+version has committed (bumps commit right after taking their version).
+
+Sources and their entity keys:
+
+* ``price``        — company_id (bars or cached SMA columns written)
+* ``fundamentals`` — company_id (financial snapshot / market data refreshed)
+* ``fx``           — ``"BASE/QUOTE"`` pair
+* ``universe``     — ``"companies"`` / ``"baskets"`` (any row of those tables)
+* ``valuation``    — portfolio_id (``portfolio_valuation_daily`` rows written or deleted)
+* ``user_data``    — ``"portfolio:<id>"`` (transactions / accounts), ``"watchlist:<user_id>"``
+  (favorites, notes, holdings), ``"alerts:<user_id>"``
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.ingestion_watermark import IngestionWatermark, watermark_version_seq
+from utils.itertools_helpers import chunked
+
+logger = logging.getLogger(__name__)
+
+PRICE = "price"
+FUNDAMENTALS = "fundamentals"
+FX = "fx"
+UNIVERSE = "universe"
+VALUATION = "valuation"
+USER_DATA = "user_data"
+
+SOURCES = (PRICE, FUNDAMENTALS, FX, UNIVERSE, VALUATION, USER_DATA)
+
+_QUERY_CHUNK = 1000
+
+
+def fx_key(base: str, quote: str) -> str:
+    return f"{base.upper()}/{quote.upper()}"
+
+
+def watermark_upsert(source: str, entity_keys: list[str], version=None):
+    """
+    Upsert statement setting *entity_keys* to *version*.
+    Without a version each row takes its own next sequence value, for
+    callers that must stay inside an ongoing flush (see universe_cache).
+    """
+    version = watermark_version_seq.next_value() if version is None else version
+    now = datetime.utcnow()
+    stmt = insert(IngestionWatermark).values(
+        [
+            {"source": source, "entity_key": key, "version": version, "updated_at": now}
+            for key in entity_keys
+        ]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[IngestionWatermark.source, IngestionWatermark.entity_key],
+        set_={"version": stmt.excluded.version, "updated_at": stmt.excluded.updated_at},
+    )
+
+
+def bump_watermarks(db: Session, source: str, entity_keys: Iterable) -> int | None:
+    """
+    Give *entity_keys* of *source* a new version (one version per call).
+
+    Meant to run after the data itself is committed.  A failure here is
+    logged and swallowed so it never fails the ingestion that triggered it;
+    consumers then simply see the entity as unchanged until its next write.
+    Returns the new version, or None if nothing was bumped.
+    """
+    keys = sorted({str(k) for k in entity_keys if k is not None})
+    if not keys:
+        return None
+
+    try:
+        version = db.scalar(select(watermark_version_seq.next_value()))
+        for chunk in chunked(keys, 500):
+            db.execute(watermark_upsert(source, list(chunk), version))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to bump {source} watermarks for {len(keys)} entities: {e}")
+        return None
+
+    logger.debug(f"Bumped {source} watermarks for {len(keys)} entities to v{version}")
+    return version
+
+
+def get_watermarks(db: Session, source: str, entity_keys: Iterable) -> dict[str, int]:
+    """Current version per entity key (keys without a watermark are omitted)."""
+    keys = [str(k) for k in entity_keys]
+    versions: dict[str, int] = {}
+    for chunk in chunked(keys, _QUERY_CHUNK):
+        rows = (
+            db.query(IngestionWatermark.entity_key, IngestionWatermark.version)
+            .filter(
+                IngestionWatermark.source == source,
+                IngestionWatermark.entity_key.in_(list(chunk)),
+            )
+            .all()
+        )
+        versions.update(dict(rows))
+    return versions
+
+
+def get_company_watermarks(db: Session, source: str, company_ids: Iterable[int]) -> dict[int, int]:
+    return {int(k): v for k, v in get_watermarks(db, source, company_ids).items()}
+
+
+def get_current_version(db: Session, source: str | None = None) -> int:
+    """Highest version recorded (optionally for one source); 0 when empty."""
+    query = db.query(func.max(IngestionWatermark.version))
+    if source:
+        query = query.filter(IngestionWatermark.source == source)
+    return query.scalar() or 0
+
+
+def get_changes_since(db: Session, source: str, since_version: int = 0) -> dict:
+    """
+    Entities of *source* written after *since_version*.
+
+    Returns ``{"source", "since", "current_version", "entity_keys"}``;
+    consumers store ``current_version`` and pass it back as *since_version*
+    on their next run.  Versions younger than ``WATERMARK_SETTLE_SECONDS``
+    (and everything after them) are held back until a later call, so a
+    slower transaction committing a lower version is never skipped.
+    """
+    settled_before = datetime.utcnow() - timedelta(seconds=settings.WATERMARK_SETTLE_SECONDS)
+    rows = (
+        db.query(IngestionWatermark.entity_key, IngestionWatermark.version, IngestionWatermark.updated_at)
+        .filter(
+            IngestionWatermark.source == source,
+            IngestionWatermark.version > since_version,
+        )
+        .order_by(IngestionWatermark.version, IngestionWatermark.entity_key)
+        .all()
+    )
+
+    entity_keys: list[str] = []
+    current_version = max(since_version, 0)
+    for key, version, updated_at in rows:
+        if updated_at > settled_before:
+            break
+        entity_keys.append(key)
+        current_version = version
+    return {
+        "source": source,
+        "since": since_version,
+        "current_version": current_version,
+        "entity_keys": entity_keys,
+    }
+
+
+def get_changed_company_ids(db: Session, source: str, since_version: int = 0) -> tuple[list[int], int]:
+    """Company ids changed after *since_version*, plus the version to resume from."""
+    changes = get_changes_since(db, source, since_version)
+    return [int(k) for k in changes["entity_keys"]], changes["current_version"]
@@ -0,0 +1,125 @@
+"""
+Maintenance of ``company_latest_bar`` — the latest ``stock_price_history``
+bar per company (listing market) with its SMAs and the previous close.
+
+"Latest close / SMAs for these companies" used to be answered with max-date
+subqueries or ``ORDER BY date DESC LIMIT 1`` probes over the partitioned
+history.  Every price write path now calls :func:`refresh_latest_bars` for
+the companies it touched (after their SMAs are written), so readers do
+primary-key lookups via :func:`get_latest_bars`.
+
+The refresh is one ``INSERT … SELECT … ON CONFLICT`` statement per batch;
+companies whose history disappeared lose their row.
+"""
+import logging
+import time
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.latest_bar import CompanyLatestBar
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_SQL = """
+INSERT INTO company_latest_bar (
+    company_id, market_id, date,
+    open, high, low, close, adjusted_close, volume,
+    sma_20, sma_50, sma_100, sma_200,
+    prev_date, prev_close, updated_at
+)
+SELECT
+    c.company_id, c.market_id, bar.date,
+    bar.open, bar.high, bar.low, bar.close, bar.adjusted_close, bar.volume,
+    bar.sma_20, bar.sma_50, bar.sma_100, bar.sma_200,
+    prev.date, prev.close,
+    now() AT TIME ZONE 'utc'
+FROM companies c
+CROSS JOIN LATERAL (
+    SELECT date, open, high, low, close, adjusted_close, volume, sma_20, sma_50, sma_100, sma_200
+    FROM stock_price_history
+    WHERE company_id = c.company_id AND market_id = c.market_id
+    ORDER BY date DESC
+    LIMIT 1
+) bar
+LEFT JOIN LATERAL (
+    SELECT date, close
+    FROM stock_price_history
+    WHERE company_id = c.company_id AND market_id = c.market_id AND date < bar.date
+    ORDER BY date DESC
+    LIMIT 1
+) prev ON TRUE
+{where}
+ON CONFLICT (company_id) DO UPDATE SET
+    market_id = EXCLUDED.market_id,
+    date = EXCLUDED.date,
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    adjusted_close = EXCLUDED.adjusted_close,
+    volume = EXCLUDED.volume,
+    sma_20 = EXCLUDED.sma_20,
+    sma_50 = EXCLUDED.sma_50,
+    sma_100 = EXCLUDED.sma_100,
+    sma_200 = EXCLUDED.sma_200,
+    prev_date = EXCLUDED.prev_date,
+    prev_close = EXCLUDED.prev_close,
+    updated_at = EXCLUDED.updated_at
+"""
+
+# Rows whose company no longer has a bar on its listing market
+_PRUNE_SQL = """
+DELETE FROM company_latest_bar lb
+WHERE {where}
+  AND NOT EXISTS (
+    SELECT 1
+    FROM companies c
+    JOIN stock_price_history s ON s.company_id = c.company_id AND s.market_id = c.market_id
+    WHERE c.company_id = lb.company_id
+)
+"""
+
+
+def _run_refresh(db: Session, where: str, prune_where: str, params: dict, label: str) -> int:
+    start = time.time()
+    try:
+        db.execute(text(_PRUNE_SQL.format(where=prune_where)), params)
+        result = db.execute(text(_REFRESH_SQL.format(where=where)), params)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Latest bar refresh ({label}) failed: {e}")
+        return 0
+    logger.info(f"Latest bar refresh ({label}): {result.rowcount} rows in {time.time() - start:.2f}s")
+    return result.rowcount
+
+
+def refresh_latest_bars(db: Session, company_ids: Iterable[int] | None = None) -> int:
+    """
+    Recompute the latest bar of *company_ids* (all companies when None).
+    Like the watermark bumps, failures are logged and never break ingestion.
+    """
+    if company_ids is None:
+        # An explicit WHERE keeps "ON CONFLICT" from parsing as a join condition
+        return _run_refresh(db, "WHERE TRUE", "TRUE", {}, "all")
+    ids = sorted({int(cid) for cid in company_ids})
+    if not ids:
+        return 0
+    return _run_refresh(
+        db,
+        "WHERE c.company_id = ANY(:ids)",
+        "lb.company_id = ANY(:ids)",
+        {"ids": ids},
+        f"{len(ids)} companies",
+    )
+
+
+def get_latest_bars(db: Session, company_ids: Iterable[int]) -> dict[int, CompanyLatestBar]:
+    """``{company_id: CompanyLatestBar}`` for companies that have any bar."""
+    ids = {int(cid) for cid in company_ids if cid is not None}
+    if not ids:
+        return {}
+    rows = db.query(CompanyLatestBar).filter(CompanyLatestBar.company_id.in_(ids)).all()
+    return {row.company_id: row for row in rows}
@@ -0,0 +1,226 @@
+"""
+Company logos: in-memory LRU over the on-disk store, with a negative cache
+and a non-blocking fetcher.
+
+``GET /api/stock/{ticker}/logo`` used to check the filesystem and, on a
+miss, download the logo with a blocking ``requests`` call inside the
+handler; tickers without a logo were re-downloaded on every view.  Lookups
+now go
+
+1. memory (``LOGO_CACHE_SIZE`` most recently served logos, with ETags);
+2. ``static/logos/<TICKER>.png`` on disk (read in a worker thread);
+3. the negative cache — ``<TICKER>.missing`` marker files, so other workers
+   and restarts share it — valid for ``LOGO_MISS_TTL_SECONDS``;
+4. the remote source, with ``httpx.AsyncClient``.  Concurrent requests for
+   the same ticker share one download.
+
+:func:`prefetch_logos` fills the disk store for many tickers at bounded
+concurrency (admin job ``logo_prefetch``) without touching the LRU.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+import httpx
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LOGO_DIR = Path(__file__).resolve().parent.parent / "static" / "logos"
+_SOURCE_URL = "https://financialmodelingprep.com/image-stock/{ticker}.png"
+_TIMEOUT = httpx.Timeout(5.0)
+# Tickers double as file names
+_TICKER_RE = re.compile(r"^[A-Z0-9][A-Z0-9.\-^=]{0,19}$")
+
+
+class Logo(NamedTuple):
+    content: bytes
+    etag: str
+
+
+_logos: "OrderedDict[str, Logo]" = OrderedDict()
+_misses: dict[str, float] = {}  # ticker -> expiry (epoch seconds)
+_lock = threading.Lock()
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def valid_ticker(ticker: str) -> bool:
+    return bool(_TICKER_RE.match(ticker))
+
+
+def _logo_path(ticker: str) -> Path:
+    return LOGO_DIR / f"{ticker}.png"
+
+
+def _miss_path(ticker: str) -> Path:
+    return LOGO_DIR / f"{ticker}.missing"
+
+
+# ── Memory ──────────────────────────────────────────────────────────
+
+def _remember(ticker: str, content: bytes) -> Logo:
+    logo = Logo(content, f'"{hashlib.sha256(content).hexdigest()[:32]}"')
+    with _lock:
+        _logos[ticker] = logo
+        _logos.move_to_end(ticker)
+        while len(_logos) > settings.LOGO_CACHE_SIZE:
+            _logos.popitem(last=False)
+    return logo
+
+
+def _cached(ticker: str) -> Optional[Logo]:
+    with _lock:
+        logo = _logos.get(ticker)
+        if logo is not None:
+            _logos.move_to_end(ticker)
+        return logo
+
+
+# ── Disk ────────────────────────────────────────────────────────────
+
+def _known_missing(ticker: str) -> bool:
+    now = time.time()
+    with _lock:
+        expiry = _misses.get(ticker)
+    if expiry is not None and expiry > now:
+        return True
+    try:
+        expiry = _miss_path(ticker).stat().st_mtime + settings.LOGO_MISS_TTL_SECONDS
+    except FileNotFoundError:
+        return False
+    if expiry <= now:
+        return False
+    with _lock:
+        _misses[ticker] = expiry
+    return True
+
+
+def _read_disk(ticker: str) -> tuple[Optional[bytes], bool]:
+    """(stored logo, known to have none) of *ticker*."""
+    try:
+        return _logo_path(ticker).read_bytes(), False
+    except FileNotFoundError:
+        return None, _known_missing(ticker)
+
+
+def _write_disk(ticker: str, content: Optional[bytes]) -> None:
+    """Store a downloaded logo, or a negative-cache marker when *content* is None."""
+    LOGO_DIR.mkdir(parents=True, exist_ok=True)
+    if content is None:
+        _miss_path(ticker).touch()
+        with _lock:
+            _misses[ticker] = time.time() + settings.LOGO_MISS_TTL_SECONDS
+        return
+    tmp = LOGO_DIR / f"{ticker}.{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp.write_bytes(content)
+    tmp.replace(_logo_path(ticker))  # readers never see a partial file
+    _miss_path(ticker).unlink(missing_ok=True)
+    with _lock:
+        _misses.pop(ticker, None)
+
+
+# ── Remote ──────────────────────────────────────────────────────────
+
+async def _download(client: httpx.AsyncClient, ticker: str) -> Optional[bytes]:
+    """Logo bytes, None when the source has none; raises httpx.HTTPError otherwise."""
+    resp = await client.get(_SOURCE_URL.format(ticker=ticker))
+    if resp.status_code == 200 and resp.content:
+        content = resp.content
+    elif resp.status_code < 500 and resp.status_code != 429:
+        logger.info(f"No logo for {ticker} (status {resp.status_code})")
+        content = None
+    else:
+        resp.raise_for_status()
+    await asyncio.to_thread(_write_disk, ticker, content)
+    return content
+
+
+async def _download_once(ticker: str) -> Optional[bytes]:
+    async with httpx.AsyncClient(timeout=_TIMEOUT, follow_redirects=True) as client:
+        return await _download(client, ticker)
+
+
+async def get_logo(ticker: str) -> Optional[Logo]:
+    """
+    Logo of *ticker* (upper-case, see :func:`valid_ticker`); None when the
+    company has no logo.  Raises httpx.HTTPError when the source fails.
+    """
+    logo = _cached(ticker)
+    if logo is not None:
+        return logo
+
+    content, missing = await asyncio.to_thread(_read_disk, ticker)
+    if content is None and missing:
+        return None
+    if content is None:
+        task = _inflight.get(ticker)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(_download_once(ticker))
+            _inflight[ticker] = task
+            task.add_done_callback(lambda t: _inflight.pop(ticker, None) if _inflight.get(ticker) is t else None)
+        # A disconnecting client must not cancel the download others wait on
+        content = await asyncio.shield(task)
+        if content is None:
+            return None
+    return _remember(ticker, content)
+
+
+# ── Bulk prefetch ───────────────────────────────────────────────────
+
+async def _prefetch(tickers: list[str]) -> Counter:
+    counts: Counter = Counter()
+    concurrency = settings.LOGO_PREFETCH_CONCURRENCY
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        timeout=_TIMEOUT,
+        limits=httpx.Limits(max_connections=concurrency),
+        follow_redirects=True,
+    ) as client:
+        async def one(ticker: str) -> None:
+            async with semaphore:
+                if await asyncio.to_thread(_logo_path(ticker).exists):
+                    counts["stored"] += 1
+                    return
+                if await asyncio.to_thread(_known_missing, ticker):
+                    counts["missing"] += 1
+                    return
+                try:
+                    content = await _download(client, ticker)
+                except (httpx.HTTPError, OSError) as e:
+                    logger.warning(f"Logo prefetch failed for {ticker}: {e}")
+                    counts["failed"] += 1
+                    return
+                counts["downloaded" if content is not None else "missing"] += 1
+
+        await asyncio.gather(*(one(t) for t in tickers))
+    return counts
+
+
+def prefetch_logos(tickers: Iterable[str]) -> dict:
+    """
+    Download the logos of *tickers* that are neither stored nor known to be
+    missing.  Blocking (runs its own event loop) — meant for job threads.
+    """
+    start = time.time()
+    valid = sorted({t.upper().strip() for t in tickers if t and valid_ticker(t.upper().strip())})
+    counts = asyncio.run(_prefetch(valid))
+    elapsed = time.time() - start
+    logger.info(f"Logo prefetch: {len(valid)} tickers in {elapsed:.1f}s ({dict(counts)})")
+    return {
+        "status": "success",
+        "tickers": len(valid),
+        "stored": counts["stored"],
+        "downloaded": counts["downloaded"],
+        "missing": counts["missing"],
+        "failed": counts["failed"],
+        "seconds": round(elapsed, 1),
+    }
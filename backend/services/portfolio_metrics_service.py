@@ -2,13 +2,14 @@ from __future__ import annotations
 
 import calendar
 import math
+from bisect import bisect_left, bisect_right
 import logging
 from decimal import Decimal, getcontext
 from datetime import date, datetime, timedelta
 from numbers import Real
 from typing import Dict, List, Optional, Tuple, Any
 
-from sqlalchemy import case, func, literal
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from utils.portfolio_utils import serialize_breakdown
@@ -16,6 +17,8 @@ from database.portfolio import Transaction, TransactionType
 from database.valuation import PortfolioValuationDaily
 from utils.decimal_helpers import to_decimal as _to_d
 
+from services.realized_pnl_ledger import get_closed_positions, get_realized_pnl, sync_realized_ledger
+from services.xirr import xirr, xirr_batch
 from services.metrics_rules import (
     amount_sql,
     INVESTOR_SIGN,
@@ -37,6 +40,173 @@ def _dt_end_of_day(d: date) -> datetime:
     return datetime.combine(d, datetime.max.time())
 
 
+class MetricsSeries:
+    """
+    Valuations and per-day transaction amounts of one portfolio, loaded once
+    (two queries) for every period ending at *end* that starts on/after *since*.
+
+    Valuation rows start at the latest row on/before *since* (the effective
+    start of the longest period).  Invested-TWR daily factors are chained as
+    prefix products, so any period's TWR is a ratio of two entries; flow sums
+    are prefix sums per transaction type.
+    """
+
+    def __init__(self, db: Session, portfolio_id: int, since: date, end: date):
+        pvd = PortfolioValuationDaily
+        anchor = (
+            db.query(func.max(pvd.date))
+            .filter(pvd.portfolio_id == portfolio_id, pvd.date <= since)
+            .scalar_subquery()
+        )
+        rows = (
+            db.query(pvd.date, pvd.total_value, pvd.by_cash)
+            .filter(
+                pvd.portfolio_id == portfolio_id,
+                pvd.date >= func.coalesce(anchor, since),
+                pvd.date <= end,
+            )
+            .order_by(pvd.date.asc())
+            .all()
+        )
+        self.dates: List[date] = [r[0] for r in rows]
+        self.totals: List[Decimal] = [_to_d(r[1]) for r in rows]
+        self.cash: List[Decimal] = [_to_d(r[2]) for r in rows]
+
+        # Invested TWR counts trades after the effective start row, which may precede since
+        flows_since = min(since, self.dates[0]) if self.dates else since
+        t = Transaction
+        day = func.date(t.timestamp).label("d")
+        flow_rows = (
+            db.query(day, t.transaction_type, func.sum(amount_sql(t)))
+            .filter(
+                t.portfolio_id == portfolio_id,
+                t.timestamp > _dt_end_of_day(flows_since),
+                t.timestamp <= _dt_end_of_day(end),
+            )
+            .group_by(day, t.transaction_type)
+            .all()
+        )
+        # type → {date: amount}
+        self.flows: Dict[TransactionType, Dict[date, Decimal]] = {}
+        for d, typ, amount in flow_rows:
+            self.flows.setdefault(typ, {})[d] = _to_d(amount)
+
+        # Per-type prefix sums over sorted dates
+        self._flow_dates: Dict[TransactionType, List[date]] = {}
+        self._flow_prefix: Dict[TransactionType, List[Decimal]] = {}
+        for typ, by_day in self.flows.items():
+            ds = sorted(by_day)
+            prefix = [D("0")]
+            for d in ds:
+                prefix.append(prefix[-1] + by_day[d])
+            self._flow_dates[typ] = ds
+            self._flow_prefix[typ] = prefix
+
+        self._build_invested_chain()
+
+    # ── Lookups ─────────────────────────────────────────────────────
+
+    def _index_at(self, day: date) -> int:
+        """Index of the latest row on/before *day*, -1 if none."""
+        return bisect_right(self.dates, day) - 1
+
+    def _slice_start(self, start: date) -> int:
+        """Effective first row of a period: latest row on/before start, else first after."""
+        i = self._index_at(start)
+        return i if i >= 0 else bisect_left(self.dates, start)
+
+    def valuation_at(self, day: date) -> Optional[Tuple[Decimal, Decimal]]:
+        """(total_value, by_cash) of the latest row on/before *day*."""
+        i = self._index_at(day)
+        return (self.totals[i], self.cash[i]) if i >= 0 else None
+
+    def total_at(self, day: date) -> Decimal:
+        val = self.valuation_at(day)
+        return val[0] if val else D("0")
+
+    def daily_flows(self, type_to_sign: Dict[TransactionType, int], start: date, end: date) -> Dict[date, Decimal]:
+        """Signed amounts per day over (start, end], for days with any of the types."""
+        out: Dict[date, Decimal] = {}
+        for typ, sign in type_to_sign.items():
+            if typ is None or typ not in self.flows:
+                continue
+            for d, amount in self.flows[typ].items():
+                if start < d <= end:
+                    out[d] = out.get(d, D("0")) + sign * amount
+        return out
+
+    def sum_flows(self, start: date, end: date, types: List[TransactionType], sign_factor: int = 1) -> Decimal:
+        """Sums signed amounts for specific transaction types over (start, end]."""
+        total = D("0")
+        for typ in types:
+            ds = self._flow_dates.get(typ)
+            if not ds:
+                continue
+            prefix = self._flow_prefix[typ]
+            total += prefix[bisect_right(ds, end)] - prefix[bisect_right(ds, start)]
+        return sign_factor * total
+
+    # ── TWR ─────────────────────────────────────────────────────────
+
+    def _build_invested_chain(self) -> None:
+        """
+        Daily factors of the invested-capital TWR (start-of-day flow
+        assumption, denom = prev + trades), chained as prefix products.
+        Zero factors are counted separately so slices can divide.
+        """
+        invested = [t - c for t, c in zip(self.totals, self.cash)]
+        trades = self.daily_flows(TWR_SIGN_TRADES, date.min, date.max)
+        self._chain = [D("1")]
+        self._zeros = [0]
+        for i in range(1, len(invested)):
+            prev_mv, curr_mv = invested[i - 1], invested[i]
+            factor = D("1")
+            if prev_mv != 0:
+                denom = prev_mv + trades.get(self.dates[i], D("0"))
+                if denom != 0:
+                    factor = D("1") + (curr_mv - denom) / denom
+            if factor == 0:
+                self._chain.append(self._chain[-1])
+                self._zeros.append(self._zeros[-1] + 1)
+            else:
+                self._chain.append(self._chain[-1] * factor)
+                self._zeros.append(self._zeros[-1])
+
+    def twr_invested(self, start: date, end: date) -> Decimal:
+        """Invested-only TWR over the rows of [effective start, end]."""
+        a, b = self._slice_start(start), self._index_at(end)
+        if b - a < 1:
+            return D("0")
+        if self._zeros[b] != self._zeros[a]:
+            return D("-1")
+        return self._chain[b] / self._chain[a] - D("1")
+
+    def avg_cash_pct(self, start: date, end: date) -> Optional[Decimal]:
+        """Mean cash share over the period's rows with a positive total; None if there are none."""
+        a, b = self._slice_start(start), self._index_at(end)
+        total_cash_pct = D("0")
+        count = 0
+        for i in range(a, b + 1):
+            if self.totals[i] > 0:
+                total_cash_pct += self.cash[i] / self.totals[i]
+                count += 1
+        return total_cash_pct / count if count else None
+
+    # ── MWRR ────────────────────────────────────────────────────────
+
+    def xirr_flows(self, start: date, end: date) -> List[Tuple[date, Decimal]]:
+        """Investor cash flows: -start value, external flows, +end value."""
+        start_val = self.total_at(start)
+        end_val = self.total_at(end)
+        flows: List[Tuple[date, Decimal]] = []
+        if start_val > 0:
+            flows.append((start, -start_val))
+        flows.extend(sorted(self.daily_flows(INVESTOR_SIGN, start, end).items()))
+        if end_val > 0:
+            flows.append((end, end_val))
+        return flows
+
+
 class PortfolioMetricsService:
     """
     Service for calculating portfolio performance metrics:
@@ -50,121 +220,18 @@ class PortfolioMetricsService:
 
     def compute_realized_pnl(self, portfolio_id: int) -> Tuple[Decimal, List[Dict]]:
         """
-        Compute realized PnL from actual sell transactions using weighted-average
-        cost basis.  Every amount is converted to portfolio currency at the FX
-        rate recorded on the transaction.
+        Realized PnL from actual sell transactions using weighted-average
+        cost basis, in portfolio currency at each transaction's FX rate.
+        Read from the persisted lot ledger (services/realized_pnl_ledger.py),
+        which only replays trades added or changed since the last call.
 
         Returns:
             (total_realized_pnl, closed_positions_list)
             Each item in closed_positions_list is a dict with per-sell-event details.
         """
-        from database.company import Company
-        from collections import defaultdict
-
-        rows = (
-            self.db.query(
-                Transaction.company_id,
-                Transaction.transaction_type,
-                Transaction.quantity,
-                Transaction.price,
-                Transaction.currency_rate,
-                Transaction.currency,
-                Transaction.fee,
-                Transaction.timestamp,
-                Company.ticker,
-                Company.name,
-            )
-            .join(Company, Transaction.company_id == Company.company_id)
-            .filter(
-                Transaction.portfolio_id == portfolio_id,
-                Transaction.transaction_type.in_([TransactionType.BUY, TransactionType.SELL]),
-                Transaction.company_id.isnot(None),
-            )
-            .order_by(Transaction.timestamp, Transaction.id)
-            .all()
-        )
-
-        # Group by company, preserving chronological order
-        by_company: Dict[int, list] = defaultdict(list)
-        for r in rows:
-            by_company[r.company_id].append(r)
-
-        total_realized = D("0")
-        closed_positions: List[Dict] = []
-
-        for company_id, txns in by_company.items():
-            pool_cost = D("0")       # total cost in portfolio currency
-            pool_cost_icy = D("0")   # total cost in instrument currency
-            pool_shares = D("0")     # total shares held
-            # Weighted-average buy timestamp (for holding period)
-            pool_ts_weighted = D("0")  # sum of (cost * timestamp_epoch)
-
-            ticker = txns[0].ticker
-            name = txns[0].name
-
-            for tx in txns:
-                qty = _to_d(tx.quantity)
-                price = _to_d(tx.price)
-                fx = _to_d(tx.currency_rate) or D("1")
-                fee = _to_d(tx.fee) or D("0")
-                ts_epoch = D(str(tx.timestamp.timestamp()))
-
-                if tx.transaction_type == TransactionType.BUY:
-                    cost_pcy = qty * price * fx + fee * fx
-                    cost_icy = qty * price + fee
-                    pool_cost += cost_pcy
-                    pool_cost_icy += cost_icy
-                    pool_shares += qty
-                    pool_ts_weighted += cost_pcy * ts_epoch
-
-                elif tx.transaction_type == TransactionType.SELL:
-                    if pool_shares <= 0:
-                        continue
-                    avg_cost = pool_cost / pool_shares
-                    avg_cost_icy = pool_cost_icy / pool_shares
-                    proceeds_pcy = qty * price * fx - fee * fx
-                    proceeds_icy = qty * price - fee
-                    cost_basis = qty * avg_cost
-                    cost_basis_icy = qty * avg_cost_icy
-                    pnl = proceeds_pcy - cost_basis
-                    pnl_icy = proceeds_icy - cost_basis_icy
-
-                    # Holding period from weighted-average buy date
-                    holding_days = None
-                    if pool_cost > 0:
-                        avg_buy_epoch = pool_ts_weighted / pool_cost
-                        holding_days = int((ts_epoch - avg_buy_epoch) / D("86400"))
-
-                    pnl_pct = float(pnl / cost_basis * D("100")) if cost_basis != 0 else 0.0
-
-                    closed_positions.append({
-                        "company_id": company_id,
-                        "ticker": ticker,
-                        "name": name,
-                        "sell_date": tx.timestamp.strftime("%Y-%m-%d"),
-                        "quantity": float(qty),
-                        "sell_price": float(price),
-                        "sell_currency": tx.currency,
-                        "sell_fx_rate": float(fx),
-                        "proceeds_pcy": float(proceeds_pcy),
-                        "proceeds_icy": float(proceeds_icy),
-                        "cost_basis_pcy": float(cost_basis),
-                        "cost_basis_icy": float(cost_basis_icy),
-                        "realized_pnl": float(pnl),
-                        "realized_pnl_icy": float(pnl_icy),
-                        "realized_pnl_pct": round(pnl_pct, 2),
-                        "holding_period_days": holding_days,
-                    })
-
-                    total_realized += pnl
-
-                    # Reduce pool proportionally
-                    frac = cost_basis / pool_cost if pool_cost > 0 else D("0")
-                    pool_ts_weighted -= pool_ts_weighted * frac
-                    pool_cost -= cost_basis
-                    pool_cost_icy -= cost_basis_icy
-                    pool_shares -= qty
-
+        sync_realized_ledger(self.db, portfolio_id)
+        total_realized = get_realized_pnl(self.db, portfolio_id, sync=False)
+        closed_positions = get_closed_positions(self.db, portfolio_id, sync=False)
         return total_realized, closed_positions
 
     # =========================================================================
@@ -222,174 +289,27 @@ class PortfolioMetricsService:
     # Data Fetching: Valuations & Flows
     # =========================================================================
 
-    def _get_valuation_at_date(self, portfolio_id: int, day: date) -> Optional[PortfolioValuationDaily]:
-        """Fetch the specific valuation record for a given date (or latest prior)."""
-        return (
-            self.db.query(PortfolioValuationDaily)
-            .filter(
-                PortfolioValuationDaily.portfolio_id == portfolio_id,
-                PortfolioValuationDaily.date <= day,
-            )
-            .order_by(PortfolioValuationDaily.date.desc())
-            .first()
-        )
-
-    def _get_total_value(self, portfolio_id: int, day: date) -> Decimal:
-        val = self._get_valuation_at_date(portfolio_id, day)
-        return _to_d(val.total_value) if val else D("0")
-
-    def _get_daily_flows(
-        self,
-        portfolio_id: int,
-        type_to_sign: Dict[TransactionType, int],
-        start: date,
-        end: date,
-    ) -> Dict[date, Decimal]:
-        """
-        Groups signed transaction amounts by day for the period (start, end].
-        Note: Strict inequality (> start) excludes start_date itself.
-        """
-        t = Transaction
-        amt = amount_sql(t)
-
-        when_clauses = [
-            (t.transaction_type == typ, (sign if sign != 0 else 0) * amt)
-            for typ, sign in type_to_sign.items()
-            if typ is not None
-        ]
-        signed_expr = case(*when_clauses, else_=literal(0)) if when_clauses else literal(0)
-
-        rows = (
-            self.db.query(
-                func.date(t.timestamp).label("d"),
-                func.sum(signed_expr),
-            )
-            .filter(
-                t.portfolio_id == portfolio_id,
-                t.timestamp > _dt_end_of_day(start),
-                t.timestamp <= _dt_end_of_day(end),
-                t.transaction_type.in_([k for k in type_to_sign if k is not None]),
-            )
-            .group_by("d")
-            .all()
-        )
-        return {d: _to_d(v) for d, v in rows}
-
-    def _sum_flows(
-        self,
-        portfolio_id: int,
-        start: date,
-        end: date,
-        types: List[TransactionType],
-        sign_factor: int = 1,
-    ) -> Decimal:
-        """Sums signed amounts for specific transaction types over (start, end]."""
-        t = Transaction
-        amt = amount_sql(t)
-        
-        val = (
-            self.db.query(func.coalesce(func.sum(sign_factor * amt), literal(0)))
-            .filter(
-                t.portfolio_id == portfolio_id,
-                t.timestamp > _dt_end_of_day(start),
-                t.timestamp <= _dt_end_of_day(end),
-                t.transaction_type.in_(types),
-            )
-            .scalar()
-        )
-        return _to_d(val)
+    def load_series(self, portfolio_id: int, since: date, end: date) -> "MetricsSeries":
+        """Valuations and daily flows covering every period that starts on/after *since*."""
+        return MetricsSeries(self.db, portfolio_id, since, end)
 
     # =========================================================================
     # Calculation Engine: TWR & MWRR
     # =========================================================================
 
-    def _chain_twr(self, rows: List[Tuple[date, Decimal, Decimal]]) -> Decimal:
-        """
-        Calculates TWR by chaining daily returns.
-        rows element: (date, end_value, flow_during_day)
-        """
-        if len(rows) < 2:
-            return D("0")
-            
-        product = D("1")
-        prev_mv = rows[0][1] # Start Value
-        
-        for i in range(1, len(rows)):
-            _, curr_mv, flow = rows[i]
-            if prev_mv == 0:
-                prev_mv = curr_mv
-                continue
-            
-            # Dietz / TWR formula for single sub-period
-            # We use "Start of Day" flow assumption to handle large inflows responsibly.
-            # Denom = Start + Flow.
-            denom = prev_mv + flow
-            
-            if denom == 0:
-                 # If base is zero, return is undefined (or 0)
-                 r_t = D("0")
-            else:
-                 r_t = (curr_mv - denom) / denom
-                 
-            product *= (D("1") + r_t)
-            prev_mv = curr_mv
-            
-        return product - D("1")
-
     def _xirr_solver(self, flows: List[Tuple[date, Decimal]]) -> Decimal:
-        """Solves XIRR using Secant/Newton method."""
+        """Solves XIRR for one flow set (vectorized solver, see services/xirr.py)."""
         if not flows:
             return D("0")
-
-        # Convert to float for solver speed
-        fflows = [(d, float(v)) for d, v in flows]
-        t0 = fflows[0][0]
-
-        def xnpv(rate, date_flows):
-            acc = 0.0
-            base = 1.0 + rate
-            for d, cf in date_flows:
-                days = (d - t0).days
-                acc += cf / (base ** (days / 365.0))
-            return acc
-
-        def solve(guess):
-            r = guess
-            for _ in range(50):
-                v = xnpv(r, fflows)
-                if abs(v) < 1e-5:
-                    return r
-                
-                # Numeric derivative (secant)
-                d = 1e-5
-                v_d = xnpv(r + d, fflows)
-                derivative = (v_d - v) / d
-                
-                if abs(derivative) < 1e-10:
-                    return None
-                    
-                new_r = r - v / derivative
-                if abs(new_r - r) < 1e-5:
-                    return new_r
-                r = new_r
-            return None
-
-        # Try multiple guesses
-        for guess in [0.1, -0.1, 0.5, -0.5, 0.0]:
-            try:
-                res = solve(guess)
-                if res and -0.999 < res < 100: # Rational bounds
-                    return D(str(res))
-            except Exception:
-                continue
-
-        return D("0")
+        return D(repr(xirr(flows)))
 
     # =========================================================================
     # Public Metrics Methods
     # =========================================================================
 
-    def calculate_ttwr(self, portfolio_id: int, start_date: date, end_date: date) -> Decimal:
+    def calculate_ttwr(
+        self, portfolio_id: int, start_date: date, end_date: date, series: Optional["MetricsSeries"] = None
+    ) -> Decimal:
         """Calculates Time-Weighted Return for total portfolio.
         
         Uses weighted average approach to avoid intraday valuation issues:
@@ -398,123 +318,50 @@ class PortfolioMetricsService:
         This correctly reflects that cash earns 0% and stocks earn whatever
         the Invested TTWR shows, weighted by actual allocation.
         """
+        series = series or self.load_series(portfolio_id, start_date, end_date)
         # 1. Get Invested TTWR (already correctly calculated)
-        invested_ttwr = self.calculate_ttwr_invested_only(portfolio_id, start_date, end_date)
-        
-        # 2. Calculate average cash allocation percentage
-        eff_start_date = self._get_valuation_at_date(portfolio_id, start_date)
-        eff_start = eff_start_date.date if eff_start_date else start_date
-        
-        pvd_rows = (
-            self.db.query(PortfolioValuationDaily)
-            .filter(
-                PortfolioValuationDaily.portfolio_id == portfolio_id,
-                PortfolioValuationDaily.date >= eff_start,
-                PortfolioValuationDaily.date <= end_date,
-            )
-            .all()
-        )
-        
-        if not pvd_rows:
+        invested_ttwr = series.twr_invested(start_date, end_date)
+        # 2. Average cash allocation percentage over the same rows
+        avg_cash_pct = series.avg_cash_pct(start_date, end_date)
+        if avg_cash_pct is None:
             return D("0")
-        
-        # Calculate average allocation
-        total_cash_pct = D("0")
-        count = 0
-        
-        for pvd in pvd_rows:
-            total_val = _to_d(pvd.total_value)
-            cash_val = _to_d(pvd.by_cash)
-            
-            if total_val > 0:
-                cash_pct = cash_val / total_val
-                total_cash_pct += cash_pct
-                count += 1
-        
-        if count == 0:
-            return D("0")
-        
-        avg_cash_pct = total_cash_pct / count
-        avg_invested_pct = D("1") - avg_cash_pct
-        
         # 3. Weighted average
         # Portfolio TTWR = Cash% × 0% + Invested% × Invested_TTWR
-        portfolio_ttwr = avg_invested_pct * invested_ttwr
-        
-        return portfolio_ttwr
+        return (D("1") - avg_cash_pct) * invested_ttwr
 
-    def calculate_ttwr_invested_only(self, portfolio_id: int, start_date: date, end_date: date) -> Decimal:
+    def calculate_ttwr_invested_only(
+        self, portfolio_id: int, start_date: date, end_date: date, series: Optional["MetricsSeries"] = None
+    ) -> Decimal:
         """Calculates TWR for Invested Capital (removing Cash Drag)."""
-        eff_start_date = self._get_valuation_at_date(portfolio_id, start_date)
-        eff_start = eff_start_date.date if eff_start_date else start_date
-        
-        # Logic: Invested Value = Total - Cash
-        invested_col = (
-            func.coalesce(PortfolioValuationDaily.total_value, 0) - 
-            func.coalesce(PortfolioValuationDaily.by_cash, 0)
-        )
-        
-        pvd_rows = (
-            self.db.query(PortfolioValuationDaily.date, invested_col)
-            .filter(
-                PortfolioValuationDaily.portfolio_id == portfolio_id,
-                PortfolioValuationDaily.date >= eff_start,
-                PortfolioValuationDaily.date <= end_date,
-            )
-            .order_by(PortfolioValuationDaily.date.asc())
-            .all()
-        )
-        
-        # Flows for Invested TWR are Trades (Buy/Sell)
-        flow_map = self._get_daily_flows(portfolio_id, TWR_SIGN_TRADES, eff_start, end_date)
-        
-        rows = []
-        for d, val in pvd_rows:
-            rows.append((d, _to_d(val), flow_map.get(d, D("0"))))
-            
-        return self._chain_twr(rows)
+        series = series or self.load_series(portfolio_id, start_date, end_date)
+        return series.twr_invested(start_date, end_date)
 
-    def calculate_mwrr(self, portfolio_id: int, start_date: date, end_date: date) -> Decimal:
+    def calculate_mwrr(
+        self, portfolio_id: int, start_date: date, end_date: date, series: Optional["MetricsSeries"] = None
+    ) -> Decimal:
         """Calculates Money-Weighted Return (XIRR)."""
-        # 1. Initial Value (Negative Cash Flow)
-        start_val = self._get_total_value(portfolio_id, start_date)
-        
-        # 2. External Flows during period
-        raw_flows = self._get_daily_flows(portfolio_id, INVESTOR_SIGN, start_date, end_date)
-        
-        # 3. End Value (Positive Cash Flow)
-        end_val = self._get_total_value(portfolio_id, end_date)
-        
-        xirr_flows = []
-        if start_val > 0:
-            xirr_flows.append((start_date, -start_val))
-        
-        for d, amt in raw_flows.items():
-            xirr_flows.append((d, amt))
-            
-        if end_val > 0:
-            xirr_flows.append((end_date, end_val))
-            
-        return self._xirr_solver(xirr_flows)
+        series = series or self.load_series(portfolio_id, start_date, end_date)
+        return self._xirr_solver(series.xirr_flows(start_date, end_date))
 
     def calculate_returns_breakdown(
         self, 
         portfolio_id: int, 
         start_date: date, 
         end_date: date,
-        override_ending_vals: Optional[Dict[str, Decimal]] = None
+        override_ending_vals: Optional[Dict[str, Decimal]] = None,
+        series: Optional["MetricsSeries"] = None,
     ) -> Dict:
         """Generates detailed PnL decomposition (Cash, Invested, Flows)."""
-        start_pvd = self._get_valuation_at_date(portfolio_id, start_date)
-        end_pvd = self._get_valuation_at_date(portfolio_id, end_date)
+        series = series or self.load_series(portfolio_id, start_date, end_date)
+        start_pvd = series.valuation_at(start_date)
+        end_pvd = series.valuation_at(end_date)
         
         if not end_pvd:
             return {}
 
         # Safe Decimals
         if start_pvd:
-            start_val = _to_d(start_pvd.total_value)
-            start_cash = _to_d(start_pvd.by_cash)
+            start_val, start_cash = start_pvd
         else:
             # Before inception or no prior history
             start_val = D("0")
@@ -522,12 +369,11 @@ class PortfolioMetricsService:
         
         # Override Ending Values if provided (for Today's live view)
         if override_ending_vals:
-            end_val = override_ending_vals.get("total_value", _to_d(end_pvd.total_value))
-            end_cash = override_ending_vals.get("cash_val", _to_d(end_pvd.by_cash))
+            end_val = override_ending_vals.get("total_value", end_pvd[0])
+            end_cash = override_ending_vals.get("cash_val", end_pvd[1])
             # Invested is derived: Total - Cash
         else:
-            end_val = _to_d(end_pvd.total_value)
-            end_cash = _to_d(end_pvd.by_cash)
+            end_val, end_cash = end_pvd
         
 
 
@@ -537,21 +383,21 @@ class PortfolioMetricsService:
         end_invested = end_val - end_cash
 
         # Sum components
-        deposits = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.DEPOSIT])
-        withdrawals = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.WITHDRAWAL])
+        deposits = series.sum_flows(start_date, end_date, [TransactionType.DEPOSIT])
+        withdrawals = series.sum_flows(start_date, end_date, [TransactionType.WITHDRAWAL])
         net_external = deposits - withdrawals
 
-        dividends = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.DIVIDEND])
-        interest = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.INTEREST])
-        fees = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.FEE])
-        taxes = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.TAX])
+        dividends = series.sum_flows(start_date, end_date, [TransactionType.DIVIDEND])
+        interest = series.sum_flows(start_date, end_date, [TransactionType.INTEREST])
+        fees = series.sum_flows(start_date, end_date, [TransactionType.FEE])
+        taxes = series.sum_flows(start_date, end_date, [TransactionType.TAX])
 
         # Core PnL math
         total_pnl = (end_val - start_val) - net_external
 
         # Invested Logic
-        buys = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.BUY])
-        sells = self._sum_flows(portfolio_id, start_date, end_date, [TransactionType.SELL])
+        buys = series.sum_flows(start_date, end_date, [TransactionType.BUY])
+        sells = series.sum_flows(start_date, end_date, [TransactionType.SELL])
         net_trades = buys - sells
         
         # Invested PnL = Change in Invested Capital - Net Injection of Capital (Buys - Sells)
@@ -662,19 +508,30 @@ class PortfolioMetricsService:
         # Determine if "end_date" matches "today" to apply overrides
         is_today = (end_date == date.today())
 
+        period_starts = {}
         for p in PERIODS:
-
             start = self.get_period_start_date(portfolio_id, end_date, p)
-            if not start:
-                continue
-                
-            ttwr = self.calculate_ttwr(portfolio_id, start, end_date)
-            ttwr_invested = self.calculate_ttwr_invested_only(portfolio_id, start, end_date)
-            mwrr = self.calculate_mwrr(portfolio_id, start, end_date)
+            if start:
+                period_starts[p] = start
+
+        # One load covers every period; each metric below is a slice of it
+        series = None
+        if period_starts:
+            series = self.load_series(portfolio_id, min(period_starts.values()), end_date)
+
+        # MWRR of every period in one solver call
+        mwrr_by_period = {}
+        if period_starts:
+            flow_sets = [series.xirr_flows(start, end_date) for start in period_starts.values()]
+            mwrr_by_period = dict(zip(period_starts, xirr_batch(flow_sets)))
+
+        for p, start in period_starts.items():
+            ttwr_invested = series.twr_invested(start, end_date)
+            ttwr = self.calculate_ttwr(portfolio_id, start, end_date, series=series)
             
             ttwr_map[p] = float(ttwr)
             inv_map[p] = float(ttwr_invested)
-            mwrr_map[p] = float(mwrr)
+            mwrr_map[p] = float(mwrr_by_period[p])
             
             if include_all_breakdowns or p in ALWAYS_BREAKDOWN:
                 # Apply override ONLY if end_date is today and we have overrides
@@ -692,7 +549,8 @@ class PortfolioMetricsService:
                     portfolio_id, 
                     start, 
                     end_date,
-                    override_ending_vals=overrides_bd
+                    override_ending_vals=overrides_bd,
+                    series=series,
                 )
                 breakdowns[p] = serialize_breakdown(bd)
                 start_dates[p] = start.isoformat()
@@ -8,12 +8,15 @@ from sqlalchemy import func
 
 from database.position import PortfolioPositions
 from database.company import Company
-from database.stock_data import StockPriceHistory, CompanyMarketData
+from database.latest_bar import CompanyLatestBar
+from database.stock_data import CompanyMarketData
 from database.fx import FxRate
 from database.portfolio import Transaction
 from services.yfinance_data_update.data_update_service import fetch_and_save_stock_price_history_data_batch
 from services.portfolio_metrics_service import PortfolioMetricsService
-from services.fx.fx_rate_helper import get_latest_fx_rate, get_fx_rates_batch_for_date
+from services.fx.fx_rate_helper import get_latest_fx_rate
+from services.latest_bar_service import get_latest_bars
+from services.reference_price_service import get_closes_as_of, get_fx_as_of
 from utils.decimal_helpers import to_decimal as _to_d
 
 logger = logging.getLogger(__name__)
@@ -60,8 +63,8 @@ def _fetch_historical_data(
     instrument_currencies: Set[str]
 ) -> tuple[Dict[int, Dict[str, Decimal]], Dict[str, Dict[str, Decimal]], Dict[str, date]]:
     """
-    Fetches historical prices and FX rates for the specified periods.
-    Optimized: Fetches ALL data in one range query per company instead of loop.
+    Fetches reference prices and FX rates at each period's start date
+    (as-of lookups: one query for all prices, one for all FX pairs).
     Returns: (ref_prices, ref_fx_rates, period_start_dates)
     """
     today = date.today()
@@ -69,96 +72,31 @@ def _fetch_historical_data(
     ref_prices = {}    # { cid: { '1d': Decimal(...), ... } }
     ref_fx_rates = {}  # { ccy: { '1d': Decimal(...), ... } }
     
-    # 1. Calculate start dates & Find global minimum date
-    min_date = today
-    
     for p in periods:
         # Dummy portfolio_id=0 as calendar math is generic
         sd = metrics_svc.get_period_start_date(0, today, p)
         if sd:
             period_start_dates[p] = sd
-            if sd < min_date:
-                min_date = sd
 
     if not company_ids:
         return ref_prices, ref_fx_rates, period_start_dates
 
-    # 2. OPTIMIZED Fetch Historical Prices (Single Query)
-    # We fetch all prices from min_date to today for these companies.
-    # Then we do in-memory lookup for each period start date.
-    
-    raw_prices = (
-        db.query(StockPriceHistory.company_id, StockPriceHistory.date, StockPriceHistory.close)
-        .filter(
-            StockPriceHistory.company_id.in_(company_ids),
-            StockPriceHistory.date >= min_date
-        )
-        .order_by(StockPriceHistory.company_id, StockPriceHistory.date.desc())
-        .all()
-    )
-    
-    # Build fast lookup map: price_map[cid][date_iso] = price
-    # Since we ordered primarily by company, we can process easily.
-    price_lut: Dict[int, Dict[str, Decimal]] = {}
-    
-    for cid, dt, close in raw_prices:
-        if cid not in price_lut:
-            price_lut[cid] = {}
-        if close is not None:
-             price_lut[cid][dt.isoformat()] = _to_d(close)
-
-    # Resolve Reference Price for each Period
-    for p, sd in period_start_dates.items():
-        target_iso = sd.isoformat()
-        
-        for cid in company_ids:
-            if cid not in ref_prices:
-                ref_prices[cid] = {}
-                
-            # Smart Lookup: Exact match or nearest previous?
-            # The original logic used `date <= sd ORDER BY date DESC LIMIT 1`.
-            # We must replicate that.
-            # In our fetched range [min_date, today], we check if target is present.
-            # If target < min_date (shouldn't happen if min_date is correct), we miss data.
-            # But wait: If the market was closed on 'sd', we need the close from 'sd-1' or earlier.
-            # Our range query gets everything >= min_date.
-            # If the true "last trading day" was BEFORE min_date (e.g. sd is Sunday, Friday was min_date-1),
-            # we might miss it.
-            # SAFE FIX: Subtract 7 days from min_date to cover weekends/holidays gap.
-            
-            # For this implementations, we iterate backwards from sd in Python to find nearest.
-            # Actually, `get_period_start_date` usually returns a calendar day.
-            
-            start_search = sd
-            found_price = None
-            
-            # Look back up to 5 days for data point (simple gap filling)
-            # Efficient since dictionary lookup is O(1)
-            comp_prices = price_lut.get(cid, {})
-            if not comp_prices:
-                continue
-
-            for i in range(5):
-                chk = (start_search - timedelta(days=i)).isoformat()
-                if chk in comp_prices:
-                    found_price = comp_prices[chk]
-                    break
-            
-            if found_price:
-                 ref_prices[cid][p] = found_price
+    ref_dates = set(period_start_dates.values())
+
+    # Latest close on/before each start date (market closed on 'sd' → previous session)
+    closes = get_closes_as_of(db, company_ids, ref_dates)
+    for cid, by_date in closes.items():
+        ref_prices[cid] = {
+            p: by_date[sd] for p, sd in period_start_dates.items() if by_date.get(sd)
+        }
 
-    # 3. Fetch Historical FX Rates
-    # Optimization: Keep existing batch helper but ensure it's efficient?
-    # Existing `get_fx_rates_batch_for_date` does one query per date.
-    # We could optimize this too, but for now let's stick to price optimization first as it's the biggest volume.
     currencies_to_fetch = instrument_currencies - {portfolio_currency}
     if currencies_to_fetch:
-        for p, sd in period_start_dates.items():
-            fx_rates = get_fx_rates_batch_for_date(db, currencies_to_fetch, portfolio_currency, sd)
-            for base_ccy, rate in fx_rates.items():
-                if base_ccy not in ref_fx_rates:
-                    ref_fx_rates[base_ccy] = {}
-                ref_fx_rates[base_ccy][p] = _to_d(rate)
+        fx = get_fx_as_of(db, currencies_to_fetch, portfolio_currency, ref_dates)
+        for base_ccy, by_date in fx.items():
+            ref_fx_rates[base_ccy] = {
+                p: by_date[sd] for p, sd in period_start_dates.items() if sd in by_date
+            }
 
     return ref_prices, ref_fx_rates, period_start_dates
 
@@ -170,15 +108,10 @@ def _get_current_price(db: Session, company_id: int) -> Decimal:
     1. StockPriceHistory (Official/Consistent with Breakdown)
     2. CompanyMarketData (Fallback/Live)
     """
-    # Primary: StockPriceHistory
-    latest_hist: Optional[StockPriceHistory] = (
-        db.query(StockPriceHistory)
-        .filter(StockPriceHistory.company_id == company_id)
-        .order_by(StockPriceHistory.date.desc())
-        .first()
-    )
-    if latest_hist and latest_hist.close is not None:
-        return _to_d(latest_hist.close)
+    # Primary: StockPriceHistory (latest bar, by primary key)
+    latest_bar: Optional[CompanyLatestBar] = db.get(CompanyLatestBar, company_id)
+    if latest_bar and latest_bar.close is not None:
+        return _to_d(latest_bar.close)
 
     # Fallback: CompanyMarketData
     latest_md: Optional[CompanyMarketData] = (
@@ -339,22 +272,12 @@ def get_holdings_for_user(db: Session, portfolio) -> List[dict]:
     for row in cw_rows:
         cmd_map[row.company_id] = _to_d(row.current_price)
 
-    # bulk StockPriceHistory (latest per company)
-    # Getting "latest" efficiency in SQL for many companies can be tricky (WINDOW func or distinct ON).
-    # Since we already fetched bulk history for sparklines, maybe we can reuse?
-    # Actually, `_fetch_historical_data` gets history up to Today... but it uses `min_date`.
-    # It might miss the true "latest" if min_date is far back.
-    # Let's do a dedicated distinct query for latest prices.
-    sph_latest_map = {}
-    latest_sph_rows = (
-        db.query(StockPriceHistory.company_id, StockPriceHistory.close)
-        .filter(StockPriceHistory.company_id.in_(company_ids))
-        .order_by(StockPriceHistory.company_id, StockPriceHistory.date.desc())
-        .distinct(StockPriceHistory.company_id)
-        .all()
-    )
-    for cid, close in latest_sph_rows:
-        sph_latest_map[cid] = _to_d(close)
+    # Latest bar per company: primary-key reads of company_latest_bar
+    sph_latest_map = {
+        cid: _to_d(bar.close)
+        for cid, bar in get_latest_bars(db, company_ids).items()
+        if bar.close is not None
+    }
 
     # 3. Batch Fetch: Current FX Rates
     # We need rate from InstCCY -> PortfolioCCY
@@ -363,17 +286,11 @@ def get_holdings_for_user(db: Session, portfolio) -> List[dict]:
     current_fx_map = {portfolio_ccy: Decimal("1.0")} # Base map
     
     if needed_pairs:
-        # We need to fetch latest rates for these
-        # We can use the existing helper logic but generalized
-        # For now, let's just loop locally if we don't want to rewrite helper
-        # Or better: Fetch all FxRates for these base currencies to target where date is recent?
-        # A simple loop calling get_latest_fx_rate is N queries (where N = num currencies).
-        # Typically N is small (USD, EUR, PLN, GBP...). So N=3-4 queries is fine compared to N=50 positions.
-        # But let's be cleaner.
-        
+        today = date.today()
+        latest_fx = get_fx_as_of(db, needed_pairs, portfolio_ccy, [today])
         for ccy in needed_pairs:
-             rate = get_latest_fx_rate(db, ccy, portfolio_ccy)
-             current_fx_map[ccy] = _to_d(rate) if rate else Decimal("1.0")
+            rate = latest_fx.get(ccy.upper(), {}).get(today)
+            current_fx_map[ccy] = rate if rate else Decimal("1.0")
     
     # 4. Fetch Historical Data (Batch)
     metrics_svc = PortfolioMetricsService(db)
@@ -0,0 +1,221 @@
+"""
+Stored dashboard performance (``portfolio_returns``).
+
+``/dashboard/performance`` used to rebuild every period's TTWR, MWRR and
+breakdown on each page load.  The summary is now computed once per data
+change and stored, one row per standard period:
+
+* the rematerialization worker calls :func:`refresh_portfolio_returns` after
+  each rebuild, so the rows for today are ready before the next page load;
+* :func:`get_performance` serves the rows with one indexed query while their
+  ``valuation_version`` matches :func:`inputs_version`, and otherwise
+  computes, stores and returns a fresh summary — this also covers other
+  as-of dates and materializations that did not go through the queue.
+
+Like the endpoint always did, every summary ends on live values (holdings at
+their latest prices and FX rates, current account cash).  The stored
+version is therefore the highest ingestion watermark among the portfolio's
+valuations, its user data (cash), the prices of its open positions and the
+FX pairs they need; all watermarks share one sequence, so any of those
+writes moves it.
+"""
+import logging
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.portfolio import Portfolio
+from database.valuation import PortfolioReturns
+from services.portfolio_metrics_service import PERIODS, PortfolioMetricsService
+from services.portfolio_positions_service import get_holdings_for_user
+from services.valuation.valuation_version import get_live_inputs_version, get_valuation_version
+
+logger = logging.getLogger(__name__)
+
+# Periods whose PnL is aligned with the holdings table on today's view.
+# ITD is excluded: it includes realized history that is NOT in the holdings
+# table, and forcing it to match causes a phantom 'starting investment'.
+_LIVE_PNL_PERIODS = ["1d", "1w", "1m", "3m", "6m", "1y", "ytd"]
+
+
+def _live_overrides(db: Session, portfolio: Portfolio) -> dict:
+    """Today's ending values and per-period PnL from live holdings and account cash."""
+    holdings = get_holdings_for_user(db, portfolio)
+    live_invested = sum(
+        Decimal(str(h["shares"]))
+        * Decimal(str(h["last_price"]))
+        * Decimal(str(h["fx_rate_to_portfolio_ccy"]))
+        for h in holdings
+    )
+    live_cash = sum(Decimal(str(a.cash)) for a in portfolio.accounts)
+
+    live_pnl_map = {p: Decimal("0") for p in _LIVE_PNL_PERIODS}
+    for h in holdings:
+        ppnl = h.get("period_pnl", {})
+        for p in _LIVE_PNL_PERIODS:
+            val = ppnl.get(p)
+            if val is not None:
+                live_pnl_map[p] += Decimal(str(val))
+
+    return {
+        "total_value": live_invested + live_cash,
+        "cash_val": live_cash,
+        "period_pnl_map": live_pnl_map,
+    }
+
+
+def compute_performance(db: Session, portfolio: Portfolio, end_date: date) -> dict:
+    """Full performance summary with all breakdowns, ending on live holdings and cash."""
+    return PortfolioMetricsService(db).build_performance_summary(
+        portfolio.id,
+        end_date,
+        include_all_breakdowns=True,
+        current_values_override=_live_overrides(db, portfolio),
+    )
+
+
+def inputs_version(db: Session, portfolio: Portfolio) -> int:
+    """Highest watermark among the data a summary of *portfolio* is computed from."""
+    return max(get_valuation_version(db, portfolio.id), get_live_inputs_version(db, portfolio))
+
+
+# ── Storage ─────────────────────────────────────────────────────────
+
+def _num(value):
+    return None if value is None else Decimal(str(value))
+
+
+def store_performance(db: Session, portfolio_id: int, performance: dict, version: int) -> int:
+    """Replace the stored rows of the summary's as-of date.  Commits; returns rows written."""
+    as_of = date.fromisoformat(performance["as_of_date"])
+    perf = performance["performance"]
+    breakdowns = performance.get("breakdowns", {})
+    starts = performance.get("period_meta", {}).get("start_date", {})
+    now = datetime.utcnow()
+
+    rows = []
+    for period in PERIODS:
+        if period not in perf["ttwr"]:
+            continue
+        bd = breakdowns.get(period) or {}
+        income = bd.get("income_expenses", {})
+        pnl = bd.get("pnl", {})
+        rows.append({
+            "portfolio_id": portfolio_id,
+            "date": as_of,
+            "period": period,
+            "start_date": date.fromisoformat(starts[period]) if period in starts else None,
+            "ttwr": _num(perf["ttwr"][period]),
+            "ttwr_invested": _num(perf["ttwr_invested"][period]),
+            "mwrr": _num(perf["mwrr"][period]),
+            "unrealized_gains": _num(pnl.get("unrealized_gains_residual")),
+            "realized_gains": _num(performance["realized_pnl"]),
+            "dividend_income": _num(income.get("dividends")),
+            "interest_income": _num(income.get("interest")),
+            "currency_effects": _num(pnl.get("currency_effects")),
+            "fees_paid": _num(income.get("fees")),
+            "total_return": _num(pnl.get("total_pnl_ex_flows")),
+            "beginning_value": _num(bd.get("beginning_value")),
+            "ending_value": _num(bd.get("ending_value")),
+            "net_cash_flows": _num(bd.get("cash_flows", {}).get("net_external")),
+            "breakdown": bd if period in breakdowns else None,
+            "closed_positions": performance["closed_positions"] if period == "itd" else None,
+            "valuation_version": version,
+            "computed_at": now,
+        })
+
+    try:
+        # Periods that no longer apply (e.g. all transactions deleted) must not linger
+        db.execute(
+            delete(PortfolioReturns).where(
+                PortfolioReturns.portfolio_id == portfolio_id,
+                PortfolioReturns.date == as_of,
+                PortfolioReturns.period.notin_([r["period"] for r in rows]),
+            )
+        )
+        if rows:
+            stmt = insert(PortfolioReturns).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_portfolio_returns",
+                set_={
+                    col: stmt.excluded[col]
+                    for col in rows[0]
+                    if col not in ("portfolio_id", "date", "period")
+                },
+            )
+            db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to store returns of portfolio {portfolio_id} as of {as_of}: {e}")
+        return 0
+    return len(rows)
+
+
+def load_performance(db: Session, portfolio_id: int, end_date: date, version: int) -> Optional[dict]:
+    """Stored summary in the shape of ``build_performance_summary``, or None if absent/stale."""
+    rows = (
+        db.query(PortfolioReturns)
+        .filter(PortfolioReturns.portfolio_id == portfolio_id, PortfolioReturns.date == end_date)
+        .all()
+    )
+    if not rows or any(r.valuation_version != version for r in rows):
+        return None
+
+    by_period = {r.period: r for r in rows}
+    ordered = [by_period[p] for p in PERIODS if p in by_period]
+    itd = by_period.get("itd")
+
+    result = {
+        "portfolio_id": portfolio_id,
+        "as_of_date": end_date.isoformat(),
+        "realized_pnl": float(ordered[0].realized_gains or 0),
+        "closed_positions": (itd.closed_positions if itd else None) or [],
+        "performance": {
+            "ttwr": {r.period: float(r.ttwr) for r in ordered},
+            "ttwr_invested": {r.period: float(r.ttwr_invested) for r in ordered},
+            "mwrr": {r.period: float(r.mwrr) for r in ordered},
+        },
+    }
+    with_breakdown = [r for r in ordered if r.breakdown is not None]
+    if with_breakdown:
+        result["period_meta"] = {
+            "start_date": {r.period: r.start_date.isoformat() for r in with_breakdown},
+            "end_date": {r.period: end_date.isoformat() for r in with_breakdown},
+        }
+        result["breakdowns"] = {r.period: r.breakdown for r in with_breakdown}
+    return result
+
+
+# ── Entry points ────────────────────────────────────────────────────
+
+def get_performance(db: Session, portfolio: Portfolio, end_date: date) -> dict:
+    """Stored performance of *portfolio* as of *end_date*, computed and stored on a miss."""
+    version = inputs_version(db, portfolio)
+    stored = load_performance(db, portfolio.id, end_date, version)
+    if stored is not None:
+        return stored
+
+    performance = compute_performance(db, portfolio, end_date)
+    store_performance(db, portfolio.id, performance, version)
+    return performance
+
+
+def refresh_portfolio_returns(db: Session, portfolio_id: int) -> None:
+    """Recompute and store today's performance of *portfolio_id* (after materialization)."""
+    portfolio = db.get(Portfolio, portfolio_id)
+    if portfolio is None:
+        return
+    start = time.time()
+    # Read before computing: a write racing with us leaves the rows stale, not wrong
+    version = inputs_version(db, portfolio)
+    performance = compute_performance(db, portfolio, date.today())
+    written = store_performance(db, portfolio_id, performance, version)
+    logger.info(
+        f"Stored {written} return periods of portfolio {portfolio_id} in {time.time() - start:.2f}s"
+    )
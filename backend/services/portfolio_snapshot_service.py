@@ -1,9 +1,10 @@
 from decimal import Decimal
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from database.account import Account
 from database.valuation import PortfolioValuationDaily
-from database.portfolio import Transaction, TransactionType, Portfolio
+from database.portfolio import Portfolio
+from services.account_ledger import EXTERNAL, TRADE, account_states
 from utils.decimal_helpers import to_decimal as _dec
 
 
@@ -33,63 +34,25 @@ def get_portfolio_snapshot(
     invested_value_current = total_value - cash_available
 
     # --- 2) Lifetime net invested cash into securities (BUY/SELL only) ---
-    #     Using transaction.currency_rate as FX to base.
-    from sqlalchemy import func
+    #     and net external deposits, up to the valuation date, from the
+    #     account ledger.  Transaction.currency_rate is the FX to base.
+    account_ids = [
+        a_id for (a_id,) in db.query(Account.id).filter(Account.portfolio_id == portfolio.id).all()
+    ]
+    states = account_states(db, account_ids, pvd.date)
 
-    tx_rows = (
-        db.query(Transaction)
-        .filter(
-            Transaction.portfolio_id == portfolio.id,
-            Transaction.transaction_type.in_([
-                TransactionType.BUY, TransactionType.SELL,
-                TransactionType.DEPOSIT, TransactionType.WITHDRAWAL,
-                TransactionType.TRANSFER_IN, TransactionType.TRANSFER_OUT
-            ]),
-            Transaction.transaction_type.in_([TransactionType.BUY, TransactionType.SELL, TransactionType.DEPOSIT, TransactionType.WITHDRAWAL, TransactionType.TRANSFER_IN, TransactionType.TRANSFER_OUT]),
-            func.date(Transaction.timestamp) <= pvd.date,  # up to same date as valuation
-        )
-        .all()
-    )
+    def _to_base(ccy: str, booked: Decimal, at_rate: Decimal) -> Decimal:
+        return booked if ccy == base_ccy else at_rate
 
     net_invested = Decimal("0")
     net_deposits = Decimal("0")
-
-    for tx in tx_rows:
-        qty = _dec(tx.quantity)
-        price = _dec(tx.price)
-        fee = _dec(tx.fee)
-        tx_ccy = (tx.currency or "").upper()
-
-        # FX: transaction currency -> portfolio currency
-        if tx_ccy == base_ccy:
-            fx = Decimal("1")
-        else:
-            fx = _dec(tx.currency_rate or 1)
-
-        # 1. Invested Cash (Existing)
-        if tx.transaction_type == TransactionType.BUY:
-            # Money OUT = (qty * price + fee)
-            cash_out_base = (qty * price + fee) * fx
-            net_invested += cash_out_base
-        elif tx.transaction_type == TransactionType.SELL:
-            # Money IN = (qty * price - fee)
-            cash_in_base = (qty * price - fee) * fx
-            net_invested -= cash_in_base
-            
-        # 2. Net External Deposits (New)
-        # Using same FX rules (approximate but consistent)
-        # For deposits/withdrawals, quantity is the amount.
-        amount = qty * fx
-        if tx.transaction_type == TransactionType.DEPOSIT:
-            net_deposits += amount
-        elif tx.transaction_type == TransactionType.WITHDRAWAL:
-            net_deposits -= amount
-        # Treat transfers as deposits/withdrawals for portfolio context?
-        # Usually yes.
-        elif tx.transaction_type == TransactionType.TRANSFER_IN:
-            net_deposits += amount
-        elif tx.transaction_type == TransactionType.TRANSFER_OUT:
-            net_deposits -= amount
+    for state in states.values():
+        # BUY cash flows are negative, SELL positive
+        for ccy, booked, at_rate in state.cash_flows([TRADE]):
+            net_invested -= _to_base(ccy, booked, at_rate)
+        # Deposits/withdrawals and transfers in/out
+        for ccy, booked, at_rate in state.cash_flows([EXTERNAL]):
+            net_deposits += _to_base(ccy, booked, at_rate)
 
     # Round everything to 2 decimals for dashboard
     total_value = total_value.quantize(Decimal("0.01"))
@@ -0,0 +1,300 @@
+"""
+Persisted weighted-average-cost ledger for realized PnL.
+
+``compute_realized_pnl`` used to replay every BUY and SELL of a portfolio in
+Decimal arithmetic on each call.  ``realized_pnl_ledger`` now stores the lot
+pool of each (portfolio, company) after every trade, plus the realized result
+of each SELL, so:
+
+* totals and per-period realized PnL are one indexed aggregate
+  (:func:`get_realized_pnl`);
+* :func:`sync_realized_ledger` only replays trades that have no row yet,
+  starting from the pool stored just before the earliest of them — appending
+  new trades costs one step each, a backdated trade replays its company from
+  that point on.
+
+Any ORM insert, edit or delete of a ``Transaction`` deletes the affected
+companies' rows from the transaction time on (old and new values for edits)
+in the same flush; the next sync replays them.  Bulk Core writes bypass the
+session events — call :func:`invalidate_realized_ledger` after those.
+
+Pools are per portfolio and company (across accounts), the basis the
+dashboard has always reported.
+"""
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, product
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, delete, event, func, inspect, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.company import Company
+from database.portfolio import Transaction, TransactionType
+from database.realized_pnl import RealizedPnlEntry as L
+from utils.decimal_helpers import to_decimal as _to_d
+
+logger = logging.getLogger(__name__)
+
+_TRADES = (TransactionType.BUY, TransactionType.SELL)
+_ZERO = Decimal("0")
+
+
+def _end_of_day(d: date) -> datetime:
+    return datetime.combine(d, datetime.max.time())
+
+
+# ── Replay ──────────────────────────────────────────────────────────
+
+class _Pool:
+    __slots__ = ("shares", "cost", "cost_icy", "ts_weighted")
+
+    def __init__(self, row: Optional[L] = None):
+        self.shares = _to_d(row.pool_shares) if row else _ZERO
+        self.cost = _to_d(row.pool_cost) if row else _ZERO            # portfolio currency
+        self.cost_icy = _to_d(row.pool_cost_icy) if row else _ZERO    # instrument currency
+        self.ts_weighted = _to_d(row.pool_ts_weighted) if row else _ZERO  # Σ cost × buy epoch
+
+    def apply(self, tx: Transaction) -> dict:
+        """Fold one trade into the pool; returns its ledger row."""
+        qty = _to_d(tx.quantity)
+        price = _to_d(tx.price)
+        fx = _to_d(tx.currency_rate) or Decimal("1")
+        fee = _to_d(tx.fee) or _ZERO
+        ts_epoch = Decimal(str(tx.timestamp.timestamp()))
+        row = {
+            "transaction_id": tx.id,
+            "portfolio_id": tx.portfolio_id,
+            "company_id": tx.company_id,
+            "timestamp": tx.timestamp,
+            "transaction_type": tx.transaction_type.value,
+        }
+
+        if tx.transaction_type == TransactionType.BUY:
+            cost_pcy = qty * price * fx + fee * fx
+            self.cost += cost_pcy
+            self.cost_icy += qty * price + fee
+            self.shares += qty
+            self.ts_weighted += cost_pcy * ts_epoch
+
+        elif self.shares > 0:
+            avg_cost = self.cost / self.shares
+            avg_cost_icy = self.cost_icy / self.shares
+            proceeds_pcy = qty * price * fx - fee * fx
+            proceeds_icy = qty * price - fee
+            cost_basis = qty * avg_cost
+            cost_basis_icy = qty * avg_cost_icy
+
+            # Holding period from weighted-average buy date
+            holding_days = None
+            if self.cost > 0:
+                avg_buy_epoch = self.ts_weighted / self.cost
+                holding_days = int((ts_epoch - avg_buy_epoch) / Decimal("86400"))
+
+            row.update(
+                quantity=qty,
+                price=price,
+                fx_rate=fx,
+                currency=tx.currency,
+                proceeds_pcy=proceeds_pcy,
+                proceeds_icy=proceeds_icy,
+                cost_basis_pcy=cost_basis,
+                cost_basis_icy=cost_basis_icy,
+                realized_pnl=proceeds_pcy - cost_basis,
+                realized_pnl_icy=proceeds_icy - cost_basis_icy,
+                holding_period_days=holding_days,
+            )
+
+            # Reduce pool proportionally
+            frac = cost_basis / self.cost if self.cost > 0 else _ZERO
+            self.ts_weighted -= self.ts_weighted * frac
+            self.cost -= cost_basis
+            self.cost_icy -= cost_basis_icy
+            self.shares -= qty
+        # else: SELL from an empty pool is ignored (row records the unchanged pool)
+
+        row.update(
+            pool_shares=self.shares,
+            pool_cost=self.cost,
+            pool_cost_icy=self.cost_icy,
+            pool_ts_weighted=self.ts_weighted,
+        )
+        return row
+
+
+def sync_realized_ledger(db: Session, portfolio_id: int) -> int:
+    """
+    Replay the portfolio's trades that have no ledger row yet, per company
+    from its earliest such trade on.  Writes in the caller's transaction;
+    returns the number of rows written.
+    """
+    pending = dict(
+        db.query(Transaction.company_id, func.min(Transaction.timestamp))
+        .outerjoin(L, L.transaction_id == Transaction.id)
+        .filter(
+            Transaction.portfolio_id == portfolio_id,
+            Transaction.transaction_type.in_(_TRADES),
+            Transaction.company_id.isnot(None),
+            L.transaction_id.is_(None),
+        )
+        .group_by(Transaction.company_id)
+        .all()
+    )
+    if not pending:
+        return 0
+
+    # Later rows were computed without the pending trades
+    for company_id, first in pending.items():
+        db.execute(
+            delete(L).where(L.portfolio_id == portfolio_id, L.company_id == company_id, L.timestamp >= first)
+        )
+
+    last_rows = (
+        db.query(L)
+        .filter(L.portfolio_id == portfolio_id, L.company_id.in_(pending))
+        .order_by(L.company_id, L.timestamp.desc(), L.transaction_id.desc())
+        .distinct(L.company_id)
+        .all()
+    )
+    pools = {cid: _Pool() for cid in pending}
+    pools.update({row.company_id: _Pool(row) for row in last_rows})
+
+    txs = (
+        db.query(Transaction)
+        .filter(
+            Transaction.portfolio_id == portfolio_id,
+            Transaction.transaction_type.in_(_TRADES),
+            or_(*[
+                and_(Transaction.company_id == cid, Transaction.timestamp >= first)
+                for cid, first in pending.items()
+            ]),
+        )
+        .order_by(Transaction.company_id, Transaction.timestamp, Transaction.id)
+        .all()
+    )
+    rows = [pools[tx.company_id].apply(tx) for tx in txs]
+    if rows:
+        stmt = insert(L).values(rows).on_conflict_do_nothing(index_elements=["transaction_id"])
+        db.execute(stmt)
+    logger.debug(
+        f"Realized PnL ledger: replayed {len(rows)} trades of {len(pending)} companies "
+        f"in portfolio {portfolio_id}"
+    )
+    return len(rows)
+
+
+# ── Reads ───────────────────────────────────────────────────────────
+
+def get_realized_pnl(
+    db: Session,
+    portfolio_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    sync: bool = True,
+) -> Decimal:
+    """Realized PnL (portfolio currency) of sells in (start, end]; open bounds when None."""
+    if sync:
+        sync_realized_ledger(db, portfolio_id)
+    query = db.query(func.coalesce(func.sum(L.realized_pnl), 0)).filter(L.portfolio_id == portfolio_id)
+    if start is not None:
+        query = query.filter(L.timestamp > _end_of_day(start))
+    if end is not None:
+        query = query.filter(L.timestamp <= _end_of_day(end))
+    return _to_d(query.scalar())
+
+
+def get_closed_positions(db: Session, portfolio_id: int, sync: bool = True) -> list[dict]:
+    """Per-sell details, grouped by company in order of first trade, chronological within."""
+    if sync:
+        sync_realized_ledger(db, portfolio_id)
+    first_trade = func.min(L.timestamp).over(partition_by=L.company_id).label("first_trade")
+    sells = (
+        db.query(L, Company.ticker, Company.name, first_trade)
+        .join(Company, Company.company_id == L.company_id)
+        .filter(L.portfolio_id == portfolio_id)
+        .subquery()
+    )
+    rows = (
+        db.query(sells)
+        .filter(sells.c.realized_pnl.isnot(None))
+        .order_by(sells.c.first_trade, sells.c.company_id, sells.c.timestamp, sells.c.transaction_id)
+        .all()
+    )
+
+    closed = []
+    for r in rows:
+        cost_basis = _to_d(r.cost_basis_pcy)
+        pnl = _to_d(r.realized_pnl)
+        pnl_pct = float(pnl / cost_basis * Decimal("100")) if cost_basis != 0 else 0.0
+        closed.append({
+            "company_id": r.company_id,
+            "ticker": r.ticker,
+            "name": r.name,
+            "sell_date": r.timestamp.strftime("%Y-%m-%d"),
+            "quantity": float(r.quantity),
+            "sell_price": float(r.price),
+            "sell_currency": r.currency,
+            "sell_fx_rate": float(r.fx_rate),
+            "proceeds_pcy": float(r.proceeds_pcy),
+            "proceeds_icy": float(r.proceeds_icy),
+            "cost_basis_pcy": float(cost_basis),
+            "cost_basis_icy": float(r.cost_basis_icy),
+            "realized_pnl": float(pnl),
+            "realized_pnl_icy": float(r.realized_pnl_icy),
+            "realized_pnl_pct": round(pnl_pct, 2),
+            "holding_period_days": r.holding_period_days,
+        })
+    return closed
+
+
+# ── Invalidation ────────────────────────────────────────────────────
+
+def invalidate_realized_ledger(
+    db: Session,
+    portfolio_id: int,
+    company_ids: Optional[Iterable[int]] = None,
+    from_ts: Optional[datetime] = None,
+) -> None:
+    """Delete ledger rows of *company_ids* (all when None) at or after *from_ts* (all when None)."""
+    stmt = delete(L).where(L.portfolio_id == portfolio_id)
+    if company_ids is not None:
+        ids = sorted({int(c) for c in company_ids if c is not None})
+        if not ids:
+            return
+        stmt = stmt.where(L.company_id.in_(ids))
+    if from_ts is not None:
+        stmt = stmt.where(L.timestamp >= from_ts)
+    db.execute(stmt)
+
+
+def _history_values(state, attr: str) -> list:
+    hist = state.attrs[attr].history
+    return [v for v in chain(hist.added or (), hist.deleted or (), hist.unchanged or ()) if v is not None]
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_transaction_change(session: Session, flush_context) -> None:
+    earliest: dict[tuple[int, int], datetime] = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Transaction):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        state = inspect(obj)
+        stamps = _history_values(state, "timestamp")
+        # Unknown time (unloaded attribute): replay the whole company
+        first = min(stamps) if stamps else datetime.min
+        keys = product(_history_values(state, "portfolio_id"), _history_values(state, "company_id"))
+        for key in keys:
+            if key not in earliest or first < earliest[key]:
+                earliest[key] = first
+
+    if not earliest:
+        return
+    conn = session.connection()
+    for (portfolio_id, company_id), first in earliest.items():
+        conn.execute(
+            delete(L).where(L.portfolio_id == portfolio_id, L.company_id == company_id, L.timestamp >= first)
+        )
@@ -0,0 +1,106 @@
+"""
+As-of price and FX lookup at a handful of reference dates.
+
+Period returns (1D, 1W, 1M, YTD, …) only need the close on or before each
+period's start date.  Instead of loading every bar since the oldest start and
+searching it in Python, each (company, date) and (currency, date) pair is
+resolved by one ``LATERAL … ORDER BY date DESC LIMIT 1`` index probe; one
+query covers all pairs.  Cost and memory depend on the number of pairs, not
+on how much history exists.
+"""
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from utils.decimal_helpers import to_decimal as _to_d
+
+logger = logging.getLogger(__name__)
+
+_CLOSES_SQL = text("""
+SELECT c.company_id, r.ref_date, px.close
+FROM companies c
+CROSS JOIN unnest(CAST(:dates AS date[])) AS r(ref_date)
+CROSS JOIN LATERAL (
+    SELECT close
+    FROM stock_price_history
+    WHERE company_id = c.company_id
+      AND market_id = c.market_id
+      AND date <= r.ref_date
+      AND close IS NOT NULL
+    ORDER BY date DESC
+    LIMIT 1
+) px
+WHERE c.company_id = ANY(:ids)
+""")
+
+_FX_SQL = text("""
+SELECT cur.currency, r.ref_date, direct.close, inverse.close
+FROM unnest(CAST(:currencies AS text[])) AS cur(currency)
+CROSS JOIN unnest(CAST(:dates AS date[])) AS r(ref_date)
+LEFT JOIN LATERAL (
+    SELECT close
+    FROM fx_rates
+    WHERE base_currency = cur.currency AND quote_currency = :quote
+      AND date <= r.ref_date AND close IS NOT NULL
+    ORDER BY date DESC
+    LIMIT 1
+) direct ON TRUE
+LEFT JOIN LATERAL (
+    SELECT close
+    FROM fx_rates
+    WHERE base_currency = :quote AND quote_currency = cur.currency
+      AND date <= r.ref_date AND close IS NOT NULL AND close <> 0
+    ORDER BY date DESC
+    LIMIT 1
+) inverse ON TRUE
+""")
+
+
+def get_closes_as_of(
+    db: Session, company_ids: Iterable[int], dates: Iterable[date]
+) -> dict[int, dict[date, Decimal]]:
+    """
+    Latest close on or before each date, per company (listing market bars).
+    Returns ``{company_id: {date: close}}``; pairs without any bar are absent.
+    """
+    ids = sorted({int(cid) for cid in company_ids})
+    ref_dates = sorted(set(dates))
+    if not ids or not ref_dates:
+        return {}
+
+    closes: dict[int, dict[date, Decimal]] = {}
+    for cid, ref_date, close in db.execute(_CLOSES_SQL, {"ids": ids, "dates": ref_dates}):
+        closes.setdefault(cid, {})[ref_date] = _to_d(close)
+    return closes
+
+
+def get_fx_as_of(
+    db: Session, currencies: Iterable[str], quote: str, dates: Iterable[date]
+) -> dict[str, dict[date, Decimal]]:
+    """
+    ``currency → quote`` rate on or before each date: the direct pair, else the
+    inverted ``quote/currency`` pair (same rule as ``get_fx_rate_for_date``).
+    Returns ``{currency: {date: rate}}``; pairs without any rate are absent.
+    """
+    quote = quote.upper()
+    codes = sorted({c.upper() for c in currencies if c} - {quote})
+    ref_dates = sorted(set(dates))
+    if not codes or not ref_dates:
+        return {}
+
+    rates: dict[str, dict[date, Decimal]] = {}
+    rows = db.execute(_FX_SQL, {"currencies": codes, "quote": quote, "dates": ref_dates})
+    for currency, ref_date, direct, inverse in rows:
+        if direct is not None:
+            rate = _to_d(direct)
+        elif inverse is not None:
+            rate = Decimal("1") / _to_d(inverse)
+        else:
+            logger.warning(f"No FX rate found for {currency}/{quote} as of {ref_date}")
+            continue
+        rates.setdefault(currency, {})[ref_date] = rate
+    return rates
@@ -0,0 +1,313 @@
+"""
+Multi-process scan executor with shared-memory price arrays.
+
+Scanners run inside job threads of the API process, so their pandas work
+competes with request handlers for the GIL.  This module moves the CPU-bound
+part of a scan into a pool of worker processes:
+
+1. The caller loads price bars once and packs them into flat NumPy columns
+   (one row per bar, rows grouped by company, plus an ``offsets`` index).
+2. The columns are published through ``multiprocessing.shared_memory`` —
+   workers attach to the blocks by name instead of receiving pickled frames.
+3. The universe is split into contiguous company shards, each shard runs a
+   module-level *kernel* in a worker, and the per-shard result lists are
+   concatenated in shard order.
+
+Kernel contract::
+
+    def kernel(columns: dict[str, np.ndarray],
+               company_ids: np.ndarray,
+               offsets: np.ndarray,
+               params: dict) -> list[dict]
+
+``columns`` holds views of the shard's rows only, ``offsets`` is relative to
+the shard (``offsets[i]:offsets[i + 1]`` are the bars of ``company_ids[i]``).
+Kernels must be importable top-level functions and return plain, picklable
+dicts.  Small universes skip the pool and run the kernel in-process.
+"""
+
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Kernel = Callable[[dict, np.ndarray, np.ndarray, dict], list]
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+# Default cap: every uvicorn worker owns its own pool
+_DEFAULT_MAX_WORKERS = 4
+
+
+# ── Pool management ─────────────────────────────────────────────────
+
+def get_worker_count() -> int:
+    """Configured worker count (``SCAN_WORKERS``; 0 means one per CPU core, at most 4)."""
+    configured = settings.SCAN_WORKERS
+    if configured and configured > 0:
+        return configured
+    return min(os.cpu_count() or 1, _DEFAULT_MAX_WORKERS)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Lazily create the shared process pool.
+    Uses the ``spawn`` start method: forking a multi-threaded uvicorn worker
+    would copy held locks and open DB connections into the children.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = get_worker_count()
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+            )
+            logger.info(f"Scan executor: started process pool with {workers} workers")
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes (registered with ``atexit``)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop *broken* so the next scan starts a fresh pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
+
+
+# ── Packing ─────────────────────────────────────────────────────────
+
+def pack_price_frame(
+    df: pd.DataFrame,
+    value_columns: list[str],
+    dtype=np.float64,
+) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Convert a long price frame (``company_id``, ``date``, *value_columns*)
+    into contiguous columns grouped by company.
+
+    Returns ``(columns, company_ids, offsets)`` where ``columns`` also contains
+    ``date`` as ``datetime64[D]``.  Rows are ordered by (company_id, date).
+    """
+    if df.empty:
+        empty = {col: np.empty(0, dtype=dtype) for col in value_columns}
+        empty["date"] = np.empty(0, dtype="datetime64[D]")
+        return empty, np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64)
+
+    df = df.sort_values(["company_id", "date"], kind="stable")
+    cids = df["company_id"].to_numpy(dtype=np.int64)
+
+    # Group boundaries: first row of each company + final sentinel
+    starts = np.flatnonzero(np.r_[True, cids[1:] != cids[:-1]])
+    offsets = np.r_[starts, len(cids)].astype(np.int64)
+
+    columns = {
+        col: np.ascontiguousarray(df[col].to_numpy(dtype=dtype, na_value=np.nan))
+        for col in value_columns
+    }
+    columns["date"] = np.ascontiguousarray(
+        pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[D]")
+    )
+    return columns, cids[starts], offsets
+
+
+def concat_packed(
+    parts: list[tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]],
+    value_columns: list[str],
+    dtype=np.float64,
+) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Join packed chunks (:func:`pack_price_frame` results of disjoint company
+    sets) into one packed universe; offsets are rebased per chunk.
+    """
+    parts = [p for p in parts if len(p[1])]
+    if not parts:
+        return pack_price_frame(pd.DataFrame(), value_columns, dtype=dtype)
+    if len(parts) == 1:
+        return parts[0]
+
+    keys = list(parts[0][0])
+    columns = {key: np.concatenate([p[0][key] for p in parts]) for key in keys}
+    company_ids = np.concatenate([p[1] for p in parts])
+    row_starts = np.cumsum([0] + [int(p[2][-1]) for p in parts[:-1]])
+    offsets = np.concatenate(
+        [p[2][:-1] + base for p, base in zip(parts, row_starts)]
+        + [np.array([row_starts[-1] + int(parts[-1][2][-1])], dtype=np.int64)]
+    ).astype(np.int64)
+    return columns, company_ids, offsets
+
+
+# ── Shared memory ───────────────────────────────────────────────────
+
+def _publish(arrays: dict[str, np.ndarray]) -> tuple[dict, list]:
+    """
+    Copy arrays into new shared-memory blocks.
+    Returns (layout, blocks): layout is a small picklable
+    ``{key: (block_name, shape, dtype_str)}`` map sent to workers.
+    """
+    layout: dict[str, tuple] = {}
+    blocks: list[shared_memory.SharedMemory] = []
+    try:
+        for key, arr in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            blocks.append(block)
+            view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)
+            view[...] = arr
+            layout[key] = (block.name, arr.shape, arr.dtype.str)
+    except Exception:
+        _release(blocks)
+        raise
+    return layout, blocks
+
+
+def _release(blocks: list) -> None:
+    for block in blocks:
+        try:
+            block.close()
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _run_shard(
+    kernel: Kernel,
+    layout: dict,
+    shard_start: int,
+    shard_stop: int,
+    params: dict,
+) -> list:
+    """Worker entry point: attach to the blocks, slice the shard, run kernel."""
+    blocks = []
+    arrays: dict[str, np.ndarray] = {}
+    try:
+        for key, (name, shape, dtype) in layout.items():
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+        company_ids = arrays["__company_ids"]
+        offsets = arrays["__offsets"]
+        row_start = int(offsets[shard_start])
+        row_stop = int(offsets[shard_stop])
+
+        columns = {
+            key: arr[row_start:row_stop]
+            for key, arr in arrays.items()
+            if not key.startswith("__")
+        }
+        shard_ids = company_ids[shard_start:shard_stop].copy()
+        shard_offsets = offsets[shard_start:shard_stop + 1] - row_start
+        return kernel(columns, shard_ids, shard_offsets, params)
+    finally:
+        # Views must be dropped before the blocks they point into can close
+        arrays.clear()
+        columns = company_ids = offsets = None
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # A failing kernel's traceback can still reference a view
+                pass
+
+
+# ── Public entry point ──────────────────────────────────────────────
+
+def _shard_bounds(n_companies: int, n_shards: int) -> list[tuple[int, int]]:
+    size = math.ceil(n_companies / n_shards)
+    return [
+        (start, min(start + size, n_companies))
+        for start in range(0, n_companies, size)
+    ]
+
+
+def run_sharded_scan(
+    kernel: Kernel,
+    columns: dict[str, np.ndarray],
+    company_ids: np.ndarray,
+    offsets: np.ndarray,
+    params: dict | None = None,
+    label: str = "scan",
+) -> list:
+    """
+    Run *kernel* over a packed universe, in worker processes when worthwhile.
+
+    Falls back to a single in-process call when the universe is smaller than
+    ``SCAN_PARALLEL_MIN_COMPANIES``, only one worker is configured, or the
+    pool cannot be used (e.g. shared memory unavailable).
+    """
+    params = params or {}
+    n_companies = len(company_ids)
+    if n_companies == 0:
+        return []
+
+    workers = get_worker_count()
+    if workers <= 1 or n_companies < settings.SCAN_PARALLEL_MIN_COMPANIES:
+        return kernel(columns, company_ids, offsets, params)
+
+    start_time = time.time()
+    # Several shards per worker keeps the pool busy when shards are uneven
+    bounds = _shard_bounds(n_companies, workers * 2)
+
+    arrays = dict(columns)
+    arrays["__company_ids"] = company_ids
+    arrays["__offsets"] = offsets
+
+    try:
+        layout, blocks = _publish(arrays)
+    except OSError as exc:
+        logger.warning(f"Scan executor ({label}): shared memory unavailable ({exc}), running in-process")
+        return kernel(columns, company_ids, offsets, params)
+
+    pool = _get_pool()
+    try:
+        futures = [
+            pool.submit(_run_shard, kernel, layout, start, stop, params)
+            for start, stop in bounds
+        ]
+        results: list = []
+        for future in futures:
+            results.extend(future.result())
+    except BrokenProcessPool as exc:
+        # A worker died (e.g. OOM-killed): replace the pool, finish in-process
+        logger.error(f"Scan executor ({label}): process pool broken ({exc}), running in-process")
+        _discard_pool(pool)
+        _release(blocks)
+        blocks = []
+        return kernel(columns, company_ids, offsets, params)
+    finally:
+        _release(blocks)
+
+    elapsed = time.time() - start_time
+    logger.info(
+        f"Scan executor ({label}): {n_companies} companies, "
+        f"{int(offsets[-1])} rows in {len(bounds)} shards "
+        f"on {workers} workers — {elapsed:.2f}s"
+    )
+    return results
@@ -0,0 +1,214 @@
+"""
+Generic, data-versioned cache for per-company scan results.
+
+A cached entry is keyed by (scan_type, params_hash, company_id) and stores the
+company's *data version* (its ingestion watermarks, see
+``services/ingestion_watermarks.py``) at compute time.  On the next run the current
+versions are read in bulk; entries whose version still matches are served as
+is and only the remaining companies are recomputed.
+
+Scans should hash only the parameters that change the per-company output.
+Thresholds that merely filter that output (min score, ratio bounds, …) are
+better applied after the lookup, so one cached entry serves every threshold.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.scan_cache import ScanResultCache
+from services.ingestion_watermarks import PRICE, get_company_watermarks
+from utils.itertools_helpers import chunked
+
+logger = logging.getLogger(__name__)
+
+_QUERY_CHUNK = 1000
+
+# In-process hit/miss counters per scan type (since process start)
+_stats: dict[str, dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+# ── Keys ────────────────────────────────────────────────────────────
+
+def _normalize(value: Any) -> Any:
+    """Canonical form: sorted dict keys, 3.0 == 3, stripped strings."""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize(v) for v in value]
+        return sorted(items, key=repr) if isinstance(value, set) else items
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else round(value, 10)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def hash_params(params: dict) -> str:
+    """Stable sha256 of the normalized scan parameters."""
+    payload = json.dumps(_normalize(params), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# ── Data versions ───────────────────────────────────────────────────
+
+def get_data_versions(
+    db: Session,
+    company_ids: list[int],
+    sources: Iterable[str],
+) -> dict[int, str]:
+    """
+    Return {company_id: version_string} combining the requested sources'
+    ingestion watermarks, e.g. ``"price=1842"``.  Companies never written
+    since watermarks exist get ``"…=none"``.
+    """
+    sources = sorted(sources)
+    per_source = {src: get_company_watermarks(db, src, company_ids) for src in sources}
+    return {
+        cid: "|".join(f"{src}={per_source[src].get(cid, 'none')}" for src in sources)
+        for cid in company_ids
+    }
+
+
+# ── Stats ───────────────────────────────────────────────────────────
+
+def _record(scan_type: str, hits: int, misses: int) -> None:
+    with _stats_lock:
+        entry = _stats.setdefault(scan_type, {"hits": 0, "misses": 0, "runs": 0})
+        entry["hits"] += hits
+        entry["misses"] += misses
+        entry["runs"] += 1
+
+
+def get_cache_stats(db: Session) -> dict:
+    """Hit ratios since process start plus stored entry counts per scan type."""
+    stored = dict(
+        db.query(ScanResultCache.scan_type, func.count(ScanResultCache.id))
+        .group_by(ScanResultCache.scan_type)
+        .all()
+    )
+    with _stats_lock:
+        snapshot = {k: dict(v) for k, v in _stats.items()}
+
+    stats = {}
+    for scan_type in sorted(set(snapshot) | set(stored)):
+        entry = snapshot.get(scan_type, {"hits": 0, "misses": 0, "runs": 0})
+        lookups = entry["hits"] + entry["misses"]
+        stats[scan_type] = {
+            **entry,
+            "hit_ratio": round(entry["hits"] / lookups, 4) if lookups else None,
+            "stored_entries": stored.get(scan_type, 0),
+        }
+    return stats
+
+
+# ── Read / write ────────────────────────────────────────────────────
+
+def _load_entries(
+    db: Session, scan_type: str, params_hash: str, company_ids: list[int]
+) -> dict[int, tuple[str, Any]]:
+    entries: dict[int, tuple[str, Any]] = {}
+    for chunk_ids in chunked(company_ids, _QUERY_CHUNK):
+        rows = (
+            db.query(
+                ScanResultCache.company_id,
+                ScanResultCache.data_version,
+                ScanResultCache.result,
+            )
+            .filter(
+                ScanResultCache.scan_type == scan_type,
+                ScanResultCache.params_hash == params_hash,
+                ScanResultCache.company_id.in_(list(chunk_ids)),
+            )
+            .all()
+        )
+        entries.update({cid: (version, result) for cid, version, result in rows})
+    return entries
+
+
+def _store_entries(
+    db: Session,
+    scan_type: str,
+    params_hash: str,
+    results: dict[int, Any],
+    versions: dict[int, str],
+) -> None:
+    now = datetime.utcnow()
+    rows = [
+        {
+            "scan_type": scan_type,
+            "params_hash": params_hash,
+            "company_id": cid,
+            "data_version": versions[cid],
+            "result": result,
+            "computed_at": now,
+        }
+        for cid, result in results.items()
+        if cid in versions
+    ]
+    for chunk in chunked(rows, 500):
+        stmt = insert(ScanResultCache).values(list(chunk))
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_scan_result_cache_key",
+            set_={
+                "data_version": stmt.excluded.data_version,
+                "result": stmt.excluded.result,
+                "computed_at": stmt.excluded.computed_at,
+            },
+        )
+        db.execute(stmt)
+    db.commit()
+
+
+def run_cached(
+    db: Session,
+    scan_type: str,
+    params: dict,
+    company_ids: list[int],
+    compute: Callable[[list[int]], dict[int, Any]],
+    sources: Iterable[str] = (PRICE,),
+) -> dict[int, Any]:
+    """
+    Return {company_id: result} for every company, computing only misses.
+
+    *compute* receives the company ids whose inputs changed (or were never
+    analysed) and must return ``{company_id: json_serializable_result}``;
+    companies it leaves out are cached as "no result" (``None``).
+    """
+    if not company_ids:
+        return {}
+
+    params_hash = hash_params(params)
+    versions = get_data_versions(db, company_ids, sources)
+    entries = _load_entries(db, scan_type, params_hash, company_ids)
+
+    results: dict[int, Any] = {}
+    misses: list[int] = []
+    for cid in company_ids:
+        entry = entries.get(cid)
+        if entry and entry[0] == versions[cid]:
+            results[cid] = entry[1]
+        else:
+            misses.append(cid)
+
+    hits = len(company_ids) - len(misses)
+    _record(scan_type, hits, len(misses))
+    logger.info(
+        f"Scan cache [{scan_type}]: {hits}/{len(company_ids)} hits "
+        f"({hits / len(company_ids):.0%}), recomputing {len(misses)}"
+    )
+
+    if misses:
+        computed = compute(misses) or {}
+        fresh = {cid: computed.get(cid) for cid in misses}
+        _store_entries(db, scan_type, params_hash, fresh, versions)
+        results.update(fresh)
+
+    return results
@@ -1,37 +1,35 @@
 """Shared helpers for resolving the stock universe for scan operations.
 
 Extracted from golden_cross.py / death_cross.py to eliminate duplication.
+Membership comes from the compiled cache in services/universe_cache.py.
 """
 import logging
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from database.company import Company
-from database.market import Market
-from services.basket_resolver import resolve_baskets_to_companies
+from services.company_filter_service import filter_companies
+from services.universe_cache import CompanyRef, resolve_ids, resolve_refs
 
 logger = logging.getLogger(__name__)
 
 
-def get_markets_and_companies(db: Session, market_names: list[str]):
-    """Look up markets by name and return their IDs + associated companies."""
-    markets = db.query(Market).filter(Market.name.in_(market_names)).all()
-    market_ids = [m.market_id for m in markets]
-    if not market_ids:
+def _check_markets(db: Session, market_names: list[str]) -> None:
+    """Same 404s as the per-market lookup used to raise."""
+    market_ids, company_ids = resolve_ids(db, None, market_names)
+    if not len(market_ids):
         raise HTTPException(status_code=404, detail="No matching markets found.")
-    companies = db.query(Company).filter(Company.market_id.in_(market_ids)).all()
-    if not companies:
+    if not len(company_ids):
         raise HTTPException(
             status_code=404, detail="No companies found for these markets."
         )
-    return market_ids, companies
 
 
-def _resolve_baskets_or_404(db: Session, basket_ids: list[int]):
-    if not basket_ids:
-        return set(), []
+def _resolve_or_404(db: Session, market_names, basket_ids, resolver):
+    if market_names:
+        _check_markets(db, market_names)
     try:
-        return resolve_baskets_to_companies(db, basket_ids)
+        return resolver(db, basket_ids, market_names)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
@@ -42,29 +40,40 @@ def resolve_universe(
     basket_ids: list[int] | None,
 ):
     """Resolve a combined set of markets + baskets into (market_ids, companies)."""
-    market_ids: set[int] = set()
-    company_map: dict[int, Company] = {}
+    market_ids, company_ids = _resolve_or_404(db, market_names, basket_ids, resolve_ids)
 
-    if market_names:
-        mids, comps = get_markets_and_companies(db, market_names)
-        market_ids.update(mids)
-        for comp in comps:
-            company_map[comp.company_id] = comp
+    if not len(company_ids):
+        return market_ids.tolist(), []
+    if not len(market_ids):
+        return [], []
+
+    companies = (
+        db.query(Company)
+        .filter(Company.company_id.in_(company_ids.tolist()))
+        .all()
+    )
+    return market_ids.tolist(), companies
 
-    if basket_ids:
-        basket_market_ids, basket_companies = _resolve_baskets_or_404(db, basket_ids)
-        market_ids.update(basket_market_ids)
-        for comp in basket_companies:
-            company_map[comp.company_id] = comp
 
-    if not company_map:
-        return market_ids, []
+def resolve_universe_refs(
+    db: Session,
+    market_names: list[str] | None,
+    basket_ids: list[int] | None,
+    **filters,
+) -> tuple[list[int], list[CompanyRef]]:
+    """
+    Like resolve_universe, but with cached CompanyRef rows instead of ORM objects.
+    Optional *filters* (min_cap_millions, min_dollar_volume_millions, sectors,
+    industries) are applied as one query on company_screening_facts.
+    """
+    market_ids, refs = _resolve_or_404(db, market_names, basket_ids, resolve_refs)
 
-    for comp in company_map.values():
-        if comp.market and comp.market.market_id:
-            market_ids.add(comp.market.market_id)
+    if refs and any(filters.values()):
+        refs = filter_companies(db, refs, **filters)
 
-    if not market_ids:
+    if not refs:
+        return market_ids.tolist(), []
+    if not len(market_ids):
         return [], []
 
-    return list(market_ids), list(company_map.values())
+    return market_ids.tolist(), refs
@@ -0,0 +1,177 @@
+"""
+Composite multi-criteria screener.
+
+A screen is a declarative list of ``{field, op, value}`` criteria.  Each field
+maps to a column (or derived expression) of ``company_screening_facts``; all
+criteria, the universe restriction, ranking and pagination compile into ONE
+SQL query, with the total match count taken from a window function in the
+same pass.
+"""
+import logging
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.company import Company
+from database.screening_facts import CompanyScreeningFacts as F
+from schemas.screener_schemas import ScreenerCriterion, ScreenerRequest
+from services.universe_cache import resolve_ids
+
+logger = logging.getLogger(__name__)
+
+NUMBER = "number"
+TEXT = "text"
+BOOL = "bool"
+
+# name → (SQL expression, kind, description)
+FIELDS = {
+    # Size / liquidity (USD)
+    "market_cap_usd": (F.market_cap_usd, NUMBER, "Market cap in USD"),
+    "avg_dollar_volume_usd": (F.avg_dollar_volume_usd, NUMBER, "Average daily volume × price, USD"),
+    # Classification
+    "sector": (F.sector, TEXT, "Sector"),
+    "industry": (F.industry, TEXT, "Industry"),
+    "market_id": (F.market_id, NUMBER, "Listing market id"),
+    # Indicators (latest bar)
+    "last_close": (F.last_close, NUMBER, "Latest close (local currency)"),
+    "sma_50": (F.sma_50, NUMBER, "50-day SMA"),
+    "sma_200": (F.sma_200, NUMBER, "200-day SMA"),
+    "pct_vs_sma_200": (F.pct_vs_sma_200, NUMBER, "Close vs SMA200, %"),
+    # Fundamentals
+    "ev_to_revenue": (F.ev_to_revenue, NUMBER, "Enterprise value / revenue"),
+    "net_margin_pct": (F.net_margin_pct, NUMBER, "Net income / revenue, %"),
+    "pe_ratio": (F.pe_ratio, NUMBER, "Market cap / net income (profitable only)"),
+    "price_to_book": (F.price_to_book, NUMBER, "Price / book"),
+    # Scan state
+    "above_sma_200": (F.last_close > F.sma_200, BOOL, "Close above SMA200"),
+    "golden_cross_state": (F.sma_50 > F.sma_200, BOOL, "SMA50 above SMA200"),
+}
+
+_OPS_BY_KIND = {
+    NUMBER: {"gt", "gte", "lt", "lte", "eq", "neq", "between", "in"},
+    TEXT: {"eq", "neq", "in"},
+    BOOL: {"is_true", "is_false"},
+}
+
+
+def list_fields() -> list[dict]:
+    return [
+        {"field": name, "kind": kind, "ops": sorted(_OPS_BY_KIND[kind]), "description": desc}
+        for name, (_, kind, desc) in FIELDS.items()
+    ]
+
+
+def _field(name: str):
+    if name not in FIELDS:
+        raise ValueError(f"Unknown screener field '{name}'")
+    return FIELDS[name]
+
+
+def _number(value, field: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{field}' expects a number, got {value!r}")
+    return value
+
+
+def _compile(criterion: ScreenerCriterion):
+    """One criterion → one SQL boolean expression."""
+    expr, kind, _ = _field(criterion.field)
+    op, value = criterion.op, criterion.value
+    if op not in _OPS_BY_KIND[kind]:
+        raise ValueError(f"Operator '{op}' is not valid for {kind} field '{criterion.field}'")
+
+    if op == "is_true":
+        return expr.is_(True)
+    if op == "is_false":
+        return expr.is_(False)
+
+    if op == "in":
+        if not isinstance(value, list) or not value:
+            raise ValueError(f"'in' on '{criterion.field}' expects a non-empty list")
+        if kind == NUMBER:
+            value = [_number(v, criterion.field) for v in value]
+        return expr.in_(value)
+
+    if op == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError(f"'between' on '{criterion.field}' expects [low, high]")
+        low, high = (_number(v, criterion.field) for v in value)
+        return expr.between(low, high)
+
+    if kind == NUMBER:
+        value = _number(value, criterion.field)
+    return {
+        "gt": lambda: expr > value,
+        "gte": lambda: expr >= value,
+        "lt": lambda: expr < value,
+        "lte": lambda: expr <= value,
+        "eq": lambda: expr == value,
+        "neq": lambda: expr != value,
+    }[op]()
+
+
+def run_screen(db: Session, request: ScreenerRequest) -> dict:
+    """
+    Execute a screen.  Raises ValueError for invalid criteria, sort fields
+    or unknown basket ids.
+    """
+    start = time.time()
+    conditions = [_compile(c) for c in request.criteria]
+    sort_expr, sort_kind, _ = _field(request.sort_by)
+    if sort_kind == BOOL:
+        raise ValueError(f"Cannot sort by boolean field '{request.sort_by}'")
+
+    query = (
+        db.query(F, Company.ticker, Company.name, func.count().over().label("total"))
+        .join(Company, Company.company_id == F.company_id)
+    )
+
+    if request.basket_ids or request.markets:
+        _, company_ids = resolve_ids(db, request.basket_ids, request.markets)
+        if not len(company_ids):
+            return {"total": 0, "page": request.page, "page_size": request.page_size, "data": []}
+        query = query.filter(F.company_id.in_(company_ids.tolist()))
+
+    for condition in conditions:
+        query = query.filter(condition)
+
+    order = sort_expr.desc() if request.sort_desc else sort_expr.asc()
+    rows = (
+        query.order_by(order.nullslast(), F.company_id)
+        .offset((request.page - 1) * request.page_size)
+        .limit(request.page_size)
+        .all()
+    )
+
+    if rows:
+        total = rows[0].total
+    else:
+        # Page past the end: the window count has no row to ride on
+        total = query.with_entities(func.count(F.company_id)).scalar() if request.page > 1 else 0
+
+    data = [
+        {
+            "company_id": facts.company_id,
+            "ticker": ticker,
+            "name": name,
+            "sector": facts.sector,
+            "industry": facts.industry,
+            "market_cap_usd": facts.market_cap_usd,
+            "avg_dollar_volume_usd": facts.avg_dollar_volume_usd,
+            "last_close": facts.last_close,
+            "price_date": facts.price_date.isoformat() if facts.price_date else None,
+            "pct_vs_sma_200": facts.pct_vs_sma_200,
+            "ev_to_revenue": facts.ev_to_revenue,
+            "net_margin_pct": facts.net_margin_pct,
+            "pe_ratio": facts.pe_ratio,
+            "price_to_book": facts.price_to_book,
+        }
+        for facts, ticker, name, _ in rows
+    ]
+
+    logger.info(
+        f"Screener: {len(conditions)} criteria, {total} matches, "
+        f"page {request.page} in {time.time() - start:.3f}s"
+    )
+    return {"total": total, "page": request.page, "page_size": request.page_size, "data": data}
@@ -0,0 +1,149 @@
+"""
+Maintenance of ``company_screening_facts`` — per-company values used to
+narrow a scan universe (USD market cap, average dollar volume, sector,
+industry, listing market) and by the composite screener (latest close and
+SMAs, valuation ratios).
+
+The whole refresh is one ``INSERT … SELECT … ON CONFLICT`` statement: the
+latest USD rate per currency (direct pair, else inverted USD/XXX) is joined in
+SQL, so no per-currency round trips happen.  Ingestion paths call
+:func:`refresh_screening_facts` for the companies they touched and
+:func:`refresh_screening_facts_for_currencies` after FX updates; the daily
+refresh jobs run a full refresh.
+"""
+import logging
+import time
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_SQL = """
+WITH fx_direct AS (
+    SELECT DISTINCT ON (base_currency) base_currency AS currency, close AS rate
+    FROM fx_rates
+    WHERE quote_currency = 'USD' AND close IS NOT NULL AND close <> 0
+    ORDER BY base_currency, date DESC
+),
+fx_inverse AS (
+    SELECT DISTINCT ON (quote_currency) quote_currency AS currency, 1.0 / close AS rate
+    FROM fx_rates
+    WHERE base_currency = 'USD' AND close IS NOT NULL AND close <> 0
+    ORDER BY quote_currency, date DESC
+)
+INSERT INTO company_screening_facts (
+    company_id, market_id, currency, sector, industry,
+    market_cap_usd, avg_dollar_volume_usd,
+    price_date, last_close, sma_50, sma_200, pct_vs_sma_200,
+    ev_to_revenue, net_margin_pct, pe_ratio, price_to_book,
+    updated_at
+)
+SELECT
+    c.company_id,
+    c.market_id,
+    cur.currency,
+    COALESCE(c.sector, ov.sector),
+    COALESCE(c.industry, ov.industry),
+    md.market_cap * usd.rate,
+    md.average_volume * md.current_price * usd.rate,
+    bar.date,
+    bar.close,
+    bar.sma_50,
+    bar.sma_200,
+    CASE WHEN bar.sma_200 > 0 THEN (bar.close / bar.sma_200 - 1) * 100 END,
+    CASE WHEN fin.total_revenue <> 0 THEN
+        COALESCE(
+            fin.enterprise_value,
+            CASE WHEN md.market_cap > 0 THEN md.market_cap + fin.total_debt - fin.cash_and_cash_equivalents END
+        ) / fin.total_revenue
+    END,
+    CASE WHEN fin.total_revenue <> 0 THEN fin.net_income / fin.total_revenue * 100 END,
+    CASE WHEN fin.net_income > 0 AND md.market_cap > 0 THEN md.market_cap / fin.net_income END,
+    md.price_to_book,
+    now() AT TIME ZONE 'utc'
+FROM companies c
+LEFT JOIN markets m ON m.market_id = c.market_id
+LEFT JOIN company_overview ov ON ov.company_id = c.company_id
+LEFT JOIN company_financials fin ON fin.company_id = c.company_id
+LEFT JOIN LATERAL (
+    SELECT market_cap, average_volume, current_price, price_to_book
+    FROM company_market_data
+    WHERE company_id = c.company_id
+    ORDER BY last_updated DESC NULLS LAST, id DESC
+    LIMIT 1
+) md ON TRUE
+LEFT JOIN LATERAL (
+    SELECT date, close, sma_50, sma_200
+    FROM stock_price_history
+    WHERE company_id = c.company_id AND market_id = c.market_id
+    ORDER BY date DESC
+    LIMIT 1
+) bar ON TRUE
+CROSS JOIN LATERAL (SELECT COALESCE(m.currency, 'USD') AS currency) cur
+LEFT JOIN fx_direct fd ON fd.currency = cur.currency
+LEFT JOIN fx_inverse fi ON fi.currency = cur.currency
+CROSS JOIN LATERAL (
+    SELECT CASE WHEN cur.currency = 'USD' THEN 1.0 ELSE COALESCE(fd.rate, fi.rate) END AS rate
+) usd
+{where}
+ON CONFLICT (company_id) DO UPDATE SET
+    market_id = EXCLUDED.market_id,
+    currency = EXCLUDED.currency,
+    sector = EXCLUDED.sector,
+    industry = EXCLUDED.industry,
+    market_cap_usd = EXCLUDED.market_cap_usd,
+    avg_dollar_volume_usd = EXCLUDED.avg_dollar_volume_usd,
+    price_date = EXCLUDED.price_date,
+    last_close = EXCLUDED.last_close,
+    sma_50 = EXCLUDED.sma_50,
+    sma_200 = EXCLUDED.sma_200,
+    pct_vs_sma_200 = EXCLUDED.pct_vs_sma_200,
+    ev_to_revenue = EXCLUDED.ev_to_revenue,
+    net_margin_pct = EXCLUDED.net_margin_pct,
+    pe_ratio = EXCLUDED.pe_ratio,
+    price_to_book = EXCLUDED.price_to_book,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def _run_refresh(db: Session, where: str, params: dict, label: str) -> int:
+    start = time.time()
+    try:
+        result = db.execute(text(_REFRESH_SQL.format(where=where)), params)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Screening facts refresh ({label}) failed: {e}")
+        return 0
+    logger.info(
+        f"Screening facts refresh ({label}): {result.rowcount} rows in {time.time() - start:.2f}s"
+    )
+    return result.rowcount
+
+
+def refresh_screening_facts(db: Session, company_ids: Iterable[int] | None = None) -> int:
+    """
+    Recompute facts for *company_ids* (all companies when None).
+    Like the watermark bumps, failures are logged and never break ingestion.
+    """
+    if company_ids is None:
+        # An explicit WHERE keeps "ON CONFLICT" from parsing as a join condition
+        return _run_refresh(db, "WHERE TRUE", {}, "all")
+    ids = sorted({int(cid) for cid in company_ids})
+    if not ids:
+        return 0
+    return _run_refresh(
+        db, "WHERE c.company_id = ANY(:ids)", {"ids": ids}, f"{len(ids)} companies"
+    )
+
+
+def refresh_screening_facts_for_currencies(db: Session, currencies: Iterable[str]) -> int:
+    """Recompute facts of companies listed in *currencies* (after an FX update)."""
+    codes = sorted({c.upper() for c in currencies if c} - {"USD"})
+    if not codes:
+        return 0
+    return _run_refresh(
+        db, "WHERE cur.currency = ANY(:codes)", {"codes": codes}, f"currencies {codes}"
+    )
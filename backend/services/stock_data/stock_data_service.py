@@ -9,6 +9,9 @@ import pandas_market_calendars as mcal
 from datetime import date
 from services.company.company_service import get_or_create_company
 from services.market.market_service import get_or_create_market
+from services.ingestion_watermarks import PRICE, bump_watermarks
+from services.latest_bar_service import refresh_latest_bars
+from services.screening_facts_service import refresh_screening_facts
 from utils.db_retry import retry_on_db_lock
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
@@ -130,8 +133,9 @@ def fetch_and_save_stock_price_history_data(
             else [d for d in recheck_dates if d in fetched_dates]
         )
 
+        written = 0
         if dates_to_update:
-            process_updates(
+            written = process_updates(
                 db=db,
                 company=company,
                 market=market_obj,
@@ -161,6 +165,11 @@ def fetch_and_save_stock_price_history_data(
             # Trigger SMA update using DB history to ensure we have enough data points
             # (since stock_data here might only contain a few recent days)
             update_smas_for_company(db, company.company_id, market_obj.market_id)
+            refresh_latest_bars(db, [company.company_id])
+            refresh_screening_facts(db, [company.company_id])
+            # Bump last, so consumers never see the new bars without SMAs and latest bar
+            if written:
+                bump_watermarks(db, PRICE, [company.company_id])
 
         return {
             "status": "success",
@@ -250,8 +259,8 @@ def process_updates(
     dates_to_update: List[date],
     force_update: bool,
     forced_overwrite_dates: Set[date],
-):
-    """Insert or update records in StockPriceHistory."""
+) -> int:
+    """Insert or update records in StockPriceHistory; returns the rows written."""
     rows: list[dict] = []
     for date_str, row in stock_data.iterrows():
         date_obj = date_str.date()
@@ -296,7 +305,7 @@ def process_updates(
 
     if not rows:
         logger.info("Processed_ 0 records")
-        return
+        return 0
 
     stmt = (
         insert(StockPriceHistory)
@@ -312,3 +321,5 @@ def process_updates(
     except IntegrityError as exc:  # noqa: BLE001
         db.rollback()
         logger.warning("Duplicate price rows skipped for %s: %s", company.ticker, exc)
+        return 0
+    return len(rows)
@@ -0,0 +1,92 @@
+"""
+Versioned response cache for the stock details page (``GET /api/stock/{ticker}``).
+
+Building the page runs a dozen queries plus pandas work (two years of bars,
+financial trends, peers) for data that changes at most a few times a day.
+Built pages are kept per (company, MA windows, chart format) and tagged
+with the company's ``price`` and ``fundamentals`` ingestion watermarks, its
+``company_market_data.last_updated`` stamp (the background refresh updates
+``current_price`` without a ``price`` bump) and the calendar day, so any
+committed price or fundamentals write for the company makes the entry miss
+on its next request.
+
+Each entry carries a strong ETag (a digest of its canonical JSON), so a
+client revalidating an unchanged page gets ``304 Not Modified`` without the
+page being rebuilt or re-sent.  Views are counted per ticker; after each
+daily refresh :func:`most_viewed` tells the refresh job which pages to
+rebuild ahead of the first visitor (see ``warm_stock_details_cache``).
+"""
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from datetime import date
+from typing import NamedTuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.stock_data import CompanyMarketData
+from services.ingestion_watermarks import FUNDAMENTALS, PRICE, get_watermarks
+
+
+class CachedPage(NamedTuple):
+    version: tuple
+    body: dict
+    digest: str
+
+
+_pages: "OrderedDict[tuple, CachedPage]" = OrderedDict()
+_views: Counter = Counter()
+_lock = threading.Lock()
+
+
+def page_version(db: Session, company_id: int) -> tuple:
+    """(price version, fundamentals version, market data stamp, day) of *company_id*."""
+    key = str(company_id)
+    return (
+        get_watermarks(db, PRICE, [key]).get(key, 0),
+        get_watermarks(db, FUNDAMENTALS, [key]).get(key, 0),
+        db.query(func.max(CompanyMarketData.last_updated))
+        .filter(CompanyMarketData.company_id == company_id)
+        .scalar(),
+        date.today(),
+    )
+
+
+def _digest(body: dict) -> str:
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+def get_page(company_id: int, variant: tuple, version: tuple) -> CachedPage | None:
+    """Cached *variant* (MA windows, chart format) of *company_id* if it was built at *version*."""
+    key = (company_id, variant)
+    with _lock:
+        page = _pages.get(key)
+        if page is None or page.version != version:
+            return None
+        _pages.move_to_end(key)
+        return page
+
+
+def store_page(company_id: int, variant: tuple, version: tuple, body: dict) -> CachedPage:
+    page = CachedPage(version, body, _digest(body))
+    with _lock:
+        _pages[(company_id, variant)] = page
+        _pages.move_to_end((company_id, variant))
+        while len(_pages) > settings.STOCK_DETAILS_CACHE_SIZE:
+            _pages.popitem(last=False)
+    return page
+
+
+def record_view(ticker: str) -> None:
+    with _lock:
+        _views[ticker] += 1
+
+
+def most_viewed(limit: int) -> list[str]:
+    """Tickers with the most page views in this process, most viewed first."""
+    with _lock:
+        return [ticker for ticker, _ in _views.most_common(limit)]
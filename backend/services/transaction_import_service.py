@@ -0,0 +1,201 @@
+"""
+Bulk transaction import.
+
+Importing rows one by one (insert, ``apply_transaction_to_position``,
+rematerialize) costs a position update and a valuation rebuild per row.  Here
+all rows are validated first, then inserted with one executemany in a single
+DB transaction, and the derived state is rebuilt once:
+
+* each affected (account, company) position is recomputed once;
+* each affected account's cash is recomputed once;
+* the caller rebuilds valuations once per portfolio from ``rebuild_from``
+  (the earliest imported date) — the API queues it, the CLI runs it inline.
+
+The Core insert bypasses the session events, so the account ledger
+checkpoints and realized-PnL rows from the earliest imported dates on, and
+the cached dashboard sections, are invalidated explicitly.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database.account import Account
+from database.company import Company
+from database.portfolio import Portfolio, Transaction
+from schemas.portfolio_schemas import TransactionImportRow, TransactionType
+from services.account_ledger import invalidate_account_ledger
+from services.dashboard_core_service import invalidate_user_data
+from services.positions_service import get_default_account_id, recompute_account_cash, recompute_position
+from services.realized_pnl_ledger import invalidate_realized_ledger
+from utils.decimal_helpers import to_decimal as _dec
+
+logger = logging.getLogger(__name__)
+
+_TRADES = {TransactionType.BUY, TransactionType.SELL}
+_NEEDS_COMPANY = _TRADES | {TransactionType.DIVIDEND}
+
+
+class TransactionImportError(ValueError):
+    """Validation failed; nothing was written.  ``errors`` lists ``{row, error}``."""
+
+    def __init__(self, errors: list[dict]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid rows, first: row {errors[0]['row']}: {errors[0]['error']}")
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _total_value(row: TransactionImportRow, price: Decimal, fee: Decimal) -> Decimal:
+    if row.total_value is not None:
+        return _dec(row.total_value)
+    if row.transaction_type == TransactionType.BUY:
+        return row.quantity * price + fee
+    if row.transaction_type == TransactionType.SELL:
+        return row.quantity * price - fee
+    return _dec(row.quantity)
+
+
+def _build_values(
+    db: Session,
+    portfolio: Portfolio,
+    user_id: int,
+    rows: list[TransactionImportRow],
+    default_account_id: int,
+) -> list[dict]:
+    """Validate every row and return insert values; raises TransactionImportError."""
+    account_ids = {
+        acc_id for (acc_id,) in db.query(Account.id).filter(Account.portfolio_id == portfolio.id)
+    }
+    tickers = {r.ticker for r in rows if r.company_id is None and r.ticker}
+    ticker_ids = dict(
+        db.query(Company.ticker, Company.company_id).filter(Company.ticker.in_(tickers)).all()
+    ) if tickers else {}
+    given_ids = {r.company_id for r in rows if r.company_id is not None}
+    known_ids = {
+        cid for (cid,) in db.query(Company.company_id).filter(Company.company_id.in_(given_ids))
+    } if given_ids else set()
+
+    errors: list[dict] = []
+    values: list[dict] = []
+    for i, row in enumerate(rows):
+        ttype = row.transaction_type
+        account_id = row.account_id or default_account_id
+        if account_id not in account_ids:
+            errors.append({"row": i, "error": f"Account {account_id} not found for this portfolio"})
+
+        if row.company_id is not None:
+            company_id = row.company_id
+            if company_id not in known_ids:
+                errors.append({"row": i, "error": f"Company {company_id} not found"})
+        elif row.ticker:
+            company_id = ticker_ids.get(row.ticker)
+            if company_id is None:
+                errors.append({"row": i, "error": f"Company not found for ticker {row.ticker}"})
+        else:
+            company_id = None
+            if ttype in _NEEDS_COMPANY:
+                errors.append({"row": i, "error": f"{ttype.value} requires company_id or ticker"})
+
+        if ttype in _TRADES and not row.price:
+            errors.append({"row": i, "error": f"{ttype.value} requires a positive price"})
+
+        # Cash-like rows carry the amount in quantity with a neutral price
+        price = _dec(row.price) if row.price is not None else Decimal("1")
+        fee = _dec(row.fee or 0)
+        values.append({
+            "user_id": user_id,
+            "portfolio_id": portfolio.id,
+            "account_id": account_id,
+            "company_id": company_id,
+            "transaction_type": ttype,
+            "quantity": _dec(row.quantity),
+            "price": price,
+            "fee": fee,
+            "total_value": _total_value(row, price, fee),
+            "currency": row.currency,
+            "currency_rate": _dec(row.currency_rate or 1),
+            "timestamp": _naive_utc(row.timestamp),
+            "note": row.note,
+        })
+
+    if errors:
+        raise TransactionImportError(errors)
+    return values
+
+
+def import_transactions_bulk(
+    db: Session,
+    portfolio: Portfolio,
+    user_id: int,
+    rows: list[TransactionImportRow],
+    account_id: Optional[int] = None,
+) -> dict:
+    """
+    Validate and insert *rows* into *portfolio* in one DB transaction, then
+    recompute affected positions and account cash once each.  Commits.
+
+    Does not rebuild valuations: the caller rematerializes from the returned
+    ``rebuild_from``.  Raises TransactionImportError (nothing written) when
+    any row is invalid.
+    """
+    start = time.time()
+    try:
+        default_account_id = account_id or get_default_account_id(db, portfolio.id)
+        values = _build_values(db, portfolio, user_id, rows, default_account_id)
+
+        db.execute(insert(Transaction), values)
+
+        # Core insert: no session events, invalidate derived ledgers by hand
+        first_by_account: dict[int, datetime] = {}
+        first_by_company: dict[int, datetime] = {}
+        positions: set[tuple[int, int]] = set()
+        for v in values:
+            ts = v["timestamp"]
+            acc = v["account_id"]
+            first_by_account[acc] = min(ts, first_by_account.get(acc, ts))
+            if v["company_id"] is not None:
+                cid = v["company_id"]
+                first_by_company[cid] = min(ts, first_by_company.get(cid, ts))
+                if v["transaction_type"] in _TRADES:
+                    positions.add((acc, cid))
+
+        for acc, first in first_by_account.items():
+            invalidate_account_ledger(db, [acc], first.date())
+        for cid, first in first_by_company.items():
+            invalidate_realized_ledger(db, portfolio.id, [cid], first)
+
+        for acc, cid in sorted(positions):
+            recompute_position(db, acc, cid)
+        for acc in sorted(first_by_account):
+            recompute_account_cash(db, acc)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_user_data(db, [portfolio.id], [user_id])
+
+    elapsed = time.time() - start
+    rate = len(values) / elapsed if elapsed > 0 else float(len(values))
+    rebuild_from = min(first_by_account.values()).date()
+    logger.info(
+        f"Imported {len(values)} transactions into portfolio {portfolio.id} in {elapsed:.2f}s "
+        f"({rate:.0f} rows/s); {len(positions)} positions, {len(first_by_account)} accounts recomputed"
+    )
+    return {
+        "imported": len(values),
+        "positions_recomputed": len(positions),
+        "accounts_recomputed": len(first_by_account),
+        "rebuild_from": rebuild_from,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rate, 1),
+    }
@@ -0,0 +1,292 @@
+"""
+Compiled, cached basket and scan-universe membership.
+
+Resolving a basket used to re-run its rules (market_codes / include_symbols /
+exclude_symbols, index or static membership) as ORM queries on every scan.
+Here the whole company catalog is loaded once into a compact snapshot:
+
+* sorted ``int64`` arrays of company ids per exchange code, market, index
+  and static basket, plus aligned :class:`CompanyRef` rows;
+* each basket compiles lazily to a sorted id array;
+* any (baskets, markets) combination is memoized as ``(market_ids, company_ids)``.
+
+The snapshot is tagged with the ``universe`` ingestion watermark.  Every
+committed ORM change to ``Company``, ``Basket`` or ``BasketCompany`` bumps that
+watermark in the same transaction (session events below) and drops the local
+snapshot at once; other processes notice the new version within
+``UNIVERSE_CACHE_CHECK_SECONDS``.  Bulk Core updates bypass the events — call
+:func:`invalidate` after those.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from itertools import chain
+from typing import Iterable, NamedTuple
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.baskets import Basket, BasketCompany, BasketType
+from database.company import Company, company_stockindex_association
+from database.market import Market
+from services.ingestion_watermarks import UNIVERSE, get_current_version, watermark_upsert
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = np.empty(0, dtype=np.int64)
+_MAX_MEMOIZED = 256
+
+
+class CompanyRef(NamedTuple):
+    """The slice of a company scanners need, without an ORM object."""
+    company_id: int
+    ticker: str
+    name: str
+    market_id: int | None
+    market_name: str | None
+
+
+def _group(pairs: Iterable[tuple]) -> dict:
+    grouped: dict = defaultdict(list)
+    for key, company_id in pairs:
+        if key is not None and company_id is not None:
+            grouped[key].append(company_id)
+    return {key: np.unique(np.asarray(ids, dtype=np.int64)) for key, ids in grouped.items()}
+
+
+def _union(arrays: list[np.ndarray]) -> np.ndarray:
+    arrays = [a for a in arrays if len(a)]
+    if not arrays:
+        return _EMPTY
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.unique(np.concatenate(arrays))
+
+
+class _Snapshot:
+    """Immutable view of the catalog at one universe version."""
+
+    def __init__(self, db: Session, version: int):
+        self.version = version
+
+        rows = (
+            db.query(
+                Company.company_id,
+                Company.ticker,
+                Company.name,
+                Company.market_id,
+                Company.yfinance_market,
+            )
+            .order_by(Company.company_id)
+            .all()
+        )
+        self.market_names: dict[int, str] = dict(db.query(Market.market_id, Market.name).all())
+
+        self.ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        self.company_market_ids = np.fromiter(
+            (r[3] if r[3] is not None else -1 for r in rows), dtype=np.int64, count=len(rows)
+        )
+        self.company_refs = [
+            CompanyRef(r[0], r[1], r[2], r[3], self.market_names.get(r[3])) for r in rows
+        ]
+
+        self.by_ticker = _group((r[1], r[0]) for r in rows)
+        self.by_exchange = _group((r[4], r[0]) for r in rows)
+        self.by_market = _group((r[3], r[0]) for r in rows)
+        self.by_index = _group(
+            db.execute(
+                select(
+                    company_stockindex_association.c.index_id,
+                    company_stockindex_association.c.company_id,
+                )
+            ).all()
+        )
+        self.by_static_basket = _group(
+            db.query(BasketCompany.basket_id, BasketCompany.company_id).all()
+        )
+        self.baskets = {
+            basket_id: (basket_type, reference_id, rules)
+            for basket_id, basket_type, reference_id, rules in db.query(
+                Basket.id, Basket.type, Basket.reference_id, Basket.rules
+            ).all()
+        }
+        self.market_ids_by_name = _group(
+            (name, market_id) for market_id, name in self.market_names.items()
+        )
+
+        self._compiled: dict[int, np.ndarray] = {}
+        self._resolved: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+
+    # ── Compilation ─────────────────────────────────────────────────
+
+    def _symbols(self, tickers) -> np.ndarray:
+        return _union([self.by_ticker.get(t, _EMPTY) for t in tickers or []])
+
+    def _compile(self, basket_id: int) -> np.ndarray:
+        """Basket membership: smart rules, legacy market/index reference or static list."""
+        basket_type, reference_id, rules = self.baskets[basket_id]
+
+        # Scenario A: Smart Basket with Rules
+        if rules:
+            ids = _union(
+                [self.by_exchange.get(code, _EMPTY) for code in rules.get("market_codes") or []]
+                + [self._symbols(rules.get("include_symbols"))]
+            )
+            if "exclude_symbols" in rules:
+                ids = np.setdiff1d(ids, self._symbols(rules["exclude_symbols"]), assume_unique=True)
+            return ids
+
+        # Scenario B / C: Legacy Market / Index Reference
+        if basket_type == BasketType.MARKET and reference_id is not None:
+            return self.by_market.get(reference_id, _EMPTY)
+        if basket_type == BasketType.INDEX and reference_id is not None:
+            return self.by_index.get(reference_id, _EMPTY)
+
+        # Scenario D: Static Custom Basket
+        return self.by_static_basket.get(basket_id, _EMPTY)
+
+    def basket_ids_array(self, basket_id: int) -> np.ndarray:
+        compiled = self._compiled.get(basket_id)
+        if compiled is None:
+            compiled = self._compile(basket_id)
+            self._compiled[basket_id] = compiled
+        return compiled
+
+    def market_ids_of(self, company_ids: np.ndarray) -> np.ndarray:
+        if not len(company_ids):
+            return _EMPTY
+        market_ids = self.company_market_ids[np.searchsorted(self.ids, company_ids)]
+        return np.unique(market_ids[market_ids >= 0])
+
+    def resolve(self, basket_ids: tuple, market_names: tuple) -> tuple[np.ndarray, np.ndarray]:
+        key = (basket_ids, market_names)
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            return resolved
+
+        missing = [b for b in basket_ids if b not in self.baskets]
+        if missing:
+            raise ValueError(f"Unknown basket IDs: {', '.join(str(b) for b in sorted(missing))}")
+
+        named_market_ids = _union([self.market_ids_by_name.get(n, _EMPTY) for n in market_names])
+        company_ids = _union(
+            [self.basket_ids_array(b) for b in basket_ids]
+            + [self.by_market.get(int(m), _EMPTY) for m in named_market_ids]
+        )
+        # Membership tables are read separately from companies; keep only known ids
+        company_ids = company_ids[np.isin(company_ids, self.ids, assume_unique=True)]
+        market_ids = _union([named_market_ids, self.market_ids_of(company_ids)])
+
+        if len(self._resolved) >= _MAX_MEMOIZED:
+            self._resolved.clear()
+        self._resolved[key] = (market_ids, company_ids)
+        return market_ids, company_ids
+
+    def refs(self, company_ids: np.ndarray) -> list[CompanyRef]:
+        positions = np.searchsorted(self.ids, company_ids)
+        return [self.company_refs[pos] for pos in positions.tolist()]
+
+
+# ── Snapshot lifecycle ──────────────────────────────────────────────
+
+_snapshot: _Snapshot | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def invalidate() -> None:
+    """Drop this process's snapshot; the next resolution rebuilds it."""
+    global _snapshot
+    _snapshot = None
+
+
+def _get_snapshot(db: Session) -> _Snapshot:
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < settings.UNIVERSE_CACHE_CHECK_SECONDS:
+        return snapshot
+
+    with _lock:
+        version = get_current_version(db, UNIVERSE)
+        if _snapshot is None or _snapshot.version != version:
+            start = time.time()
+            _snapshot = _Snapshot(db, version)
+            logger.info(
+                f"Universe cache: compiled {len(_snapshot.ids)} companies, "
+                f"{len(_snapshot.baskets)} baskets (v{version}) in {time.time() - start:.3f}s"
+            )
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+# ── Public API ──────────────────────────────────────────────────────
+
+def resolve_ids(
+    db: Session,
+    basket_ids: Iterable[int] | None = None,
+    market_names: Iterable[str] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return ``(market_ids, company_ids)`` as sorted int64 arrays for the union
+    of *basket_ids* and the markets named in *market_names*.
+    Raises ValueError for unknown basket ids.
+    """
+    snapshot = _get_snapshot(db)
+    return snapshot.resolve(
+        tuple(sorted(set(basket_ids or ()))),
+        tuple(sorted(set(market_names or ()))),
+    )
+
+
+def resolve_refs(
+    db: Session,
+    basket_ids: Iterable[int] | None = None,
+    market_names: Iterable[str] | None = None,
+) -> tuple[np.ndarray, list[CompanyRef]]:
+    """Like :func:`resolve_ids`, with lightweight company rows."""
+    snapshot = _get_snapshot(db)
+    market_ids, company_ids = snapshot.resolve(
+        tuple(sorted(set(basket_ids or ()))),
+        tuple(sorted(set(market_names or ()))),
+    )
+    return market_ids, snapshot.refs(company_ids)
+
+
+def all_company_refs(db: Session) -> list[CompanyRef]:
+    snapshot = _get_snapshot(db)
+    return snapshot.refs(snapshot.ids)
+
+
+# ── Invalidation hooks ──────────────────────────────────────────────
+
+_UNIVERSE_KEYS = {Company: "companies", Basket: "baskets", BasketCompany: "baskets"}
+_PENDING = "universe_cache_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_catalog_change(session: Session, flush_context) -> None:
+    touched = {
+        _UNIVERSE_KEYS[type(obj)]
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if type(obj) in _UNIVERSE_KEYS
+    }
+    pending = session.info.setdefault(_PENDING, set())
+    new_keys = touched - pending
+    if new_keys:
+        # Same transaction as the change itself: both commit or neither does
+        session.connection().execute(watermark_upsert(UNIVERSE, sorted(new_keys)))
+        pending.update(new_keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop(_PENDING, None):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING, None)
@@ -19,6 +19,8 @@ from database.market import Market
 from database.stock_data import StockPriceHistory, CompanyMarketData
 from api.valuation_preview import preview_day_value, fx_to_base_for_currency
 from services.fx.fx_rate_helper import get_fx_rate_for_date
+from services.valuation.valuation_version import mark_materialized
+from services.account_ledger import portfolio_state_at
 
 log = logging.getLogger(__name__)
 
@@ -48,78 +50,14 @@ def delete_range_pvd(db: Session, portfolio_id: int, start: date, end: date):
                PortfolioValuationDaily.date <= end)
       ).delete(synchronize_session=False)
     db.commit()
+    mark_materialized(db, portfolio_id)
 
 def _calculate_cash_balance(db: Session, portfolio_id: int, as_of: date, base_ccy: str) -> Decimal:
     """
-    Calculate actual cash balance by processing ALL cash-affecting transactions and
-    revaluing each currency position using FX as of the provided date.
+    Cash balance at end of as_of (account ledger state), with each currency
+    position revalued using FX as of the provided date.
     """
-    balances_by_ccy: Dict[str, Decimal] = {}
-
-    def _apply(ccy: str, delta: Decimal):
-        balances_by_ccy[ccy] = balances_by_ccy.get(ccy, Decimal("0")) + delta
-
-    cash_transactions = (
-        db.query(Transaction)
-        .filter(
-            Transaction.portfolio_id == portfolio_id,
-            func.date(Transaction.timestamp) <= as_of,
-        )
-        .order_by(Transaction.timestamp)
-        .all()
-    )
-
-    # Pre-fetch account currencies to handle auto-conversion
-    account_currencies = {
-        a_id: (ccy or "").upper() 
-        for a_id, ccy in db.query(Account.id, Account.currency).filter(Account.portfolio_id == portfolio_id).all()
-    }
-    
-    for tx in cash_transactions:
-        tx_ccy = (tx.currency or base_ccy).upper()
-        # If transaction account is same as base, we treat it as settled in base 
-        # (Auto-conversion at tx time using tx.currency_rate)
-        acc_ccy = account_currencies.get(tx.account_id, base_ccy)
-        
-        should_convert_to_base = (acc_ccy == base_ccy) and (tx_ccy != base_ccy)
-        
-        if should_convert_to_base:
-            # Use transaction rate to convert rigid flow to base
-            rate = _dec(tx.currency_rate or 1)
-            # Switch bucket to base
-            target_ccy = base_ccy
-            factor = rate
-        else:
-            target_ccy = tx_ccy
-            factor = Decimal("1")
-            
-        ttype = tx.transaction_type
-        delta = Decimal("0")
-
-        if ttype == TransactionType.DEPOSIT:
-            delta = _dec(tx.quantity)
-        elif ttype == TransactionType.WITHDRAWAL:
-            delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.DIVIDEND:
-            delta = _dec(tx.quantity)
-        elif ttype == TransactionType.INTEREST:
-            delta = _dec(tx.quantity)
-        elif ttype == TransactionType.FEE:
-            delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.TAX:
-            delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.TRANSFER_IN:
-            delta = _dec(tx.quantity)
-        elif ttype == TransactionType.TRANSFER_OUT:
-            delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.BUY:
-            total_cost = (_dec(tx.quantity) * _dec(tx.price or 0)) + _dec(tx.fee or 0)
-            delta = -total_cost
-        elif ttype == TransactionType.SELL:
-            total_proceeds = (_dec(tx.quantity) * _dec(tx.price or 0)) - _dec(tx.fee or 0)
-            delta = total_proceeds
-            
-        _apply(target_ccy, delta * factor)
+    balances_by_ccy, _ = portfolio_state_at(db, portfolio_id, as_of, base_ccy)
 
     cash_balance_base = Decimal("0")
     for ccy, amt in balances_by_ccy.items():
@@ -190,80 +128,12 @@ def _day_net_contributions(
 
 def _get_portfolio_state_at(db: Session, portfolio_id: int, as_of: date):
     """
-    Returns (cash_dict, positions_dict) at end of as_of.
-    Uses generic 'since beginning' approach but only called once.
+    Returns (cash_dict, positions_dict) at end of as_of, from the account
+    ledger (nearest checkpoint + later transactions).
     """
-    cash_map = {} # {ccy: Decimal}
-    pos_map = {}  # {company_id: Decimal}
-    
-    # Fetch ALL txs <= as_of
-    txs = (
-        db.query(Transaction)
-        .filter(
-            Transaction.portfolio_id == portfolio_id,
-            func.date(Transaction.timestamp) <= as_of
-        )
-        .order_by(Transaction.timestamp)
-        .all()
-    )
-    
     pf = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
     base_ccy = (pf.currency or "USD").upper()
-    
-    account_currencies = {
-        a_id: (ccy or "").upper() 
-        for a_id, ccy in db.query(Account.id, Account.currency).filter(Account.portfolio_id == portfolio_id).all()
-    }
-
-    for tx in txs:
-         # -- Cash --
-        tx_ccy = (tx.currency or base_ccy).upper()
-        acc_ccy = account_currencies.get(tx.account_id, base_ccy)
-        should_convert_to_base = (acc_ccy == base_ccy) and (tx_ccy != base_ccy)
-        
-        rate = _dec(tx.currency_rate or 1)
-        
-        if should_convert_to_base:
-            target_ccy = base_ccy
-            factor = rate
-        else:
-            target_ccy = tx_ccy
-            factor = Decimal("1")
-            
-        ttype = tx.transaction_type
-        delta = Decimal("0")
-        
-        if ttype == TransactionType.DEPOSIT: delta = _dec(tx.quantity)
-        elif ttype == TransactionType.WITHDRAWAL: delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.DIVIDEND: delta = _dec(tx.quantity)
-        elif ttype == TransactionType.INTEREST: delta = _dec(tx.quantity)
-        elif ttype == TransactionType.FEE: delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.TAX: delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.TRANSFER_IN: delta = _dec(tx.quantity)
-        elif ttype == TransactionType.TRANSFER_OUT: delta = -_dec(tx.quantity)
-        elif ttype == TransactionType.BUY:
-            total_cost = (_dec(tx.quantity) * _dec(tx.price or 0)) + _dec(tx.fee or 0)
-            delta = -total_cost
-        elif ttype == TransactionType.SELL:
-            total_proceeds = (_dec(tx.quantity) * _dec(tx.price or 0)) - _dec(tx.fee or 0)
-            delta = total_proceeds
-        
-        cash_map[target_ccy] = cash_map.get(target_ccy, Decimal("0")) + (delta * factor)
-        
-        # -- Positions --
-        if tx.company_id:
-            cid = tx.company_id
-            q = _dec(tx.quantity)
-            if ttype == TransactionType.BUY:
-                pos_map[cid] = pos_map.get(cid, Decimal("0")) + q
-            elif ttype == TransactionType.SELL:
-                pos_map[cid] = pos_map.get(cid, Decimal("0")) - q
-            elif ttype == TransactionType.TRANSFER_IN:
-                pos_map[cid] = pos_map.get(cid, Decimal("0")) + q
-            elif ttype == TransactionType.TRANSFER_OUT:
-                pos_map[cid] = pos_map.get(cid, Decimal("0")) - q
-                
-    return cash_map, pos_map
+    return portfolio_state_at(db, portfolio_id, as_of, base_ccy)
 
 def _get_companies_valuation(db: Session, as_of: date, company_ids: list[int], base_ccy: str, portfolio_id: int):
     """
@@ -474,6 +344,7 @@ def run_materialize_day(
 
     db.execute(stmt)
     db.commit()
+    mark_materialized(db, portfolio_id)
 
     return {
         "message": "materialized",
@@ -495,7 +366,16 @@ def run_materialize_range(
     start: date,
     end: date,
     db: Session,
+    only_dates: Optional[set[date]] = None,
 ):
+    """
+    Materialize [start..end] in one pass, rolling cash and positions forward
+    day by day from the state at start - 1.
+
+    With *only_dates*, transactions are still applied for every day but only
+    those dates are valued and upserted (used to fill gaps between existing
+    rows without rewriting them).
+    """
     if end < start:
         raise ValueError("end < start")
 
@@ -540,6 +420,11 @@ def run_materialize_range(
     txs_by_date = defaultdict(list)
     for tx in range_txs:
         txs_by_date[tx.timestamp.date()].append(tx)
+
+    account_currencies = {
+        a_id: (ccy or "").upper() 
+        for a_id, ccy in db.query(Account.id, Account.currency).filter(Account.portfolio_id == portfolio_id).all()
+    }
         
     out = []
     
@@ -550,12 +435,6 @@ def run_materialize_range(
         todays_txs = txs_by_date.get(cur, [])
         
         daily_net_contrib = Decimal("0")
-        
-        # Pre-fetch account currencies (cached map)
-        account_currencies = {
-            a_id: (ccy or "").upper() 
-            for a_id, ccy in db.query(Account.id, Account.currency).filter(Account.portfolio_id == portfolio_id).all()
-        }
 
         for tx in todays_txs:
             # -- Update Cash --
@@ -629,6 +508,10 @@ def run_materialize_range(
                 else:
                     daily_net_contrib += val
 
+        if only_dates is not None and cur not in only_dates:
+            cur += timedelta(days=1)
+            continue
+
         # B. Calculate Valuation
         
         # 1. Cash Value in Base
@@ -729,4 +612,6 @@ def run_materialize_range(
         cur += timedelta(days=1)
 
     db.commit()
+    if out:
+        mark_materialized(db, portfolio_id)
     return {"portfolio_id": portfolio_id, "points": out}
@@ -0,0 +1,247 @@
+"""
+Debounced background queue for portfolio rematerialization.
+
+Write endpoints used to call ``rematerialize_from_tx`` inline: every call
+deleted and recomputed all valuation days from the transaction date to today,
+so entering ten backdated transactions ran ten overlapping rebuilds while the
+user waited.  Now they call :func:`enqueue_rematerialization`, which records
+``(portfolio, earliest dirty date)`` in ``rematerialization_queue`` and
+returns at once:
+
+* repeated requests coalesce into one row, keeping the earliest date;
+* a row is processed once no new request arrived for
+  ``REMATERIALIZE_DEBOUNCE_SECONDS`` (or its first request is older than
+  ``REMATERIALIZE_MAX_WAIT_SECONDS``);
+* one daemon thread per process drains due rows; claiming a row is an atomic
+  UPDATE, so several processes never rebuild the same request twice.  Claims
+  older than ``_STALE_CLAIM`` (crashed worker) are taken over.
+
+After each rebuild the worker also refreshes the portfolio's stored dashboard
+returns (``services/portfolio_returns_service.py``).
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, delete, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.base import SessionLocal
+from database.rematerialization import RematerializationRequest as Q
+
+logger = logging.getLogger(__name__)
+
+_IDLE_POLL_SECONDS = 30.0
+_STALE_CLAIM = timedelta(minutes=30)
+_MAX_ATTEMPTS = 5
+
+_wake = threading.Event()
+_worker: threading.Thread | None = None
+_worker_lock = threading.Lock()
+
+
+# ── Producers ───────────────────────────────────────────────────────
+
+def enqueue_rematerialization(db: Session, portfolio_id: int, dirty_from: date) -> bool:
+    """
+    Request a valuation rebuild of *portfolio_id* from *dirty_from* to today.
+    Commits; returns False (logged) if the request could not be recorded.
+    """
+    now = datetime.utcnow()
+    stmt = insert(Q).values(
+        portfolio_id=portfolio_id,
+        dirty_from=dirty_from,
+        requested_at=now,
+        first_requested_at=now,
+        attempts=0,
+    )
+    excluded = stmt.excluded
+    claimed = Q.claimed_at.isnot(None)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Q.portfolio_id],
+        set_={
+            # A running rebuild keeps its date; new work waits in pending_from
+            "dirty_from": case(
+                (claimed, Q.dirty_from),
+                else_=func.least(Q.dirty_from, excluded.dirty_from),
+            ),
+            "pending_from": case(
+                (claimed, func.least(func.coalesce(Q.pending_from, excluded.dirty_from), excluded.dirty_from)),
+                else_=Q.pending_from,
+            ),
+            "requested_at": excluded.requested_at,
+        },
+    )
+    try:
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to queue rematerialization of portfolio {portfolio_id} from {dirty_from}: {e}")
+        return False
+
+    start_worker()
+    _wake.set()
+    return True
+
+
+def get_pending_from(db: Session, portfolio_id: int) -> date | None:
+    """Earliest date still waiting to be rematerialized, or None."""
+    row = db.query(Q.dirty_from, Q.pending_from).filter(Q.portfolio_id == portfolio_id).first()
+    if row is None:
+        return None
+    return min(d for d in row if d is not None)
+
+
+# ── Consumer ────────────────────────────────────────────────────────
+
+def _claim(db: Session, portfolio_id: int, now: datetime):
+    """Atomically take a due row; returns (dirty_from,) or None if someone else has it."""
+    stmt = (
+        update(Q)
+        .where(
+            Q.portfolio_id == portfolio_id,
+            or_(Q.claimed_at.is_(None), Q.claimed_at < now - _STALE_CLAIM),
+        )
+        .values(claimed_at=now, attempts=Q.attempts + 1)
+        .returning(Q.dirty_from)
+    )
+    row = db.execute(stmt).first()
+    db.commit()
+    return row
+
+
+def _finish(db: Session, portfolio_id: int) -> None:
+    """Drop the row, or turn requests that arrived meanwhile into the next run."""
+    result = db.execute(delete(Q).where(Q.portfolio_id == portfolio_id, Q.pending_from.is_(None)))
+    if not result.rowcount:
+        now = datetime.utcnow()
+        db.execute(
+            update(Q)
+            .where(Q.portfolio_id == portfolio_id)
+            .values(
+                dirty_from=Q.pending_from,
+                pending_from=None,
+                claimed_at=None,
+                attempts=0,
+                last_error=None,
+                first_requested_at=now,
+            )
+        )
+    db.commit()
+
+
+def _fail(db: Session, portfolio_id: int, error: Exception) -> None:
+    db.rollback()
+    now = datetime.utcnow()
+    db.execute(
+        update(Q)
+        .where(Q.portfolio_id == portfolio_id)
+        .values(
+            dirty_from=func.least(Q.dirty_from, func.coalesce(Q.pending_from, Q.dirty_from)),
+            pending_from=None,
+            claimed_at=None,
+            # Retry after a fresh debounce interval
+            requested_at=now,
+            first_requested_at=now,
+            last_error=str(error)[:2000],
+        )
+    )
+    db.commit()
+
+
+def _run_one(db: Session, portfolio_id: int, dirty_from: date) -> None:
+    from services.portfolio_returns_service import refresh_portfolio_returns
+    from services.valuation.rematerializ import rematerialize_from_tx
+
+    start = time.time()
+    rematerialize_from_tx(db, portfolio_id, dirty_from)
+    # rematerialize_from_tx leaves the account cash sync uncommitted
+    db.commit()
+    logger.info(
+        f"Rematerialized portfolio {portfolio_id} from {dirty_from} in {time.time() - start:.2f}s"
+    )
+
+    # Stored dashboard returns are a by-product of the rebuild; a failure here
+    # only means the next page load computes them itself
+    try:
+        refresh_portfolio_returns(db, portfolio_id)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Refreshing stored returns of portfolio {portfolio_id} failed: {e}")
+
+
+def process_due(db: Session) -> float | None:
+    """
+    Rebuild every due portfolio.  Returns seconds until the next queued row
+    becomes due, or None when nothing else is waiting.
+    """
+    now = datetime.utcnow()
+    debounce = timedelta(seconds=settings.REMATERIALIZE_DEBOUNCE_SECONDS)
+    max_wait = timedelta(seconds=settings.REMATERIALIZE_MAX_WAIT_SECONDS)
+    due_filter = or_(Q.requested_at <= now - debounce, Q.first_requested_at <= now - max_wait)
+
+    due = [
+        pid for (pid,) in db.query(Q.portfolio_id)
+        .filter(due_filter, or_(Q.claimed_at.is_(None), Q.claimed_at < now - _STALE_CLAIM))
+        .order_by(Q.first_requested_at)
+        .all()
+    ]
+    for portfolio_id in due:
+        claimed = _claim(db, portfolio_id, datetime.utcnow())
+        if claimed is None:
+            continue
+        try:
+            _run_one(db, portfolio_id, claimed[0])
+            _finish(db, portfolio_id)
+        except Exception as e:
+            logger.error(f"Rematerialization of portfolio {portfolio_id} failed: {e}")
+            _fail(db, portfolio_id, e)
+
+    # Give up on rows that keep failing so they don't spin forever
+    dropped = db.execute(
+        delete(Q).where(Q.attempts >= _MAX_ATTEMPTS, Q.claimed_at.is_(None)).returning(Q.portfolio_id)
+    ).scalars().all()
+    db.commit()
+    if dropped:
+        logger.error(f"Dropped rematerialization requests after {_MAX_ATTEMPTS} failures: {dropped}")
+
+    waiting = (
+        db.query(func.min(func.least(Q.requested_at + debounce, Q.first_requested_at + max_wait)))
+        .filter(Q.claimed_at.is_(None))
+        .scalar()
+    )
+    if waiting is None:
+        return None
+    return max((waiting - datetime.utcnow()).total_seconds(), 0.1)
+
+
+def _worker_loop() -> None:
+    timeout = 0.0  # drain leftovers from a previous run right away
+    while True:
+        _wake.wait(timeout)
+        _wake.clear()
+        db = SessionLocal()
+        try:
+            next_due = process_due(db)
+        except Exception as e:
+            logger.error(f"Rematerialization worker error: {e}")
+            next_due = None
+        finally:
+            db.close()
+        timeout = min(next_due, _IDLE_POLL_SECONDS) if next_due is not None else _IDLE_POLL_SECONDS
+
+
+def start_worker() -> None:
+    """Start this process's queue worker thread (idempotent)."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="rematerialize-queue", daemon=True)
+            _worker.start()
+            logger.info("Rematerialization queue worker started")
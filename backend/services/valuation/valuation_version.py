@@ -0,0 +1,115 @@
+"""
+Per-portfolio materialization version, for conditional valuation responses.
+
+Every write to ``portfolio_valuation_daily`` bumps the portfolio's
+``valuation`` ingestion watermark (see ``services/ingestion_watermarks.py``).
+Endpoints derive their ETag from that version, so an unchanged portfolio
+answers ``If-None-Match`` with 304.
+
+Versions are memoized per process: a local materialization updates the memo
+at once, other processes' writes are noticed within
+``VALUATION_VERSION_CHECK_SECONDS``.  Within that window a repeated request is
+answered without any database query.
+
+:func:`get_live_inputs_version` is the newest watermark among the data
+today's valuation is built from (cash, prices of open positions, FX); a
+materialization stamped after it is current.
+"""
+import threading
+import time
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database.company import Company
+from database.market import Market
+from database.portfolio import Portfolio
+from database.position import PortfolioPositions
+from database.valuation import PortfolioValuationDaily
+from services.ingestion_watermarks import (
+    FX,
+    PRICE,
+    USER_DATA,
+    VALUATION,
+    bump_watermarks,
+    fx_key,
+    get_watermarks,
+)
+
+_versions: dict[int, tuple[int, float]] = {}  # portfolio_id → (version, checked_at)
+_lock = threading.Lock()
+
+
+def get_valuation_version(db: Session, portfolio_id: int) -> int:
+    """Current materialization version of *portfolio_id* (0 if never written)."""
+    cached = _versions.get(portfolio_id)
+    if cached and time.monotonic() - cached[1] < settings.VALUATION_VERSION_CHECK_SECONDS:
+        return cached[0]
+
+    version = get_watermarks(db, VALUATION, [portfolio_id]).get(str(portfolio_id), 0)
+    with _lock:
+        _versions[portfolio_id] = (version, time.monotonic())
+    return version
+
+
+def mark_materialized(db: Session, portfolio_id: int) -> None:
+    """Record that *portfolio_id*'s daily rows changed (call after committing them)."""
+    version = bump_watermarks(db, VALUATION, [portfolio_id])
+    with _lock:
+        if version is None:
+            # Bump failed: force a re-read instead of trusting the memo
+            _versions.pop(portfolio_id, None)
+        else:
+            _versions[portfolio_id] = (version, time.monotonic())
+
+
+def get_live_inputs_version(db: Session, portfolio: Portfolio) -> int:
+    """Highest watermark among *portfolio*'s cash, open positions' prices and their FX pairs."""
+    account_ids = [a.id for a in portfolio.accounts]
+    positions = []
+    if account_ids:
+        # Open positions and their currencies, as get_holdings_for_user resolves them
+        positions = (
+            db.query(PortfolioPositions.company_id, PortfolioPositions.instrument_currency_code, Market.currency)
+            .join(Company, Company.company_id == PortfolioPositions.company_id)
+            .outerjoin(Market, Market.market_id == Company.market_id)
+            .filter(PortfolioPositions.account_id.in_(account_ids), PortfolioPositions.quantity > 0)
+            .all()
+        )
+    company_ids = {cid for cid, _, _ in positions}
+    currencies = {market_ccy or pos_ccy for _, pos_ccy, market_ccy in positions} - {portfolio.currency, None}
+    pairs = [fx_key(ccy, portfolio.currency) for ccy in currencies]
+    pairs += [fx_key(portfolio.currency, ccy) for ccy in currencies]
+
+    versions = list(get_watermarks(db, USER_DATA, [f"portfolio:{portfolio.id}"]).values())
+    versions += get_watermarks(db, PRICE, company_ids).values()
+    versions += get_watermarks(db, FX, pairs).values()
+    return max(versions, default=0)
+
+
+def is_today_current(db: Session, portfolio: Portfolio) -> bool:
+    """Whether today's valuation row exists and was materialized after its inputs last changed."""
+    has_today = (
+        db.query(PortfolioValuationDaily.id)
+        .filter(PortfolioValuationDaily.portfolio_id == portfolio.id, PortfolioValuationDaily.date == date.today())
+        .first()
+        is not None
+    )
+    if not has_today:
+        return False
+    # Read, not memoized: another process may have just materialized
+    version = get_watermarks(db, VALUATION, [portfolio.id]).get(str(portfolio.id), 0)
+    return version > get_live_inputs_version(db, portfolio)
+
+
+def matches_etag(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against *etag*."""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
@@ -0,0 +1,108 @@
+"""
+Vectorized XIRR (money-weighted return) solver.
+
+Solves ``Σ cf_i / (1 + r)^t_i = 0`` with ``t_i`` = days since the first
+flow / 365, for many flow sets at once: flows are padded into one
+``(problems × flows)`` matrix and NPV is evaluated with array operations.
+
+The iteration is the former per-set secant solver, run for all sets in
+lock-step, so it accepts the same roots: starting guesses 0.1, -0.1, 0.5,
+-0.5 and 0 are tried in turn, each with up to 50 steps using a forward
+difference slope; the first guess converging to a non-zero rate inside
+``(-0.999, 100)`` wins, and sets where none does solve to 0.  Evaluations
+that overflow or turn non-real (``1 + r < 0``) fail that guess, as the
+exceptions did in the scalar version.  ``scripts/check_xirr.py`` compares
+both on random flow sets.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Sequence
+
+import numpy as np
+
+R_MIN = -0.999
+R_MAX = 100.0
+GUESSES = (0.1, -0.1, 0.5, -0.5, 0.0)
+_MAX_ITER = 50
+_NPV_TOL = 1e-5    # |NPV| accepted as a root
+_STEP_TOL = 1e-5   # rate step accepted as converged
+_DIFF = 1e-5       # forward difference for the slope
+_MIN_SLOPE = 1e-10
+
+Flows = Sequence[tuple[date, Decimal | float]]
+
+
+def _pack(flow_sets: Sequence[Flows]) -> tuple[np.ndarray, np.ndarray]:
+    """(year fractions, amounts) matrices, zero-padded to the longest flow set."""
+    width = max((len(f) for f in flow_sets), default=0)
+    years = np.zeros((len(flow_sets), width))
+    amounts = np.zeros((len(flow_sets), width))
+    for i, flows in enumerate(flow_sets):
+        if not flows:
+            continue
+        t0 = flows[0][0].toordinal()
+        years[i, : len(flows)] = [(d.toordinal() - t0) / 365.0 for d, _ in flows]
+        amounts[i, : len(flows)] = [float(v) for _, v in flows]
+    return years, amounts
+
+
+def _npv(rates: np.ndarray, years: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """NPV per problem at *rates* (one rate per row); NaN/inf where it is undefined."""
+    with np.errstate(all="ignore"):
+        return (amounts / np.power((1.0 + rates)[:, None], years)).sum(axis=1)
+
+
+def _solve(guess: float, years: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """Secant iteration from *guess* for every problem; NaN where it does not converge."""
+    rate = np.full(len(amounts), guess)
+    result = np.full(len(amounts), np.nan)
+    active = np.ones(len(amounts), dtype=bool)
+
+    for _ in range(_MAX_ITER):
+        if not active.any():
+            break
+        npv = _npv(rate, years, amounts)
+        active &= np.isfinite(npv)
+        root = active & (np.abs(npv) < _NPV_TOL)
+        result = np.where(root, rate, result)
+        active &= ~root
+
+        npv_d = _npv(rate + _DIFF, years, amounts)
+        active &= np.isfinite(npv_d)
+        with np.errstate(all="ignore"):
+            slope = (npv_d - npv) / _DIFF
+            active &= ~(np.abs(slope) < _MIN_SLOPE)
+            new_rate = rate - npv / slope
+
+        converged = active & (np.abs(new_rate - rate) < _STEP_TOL)
+        result = np.where(converged, new_rate, result)
+        active &= ~converged
+        rate = np.where(active, new_rate, rate)
+    return result
+
+
+def xirr_batch(flow_sets: Sequence[Flows]) -> np.ndarray:
+    """
+    Annualized IRR of each flow set (dates ascending, first flow defines t=0).
+    Returns 0.0 for empty sets and where no guess converges inside (-0.999, 100).
+    """
+    if not flow_sets:
+        return np.zeros(0)
+    years, amounts = _pack(flow_sets)
+    rates = np.zeros(len(flow_sets))
+    pending = np.array([bool(flows) for flows in flow_sets])
+
+    for guess in GUESSES:
+        if not pending.any():
+            break
+        idx = np.flatnonzero(pending)
+        found = _solve(guess, years[idx], amounts[idx])
+        ok = (found != 0) & (found > R_MIN) & (found < R_MAX)  # NaN compares False
+        rates[idx[ok]] = found[ok]
+        pending[idx[ok]] = False
+    return rates
+
+
+def xirr(flows: Flows) -> float:
+    """Annualized IRR of one flow set (see :func:`xirr_batch`)."""
+    return float(xirr_batch([flows])[0])
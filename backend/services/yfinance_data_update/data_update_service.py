@@ -17,7 +17,10 @@ from services.company.company_service import get_or_create_company
 from services.fundamentals.financials_batch_update_service import (
     update_financials_for_tickers,
 )
+from services.ingestion_watermarks import PRICE, bump_watermarks
 from services.market.market_service import get_or_create_market
+from services.latest_bar_service import refresh_latest_bars
+from services.screening_facts_service import refresh_screening_facts
 from services.stock_data.stock_data_service import (
     fetch_and_save_stock_price_history_data,
     update_smas_for_company,
@@ -272,6 +275,12 @@ def fetch_and_save_stock_price_history_data_batch(
                 except Exception as e:
                     logger.error(f"SMA update failed for {comp.ticker}: {e}")
 
+        # Bump after the SMAs and latest bars so consumers never see the new bars without them
+        changed_ids = sma_company_ids | ({c.company_id for c in companies} if force_update else set())
+        refresh_latest_bars(db, changed_ids)
+        bump_watermarks(db, PRICE, changed_ids)
+        refresh_screening_facts(db, [c.company_id for c in companies])
+
         return {"status": "success", "inserted": len(mappings)}
     else:
         insert_end = time.time()
@@ -279,6 +288,7 @@ def fetch_and_save_stock_price_history_data_batch(
         logger.info(f"[TIMER] No rows to insert: {insert_end - insert_start:.3f}s")
 
         # Even if no new rows, SMAs might be missing from prior runs
+        changed_ids = {c.company_id for c in companies} if force_update else set()
         for comp in companies:
             try:
                 latest_sph = (
@@ -289,8 +299,13 @@ def fetch_and_save_stock_price_history_data_batch(
                 )
                 if latest_sph and (latest_sph.sma_50 is None or latest_sph.sma_200 is None):
                     update_smas_for_company(db, comp.company_id, market_obj.market_id)
+                    changed_ids.add(comp.company_id)
             except Exception as e:
                 logger.error(f"SMA backfill failed for {comp.ticker}: {e}")
+        refresh_latest_bars(db, changed_ids)
+        bump_watermarks(db, PRICE, changed_ids)
+        # Current price moved even without new bars
+        refresh_screening_facts(db, [c.company_id for c in companies])
 
         return {"status": "success", "inserted": 0}
 
@@ -361,5 +376,6 @@ def ensure_fresh_data(
         )
         if latest_sph and (latest_sph.sma_50 is None or latest_sph.sma_200 is None):
             update_smas_for_company(db, company.company_id, market.market_id)
+            refresh_latest_bars(db, [company.company_id])
     except Exception as e:
         logger.error(f"Failed to backfill SMAs for {ticker}: {e}")
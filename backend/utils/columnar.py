@@ -0,0 +1,38 @@
+"""
+Columnar chart payloads.
+
+Chart endpoints return one dict per day by default ("rows").  With
+``format=columnar`` they return parallel arrays per field instead, built
+straight from the DataFrame columns, and encode them with orjson — no
+per-row dicts and no recursive NaN/NumPy sanitizing pass.  The row format
+stays the default for existing clients.
+"""
+from typing import Any, Literal, Optional
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+
+ChartFormat = Literal["rows", "columnar"]
+
+
+def column(values, decimals: Optional[int] = None) -> list:
+    """
+    Float column as a JSON-ready list: optionally rounded, NaN/±inf as None.
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    if decimals is not None:
+        arr = np.round(arr, decimals)
+    out = arr.tolist()
+    invalid = ~np.isfinite(arr)
+    if invalid.any():
+        for i in np.flatnonzero(invalid):
+            out[i] = None
+    return out
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson-encoded response; NumPy arrays/scalars allowed, NaN/inf become null."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
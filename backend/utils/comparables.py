@@ -1,9 +1,22 @@
+from bisect import bisect_left
+from math import isnan
+
 from sqlalchemy.orm import Session
 from database.company import Company
 from database.financials import CompanyFinancials
-from database.market import Market
+from services.industry_aggregate_service import get_industry_aggregate
 import numpy as np
 
+# Ratios aggregated per industry in ``industry_aggregates``
+PEER_METRICS = ("p_e_ratio", "ev_ebitda", "p_b_ratio", "dividend_yield")
+# Column prefix of each ratio in ``industry_aggregates``
+_COLUMNS = {
+    "p_e_ratio": "pe_ratio",
+    "ev_ebitda": "ev_ebitda",
+    "p_b_ratio": "p_b_ratio",
+    "dividend_yield": "dividend_yield",
+}
+
 
 def safe_avg(vals):
     vals = [v for v in vals if v]
@@ -21,87 +34,96 @@ def to_python(val):
     return val
 
 
-def build_peer_comparisons(company: Company, db: Session) -> dict:
-    # Adjust: check for company.market instead of company.market
-    if not company.industry or not company.market:
-        return {}
+def _rounded(val, decimals: int = 2):
+    return round(val, decimals) if val is not None else None
+
+
+def company_peer_metrics(fin: CompanyFinancials) -> dict:
+    """
+    Valuation ratios of one company as used for peer comparison.
+
+    Mirrored in SQL by ``services/industry_aggregate_service`` — keep both in
+    sync.  Zero and NaN ratios count as missing.
+    """
+    metrics = dict.fromkeys(PEER_METRICS)
+    price = fin.current_price
+
+    eps = fin.diluted_eps or fin.basic_eps
+    if price is not None and eps and eps > 0:
+        metrics["p_e_ratio"] = price / eps
+
+    if fin.ebitda not in (None, 0):
+        market_cap = fin.shares_outstanding * price if fin.shares_outstanding and price else 0
+        ev = fin.enterprise_value
+        if ev is None:
+            ev = market_cap + (fin.total_debt or 0) - (fin.cash_and_cash_equivalents or 0)
+        metrics["ev_ebitda"] = ev / fin.ebitda
 
-    market = company.market
-
-    # Adjust: filter by Company.market_id
-    peers = (
-        db.query(CompanyFinancials)
-        .join(Company)
-        .filter(
-            Company.industry == company.industry,
-            Company.market_id == market.market_id,
-            Company.company_id != company.company_id,
-        )
-        .all()
+    equity = (
+        fin.enterprise_value - (fin.total_debt or 0) + (fin.cash_and_cash_equivalents or 0)
+        if fin.enterprise_value
+        else None
     )
+    if price is not None and equity and fin.shares_outstanding:
+        book_value_per_share = equity / fin.shares_outstanding
+        if book_value_per_share != 0:
+            metrics["p_b_ratio"] = price / book_value_per_share
+
+    market_cap = fin.shares_outstanding * price if fin.shares_outstanding and price else None
+    if market_cap not in (None, 0):
+        metrics["dividend_yield"] = (fin.dividends_paid or 0) / market_cap
+
+    return {k: (v if v and not isnan(v) else None) for k, v in metrics.items()}
+
+
+def _without(values: list[float], own: float) -> list[float]:
+    """*values* (sorted) minus the entry closest to *own*."""
+    i = bisect_left(values, own)
+    if i == len(values) or (i > 0 and own - values[i - 1] < values[i] - own):
+        i -= 1
+    return values[:i] + values[i + 1:]
+
+
+def build_peer_comparisons(company: Company, db: Session) -> dict:
+    """
+    Industry statistics of each valuation ratio for *company*, from its
+    ``industry_aggregates`` row (same listing market and industry).
+
+    ``industry_avg`` averages the peers without the company itself; quartiles
+    cover the whole industry; ``percentile_rank`` is the share of peers below
+    the company's own ratio.
+    """
+    if not company.industry or not company.market_id:
+        return {}
 
-    pe_list = []
-    for peer in peers:
-        eps = peer.diluted_eps or peer.basic_eps
-        price = peer.current_price
-        if price is not None and eps and eps > 0:
-            pe_list.append(price / eps)
-
-    ev_ebitda_list = []
-    for peer in peers:
-        if peer.ebitda not in (None, 0):
-            market_cap = (
-                peer.shares_outstanding * peer.current_price
-                if peer.shares_outstanding and peer.current_price
-                else 0
-            )
-            ev = peer.enterprise_value
-            if ev is None:
-                ev = (
-                    market_cap
-                    + (peer.total_debt or 0)
-                    - (peer.cash_and_cash_equivalents or 0)
-                )
-            ev_ebitda_list.append(ev / peer.ebitda)
-
-    pb_list = []
-    for peer in peers:
-        price = peer.current_price
-        equity = (
-            peer.enterprise_value
-            - (peer.total_debt or 0)
-            + (peer.cash_and_cash_equivalents or 0)
-            if peer.enterprise_value
-            else None
-        )
-        if price is not None and equity and peer.shares_outstanding:
-            book_value_per_share = equity / peer.shares_outstanding
-            if book_value_per_share != 0:
-                pb_list.append(price / book_value_per_share)
-
-    div_list = []
-    for peer in peers:
-        market_cap = (
-            peer.shares_outstanding * peer.current_price
-            if peer.shares_outstanding and peer.current_price
-            else None
-        )
-        if market_cap not in (None, 0):
-            dividend_yield = (peer.dividends_paid or 0) / market_cap
-            div_list.append(dividend_yield)
-
-    rev_growth_list = [
-        peer.revenue_growth
-        for peer in peers
-        if hasattr(peer, "revenue_growth") and peer.revenue_growth is not None
-    ]
-
-    return {
-        "p_e_ratio": {"industry_avg": to_python(rounded_safe_avg(pe_list))},
-        "ev_ebitda": {"industry_avg": to_python(rounded_safe_avg(ev_ebitda_list))},
-        "p_b_ratio": {"industry_avg": to_python(rounded_safe_avg(pb_list))},
-        "dividend_yield": {"industry_avg": to_python(rounded_safe_avg(div_list))},
-        "revenue_growth": {
-            "industry_avg": to_python(rounded_safe_avg(rev_growth_list))
-        },
-    }
+    agg = get_industry_aggregate(db, company.market_id, company.industry)
+    fin = company.financials[0] if company.financials else None
+    own = company_peer_metrics(fin) if fin is not None else dict.fromkeys(PEER_METRICS)
+    is_member = agg is not None and company.company_id in agg.company_ids
+
+    result = {}
+    for metric in PEER_METRICS:
+        if agg is None:
+            result[metric] = {"industry_avg": None}
+            continue
+        column = _COLUMNS[metric]
+        peers = list(getattr(agg, f"{column}_values") or [])
+        own_value = own[metric]
+        if is_member and own_value is not None and peers:
+            peers = _without(peers, own_value)
+
+        entry = {
+            "industry_avg": to_python(rounded_safe_avg(peers)),
+            "industry_median": _rounded(getattr(agg, f"{column}_median")),
+            "industry_p25": _rounded(getattr(agg, f"{column}_p25")),
+            "industry_p75": _rounded(getattr(agg, f"{column}_p75")),
+            "percentile_rank": None,
+        }
+        if own_value is not None and peers:
+            entry["percentile_rank"] = round(bisect_left(peers, own_value) / len(peers) * 100, 1)
+        result[metric] = entry
+
+    # No growth series in company_financials; kept for the response shape
+    result["revenue_growth"] = {"industry_avg": None}
+    result["peer_count"] = (agg.peer_count - int(is_member)) if agg is not None else 0
+    return result
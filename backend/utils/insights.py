@@ -2,6 +2,7 @@
 from sqlalchemy.orm import Session
 from database.financials import CompanyFinancialHistory, CompanyFinancials
 import pandas as pd
+from utils.columnar import column
 
 
 def clean_nan_dict(d: dict) -> dict:
@@ -149,8 +150,15 @@ def build_investor_metrics(
 
 
 def build_extended_technical_analysis(
-    stock_history: list[tuple], short_window: int = 50, long_window: int = 200
+    stock_history: list[tuple],
+    short_window: int = 50,
+    long_window: int = 200,
+    columnar: bool = False,
 ) -> dict:
+    """
+    Summary indicators plus the per-date close/SMA series as ``historical``:
+    a list of per-date dicts, or parallel arrays per field when *columnar*.
+    """
     # 1) Build DataFrame
     df = pd.DataFrame(stock_history, columns=["date", "close"])
     df["close"] = pd.to_numeric(df["close"], errors="coerce")
@@ -185,21 +193,29 @@ def build_extended_technical_analysis(
             & (df["sma_short"].shift(1) >= df["sma_long"].shift(1))
         ).any()
 
-    # 4) Build one per-date list
-    historical = []
-    for row in df.itertuples(index=False):
-        historical.append(
-            {
-                "date": row.date.isoformat(),
-                "close": round(row.close, 4),
-                "sma_short": (
-                    round(row.sma_short, 4) if not pd.isna(row.sma_short) else None
-                ),
-                "sma_long": (
-                    round(row.sma_long, 4) if not pd.isna(row.sma_long) else None
-                ),
-            }
-        )
+    # 4) Build one per-date list (or one array per field)
+    if columnar:
+        historical = {
+            "date": [d.isoformat() for d in df["date"]],
+            "close": column(df["close"], 4),
+            "sma_short": column(df["sma_short"], 4),
+            "sma_long": column(df["sma_long"], 4),
+        }
+    else:
+        historical = []
+        for row in df.itertuples(index=False):
+            historical.append(
+                {
+                    "date": row.date.isoformat(),
+                    "close": round(row.close, 4),
+                    "sma_short": (
+                        round(row.sma_short, 4) if not pd.isna(row.sma_short) else None
+                    ),
+                    "sma_long": (
+                        round(row.sma_long, 4) if not pd.isna(row.sma_long) else None
+                    ),
+                }
+            )
 
     # 5) Package up and clean any NaNs → None
     payload = {